@@ -92,7 +92,30 @@ class SimplesAdmin(admin.ModelAdmin):
 
 @admin.register(CargaLog)
 class CargaLogAdmin(admin.ModelAdmin):
-    list_display = ["arquivo", "competencia", "qtd_registros", "status", "inicio", "fim"]
+    list_display = [
+        "arquivo",
+        "competencia",
+        "qtd_registros",
+        "status",
+        "linhas_s",
+        "mb_s",
+        "rss_mb_max",
+        "inicio",
+        "fim",
+    ]
     list_filter = ["status", "competencia"]
     search_fields = ["arquivo"]
-    readonly_fields = ["inicio", "fim"]
+    readonly_fields = ["inicio", "fim", "bytes_lidos", "metricas"]
+
+    # Métricas publicadas ao vivo pela telemetria do ETL (cnpj.telemetria)
+    @admin.display(description="Linhas/s")
+    def linhas_s(self, obj):
+        return obj.metricas.get("linhas_s", "-")
+
+    @admin.display(description="MB/s")
+    def mb_s(self, obj):
+        return obj.metricas.get("mb_s", "-")
+
+    @admin.display(description="RSS máx. (MB)")
+    def rss_mb_max(self, obj):
+        return obj.metricas.get("rss_mb_max") or "-"
@@ -0,0 +1,28 @@
+"""
+Utilitários de benchmark do portal CNPJ.
+
+Os comandos `bench_*` usam estas funções para resumir latências de forma
+comparável entre execuções (p50/p95/p99/máximo, em milissegundos).
+"""
+
+import math
+
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil por nearest-rank (p em 0–100). Lista vazia → 0.0."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    rank = max(1, math.ceil(p / 100 * len(ordenados)))
+    return ordenados[rank - 1]
+
+
+def resumo_latencias(valores_ms: list[float]) -> dict:
+    """Resumo padrão de uma série de latências em ms."""
+    return {
+        "n": len(valores_ms),
+        "p50": round(percentil(valores_ms, 50), 2),
+        "p95": round(percentil(valores_ms, 95), 2),
+        "p99": round(percentil(valores_ms, 99), 2),
+        "max": round(max(valores_ms), 2) if valores_ms else 0.0,
+    }
@@ -0,0 +1,213 @@
+"""
+Teste de carga HTTP da API: mix de requisições, disparo concorrente e
+orçamento de latência.
+
+O mix é gerado a partir do vocabulário de `cnpj.bench.sintetico`, então
+casa com os dados semeados pelo `loadtest_api --popular`. Categorias:
+
+    cnpj_prefixo     /api/busca/?q=<prefixo do CNPJ básico>
+    nome_fuzzy       /api/busca/?q=<nome com erro de digitação>[&uf=]
+    filtros          /api/busca/ só com filtros exatos (uf, situação, CNAE…)
+    pagina_profunda  /api/busca/ só com filtros, páginas perto do limite do from/size
+    detalhe          /api/cnpj/<básico>/
+    stats            /api/stats/
+
+Cada resposta é medida no cliente (tempo de parede até o corpo completo);
+as contagens de SQL/ES vêm dos headers do `InstrumentacaoMiddleware`.
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+
+from cnpj.bench import resumo_latencias
+from cnpj.bench.sintetico import _CNAES, _MUNICIPIOS, _PALAVRAS, _UFS
+from cnpj.middleware import HEADER_ES, HEADER_SQL
+from cnpj.views import MAX_RESULT_WINDOW, PAGE_SIZE
+
+# Peso de cada categoria no mix
+MIX_PADRAO = {
+    "cnpj_prefixo": 20,
+    "nome_fuzzy": 30,
+    "filtros": 20,
+    "pagina_profunda": 10,
+    "detalhe": 15,
+    "stats": 5,
+}
+
+# Orçamento padrão de p95 por categoria, em ms
+ORCAMENTO_P95_MS = {
+    "cnpj_prefixo": 150,
+    "nome_fuzzy": 300,
+    "filtros": 200,
+    "pagina_profunda": 500,
+    "detalhe": 200,
+    "stats": 100,
+}
+
+# Fração de situações "02" nos estabelecimentos sintéticos (3 de 5)
+_FRACAO_ATIVAS = 0.6
+
+
+def _com_erro(rng: random.Random, palavra: str) -> str:
+    """Uma edição (troca, remoção ou inversão de letras): dentro do fuzziness AUTO."""
+    if len(palavra) < 5:
+        return palavra
+    i = rng.randrange(1, len(palavra) - 1)
+    acao = rng.choice(("troca", "remove", "inverte"))
+    if acao == "troca":
+        return palavra[:i] + rng.choice("AEIOURST") + palavra[i + 1 :]
+    if acao == "remove":
+        return palavra[:i] + palavra[i + 1 :]
+    return palavra[: i - 1] + palavra[i] + palavra[i - 1] + palavra[i + 1 :]
+
+
+def _busca(params: dict) -> str:
+    return f"/api/busca/?{urlencode(params)}"
+
+
+def _requisicao(categoria: str, rng: random.Random, basicos: int) -> str:
+    if categoria == "cnpj_prefixo":
+        basico = f"{rng.randrange(basicos):08d}"
+        return _busca({"q": basico[: rng.choice((6, 7, 8))]})
+    if categoria == "nome_fuzzy":
+        nome = " ".join(_com_erro(rng, rng.choice(_PALAVRAS)) for _ in range(rng.choice((1, 2))))
+        params = {"q": nome}
+        if rng.random() < 0.3:
+            params["uf"] = rng.choice(_UFS)
+        return _busca(params)
+    if categoria == "filtros":
+        params = rng.choice(
+            (
+                {"uf": rng.choice(_UFS), "situacao": "02"},
+                {"cnae": rng.choice(_CNAES), "uf": rng.choice(_UFS)},
+                {"municipio": rng.choice(_MUNICIPIOS)},
+                {"situacao": rng.choice(("02", "04", "08")), "porte": rng.choice(("01", "03"))},
+            )
+        )
+        return _busca(params)
+    if categoria == "pagina_profunda":
+        ultima = min(MAX_RESULT_WINDOW // PAGE_SIZE, int(basicos * _FRACAO_ATIVAS) // PAGE_SIZE)
+        pagina = rng.randint(max(1, ultima // 2), max(1, ultima))
+        return _busca({"situacao": "02", "page": pagina})
+    if categoria == "detalhe":
+        return f"/api/cnpj/{rng.randrange(basicos):08d}/"
+    if categoria == "stats":
+        return "/api/stats/"
+    raise ValueError(f"Categoria desconhecida: {categoria}")
+
+
+def montar_mix(
+    basicos: int, n: int, seed: int = 42, pesos: dict[str, int] | None = None
+) -> list[tuple[str, str]]:
+    """
+    Gera `n` requisições `(categoria, caminho)` sorteadas pelos pesos, sobre
+    os CNPJs básicos `0..basicos-1`. A mesma semente gera o mesmo mix.
+    """
+    pesos = pesos or MIX_PADRAO
+    rng = random.Random(f"{seed}:mix")
+    categorias = rng.choices(list(pesos), weights=list(pesos.values()), k=n)
+    return [(c, _requisicao(c, rng, basicos)) for c in categorias]
+
+
+def _contagem(resp, header: str) -> int | None:
+    try:
+        return int(resp.headers[header])
+    except (KeyError, ValueError):
+        return None
+
+
+def executar_carga(
+    base_url: str, mix: list[tuple[str, str]], concorrencia: int, timeout: float = 30
+) -> tuple[list[dict], float]:
+    """
+    Dispara o mix com `concorrencia` clientes (uma Session por thread), cada
+    um pegando a próxima requisição da fila. Retorna `(amostras, segundos)`.
+    """
+    base_url = base_url.rstrip("/")
+    proxima = iter(mix)
+    trava = threading.Lock()
+    amostras: list[dict] = []
+
+    def cliente():
+        with requests.Session() as session:
+            while True:
+                with trava:
+                    item = next(proxima, None)
+                if item is None:
+                    return
+                categoria, caminho = item
+                t0 = time.perf_counter()
+                try:
+                    resp = session.get(base_url + caminho, timeout=timeout)
+                    status, sql, es = (
+                        resp.status_code,
+                        _contagem(resp, HEADER_SQL),
+                        _contagem(resp, HEADER_ES),
+                    )
+                except requests.RequestException:
+                    status, sql, es = 0, None, None
+                ms = (time.perf_counter() - t0) * 1000
+                with trava:
+                    amostras.append(
+                        {"categoria": categoria, "ms": ms, "status": status, "sql": sql, "es": es}
+                    )
+
+    threads = [threading.Thread(target=cliente, daemon=True) for _ in range(concorrencia)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return amostras, time.perf_counter() - t0
+
+
+def _media(valores: list) -> float | None:
+    valores = [v for v in valores if v is not None]
+    return round(sum(valores) / len(valores), 2) if valores else None
+
+
+def _resumo_grupo(amostras: list[dict], segundos: float) -> dict:
+    # 4xx de validação contam como resposta; só 5xx e falhas de conexão são erro
+    erros = sum(1 for a in amostras if not a["status"] or a["status"] >= 500)
+    return {
+        **resumo_latencias([a["ms"] for a in amostras]),
+        "rps": round(len(amostras) / segundos, 1) if segundos else 0.0,
+        "erros": erros,
+        "sql_media": _media([a["sql"] for a in amostras]),
+        "sql_max": max((a["sql"] for a in amostras if a["sql"] is not None), default=None),
+        "es_media": _media([a["es"] for a in amostras]),
+        "es_max": max((a["es"] for a in amostras if a["es"] is not None), default=None),
+    }
+
+
+def resumir(amostras: list[dict], segundos: float) -> dict:
+    """Resumo geral e por categoria (latência, vazão, erros, SQL/ES por requisição)."""
+    por_categoria: dict[str, list[dict]] = {}
+    for a in amostras:
+        por_categoria.setdefault(a["categoria"], []).append(a)
+    return {
+        "segundos": round(segundos, 3),
+        "total": _resumo_grupo(amostras, segundos),
+        "categorias": {
+            c: _resumo_grupo(grupo, segundos) for c, grupo in sorted(por_categoria.items())
+        },
+    }
+
+
+def avaliar_orcamento(resumo: dict, orcamento: dict[str, float], max_erros: float) -> list[str]:
+    """
+    Confere o p95 de cada categoria contra `orcamento` (ms) e a taxa de erros
+    contra `max_erros` (fração). Retorna as violações em texto.
+    """
+    violacoes = []
+    for categoria, r in resumo["categorias"].items():
+        limite = orcamento.get(categoria)
+        if limite is not None and r["p95"] > limite:
+            violacoes.append(f"{categoria}: p95 {r['p95']:.1f} ms > orçamento {limite:g} ms")
+        if r["n"] and r["erros"] / r["n"] > max_erros:
+            violacoes.append(f"{categoria}: {r['erros']}/{r['n']} requisições com erro")
+    return violacoes
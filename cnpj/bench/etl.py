@@ -0,0 +1,269 @@
+"""
+Medição por etapa da carga (`load_cnpj`) e da indexação (`index_es`).
+
+Cada etapa chama as mesmas funções usadas pelos comandos — leitor de CSV,
+transformação, serialização para COPY, SQL do lote de indexação e montagem
+das ações de bulk —, então uma regressão nelas aparece aqui.
+
+Etapas da carga, por tipo de arquivo:
+    unzip           descompressão do membro do ZIP
+    parse           `read_csv` em chunks
+    transform       `_transformar_chunk`
+    copy_serialize  DataFrame → TSV do COPY
+    copy            COPY no PostgreSQL (só com cursor)
+
+Etapas da indexação:
+    index_sql       SQL_LOTE em lotes (só com cursor; senão o JOIN é feito em pandas)
+    index_docs      linhas → ações de bulk
+    index_serialize ações → corpo NDJSON do bulk
+    index_bulk      bulk no Elasticsearch (só com cliente ES)
+
+Para isolar as etapas, cada arquivo é descomprimido inteiro em memória:
+use tamanhos de benchmark, não uma competência real.
+"""
+
+import io
+import json
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from cnpj.management.commands.index_es import CHUNK_SIZE_DEFAULT, SQL_LOTE, _acao_es
+from cnpj.management.commands.load_cnpj import (
+    COLUNAS,
+    COLUNAS_DERIVADAS,
+    DB_TABELA,
+    TABELAS_DOMINIO,
+    _buffer_copy,
+    _copy_buffer,
+    _ler_csv,
+    _tipo_do_arquivo,
+    _transformar_chunk,
+)
+
+# Etapas mais rápidas que isso não entram na comparação entre execuções
+MIN_SEGUNDOS_COMPARAVEL = 0.01
+
+# Colunas de SQL_LOTE, na ordem do SELECT
+COLUNAS_INDICE = [
+    "cnpj_basico",
+    "cnpj_ordem",
+    "cnpj_dv",
+    "nome_fantasia",
+    "situacao_cadastral",
+    "uf",
+    "municipio",
+    "cnae_fiscal_principal",
+    "cnaes_secundarios",
+    "porte",
+    "competencia",
+    "razao_social",
+    "opcao_simples",
+    "opcao_mei",
+    "estabelecimentos",
+    "principal",
+]
+
+
+class Cronometro:
+    """Acumula tempo, linhas e bytes por etapa."""
+
+    def __init__(self):
+        self.etapas: dict[str, dict] = {}
+
+    @contextmanager
+    def medir(self, etapa: str):
+        """Uso: `with c.medir("parse") as m: ...; m["linhas"] = n`."""
+        m = {"linhas": 0, "bytes": 0}
+        t0 = time.perf_counter()
+        yield m
+        segundos = time.perf_counter() - t0
+        acc = self.etapas.setdefault(etapa, {"segundos": 0.0, "linhas": 0, "bytes": 0})
+        acc["segundos"] += segundos
+        acc["linhas"] += m["linhas"]
+        acc["bytes"] += m["bytes"]
+
+    def resumo(self) -> dict:
+        resultado = {}
+        for etapa, acc in self.etapas.items():
+            seg = acc["segundos"] or 1e-9
+            resultado[etapa] = {
+                "segundos": round(acc["segundos"], 4),
+                "linhas": acc["linhas"],
+                "linhas_s": round(acc["linhas"] / seg, 1),
+                "mb_s": round(acc["bytes"] / seg / 1024 / 1024, 2),
+            }
+        return resultado
+
+
+def criar_tabelas_temporarias(cur) -> None:
+    """
+    Cria tabelas temporárias com o nome e a estrutura (índices inclusive) das
+    tabelas reais. Na mesma conexão elas têm precedência no search_path, então
+    o COPY e o SQL_LOTE medem o custo real sem tocar nos dados de produção.
+    """
+    for tabela in sorted(set(DB_TABELA.values())):
+        cur.execute(f"CREATE TEMP TABLE {tabela} (LIKE public.{tabela} INCLUDING ALL)")
+
+
+def medir_carga(zips: list[Path], competencia: str, cur=None) -> tuple[dict, dict]:
+    """
+    Mede as etapas da carga para cada ZIP. Retorna `(resumo_por_tipo,
+    dataframes_transformados_por_tipo)` — os DataFrames alimentam a
+    indexação quando não há banco.
+    """
+    cronometros: dict[str, Cronometro] = {}
+    dfs: dict[str, list[pd.DataFrame]] = {}
+
+    for zip_path in zips:
+        tipo = _tipo_do_arquivo(zip_path.name)
+        c = cronometros.setdefault(tipo, Cronometro())
+        colunas_insert = (
+            COLUNAS[tipo]
+            + COLUNAS_DERIVADAS.get(tipo, [])
+            + ([] if tipo in TABELAS_DOMINIO else ["competencia"])
+        )
+
+        with c.medir("unzip") as m:
+            with zipfile.ZipFile(zip_path) as zf:
+                bruto = zf.read(zf.namelist()[0])
+            m["bytes"] = len(bruto)
+
+        with c.medir("parse") as m:
+            chunks = list(_ler_csv(io.BytesIO(bruto), COLUNAS[tipo]))
+            m["linhas"] = sum(len(ch) for ch in chunks)
+            m["bytes"] = len(bruto)
+
+        with c.medir("transform") as m:
+            chunks = [_transformar_chunk(ch, tipo, competencia) for ch in chunks]
+            m["linhas"] = sum(len(ch) for ch in chunks)
+
+        with c.medir("copy_serialize") as m:
+            buffers = [_buffer_copy(ch, colunas_insert) for ch in chunks]
+            m["linhas"] = sum(len(ch) for ch in chunks)
+            m["bytes"] = sum(len(b.getvalue()) for b in buffers)
+
+        if cur is not None:
+            with c.medir("copy") as m:
+                for buf in buffers:
+                    _copy_buffer(cur, buf, DB_TABELA[tipo], colunas_insert)
+                m["linhas"] = sum(len(ch) for ch in chunks)
+                m["bytes"] = sum(len(b.getvalue()) for b in buffers)
+
+        dfs.setdefault(tipo, []).extend(chunks)
+
+    return {tipo: c.resumo() for tipo, c in cronometros.items()}, dfs
+
+
+def _linhas_indice_pandas(dfs: dict) -> list[tuple]:
+    """Reproduz o JOIN de SQL_LOTE em pandas (modo sem banco)."""
+    chave = ["cnpj_basico", "competencia"]
+    est = pd.concat(dfs["estabelecimento"], ignore_index=True)
+    if dfs.get("empresa"):
+        emp = pd.concat(dfs["empresa"], ignore_index=True)[chave + ["porte", "razao_social"]]
+        est = est.merge(emp, on=chave, how="left")
+    if dfs.get("simples"):
+        sim = pd.concat(dfs["simples"], ignore_index=True)[chave + ["opcao_simples", "opcao_mei"]]
+        est = est.merge(sim, on=chave, how="left")
+    est["estabelecimentos"] = est.groupby(chave)["cnpj_ordem"].transform("size")
+    # Principal: a matriz ou, sem matriz, o de menor cnpj_ordem
+    filial = (est["identificador_matriz_filial"] != "1").rename("filial")
+    ordem = est[chave + ["cnpj_ordem"]].join(filial).sort_values([*chave, "filial", "cnpj_ordem"])
+    est["principal"] = ~ordem.duplicated(chave).reindex(est.index)
+    # Literal de array do COPY ('{a,b}') → lista, como o psycopg2 devolveria
+    est["cnaes_secundarios"] = est["cnaes_secundarios"].str.strip("{}").str.split(",")
+    est = est.reindex(columns=COLUNAS_INDICE).astype(object)
+    est = est.where(est.notna(), None)
+    return list(est.itertuples(index=False, name=None))
+
+
+def medir_indexacao(
+    dfs: dict,
+    competencia: str,
+    es_index: str,
+    cur=None,
+    es=None,
+    batch_size: int = CHUNK_SIZE_DEFAULT,
+) -> dict:
+    """Mede as etapas da indexação de uma competência já carregada."""
+    c = Cronometro()
+
+    if cur is not None:
+        linhas = []
+        with c.medir("index_sql") as m:
+            while True:
+                cur.execute(
+                    SQL_LOTE,
+                    {"competencia": competencia, "limite": batch_size, "offset": len(linhas)},
+                )
+                lote = cur.fetchall()
+                linhas.extend(lote)
+                if len(lote) < batch_size:
+                    break
+            m["linhas"] = len(linhas)
+    else:
+        linhas = _linhas_indice_pandas(dfs)
+
+    with c.medir("index_docs") as m:
+        acoes = [_acao_es(row, es_index) for row in linhas]
+        m["linhas"] = len(acoes)
+
+    with c.medir("index_serialize") as m:
+        corpo = "".join(
+            json.dumps({"index": {"_index": a["_index"], "_id": a["_id"]}})
+            + "\n"
+            + json.dumps(a["_source"])
+            + "\n"
+            for a in acoes
+        )
+        m["linhas"] = len(acoes)
+        m["bytes"] = len(corpo)
+
+    if es is not None:
+        from elasticsearch.helpers import bulk
+
+        with c.medir("index_bulk") as m:
+            for i in range(0, len(acoes), batch_size):
+                ok, _ = bulk(es, acoes[i : i + batch_size], raise_on_error=False)
+                m["linhas"] += ok
+            m["bytes"] = len(corpo)
+
+    return c.resumo()
+
+
+def _achatar(resultado: dict) -> dict[str, float]:
+    """
+    {"carga": {tipo: {etapa: {...}}}, "indice": {etapa: {...}}} → {chave: vazão}.
+    A vazão é linhas/s, ou MB/s nas etapas sem contagem de linhas (unzip).
+    Etapas mais curtas que MIN_SEGUNDOS_COMPARAVEL ficam de fora (só ruído).
+    """
+    etapas = [
+        (f"carga.{tipo}.{etapa}", r)
+        for tipo, por_etapa in resultado.get("carga", {}).items()
+        for etapa, r in por_etapa.items()
+    ] + [(f"indice.{etapa}", r) for etapa, r in resultado.get("indice", {}).items()]
+    return {
+        chave: r["linhas_s"] or r["mb_s"]
+        for chave, r in etapas
+        if r["segundos"] >= MIN_SEGUNDOS_COMPARAVEL
+    }
+
+
+def comparar(atual: dict, anterior: dict, tolerancia: float) -> list[tuple]:
+    """
+    Compara a vazão etapa a etapa. Retorna as regressões acima de
+    `tolerancia` (fração, ex.: 0.15) como `(etapa, antes, depois, variação)`.
+    """
+    antes, depois = _achatar(anterior), _achatar(atual)
+    regressoes = []
+    for etapa, valor in depois.items():
+        base = antes.get(etapa)
+        if not base or not valor:
+            continue
+        variacao = (valor - base) / base
+        if variacao < -tolerancia:
+            regressoes.append((etapa, base, valor, round(variacao, 3)))
+    return regressoes
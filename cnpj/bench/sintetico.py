@@ -0,0 +1,190 @@
+"""
+Gerador determinístico de ZIPs sintéticos no layout da Receita.
+
+Os arquivos seguem o formato real dos dados abertos: um CSV por ZIP, sem
+cabeçalho, ISO-8859-1, `;` como separador e todos os campos entre aspas,
+nas colunas (e ordem) de `load_cnpj.COLUNAS`. A mesma semente gera sempre
+os mesmos bytes, então dois commits medem exatamente a mesma entrada.
+
+As partições compartilham o espaço de CNPJs básicos: Empresas, Simples e
+Sócios referenciam os mesmos básicos dos Estabelecimentos, como na base
+real, para que o JOIN da indexação encontre correspondências.
+"""
+
+import csv
+import io
+import random
+import zipfile
+from pathlib import Path
+
+# Nome do CSV dentro de cada ZIP (mesmo padrão da Receita)
+MEMBRO = {
+    "empresa": "K3241.K03200Y{i}.D60214.EMPRECSV",
+    "estabelecimento": "K3241.K03200Y{i}.D60214.ESTABELE",
+    "socio": "K3241.K03200Y{i}.D60214.SOCIOCSV",
+    "simples": "F.K03200$W.SIMPLES.CSV.D60214",
+    "cnae": "F.K03200$Z.D60214.CNAECSV",
+    "municipio": "F.K03200$Z.D60214.MUNICCSV",
+}
+ARQUIVO = {
+    "empresa": "Empresas{i}.zip",
+    "estabelecimento": "Estabelecimentos{i}.zip",
+    "socio": "Socios{i}.zip",
+    "simples": "Simples.zip",
+    "cnae": "Cnaes.zip",
+    "municipio": "Municipios.zip",
+}
+PARTICIONADOS = ("empresa", "estabelecimento", "socio")
+# Data fixa no ZIP: os bytes gerados não dependem do relógio
+_DATA_ZIP = (2026, 2, 14, 0, 0, 0)
+
+_PALAVRAS = (
+    "COMERCIO CONSTRUÇÕES SERVIÇOS INDÚSTRIA TRANSPORTES ALIMENTOS TECNOLOGIA "
+    "JOÃO MARIA JOSÉ SÃO PAULO PADARIA FARMÁCIA AUTO PEÇAS DISTRIBUIDORA "
+    "CONSULTORIA ENGENHARIA LOGÍSTICA AGROPECUÁRIA MATERIAIS ELÉTRICOS"
+).split()
+_UFS = "AC AL AM AP BA CE DF ES GO MA MG MS MT PA PB PE PI PR RJ RN RO RR RS SC SE SP TO".split()
+_CNAES = [f"{c:07d}" for c in (4711302, 4721102, 5611201, 6201501, 4930202, 8630503, 4744099)]
+_MUNICIPIOS = [f"{m:04d}" for m in range(1, 200)]
+
+
+def _data(rng: random.Random) -> str:
+    return f"{rng.randint(1970, 2025)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+
+
+def _nome(rng: random.Random, n: int = 3) -> str:
+    return " ".join(rng.choice(_PALAVRAS) for _ in range(n))
+
+
+def _empresa(rng, basico):
+    return [
+        basico,
+        f"{_nome(rng)} LTDA",
+        rng.choice(("2062", "2135", "2305", "2240")),
+        rng.choice(("49", "50", "65")),
+        f"{rng.randint(1, 500_000)},00",
+        rng.choice(("00", "01", "03", "05")),
+        "",
+    ]
+
+
+def _estabelecimento(rng, basico):
+    return [
+        basico,
+        "0001",
+        f"{rng.randint(0, 99):02d}",
+        "1",
+        _nome(rng, 2),
+        rng.choice(("02", "02", "02", "04", "08")),
+        _data(rng),
+        "00",
+        "",
+        "",
+        _data(rng),
+        rng.choice(_CNAES),
+        ",".join(rng.sample(_CNAES, 2)),
+        "RUA",
+        _nome(rng, 2),
+        str(rng.randint(1, 9999)),
+        rng.choice(("", "SALA 1", "LOJA A")),
+        _nome(rng, 1),
+        f"{rng.randint(1_000_000, 99_999_999):08d}",
+        rng.choice(_UFS),
+        rng.choice(_MUNICIPIOS),
+        "11",
+        f"{rng.randint(20_000_000, 99_999_999)}",
+        "",
+        "",
+        "",
+        "",
+        f"contato{rng.randint(1, 10**6)}@example.com",
+        "",
+        "",
+    ]
+
+
+def _socio(rng, basico):
+    pf = rng.random() < 0.8
+    return [
+        basico,
+        "2" if pf else "1",
+        _nome(rng, 3),
+        f"***{rng.randint(0, 999_999):06d}**" if pf else f"{rng.randint(0, 10**14 - 1):014d}",
+        rng.choice(("49", "22", "05")),
+        _data(rng),
+        "",
+        "***000000**",
+        "",
+        "00",
+        str(rng.randint(1, 9)),
+    ]
+
+
+def _simples(rng, basico):
+    simples = rng.choice("SN")
+    return [
+        basico,
+        simples,
+        _data(rng) if simples == "S" else "00000000",
+        "00000000",
+        rng.choice("SN"),
+        "00000000",
+        "00000000",
+    ]
+
+
+_LINHA = {
+    "empresa": _empresa,
+    "estabelecimento": _estabelecimento,
+    "socio": _socio,
+    "simples": _simples,
+}
+
+
+def _linhas_dominio(tipo: str):
+    if tipo == "cnae":
+        return [[c, f"ATIVIDADE {c}"] for c in _CNAES]
+    return [[m, f"MUNICÍPIO {m}"] for m in _MUNICIPIOS]
+
+
+def _gravar_zip(path: Path, membro: str, linhas) -> None:
+    """Grava o CSV em streaming dentro do ZIP (memória constante)."""
+    info = zipfile.ZipInfo(membro, date_time=_DATA_ZIP)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(path, "w") as zf, zf.open(info, "w", force_zip64=True) as f:
+        texto = io.TextIOWrapper(f, encoding="iso-8859-1", newline="")
+        writer = csv.writer(texto, delimiter=";", quoting=csv.QUOTE_ALL, lineterminator="\n")
+        writer.writerows(linhas)
+        texto.flush()
+        texto.detach()
+
+
+def gerar_competencia(destino: Path, linhas: int, particoes: int = 1, seed: int = 42) -> list[Path]:
+    """
+    Gera em `destino` os ZIPs de uma competência sintética: `particoes`
+    arquivos de Empresas/Estabelecimentos/Sócios com `linhas` registros
+    cada, mais Simples e os domínios Cnaes/Municípios. Retorna os caminhos.
+    """
+    destino.mkdir(parents=True, exist_ok=True)
+    gerados = []
+
+    for i in range(particoes):
+        basicos = [f"{i * linhas + n:08d}" for n in range(linhas)]
+        for tipo in PARTICIONADOS:
+            rng = random.Random(f"{seed}:{tipo}:{i}")
+            path = destino / ARQUIVO[tipo].format(i=i)
+            _gravar_zip(path, MEMBRO[tipo].format(i=i), (_LINHA[tipo](rng, b) for b in basicos))
+            gerados.append(path)
+
+    rng = random.Random(f"{seed}:simples")
+    basicos = (f"{n:08d}" for n in range(linhas * particoes))
+    path = destino / ARQUIVO["simples"]
+    _gravar_zip(path, MEMBRO["simples"], (_simples(rng, b) for b in basicos))
+    gerados.append(path)
+
+    for tipo in ("cnae", "municipio"):
+        path = destino / ARQUIVO[tipo]
+        _gravar_zip(path, MEMBRO[tipo], _linhas_dominio(tipo))
+        gerados.append(path)
+
+    return gerados
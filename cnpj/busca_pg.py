@@ -0,0 +1,148 @@
+"""
+Busca de estabelecimentos no PostgreSQL — reserva do Elasticsearch.
+
+Recebe os mesmos filtros de `cnpj.search.filtros_busca` e devolve os mesmos
+campos do `_source` do índice, então a `api_busca` monta a resposta igual
+com qualquer um dos motores (`cnpj.motores`).
+
+- Texto livre: `word_similarity` do pg_trgm (operador `<%`) sobre razão
+  social e nome fantasia, atendido pelos índices GIN trigram das duas
+  colunas; a ordem é a maior similaridade entre as duas.
+- Filtros exatos: o índice GIN composto (btree_gin) de competência, UF,
+  município, situação e CNAE principal atende qualquer combinação deles
+  num único bitmap scan.
+- Total: contado até `MAX_TOTAL`, como o `track_total_hits` padrão do ES
+  (acima disso o total é um piso).
+"""
+
+from django.db import connection
+
+from .search import cnpj_da_busca
+
+MAX_TOTAL = 10_000
+
+# Campo do `_source` do índice → expressão SQL
+CAMPOS = (
+    ("cnpj_basico", "e.cnpj_basico"),
+    ("cnpj_ordem", "e.cnpj_ordem"),
+    ("cnpj_dv", "e.cnpj_dv"),
+    ("razao_social", "emp.razao_social"),
+    ("nome_fantasia", "e.nome_fantasia"),
+    ("situacao_cadastral", "e.situacao_cadastral"),
+    ("uf", "e.uf"),
+    ("municipio", "e.municipio"),
+    ("cnae_fiscal_principal", "e.cnae_fiscal_principal"),
+    ("porte", "emp.porte"),
+    ("competencia", "e.competencia"),
+)
+
+_JUNCOES = """
+    LEFT JOIN cnpj_empresa emp
+        ON emp.cnpj_basico = e.cnpj_basico AND emp.competencia = e.competencia
+    LEFT JOIN cnpj_simples s
+        ON s.cnpj_basico = e.cnpj_basico AND s.competencia = e.competencia
+"""
+
+# Candidatos do texto livre: uma busca por coluna (cada uma no seu índice
+# trigram), unidas e reduzidas à melhor similaridade por estabelecimento
+_SQL_CANDIDATOS = """
+WITH candidatos AS (
+    SELECT e.id, word_similarity(%(q)s, emp.razao_social) AS score
+    FROM cnpj_empresa emp
+    JOIN cnpj_estabelecimento e
+        ON e.cnpj_basico = emp.cnpj_basico AND e.competencia = emp.competencia
+    WHERE emp.competencia = %(competencia)s AND %(q)s <%% emp.razao_social
+    UNION ALL
+    SELECT e.id, word_similarity(%(q)s, e.nome_fantasia)
+    FROM cnpj_estabelecimento e
+    WHERE e.competencia = %(competencia)s AND %(q)s <%% e.nome_fantasia
+),
+ranking AS (
+    SELECT id, max(score) AS score FROM candidatos GROUP BY id
+)
+"""
+
+
+def _condicoes(filtros: dict) -> tuple[list[str], dict, str | None]:
+    """Filtros → (cláusulas do WHERE, parâmetros, texto livre ou None)."""
+    where = ["e.competencia = %(competencia)s"]
+    params = {"competencia": filtros["competencia"]}
+    texto = None
+
+    if q := filtros.get("q"):
+        if cnpj := cnpj_da_busca(q):
+            if len(cnpj) <= 8:
+                where.append("e.cnpj_basico LIKE %(cnpj)s")
+                params["cnpj"] = cnpj + "%"
+            else:
+                # Raiz exata: o resto (ordem + DV) é filtrado dentro do índice
+                # (cnpj_basico, competencia, cnpj_ordem)
+                where.append("e.cnpj_basico = %(cnpj_basico)s")
+                where.append("e.cnpj_ordem || e.cnpj_dv LIKE %(cnpj)s")
+                params["cnpj_basico"] = cnpj[:8]
+                params["cnpj"] = cnpj[8:] + "%"
+        else:
+            texto = params["q"] = q
+
+    for nome, coluna in (
+        ("uf", "e.uf"),
+        ("municipio", "e.municipio"),
+        ("situacao", "e.situacao_cadastral"),
+        ("porte", "emp.porte"),
+        ("simples", "s.opcao_simples"),
+        ("mei", "s.opcao_mei"),
+    ):
+        if valor := filtros.get(nome):
+            where.append(f"{coluna} = %({nome})s")
+            params[nome] = valor
+
+    if cnae := filtros.get("cnae"):
+        where.append("e.cnae_fiscal_principal LIKE %(cnae)s")
+        params["cnae"] = cnae[:7] + "%"
+    if cnae_sec := filtros.get("cnae_secundario"):
+        if len(cnae_sec) >= 7:
+            where.append("e.cnaes_secundarios @> ARRAY[%(cnae_secundario)s]::varchar[]")
+            params["cnae_secundario"] = cnae_sec[:7]
+        else:
+            where.append(
+                "EXISTS (SELECT 1 FROM unnest(e.cnaes_secundarios) c WHERE c LIKE %(cnae_secundario)s)"
+            )
+            params["cnae_secundario"] = cnae_sec + "%"
+
+    return where, params, texto
+
+
+def buscar(filtros: dict, inicio: int, tamanho: int) -> tuple[int, list[dict]]:
+    """
+    Página `[inicio, inicio + tamanho)` da busca. Retorna `(total, hits)`,
+    `hits` como dicts com os campos do `_source` do ES.
+    """
+    where, params, texto = _condicoes(filtros)
+    filtro_sql = " AND ".join(where)
+    colunas = ", ".join(expr for _, expr in CAMPOS)
+
+    if texto:
+        origem = f"ranking JOIN cnpj_estabelecimento e ON e.id = ranking.id {_JUNCOES}"
+        prefixo, ordem = _SQL_CANDIDATOS, "ranking.score DESC, e.id"
+    else:
+        origem = f"cnpj_estabelecimento e {_JUNCOES}"
+        prefixo, ordem = "", "e.id"
+
+    with connection.cursor() as cur:
+        cur.execute(
+            f"{prefixo} SELECT count(*) FROM "
+            f"(SELECT 1 FROM {origem} WHERE {filtro_sql} LIMIT {MAX_TOTAL}) t",
+            params,
+        )
+        total = cur.fetchone()[0]
+        if inicio >= total:
+            return total, []
+        cur.execute(
+            f"{prefixo} SELECT {colunas} FROM {origem} WHERE {filtro_sql} "
+            f"ORDER BY {ordem} LIMIT %(tamanho)s OFFSET %(inicio)s",
+            {**params, "tamanho": tamanho, "inicio": inicio},
+        )
+        linhas = cur.fetchall()
+
+    nomes = [nome for nome, _ in CAMPOS]
+    return total, [dict(zip(nomes, (v or "" for v in linha))) for linha in linhas]
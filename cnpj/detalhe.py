@@ -0,0 +1,532 @@
+"""
+Camada de acesso aos dados do detalhe de uma empresa (CNPJ básico).
+
+Todo o payload — estabelecimento(s), empresa, Simples/MEI, sócios, CNAEs
+secundários, competências disponíveis e histórico de situação da matriz,
+já com as descrições dos domínios — sai de um único SELECT: cada parte é
+uma subconsulta LATERAL agregada com `json_agg`/`to_jsonb` e o conjunto é
+montado com `json_build_object`. Uma ida ao banco por detalhe, usada pela
+API (`api_cnpj_detalhe`) e pela página HTML (`views_html.detalhe`).
+
+Para a página HTML, `linhas_estabelecimentos` materializa cada
+estabelecimento uma única vez num objeto leve (`SimpleNamespace`) com os
+campos derivados já calculados (CNPJ formatado, endereço, descrições),
+resolvidos do mapa de CNAEs que vem na mesma consulta — o template só lê
+atributos.
+
+`historico_alteracoes` devolve só o que mudou entre competências seguidas
+(situação, endereço e CNAEs da matriz; entradas e saídas de sócios): as
+diferenças saem do próprio SQL — `lag()` sobre os campos da matriz como
+`jsonb` e anti-joins entre os quadros de sócios de competências vizinhas —
+sem trazer os retratos completos de cada mês.
+
+Empresas com milhares de filiais (redes varejistas, bancos) não cabem numa
+página: a página HTML pede só a matriz mais o `resumo` (filiais por UF e
+situação, total de sócios, agregados no SQL) e carrega filiais e sócios sob
+demanda de `pagina_filiais`/`pagina_socios`, paginados por cursor (keyset
+em `cnpj_ordem` e no id do sócio).
+"""
+
+import json
+import re
+from datetime import date
+from types import SimpleNamespace
+
+from django.db import connection
+
+from .views import SITUACAO_LABEL, _format_cnpj
+
+# Competência pedida ou, na falta, a mais recente com dados
+_SQL_ALVO = """
+alvo AS (
+    SELECT COALESCE(
+        %(competencia)s::varchar,
+        (SELECT competencia FROM cnpj_estabelecimento ORDER BY competencia DESC LIMIT 1)
+    ) AS competencia
+)"""
+
+# O estabelecimento "principal" é a matriz (ordem 0001) ou, sem ela, o de
+# menor ordem.
+SQL_DETALHE = (
+    "WITH"
+    + _SQL_ALVO
+    + """,
+estabs AS (
+    SELECT e.*
+    FROM cnpj_estabelecimento e, alvo
+    WHERE e.cnpj_basico = %(cnpj_basico)s AND e.competencia = alvo.competencia
+    ORDER BY e.cnpj_ordem <> '0001', e.cnpj_ordem
+    LIMIT %(limite)s
+),
+matriz AS (
+    SELECT cnae_fiscal_secundaria FROM estabs
+    ORDER BY cnpj_ordem <> '0001', cnpj_ordem
+    LIMIT 1
+)
+SELECT json_build_object(
+    'competencia', alvo.competencia,
+    'competencias', COALESCE(comps.lista, '[]'::json),
+    'estabelecimentos', COALESCE(est.lista, '[]'::json),
+    'empresa', emp.obj,
+    'simples', sim.obj,
+    'socios', COALESCE(soc.lista, '[]'::json),
+    'cnaes_secundarios', COALESCE(sec.lista, '[]'::json),
+    'cnaes', COALESCE(cnaes.mapa, '{}'::json),
+    'historico', COALESCE(hist.lista, '[]'::json),
+    'resumo', CASE WHEN %(resumo)s THEN res.obj END
+)::text
+FROM alvo
+LEFT JOIN LATERAL (
+    SELECT json_agg(c.competencia ORDER BY c.competencia DESC) AS lista
+    FROM (
+        SELECT DISTINCT competencia FROM cnpj_estabelecimento
+        WHERE cnpj_basico = %(cnpj_basico)s
+    ) c
+) comps ON true
+LEFT JOIN LATERAL (
+    SELECT json_agg(
+        to_jsonb(e) || jsonb_build_object(
+            'cnae_principal_descricao', cn.descricao,
+            'municipio_descricao', mu.descricao
+        )
+        ORDER BY e.cnpj_ordem <> '0001', e.cnpj_ordem
+    ) AS lista
+    FROM estabs e
+    LEFT JOIN cnpj_cnae cn ON cn.codigo = e.cnae_fiscal_principal
+    LEFT JOIN cnpj_municipio mu ON mu.codigo = e.municipio
+) est ON true
+LEFT JOIN LATERAL (
+    SELECT to_jsonb(em) || jsonb_build_object(
+        'natureza_descricao', na.descricao,
+        'qualificacao_responsavel_descricao', qr.descricao
+    ) AS obj
+    FROM cnpj_empresa em
+    LEFT JOIN cnpj_natureza na ON na.codigo = em.natureza_juridica
+    LEFT JOIN cnpj_qualificacao qr ON qr.codigo = em.qualificacao_responsavel
+    WHERE em.cnpj_basico = %(cnpj_basico)s AND em.competencia = alvo.competencia
+    ORDER BY em.id
+    LIMIT 1
+) emp ON true
+LEFT JOIN LATERAL (
+    SELECT to_jsonb(si) AS obj
+    FROM cnpj_simples si
+    WHERE si.cnpj_basico = %(cnpj_basico)s AND si.competencia = alvo.competencia
+    ORDER BY si.id
+    LIMIT 1
+) sim ON true
+LEFT JOIN LATERAL (
+    SELECT json_agg(
+        to_jsonb(so) || jsonb_build_object(
+            'qualificacao_socio_descricao', qs.descricao,
+            'qualificacao_representante_descricao', qp.descricao
+        )
+        ORDER BY so.id
+    ) AS lista
+    FROM (
+        SELECT * FROM cnpj_socio
+        WHERE cnpj_basico = %(cnpj_basico)s AND competencia = alvo.competencia
+        ORDER BY id
+        LIMIT %(limite_socios)s
+    ) so
+    LEFT JOIN cnpj_qualificacao qs ON qs.codigo = so.qualificacao_socio
+    LEFT JOIN cnpj_qualificacao qp ON qp.codigo = so.qualificacao_representante
+) soc ON true
+LEFT JOIN LATERAL (
+    SELECT json_agg(
+        json_build_object('codigo', lpad(t.cod, 7, '0'), 'descricao', COALESCE(cn.descricao, ''))
+        ORDER BY t.ordem
+    ) AS lista
+    FROM matriz
+    CROSS JOIN LATERAL regexp_split_to_table(matriz.cnae_fiscal_secundaria, '[,[:space:]]+')
+        WITH ORDINALITY AS t(cod, ordem)
+    LEFT JOIN cnpj_cnae cn ON cn.codigo = lpad(t.cod, 7, '0')
+    WHERE t.cod <> ''
+) sec ON true
+LEFT JOIN LATERAL (
+    -- Descrições de todos os CNAEs secundários dos estabelecimentos, de uma vez
+    SELECT json_object_agg(cn.codigo, cn.descricao) AS mapa
+    FROM cnpj_cnae cn
+    WHERE cn.codigo IN (
+        SELECT lpad(t.cod, 7, '0')
+        FROM estabs
+        CROSS JOIN LATERAL regexp_split_to_table(estabs.cnae_fiscal_secundaria, '[,[:space:]]+')
+            AS t(cod)
+        WHERE t.cod <> ''
+    )
+) cnaes ON true
+LEFT JOIN LATERAL (
+    SELECT json_agg(
+        json_build_object('competencia', h.competencia, 'situacao', h.situacao_cadastral)
+        ORDER BY h.competencia
+    ) AS lista
+    FROM cnpj_estabelecimento h
+    WHERE h.cnpj_basico = %(cnpj_basico)s AND h.cnpj_ordem = '0001'
+) hist ON true
+LEFT JOIN LATERAL (
+    -- Totais por UF e por situação numa só leitura (GROUPING SETS); GROUPING()
+    -- vale 1 nas linhas por UF, 2 nas por situação e 3 no total
+    SELECT json_build_object(
+        'estabelecimentos', COALESCE(max(g.n) FILTER (WHERE g.nivel = 3), 0),
+        'por_uf', COALESCE(
+            json_object_agg(COALESCE(g.uf, ''), g.n ORDER BY g.n DESC, g.uf)
+                FILTER (WHERE g.nivel = 1),
+            '{}'::json
+        ),
+        'por_situacao', COALESCE(
+            json_object_agg(COALESCE(g.situacao, ''), g.n ORDER BY g.n DESC, g.situacao)
+                FILTER (WHERE g.nivel = 2),
+            '{}'::json
+        ),
+        'socios', (
+            SELECT count(*) FROM cnpj_socio
+            WHERE %(resumo)s AND cnpj_basico = %(cnpj_basico)s AND competencia = alvo.competencia
+        )
+    ) AS obj
+    FROM (
+        SELECT uf, situacao_cadastral AS situacao, GROUPING(uf, situacao_cadastral) AS nivel,
+            count(*) AS n
+        FROM cnpj_estabelecimento
+        WHERE %(resumo)s AND cnpj_basico = %(cnpj_basico)s AND competencia = alvo.competencia
+        GROUP BY GROUPING SETS ((uf), (situacao_cadastral), ())
+    ) g
+) res ON true
+"""
+)
+
+# Uma página de filiais (sem a matriz), em ordem de cnpj_ordem a partir do
+# cursor `depois`, com as descrições de CNAE principal e município
+SQL_FILIAIS = (
+    "WITH"
+    + _SQL_ALVO
+    + """
+SELECT json_build_object(
+    'competencia', alvo.competencia,
+    'itens', COALESCE(pag.lista, '[]'::json)
+)::text
+FROM alvo
+LEFT JOIN LATERAL (
+    SELECT json_agg(
+        to_jsonb(e) || jsonb_build_object(
+            'cnae_principal_descricao', cn.descricao,
+            'municipio_descricao', mu.descricao
+        )
+        ORDER BY e.cnpj_ordem
+    ) AS lista
+    FROM (
+        SELECT * FROM cnpj_estabelecimento
+        WHERE cnpj_basico = %(cnpj_basico)s AND competencia = alvo.competencia
+            AND cnpj_ordem > %(depois)s AND cnpj_ordem <> '0001'
+            AND (%(uf)s::varchar IS NULL OR uf = %(uf)s)
+            AND (%(situacao)s::varchar IS NULL OR situacao_cadastral = %(situacao)s)
+        ORDER BY cnpj_ordem
+        LIMIT %(limite)s
+    ) e
+    LEFT JOIN cnpj_cnae cn ON cn.codigo = e.cnae_fiscal_principal
+    LEFT JOIN cnpj_municipio mu ON mu.codigo = e.municipio
+) pag ON true
+"""
+)
+
+# Uma página de sócios em ordem de id a partir do cursor `depois`
+SQL_SOCIOS = (
+    "WITH"
+    + _SQL_ALVO
+    + """
+SELECT json_build_object(
+    'competencia', alvo.competencia,
+    'itens', COALESCE(pag.lista, '[]'::json)
+)::text
+FROM alvo
+LEFT JOIN LATERAL (
+    SELECT json_agg(
+        to_jsonb(so) || jsonb_build_object(
+            'qualificacao_socio_descricao', qs.descricao,
+            'qualificacao_representante_descricao', qp.descricao
+        )
+        ORDER BY so.id
+    ) AS lista
+    FROM (
+        SELECT * FROM cnpj_socio
+        WHERE cnpj_basico = %(cnpj_basico)s AND competencia = alvo.competencia
+            AND id > %(depois)s
+        ORDER BY id
+        LIMIT %(limite)s
+    ) so
+    LEFT JOIN cnpj_qualificacao qs ON qs.codigo = so.qualificacao_socio
+    LEFT JOIN cnpj_qualificacao qp ON qp.codigo = so.qualificacao_representante
+) pag ON true
+"""
+)
+
+# Campos da matriz acompanhados no histórico → grupo na resposta
+CAMPOS_HISTORICO = {
+    "situacao_cadastral": "situacao",
+    "data_situacao_cadastral": "situacao",
+    "motivo_situacao_cadastral": "situacao",
+    "tipo_logradouro": "endereco",
+    "logradouro": "endereco",
+    "numero": "endereco",
+    "complemento": "endereco",
+    "bairro": "endereco",
+    "cep": "endereco",
+    "uf": "endereco",
+    "municipio": "endereco",
+    "cnae_fiscal_principal": "cnae",
+    "cnae_fiscal_secundaria": "cnae",
+}
+
+# Diferenças entre competências seguidas, calculadas no banco. Matriz: cada
+# competência vira um jsonb com os campos acompanhados e `lag()` traz o da
+# anterior; `jsonb_each` deixa só as chaves com valor diferente. Sócios
+# (chave: identificador, CPF/CNPJ mascarado e nome): entradas e saídas por
+# anti-join entre competências vizinhas que têm sócios da empresa — uma
+# competência carregada sem Sócios não vira "todos saíram".
+SQL_HISTORICO = """
+WITH matriz AS (
+    SELECT competencia, campos,
+        lag(competencia) OVER w AS anterior,
+        lag(campos) OVER w AS antes
+    FROM (
+        SELECT DISTINCT ON (competencia) competencia, jsonb_build_object(%s) AS campos
+        FROM cnpj_estabelecimento
+        WHERE cnpj_basico = %%(cnpj_basico)s AND cnpj_ordem = '0001'
+        ORDER BY competencia, id
+    ) m
+    WINDOW w AS (ORDER BY competencia)
+),
+campos AS (
+    SELECT m.competencia, m.anterior, k.key AS campo, m.antes -> k.key AS de, k.value AS para
+    FROM matriz m
+    CROSS JOIN LATERAL jsonb_each(m.campos) k
+    WHERE m.antes IS NOT NULL AND m.antes -> k.key IS DISTINCT FROM k.value
+),
+socios AS (
+    SELECT DISTINCT ON (competencia, identificador_socio, cnpj_cpf_socio, nome_socio)
+        competencia, identificador_socio, cnpj_cpf_socio, nome_socio, qualificacao_socio
+    FROM cnpj_socio
+    WHERE cnpj_basico = %%(cnpj_basico)s
+    ORDER BY competencia, identificador_socio, cnpj_cpf_socio, nome_socio, id
+),
+pares AS (
+    SELECT competencia, lag(competencia) OVER (ORDER BY competencia) AS anterior
+    FROM (SELECT DISTINCT competencia FROM socios) c
+),
+movimentos AS (
+    SELECT p.competencia, p.anterior, 'entrada' AS movimento, s.identificador_socio,
+        s.cnpj_cpf_socio, s.nome_socio, s.qualificacao_socio
+    FROM pares p
+    JOIN socios s ON s.competencia = p.competencia
+    WHERE p.anterior IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM socios o
+        WHERE o.competencia = p.anterior
+            AND (o.identificador_socio, o.cnpj_cpf_socio, o.nome_socio)
+                IS NOT DISTINCT FROM (s.identificador_socio, s.cnpj_cpf_socio, s.nome_socio)
+    )
+    UNION ALL
+    SELECT p.competencia, p.anterior, 'saida', o.identificador_socio,
+        o.cnpj_cpf_socio, o.nome_socio, o.qualificacao_socio
+    FROM pares p
+    JOIN socios o ON o.competencia = p.anterior
+    WHERE NOT EXISTS (
+        SELECT 1 FROM socios s
+        WHERE s.competencia = p.competencia
+            AND (s.identificador_socio, s.cnpj_cpf_socio, s.nome_socio)
+                IS NOT DISTINCT FROM (o.identificador_socio, o.cnpj_cpf_socio, o.nome_socio)
+    )
+)
+SELECT json_build_object(
+    'competencias', COALESCE(
+        (SELECT json_agg(competencia ORDER BY competencia) FROM matriz), '[]'::json
+    ),
+    'campos', COALESCE((SELECT json_agg(c ORDER BY c.competencia) FROM campos c), '[]'::json),
+    'socios', COALESCE(
+        (SELECT json_agg(mv ORDER BY mv.competencia, mv.movimento, mv.nome_socio)
+         FROM movimentos mv),
+        '[]'::json
+    )
+)::text
+""" % ", ".join(f"'{campo}', {campo}" for campo in CAMPOS_HISTORICO)
+
+
+def _datas(linha: dict | None) -> dict | None:
+    """Campos `data_*` chegam do JSON como 'AAAA-MM-DD'; volta para `date`."""
+    if linha:
+        for campo, valor in linha.items():
+            if campo.startswith("data_") and isinstance(valor, str):
+                try:
+                    linha[campo] = date.fromisoformat(valor)
+                except ValueError:
+                    pass
+    return linha
+
+
+def _consultar(sql: str, params: dict) -> dict:
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return json.loads(cur.fetchone()[0])
+
+
+def carregar_detalhe(
+    cnpj_basico: str,
+    competencia: str | None = None,
+    estabelecimentos: int | None = 1,
+    socios: int | None = None,
+    resumo: bool = False,
+) -> dict:
+    """
+    Payload do detalhe de `cnpj_basico` em uma consulta.
+
+    `competencia` None → a mais recente com dados. `estabelecimentos` e
+    `socios` limitam quantas linhas vêm (matriz primeiro); None → todas.
+    Com `resumo`, inclui `{"estabelecimentos", "por_uf", "por_situacao",
+    "socios"}` com os totais da competência (senão, `resumo` é None).
+
+    Retorna `{"competencia", "competencias", "estabelecimentos", "empresa",
+    "simples", "socios", "cnaes_secundarios", "cnaes", "historico"}`; linhas
+    como dicts com as colunas da tabela mais as descrições (`*_descricao`).
+    `cnaes` mapeia código → descrição de todos os CNAEs secundários dos
+    estabelecimentos retornados.
+    """
+    dados = _consultar(
+        SQL_DETALHE,
+        {
+            "cnpj_basico": cnpj_basico,
+            "competencia": competencia,
+            "limite": estabelecimentos,
+            "limite_socios": socios,
+            "resumo": resumo,
+        },
+    )
+    for chave in ("estabelecimentos", "socios"):
+        dados[chave] = [_datas(linha) for linha in dados[chave]]
+    for chave in ("empresa", "simples"):
+        dados[chave] = _datas(dados[chave])
+    return dados
+
+
+def pagina_filiais(
+    cnpj_basico: str,
+    competencia: str | None,
+    depois: str = "",
+    limite: int = 50,
+    uf: str | None = None,
+    situacao: str | None = None,
+) -> dict:
+    """
+    Filiais com `cnpj_ordem > depois`, até `limite`. Retorna
+    `{"competencia", "itens", "proximo"}`; `proximo` é o cursor da página
+    seguinte (None na última).
+    """
+    dados = _consultar(
+        SQL_FILIAIS,
+        {
+            "cnpj_basico": cnpj_basico,
+            "competencia": competencia,
+            "depois": depois,
+            "limite": limite + 1,  # uma a mais: diz se há próxima página
+            "uf": uf,
+            "situacao": situacao,
+        },
+    )
+    itens = [_datas(linha) for linha in dados["itens"]]
+    proximo = itens[limite - 1]["cnpj_ordem"] if len(itens) > limite else None
+    return {"competencia": dados["competencia"], "itens": itens[:limite], "proximo": proximo}
+
+
+def pagina_socios(
+    cnpj_basico: str, competencia: str | None, depois: int = 0, limite: int = 50
+) -> dict:
+    """Sócios com `id > depois`, até `limite`; mesmo formato de `pagina_filiais`."""
+    dados = _consultar(
+        SQL_SOCIOS,
+        {
+            "cnpj_basico": cnpj_basico,
+            "competencia": competencia,
+            "depois": depois,
+            "limite": limite + 1,
+        },
+    )
+    itens = [_datas(linha) for linha in dados["itens"]]
+    proximo = itens[limite - 1]["id"] if len(itens) > limite else None
+    return {"competencia": dados["competencia"], "itens": itens[:limite], "proximo": proximo}
+
+
+def historico_alteracoes(cnpj_basico: str) -> dict:
+    """
+    Alterações da empresa entre competências seguidas, numa consulta.
+
+    Retorna `{"competencias", "alteracoes"}`: `competencias` em que a matriz
+    existe e `alteracoes` só com as competências em que algo mudou, em ordem,
+    cada uma `{"competencia", "anterior", "campos", "socios"}` — `campos` como
+    `{"campo", "grupo", "de", "para"}` (grupo situacao/endereco/cnae, na ordem
+    de `CAMPOS_HISTORICO`) e `socios` como `{"entradas", "saidas"}`.
+    """
+    dados = _consultar(SQL_HISTORICO, {"cnpj_basico": cnpj_basico})
+    ordem = list(CAMPOS_HISTORICO)
+    alteracoes = {}
+
+    def alteracao(linha: dict) -> dict:
+        return alteracoes.setdefault(
+            linha["competencia"],
+            {
+                "competencia": linha["competencia"],
+                "anterior": linha["anterior"],
+                "campos": [],
+                "socios": {"entradas": [], "saidas": []},
+            },
+        )
+
+    for linha in dados["campos"]:
+        alteracao(linha)["campos"].append(
+            {
+                "campo": linha["campo"],
+                "grupo": CAMPOS_HISTORICO[linha["campo"]],
+                "de": linha["de"],
+                "para": linha["para"],
+            }
+        )
+    for linha in dados["socios"]:
+        movimento = "entradas" if linha.pop("movimento") == "entrada" else "saidas"
+        socios = alteracao(linha)["socios"][movimento]
+        socios.append({k: v for k, v in linha.items() if k not in ("competencia", "anterior")})
+    for item in alteracoes.values():
+        item["campos"].sort(key=lambda c: ordem.index(c["campo"]))
+
+    return {
+        "competencias": dados["competencias"],
+        "alteracoes": [alteracoes[c] for c in sorted(alteracoes)],
+    }
+
+
+def _codigos_cnae(texto: str | None) -> list[str]:
+    return [c.zfill(7) for c in re.split(r"[,\s]+", texto or "") if c]
+
+
+def _endereco(e: dict) -> str:
+    endereco = f"{e['tipo_logradouro'] or ''} {e['logradouro'] or ''}, {e['numero'] or ''}".strip()
+    if e["complemento"]:
+        endereco += f" - {e['complemento']}"
+    if e["bairro"]:
+        endereco += f", {e['bairro']}"
+    if e["cep"]:
+        endereco += f" - CEP: {e['cep']}"
+    return endereco
+
+
+def linhas_estabelecimentos(dados: dict) -> list[SimpleNamespace]:
+    """Estabelecimentos de `carregar_detalhe` como linhas prontas para o template."""
+    cnaes = dados["cnaes"]
+    return [
+        SimpleNamespace(
+            **e,
+            cnpj_formatado=_format_cnpj(e["cnpj_basico"], e["cnpj_ordem"], e["cnpj_dv"]),
+            situacao_descricao=SITUACAO_LABEL.get(e["situacao_cadastral"], e["situacao_cadastral"]),
+            endereco_completo=_endereco(e),
+            # `cnaes_secundarios` já é a coluna (array de códigos) da linha
+            cnaes_secundarios_desc=[
+                SimpleNamespace(codigo=c, descricao=cnaes.get(c, ""))
+                for c in _codigos_cnae(e["cnae_fiscal_secundaria"])
+            ],
+        )
+        for e in dados["estabelecimentos"]
+    ]
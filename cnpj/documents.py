@@ -6,7 +6,8 @@ incluindo razão social (proveniente da tabela Empresa via join).
 
 Mapeamento:
   - Campos de texto livre (razao_social, nome_fantasia): text + keyword (multi-field)
-  - Demais campos: keyword (busca exata/filtragem)
+  - Demais campos: keyword (busca exata/filtragem); `cnaes_secundarios` é
+    um array de keywords (um código por item)
 """
 
 from django.conf import settings
@@ -16,6 +17,29 @@ from django_elasticsearch_dsl.registries import registry
 # Import lazy para evitar circular import no momento do carregamento do app
 from cnpj.models import Estabelecimento
 
+# Peso das sugestões do autocomplete: ativas sempre acima das demais e,
+# entre elas, empresas com mais estabelecimentos primeiro
+PESO_ATIVA = 1_000
+PESO_ESTABELECIMENTOS_MAX = PESO_ATIVA - 1
+
+
+def peso_sugestao(situacao: str | None, estabelecimentos: int | None) -> int:
+    peso = min(estabelecimentos or 1, PESO_ESTABELECIMENTOS_MAX)
+    return peso + (PESO_ATIVA if situacao == "02" else 0)
+
+
+def sugestao(
+    razao_social: str | None,
+    nome_fantasia: str | None,
+    situacao: str | None,
+    estabelecimentos: int | None,
+) -> dict | None:
+    """Entrada do completion suggester: razão social e nome fantasia, com peso."""
+    entradas = [t for t in dict.fromkeys((razao_social, nome_fantasia)) if t]
+    if not entradas:
+        return None
+    return {"input": entradas, "weight": peso_sugestao(situacao, estabelecimentos)}
+
 
 @registry.register_document
 class EstabelecimentoDocument(Document):
@@ -35,6 +59,15 @@ class EstabelecimentoDocument(Document):
         fields={"keyword": fields.KeywordField()},
     )
 
+    # ── CNPJ completo (14 dígitos) ──────────────────────────────────────────
+    # Inteiro num termo só (analyzer keyword); `index_prefixes` grava também
+    # os prefixos, então a busca por CNPJ parcial vira um `term` no campo
+    # oculto de prefixos em vez de expandir todos os termos do índice
+    cnpj = fields.TextField(
+        analyzer="keyword",
+        index_prefixes={"min_chars": 2, "max_chars": 13},
+    )
+
     # ── campos de filtro (keyword) ──────────────────────────────────────────
     cnpj_basico = fields.KeywordField()
     cnpj_ordem = fields.KeywordField()
@@ -43,9 +76,17 @@ class EstabelecimentoDocument(Document):
     uf = fields.KeywordField()
     municipio = fields.KeywordField()
     cnae_fiscal_principal = fields.KeywordField()
+    cnaes_secundarios = fields.KeywordField(multi=True)
     porte = fields.KeywordField()
     competencia = fields.KeywordField()
 
+    # ── autocomplete (GET /api/suggest/) ────────────────────────────────────
+    # Razão social + nome fantasia, com peso (ativa, nº de estabelecimentos)
+    # e filtrável por competência; preenchido pelo index_es
+    sugestao = fields.CompletionField(
+        contexts=[{"name": "competencia", "type": "category", "path": "competencia"}],
+    )
+
     # ── campos Simples/MEI (vindos do modelo via prepare_*) ─────────────────
     opcao_simples = fields.KeywordField()
     opcao_mei = fields.KeywordField()
@@ -84,6 +125,7 @@ class EstabelecimentoDocument(Document):
                 "uf",
                 "municipio",
                 "cnae_fiscal_principal",
+                "cnaes_secundarios",
                 "porte",
                 "competencia",
             )
@@ -95,6 +137,17 @@ class EstabelecimentoDocument(Document):
         """Razão social vinda do atributo injetado pelo comando index_es."""
         return getattr(instance, "_razao_social", "") or ""
 
+    def prepare_cnpj(self, instance):
+        return f"{instance.cnpj_basico}{instance.cnpj_ordem}{instance.cnpj_dv}"
+
+    def prepare_sugestao(self, instance):
+        return sugestao(
+            getattr(instance, "_razao_social", ""),
+            instance.nome_fantasia,
+            instance.situacao_cadastral,
+            getattr(instance, "_estabelecimentos", None),
+        )
+
     def prepare_opcao_simples(self, instance):
         return getattr(instance, "_opcao_simples", "") or ""
 
@@ -0,0 +1,249 @@
+"""
+Exportação em streaming dos resultados da busca (CSV, CSV.gz ou Parquet).
+
+O resultado completo é percorrido no Elasticsearch com point-in-time +
+search_after, em lotes de EXPORT_LOTE documentos. Cada lote é convertido,
+enviado ao cliente e descartado — a memória do processo não cresce com o
+tamanho da exportação.
+
+Exportações são longas e podem consumir um worker inteiro; por isso o
+deploy inteiro (todos os workers do Gunicorn) aceita no máximo
+`CNPJ_EXPORT_MAX_CONCURRENT` exportações simultâneas — as demais recebem
+429, preservando o tráfego interativo. As vagas são advisory locks do
+PostgreSQL (`pg_try_advisory_lock`), compartilhados entre processos sem
+depender de um cache comum; se o worker morrer no meio, a conexão cai e o
+PostgreSQL solta a vaga sozinho.
+"""
+
+import csv
+import io
+import zlib
+
+from django.conf import settings
+from django.db import connection
+
+from .search import ordenacao
+
+EXPORT_LOTE = 5_000
+PIT_KEEP_ALIVE = "5m"
+
+CAMPOS_ES = [
+    "cnpj_basico",
+    "cnpj_ordem",
+    "cnpj_dv",
+    "razao_social",
+    "nome_fantasia",
+    "situacao_cadastral",
+    "uf",
+    "municipio",
+    "cnae_fiscal_principal",
+    "porte",
+    "opcao_simples",
+    "opcao_mei",
+]
+
+COLUNAS_EXPORT = ["cnpj"] + CAMPOS_ES + ["municipio_descricao", "cnae_descricao"]
+
+FORMATOS = {
+    # formato → (content-type, extensão)
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# ── limite de exportações simultâneas (todos os workers) ─────────────────────
+
+# Primeira chave dos advisory locks das vagas ("CNPJ"); a segunda é a vaga
+_CLASSE_LOCK = 0x434E504A
+
+
+def reservar_slot() -> int | None:
+    """
+    Tenta reservar, sem bloquear, uma das `CNPJ_EXPORT_MAX_CONCURRENT` vagas
+    do deploy. Retorna o número da vaga ou None se todas estão ocupadas. A
+    vaga fica presa à conexão desta thread até `liberar_slot`.
+    """
+    with connection.cursor() as cur:
+        for vaga in range(getattr(settings, "CNPJ_EXPORT_MAX_CONCURRENT", 2)):
+            cur.execute("SELECT pg_try_advisory_lock(%s, %s)", [_CLASSE_LOCK, vaga])
+            if cur.fetchone()[0]:
+                return vaga
+    return None
+
+
+def liberar_slot(vaga: int) -> None:
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_advisory_unlock(%s, %s)", [_CLASSE_LOCK, vaga])
+
+
+class StreamExportacao:
+    """
+    Iterador entregue ao StreamingHttpResponse. Libera a vaga de exportação
+    no `close()` — chamado pelo Django ao fim da resposta, mesmo se o
+    cliente desconectar antes do primeiro byte.
+    """
+
+    def __init__(self, gerador, vaga: int):
+        self._gerador = gerador
+        self._vaga = vaga
+        self._liberado = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._gerador)
+
+    def close(self):
+        try:
+            if hasattr(self._gerador, "close"):
+                self._gerador.close()
+        finally:
+            if not self._liberado:
+                self._liberado = True
+                liberar_slot(self._vaga)
+
+
+# ── leitura do ES ─────────────────────────────────────────────────────────────
+
+
+def abrir_pit() -> str:
+    """Abre o point-in-time da exportação (antes do streaming, p/ falhar com 503)."""
+    from elasticsearch_dsl.connections import get_connection
+
+    index = getattr(settings, "CNPJ_ES_INDEX", "cnpj_estabelecimentos")
+    return get_connection().open_point_in_time(index=index, keep_alive=PIT_KEEP_ALIVE)["id"]
+
+
+def iterar_lotes(pit_id: str, query, tem_texto: bool, limite: int):
+    """
+    Gera listas de `_source` (no máximo EXPORT_LOTE por vez) até esgotar o
+    resultado ou atingir `limite` linhas. O PIT é sempre fechado ao final,
+    inclusive se o cliente desconectar no meio do download.
+    """
+    from elasticsearch_dsl.connections import get_connection
+
+    es = get_connection()
+    search_after = None
+    restante = limite
+
+    try:
+        while restante > 0:
+            size = min(EXPORT_LOTE, restante)
+            kwargs = {
+                "pit": {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE},
+                "query": query.to_dict(),
+                "sort": ordenacao(tem_texto, pit=True),
+                "size": size,
+                "source": CAMPOS_ES,
+                "track_total_hits": False,
+            }
+            if search_after:
+                kwargs["search_after"] = search_after
+            resp = es.search(**kwargs)
+            pit_id = resp.get("pit_id", pit_id)
+
+            hits = resp["hits"]["hits"]
+            if not hits:
+                break
+            yield [h["_source"] for h in hits]
+
+            restante -= len(hits)
+            if len(hits) < size:
+                break
+            search_after = hits[-1]["sort"]
+    finally:
+        try:
+            es.close_point_in_time(id=pit_id)
+        except Exception:
+            pass
+
+
+def linhas_export(lote: list[dict], mun_map: dict, cnae_map: dict):
+    """`_source` do ES → tuplas na ordem de COLUNAS_EXPORT."""
+    for doc in lote:
+        basico = doc.get("cnpj_basico", "")
+        ordem = doc.get("cnpj_ordem", "")
+        dv = doc.get("cnpj_dv", "")
+        yield (
+            f"{basico}{ordem}{dv}",
+            *(doc.get(campo, "") for campo in CAMPOS_ES),
+            mun_map.get(doc.get("municipio", ""), ""),
+            cnae_map.get(doc.get("cnae_fiscal_principal", ""), ""),
+        )
+
+
+# ── serialização ─────────────────────────────────────────────────────────────
+
+
+def stream_csv(lotes, mun_map: dict, cnae_map: dict, gzip: bool = False):
+    """Gera bytes de CSV (com cabeçalho), opcionalmente comprimidos em gzip."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def _drenar():
+        dados = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return compressor.compress(dados) if compressor else dados
+
+    writer.writerow(COLUNAS_EXPORT)
+    yield _drenar()
+    for lote in lotes:
+        writer.writerows(linhas_export(lote, mun_map, cnae_map))
+        if bloco := _drenar():
+            yield bloco
+    if compressor:
+        yield compressor.flush()
+
+
+class _SinkMemoria:
+    """Arquivo write-only que acumula bytes até serem drenados pelo stream."""
+
+    closed = False
+
+    def __init__(self):
+        self._partes = []
+        self._pos = 0
+
+    def write(self, dados) -> int:
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._pos += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def stream_parquet(lotes, mun_map: dict, cnae_map: dict, gzip: bool = False):
+    """
+    Gera bytes de Parquet: um row group por lote do ES, rodapé ao final.
+    Requer pyarrow (ImportError se ausente).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(col, pa.string()) for col in COLUNAS_EXPORT])
+    sink = _SinkMemoria()
+    writer = pq.ParquetWriter(sink, schema, compression="gzip" if gzip else "snappy")
+    try:
+        for lote in lotes:
+            colunas = list(zip(*linhas_export(lote, mun_map, cnae_map)))
+            writer.write_table(pa.Table.from_arrays([pa.array(c) for c in colunas], schema=schema))
+            if bloco := sink.drenar():
+                yield bloco
+    finally:
+        writer.close()
+    yield sink.drenar()
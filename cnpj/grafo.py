@@ -0,0 +1,191 @@
+"""
+Grafo de vínculos societários: empresa → empresa pelos sócios pessoa
+jurídica e empresa ↔ pessoa física (CPF mascarado + nome).
+
+A lista de adjacência fica materializada em `cnpj_vinculo` (model
+`Vinculo`), reconstruída por competência depois da carga dos Sócios
+(`construir_vinculos`, chamado pelo `load_cnpj`, pelo `pipeline_cnpj` e pelo
+`grafo_cnpj`). Cada vínculo é gravado nos dois sentidos, então os vizinhos
+de qualquer nó — empresa ou pessoa — saem de um intervalo do índice
+(competencia, origem, destino, relacao), sem tocar na tabela.
+
+`vizinhanca` faz a busca em largura limitada sobre essa tabela: uma consulta
+por nível (a fronteira inteira de uma vez, `origem = ANY(...)`), com teto de
+vizinhos por nó e de linhas por nível. Uma holding com milhares de
+participações, ou um sócio presente em centenas de empresas, não explode a
+resposta: o nó volta marcado como `truncado`. Profundidade 3 custa no
+máximo 3 leituras de índice + 1 para as razões sociais.
+
+O CPF mascarado da Receita (***123456**) não identifica uma pessoa sozinho;
+junto do nome é a melhor chave disponível para agrupar a mesma pessoa física
+entre empresas — homônimos com o mesmo trecho de CPF são raros, mas possíveis.
+"""
+
+import time
+
+from django.db import connection, transaction
+
+PREFIXO_PF = "PF:"
+
+PROFUNDIDADE_PADRAO = 2
+PROFUNDIDADE_MAX = 3
+MAX_VIZINHOS = 100  # vizinhos lidos por nó a cada nível
+MAX_ARESTAS_NIVEL = 5_000  # linhas lidas por nível
+MAX_NOS = 1_000
+
+# Vínculos da competência a partir de cnpj_socio: sócio PJ vira a raiz do CNPJ
+# (8 primeiros dígitos); sócio PF, a chave "PF:<cpf mascarado>:<nome>".
+# Estrangeiros (identificador 3) não têm documento e ficam de fora.
+SQL_CONSTRUIR = """
+WITH pares AS (
+    SELECT DISTINCT cnpj_basico AS empresa,
+        CASE identificador_socio
+            WHEN '2' THEN left(cnpj_cpf_socio, 8)
+            ELSE %(prefixo_pf)s || cnpj_cpf_socio || ':' || trim(nome_socio)
+        END AS socio
+    FROM cnpj_socio
+    WHERE competencia = %(competencia)s
+        AND (
+            (identificador_socio = '2' AND cnpj_cpf_socio ~ '^[0-9]{14}$'
+                AND left(cnpj_cpf_socio, 8) <> cnpj_basico)
+            OR (identificador_socio = '1' AND cnpj_cpf_socio <> '' AND trim(nome_socio) <> '')
+        )
+)
+INSERT INTO cnpj_vinculo (competencia, origem, destino, relacao)
+SELECT %(competencia)s, empresa, socio, 'S' FROM pares
+UNION ALL
+SELECT %(competencia)s, socio, empresa, 'P' FROM pares
+"""
+
+# Até `limite` vizinhos de cada nó da fronteira, lidos do índice; o LIMIT
+# externo corta o nível inteiro
+SQL_VIZINHOS = """
+SELECT f.no, v.destino, v.relacao
+FROM unnest(%(nos)s::varchar[]) AS f(no)
+CROSS JOIN LATERAL (
+    SELECT destino, relacao FROM cnpj_vinculo
+    WHERE competencia = %(competencia)s AND origem = f.no
+    ORDER BY destino, relacao
+    LIMIT %(limite)s
+) v
+LIMIT %(limite_nivel)s
+"""
+
+SQL_RAZOES = """
+SELECT DISTINCT ON (cnpj_basico) cnpj_basico, razao_social
+FROM cnpj_empresa
+WHERE competencia = %(competencia)s AND cnpj_basico = ANY(%(cnpjs)s::varchar[])
+ORDER BY cnpj_basico, id
+"""
+
+
+def eh_pf(no: str) -> bool:
+    return no.startswith(PREFIXO_PF)
+
+
+def construir_vinculos(competencia: str) -> tuple[int, float]:
+    """
+    Reconstrói os vínculos de `competencia` (apaga e regrava numa transação).
+    Retorna `(vinculos, segundos)`; cada par empresa–sócio conta duas vezes.
+    """
+    t0 = time.perf_counter()
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute("DELETE FROM cnpj_vinculo WHERE competencia = %s", [competencia])
+        cur.execute(SQL_CONSTRUIR, {"competencia": competencia, "prefixo_pf": PREFIXO_PF})
+        total = cur.rowcount
+    with connection.cursor() as cur:
+        cur.execute("ANALYZE cnpj_vinculo")
+    return total, round(time.perf_counter() - t0, 1)
+
+
+def _competencia_grafo(cur) -> str | None:
+    """Competência mais recente com vínculos (topo do índice)."""
+    cur.execute("SELECT max(competencia) FROM cnpj_vinculo")
+    return cur.fetchone()[0]
+
+
+def _no_json(no: str, razoes: dict) -> dict:
+    if eh_pf(no):
+        cpf, _, nome = no[len(PREFIXO_PF) :].partition(":")
+        return {"id": no, "tipo": "PF", "nome": nome, "documento": cpf}
+    return {"id": no, "tipo": "PJ", "nome": razoes.get(no) or "", "documento": no}
+
+
+def vizinhanca(
+    cnpj_basico: str,
+    competencia: str | None = None,
+    profundidade: int = PROFUNDIDADE_PADRAO,
+    max_vizinhos: int = MAX_VIZINHOS,
+    max_nos: int = MAX_NOS,
+) -> dict:
+    """
+    Busca em largura a partir de `cnpj_basico` até `profundidade` saltos
+    (empresa → sócio → empresa...). `competencia` None → a mais recente com
+    vínculos.
+
+    Retorna `{"competencia", "nos", "arestas", "truncado", "encontrado"}`: `nos` em ordem
+    de descoberta, cada um `{"id", "tipo", "nome", "documento",
+    "profundidade", "truncado"}` (`truncado`: nem todos os vizinhos vieram);
+    `arestas` como `{"empresa", "socio"}`, uma por par. `truncado` no topo
+    indica que algum teto (vizinhos, linhas por nível ou `max_nos`) cortou o
+    resultado. `encontrado` é falso se a raiz não tem vínculos nem empresa
+    na competência.
+    """
+    nivel = {cnpj_basico: 0}
+    cortados = set()
+    arestas = {}
+    truncado = False
+
+    with connection.cursor() as cur:
+        competencia = competencia or _competencia_grafo(cur)
+        fronteira = [cnpj_basico]
+        for salto in range(1, profundidade + 1):
+            if not fronteira or not competencia:
+                break
+            cur.execute(
+                SQL_VIZINHOS,
+                {
+                    "nos": fronteira,
+                    "competencia": competencia,
+                    "limite": max_vizinhos + 1,  # um a mais: diz se o nó foi cortado
+                    "limite_nivel": MAX_ARESTAS_NIVEL,
+                },
+            )
+            linhas = cur.fetchall()
+            if len(linhas) >= MAX_ARESTAS_NIVEL:
+                truncado = True
+
+            lidos = dict.fromkeys(fronteira, 0)
+            proxima = []
+            for origem, destino, relacao in linhas:
+                lidos[origem] += 1
+                if lidos[origem] > max_vizinhos:
+                    cortados.add(origem)
+                    continue
+                if destino not in nivel:
+                    if len(nivel) >= max_nos:
+                        cortados.add(origem)
+                        truncado = True
+                        continue
+                    nivel[destino] = salto
+                    proxima.append(destino)
+                empresa, socio = (origem, destino) if relacao == "S" else (destino, origem)
+                arestas[(empresa, socio)] = None
+            fronteira = proxima
+
+        empresas = [no for no in nivel if not eh_pf(no)]
+        razoes = {}
+        if competencia:
+            cur.execute(SQL_RAZOES, {"competencia": competencia, "cnpjs": empresas})
+            razoes = dict(cur.fetchall())
+
+    return {
+        "competencia": competencia,
+        "nos": [
+            _no_json(no, razoes) | {"profundidade": prof, "truncado": no in cortados}
+            for no, prof in nivel.items()
+        ],
+        "arestas": [{"empresa": e, "socio": s} for e, s in arestas],
+        "truncado": truncado or bool(cortados),
+        "encontrado": len(nivel) > 1 or cnpj_basico in razoes,
+    }
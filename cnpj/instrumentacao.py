@@ -0,0 +1,131 @@
+"""
+Medição de consultas SQL e requisições ao Elasticsearch por requisição HTTP.
+
+`medir()` abre uma medição no contexto corrente (ContextVar: cada thread do
+Gunicorn tem a sua). Enquanto ela está aberta, o `execute_wrapper` das
+conexões Django conta e cronometra cada consulta SQL, e o hook no
+transporte do cliente ES conta cada requisição (retentativas internas do
+cliente contam uma vez), mede o tempo de rede visto pelo cliente e soma o
+`took` informado pelo ES. O cliente async (views de `cnpj.views_async`)
+passa pelo mesmo hook no `AsyncTransport`; o ContextVar acompanha a
+requisição também nas tasks e nas threads de `sync_to_async`.
+
+O wrapper SQL fica instalado em toda conexão Django, de qualquer thread,
+no sinal `connection_created`: sob ASGI as consultas rodam nas threads de
+`sync_to_async`, cujas conexões não são as da thread do loop onde a
+medição foi aberta — é o ContextVar que liga a consulta à requisição.
+
+Fora de uma medição os hooks não fazem nada além de ler o ContextVar.
+"""
+
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class Medicao:
+    """Contadores e tempos (ms) de uma requisição."""
+
+    __slots__ = ("sql", "sql_ms", "es", "es_ms", "es_took_ms")
+
+    def __init__(self):
+        self.sql = 0
+        self.sql_ms = 0.0
+        self.es = 0
+        self.es_ms = 0.0
+        self.es_took_ms = 0.0
+
+
+_medicao: contextvars.ContextVar[Medicao | None] = contextvars.ContextVar(
+    "cnpj_medicao", default=None
+)
+
+
+def _contar_sql(execute, sql, params, many, context):
+    if (m := _medicao.get()) is None:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        m.sql += 1
+        m.sql_ms += (time.perf_counter() - t0) * 1000
+
+
+def _instalar_sql(connection, **kwargs) -> None:
+    """Põe `_contar_sql` na conexão uma única vez (reconexões disparam o sinal de novo)."""
+    if _contar_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_contar_sql)
+
+
+connection_created.connect(_instalar_sql, dispatch_uid="cnpj_instrumentacao_sql")
+
+
+def _somar_took(m: Medicao, resp) -> None:
+    # `took` vem nas respostas de busca/agregação; bulk, PIT etc. não têm
+    if isinstance(resp.body, dict) and isinstance(resp.body.get("took"), int | float):
+        m.es_took_ms += resp.body["took"]
+
+
+def _instalar_hook_es() -> None:
+    """Envolve `Transport.perform_request` (e o do async) uma única vez por processo."""
+    from elastic_transport import AsyncTransport, Transport
+
+    original = Transport.perform_request
+    if getattr(original, "_cnpj_contagem", False):
+        return
+
+    @functools.wraps(original)
+    def perform_request(self, *args, **kwargs):
+        if (m := _medicao.get()) is None:
+            return original(self, *args, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            resp = original(self, *args, **kwargs)
+        finally:
+            m.es += 1
+            m.es_ms += (time.perf_counter() - t0) * 1000
+        _somar_took(m, resp)
+        return resp
+
+    original_async = AsyncTransport.perform_request
+
+    @functools.wraps(original_async)
+    async def perform_request_async(self, *args, **kwargs):
+        if (m := _medicao.get()) is None:
+            return await original_async(self, *args, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            resp = await original_async(self, *args, **kwargs)
+        finally:
+            m.es += 1
+            m.es_ms += (time.perf_counter() - t0) * 1000
+        _somar_took(m, resp)
+        return resp
+
+    perform_request._cnpj_contagem = True
+    Transport.perform_request = perform_request
+    AsyncTransport.perform_request = perform_request_async
+
+
+@contextmanager
+def medir():
+    """
+    Mede SQL e ES executados dentro do bloco.
+
+    Uso: `with medir() as m: ...; m.sql, m.sql_ms, m.es, m.es_ms, m.es_took_ms`.
+    """
+    _instalar_hook_es()
+    m = Medicao()
+    token = _medicao.set(m)
+    # Conexões desta thread já abertas antes do sinal (ex.: import tardio)
+    for conn in connections.all():
+        _instalar_sql(conn)
+    try:
+        yield m
+    finally:
+        _medicao.reset(token)
@@ -0,0 +1,185 @@
+"""
+Consulta em lote de CNPJs (enriquecimento de listas).
+
+Cada lote de entradas é resolvido com uma consulta por tabela usando
+`= ANY(array)` / `unnest` — o custo é de ~4 queries por lote, não por CNPJ.
+Só as tabelas e colunas pedidas na projeção (`fields`) são consultadas.
+
+Entradas aceitas: CNPJ básico (até 8 dígitos) ou completo (14 dígitos),
+com ou sem máscara. Para o básico, o estabelecimento retornado é a matriz
+(ou o de menor ordem, se não houver matriz na competência).
+"""
+
+from collections import defaultdict
+
+from django.db import connection
+
+from .models import Empresa, Estabelecimento, Simples, Socio
+
+# Colunas que identificam a linha e não fazem parte da projeção
+_COLUNAS_CHAVE = {"id", "cnpj_basico", "competencia"}
+
+
+def _colunas(model) -> list[str]:
+    return [f.column for f in model._meta.concrete_fields if f.column not in _COLUNAS_CHAVE]
+
+
+GRUPOS = {
+    "empresa": ("cnpj_empresa", _colunas(Empresa)),
+    "estabelecimento": ("cnpj_estabelecimento", _colunas(Estabelecimento)),
+    "simples": ("cnpj_simples", _colunas(Simples)),
+    "socios": ("cnpj_socio", _colunas(Socio)),
+}
+
+
+def parse_campos(fields) -> dict[str, list[str]]:
+    """
+    Projeção pedida pelo cliente → {grupo: [colunas]}.
+
+    `fields` aceita lista ou string separada por vírgula com itens "grupo"
+    (todas as colunas) ou "grupo.coluna". Vazio → tudo. Levanta ValueError
+    para outros tipos (vindos do JSON do cliente) e para grupos ou colunas
+    desconhecidos.
+    """
+    if fields is None:
+        fields = []
+    elif isinstance(fields, str):
+        fields = fields.split(",")
+    if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+        raise ValueError("`fields` deve ser uma lista de strings ou uma string.")
+    fields = [f.strip() for f in fields if f.strip()]
+    if not fields:
+        return {grupo: list(colunas) for grupo, (_, colunas) in GRUPOS.items()}
+
+    campos: dict[str, list[str]] = {}
+    for item in fields:
+        grupo, _, coluna = item.partition(".")
+        if grupo not in GRUPOS:
+            raise ValueError(f"Grupo desconhecido: {grupo}")
+        disponiveis = GRUPOS[grupo][1]
+        if not coluna:
+            campos[grupo] = list(disponiveis)
+        elif coluna not in disponiveis:
+            raise ValueError(f"Campo desconhecido: {item}")
+        elif coluna not in campos.setdefault(grupo, []):
+            campos[grupo].append(coluna)
+    return campos
+
+
+def normalizar_cnpj(valor) -> str | None:
+    """
+    Dígitos do CNPJ: até 8 → básico (zfill 8); 9 a 14 → completo (zfill 14,
+    cobre zeros à esquerda perdidos em planilhas). Outro formato → None.
+    """
+    digitos = "".join(filter(str.isdigit, str(valor or "")))
+    if not digitos or len(digitos) > 14:
+        return None
+    return digitos.zfill(8) if len(digitos) <= 8 else digitos.zfill(14)
+
+
+def _fetch_dicts(cur, sql: str, params: list) -> list[dict]:
+    cur.execute(sql, params)
+    nomes = [c[0] for c in cur.description]
+    return [dict(zip(nomes, row)) for row in cur.fetchall()]
+
+
+def _por_basico(cur, grupo: str, colunas: list[str], basicos: list[str], competencia: str):
+    """Linhas de uma tabela por cnpj_basico (uma consulta para o lote)."""
+    tabela = GRUPOS[grupo][0]
+    cols = ", ".join(["cnpj_basico"] + colunas)
+    linhas = _fetch_dicts(
+        cur,
+        f"SELECT {cols} FROM {tabela} WHERE competencia = %s AND cnpj_basico = ANY(%s)",
+        [competencia, basicos],
+    )
+    agrupado = defaultdict(list)
+    for linha in linhas:
+        agrupado[linha.pop("cnpj_basico")].append(linha)
+    return agrupado
+
+
+def _estabelecimentos(cur, colunas: list[str], chaves: list[str], competencia: str) -> dict:
+    """
+    Estabelecimentos do lote, indexados pela chave de entrada (8 ou 14 dígitos).
+    Completos: join com `unnest` das partes do CNPJ. Básicos: DISTINCT ON
+    pela menor ordem (matriz).
+    """
+    resultado = {}
+    cols = ", ".join(f"e.{c}" for c in colunas)
+    completos = [c for c in chaves if len(c) == 14]
+    basicos = [c for c in chaves if len(c) == 8]
+
+    if completos:
+        linhas = _fetch_dicts(
+            cur,
+            f"""
+            SELECT e.cnpj_basico AS _b, e.cnpj_ordem AS _o, e.cnpj_dv AS _d, {cols}
+            FROM cnpj_estabelecimento e
+            JOIN unnest(%s::text[], %s::text[], %s::text[]) AS k(basico, ordem, dv)
+              ON e.cnpj_basico = k.basico AND e.cnpj_ordem = k.ordem AND e.cnpj_dv = k.dv
+            WHERE e.competencia = %s
+            """,
+            [
+                [c[:8] for c in completos],
+                [c[8:12] for c in completos],
+                [c[12:] for c in completos],
+                competencia,
+            ],
+        )
+        for linha in linhas:
+            chave = linha.pop("_b") + linha.pop("_o") + linha.pop("_d")
+            resultado[chave] = linha
+
+    if basicos:
+        linhas = _fetch_dicts(
+            cur,
+            f"""
+            SELECT DISTINCT ON (e.cnpj_basico) e.cnpj_basico AS _b, {cols}
+            FROM cnpj_estabelecimento e
+            WHERE e.competencia = %s AND e.cnpj_basico = ANY(%s)
+            ORDER BY e.cnpj_basico, e.cnpj_ordem
+            """,
+            [competencia, basicos],
+        )
+        for linha in linhas:
+            resultado[linha.pop("_b")] = linha
+
+    return resultado
+
+
+def resolver_lote(chaves: list[str], competencia: str, campos: dict[str, list[str]]):
+    """
+    Resolve um lote de CNPJs normalizados. Gera um dicionário por entrada,
+    na mesma ordem de `chaves`.
+    """
+    basicos = sorted({c[:8] for c in chaves})
+
+    with connection.cursor() as cur:
+        estabs = {}
+        if "estabelecimento" in campos:
+            estabs = _estabelecimentos(
+                cur, campos["estabelecimento"], sorted(set(chaves)), competencia
+            )
+        por_grupo = {
+            grupo: _por_basico(cur, grupo, campos[grupo], basicos, competencia)
+            for grupo in ("empresa", "simples", "socios")
+            if grupo in campos
+        }
+
+    for chave in chaves:
+        basico = chave[:8]
+        item = {"cnpj": chave, "cnpj_basico": basico}
+        encontrado = False
+        if "estabelecimento" in campos:
+            item["estabelecimento"] = estabs.get(chave)
+            encontrado |= item["estabelecimento"] is not None
+        for grupo in ("empresa", "simples"):
+            if grupo in por_grupo:
+                linhas = por_grupo[grupo].get(basico)
+                item[grupo] = linhas[0] if linhas else None
+                encontrado |= bool(linhas)
+        if "socios" in por_grupo:
+            item["socios"] = por_grupo["socios"].get(basico, [])
+            encontrado |= bool(item["socios"])
+        item["encontrado"] = encontrado
+        yield item
@@ -0,0 +1,232 @@
+"""
+Management command para medir a latência da busca no Elasticsearch
+reproduzindo um mix gravado de consultas da `api_busca`.
+
+Compara a query antiga (todos os filtros em `bool.must`, pontuados) com a
+atual (filtros exatos em `bool.filter`, `_doc` em buscas só com filtros)
+e reporta p50/p95 do `took` do ES e do tempo de parede. Com `--pg`, o
+mesmo mix também roda na busca de reserva do PostgreSQL (`cnpj.busca_pg`),
+medida pelo tempo de parede.
+
+O arquivo de consultas é JSONL, uma consulta por linha, em qualquer um dos
+formatos:
+    {"q": "padaria", "uf": "SP"}
+    {"params": {"q": "padaria", "uf": "SP"}}
+    {"url": "/api/busca/?q=padaria&uf=SP&page=2"}
+
+Uso:
+    python manage.py bench_busca
+    python manage.py bench_busca --queries logs/busca.jsonl --repeticoes 5
+    python manage.py bench_busca --competencia 2026-02 --output logs/bench_busca.json
+    python manage.py bench_busca --pg   # ES vs. PostgreSQL nas mesmas consultas
+"""
+
+import json
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cnpj.bench import resumo_latencias
+from cnpj.views import PAGE_SIZE, _latest_competencia
+
+QUERIES_PADRAO = Path(__file__).resolve().parents[2] / "bench" / "queries_busca.jsonl"
+
+MODOS = {
+    "must": False,  # comportamento antigo
+    "filter": True,
+}
+
+
+def _carregar_queries(path: Path) -> list[dict]:
+    """Lê o mix de consultas (JSONL) e devolve a lista de parâmetros GET."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for n, linha in enumerate(f, 1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                obj = json.loads(linha)
+            except json.JSONDecodeError as exc:
+                raise CommandError(f"{path}:{n}: JSON inválido ({exc})") from exc
+            if "url" in obj:
+                params = dict(parse_qsl(urlsplit(obj["url"]).query))
+            else:
+                params = obj.get("params", obj)
+            queries.append({k: str(v) for k, v in params.items()})
+    return queries
+
+
+def _executar(es_index: str, params: dict, competencia: str, filter_context: bool):
+    """Executa uma consulta e devolve (took_ms, parede_ms)."""
+    from elasticsearch_dsl import Search
+
+    from cnpj.search import filtros_busca, montar_query, ordenacao
+
+    filtros = filtros_busca(params, params.get("competencia") or competencia)
+    query, tem_texto = montar_query(filtros, filter_context=filter_context)
+
+    try:
+        page = max(1, int(params.get("page", 1)))
+    except ValueError:
+        page = 1
+    start = (page - 1) * PAGE_SIZE
+
+    s = Search(index=es_index).query(query)
+    if filter_context:
+        s = s.sort(*ordenacao(tem_texto))
+    s = s[start : start + PAGE_SIZE]
+
+    t0 = time.perf_counter()
+    response = s.execute()
+    parede = (time.perf_counter() - t0) * 1000
+    return float(response.took), parede
+
+
+def _executar_pg(params: dict, competencia: str) -> float:
+    """Executa uma consulta na busca do PostgreSQL e devolve o tempo de parede (ms)."""
+    from cnpj import busca_pg
+    from cnpj.search import filtros_busca
+
+    filtros = filtros_busca(params, params.get("competencia") or competencia)
+    try:
+        page = max(1, int(params.get("page", 1)))
+    except ValueError:
+        page = 1
+
+    t0 = time.perf_counter()
+    busca_pg.buscar(filtros, (page - 1) * PAGE_SIZE, PAGE_SIZE)
+    return (time.perf_counter() - t0) * 1000
+
+
+class Command(BaseCommand):
+    help = "Mede p50/p95 da busca ES reproduzindo um mix de consultas (must vs. filter)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queries",
+            type=str,
+            default=str(QUERIES_PADRAO),
+            metavar="ARQUIVO",
+            help="Arquivo JSONL com o mix de consultas (padrão: mix de exemplo do projeto)",
+        )
+        parser.add_argument(
+            "--competencia",
+            type=str,
+            default=None,
+            metavar="YYYY-MM",
+            help="Competência usada quando a consulta não informa (padrão: mais recente)",
+        )
+        parser.add_argument(
+            "--repeticoes",
+            type=int,
+            default=3,
+            metavar="N",
+            help="Quantas vezes o mix completo é reproduzido por modo (padrão: 3)",
+        )
+        parser.add_argument(
+            "--aquecimento",
+            type=int,
+            default=1,
+            metavar="N",
+            help="Passadas de aquecimento descartadas por modo (padrão: 1)",
+        )
+        parser.add_argument(
+            "--limpar-cache",
+            action="store_true",
+            default=False,
+            help="Limpa os caches do índice antes de cada modo",
+        )
+        parser.add_argument(
+            "--pg",
+            action="store_true",
+            default=False,
+            help="Mede também a busca de reserva no PostgreSQL sobre o mesmo mix",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            metavar="ARQUIVO",
+            help="Grava o resultado em JSON (para comparar entre commits)",
+        )
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+        from elasticsearch_dsl.connections import get_connection
+
+        queries = _carregar_queries(Path(options["queries"]))
+        if not queries:
+            raise CommandError("Mix de consultas vazio.")
+
+        competencia = options["competencia"] or _latest_competencia()
+        if not competencia:
+            raise CommandError("Nenhuma competência disponível; informe --competencia.")
+
+        es_index: str = getattr(settings, "CNPJ_ES_INDEX", "cnpj_estabelecimentos")
+        es = get_connection()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{'='*60}\n"
+                f"  BENCH BUSCA ES\n"
+                f"  Consultas:   {len(queries)} ({options['queries']})\n"
+                f"  Competência: {competencia}\n"
+                f"  Repetições:  {options['repeticoes']} (+{options['aquecimento']} aquecimento)\n"
+                f"{'='*60}\n"
+            )
+        )
+
+        resultado = {"competencia": competencia, "consultas": len(queries), "modos": {}}
+
+        for modo, filter_context in MODOS.items():
+            if options["limpar_cache"]:
+                es.indices.clear_cache(index=es_index)
+
+            took, parede = [], []
+            for rodada in range(options["aquecimento"] + options["repeticoes"]):
+                for params in queries:
+                    try:
+                        t, w = _executar(es_index, params, competencia, filter_context)
+                    except Exception as exc:
+                        raise CommandError(f"Erro no Elasticsearch ({modo}): {exc}") from exc
+                    if rodada >= options["aquecimento"]:
+                        took.append(t)
+                        parede.append(w)
+
+            resultado["modos"][modo] = {
+                "took_ms": resumo_latencias(took),
+                "parede_ms": resumo_latencias(parede),
+            }
+
+        if options["pg"]:
+            parede = []
+            for rodada in range(options["aquecimento"] + options["repeticoes"]):
+                for params in queries:
+                    try:
+                        w = _executar_pg(params, competencia)
+                    except Exception as exc:
+                        raise CommandError(f"Erro no PostgreSQL: {exc}") from exc
+                    if rodada >= options["aquecimento"]:
+                        parede.append(w)
+            # Sem `took`: a latência do PG é só a de parede
+            resultado["modos"]["pg"] = {"parede_ms": resumo_latencias(parede)}
+
+        self.stdout.write(
+            f"  {'MODO':<8} {'took p50':>10} {'took p95':>10} {'wall p50':>10} {'wall p95':>10}"
+        )
+        self.stdout.write(f"  {'-'*52}")
+        for modo, r in resultado["modos"].items():
+            took = r.get("took_ms", {})
+            self.stdout.write(
+                f"  {modo:<8} {took.get('p50', '-'):>10} {took.get('p95', '-'):>10} "
+                f"{r['parede_ms']['p50']:>10} {r['parede_ms']['p95']:>10}"
+            )
+
+        if options["output"]:
+            out = Path(options["output"])
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"\n  ✔ Resultado gravado em {out}"))
@@ -0,0 +1,210 @@
+"""
+Management command para medir a vazão de cada etapa do ETL sobre ZIPs
+sintéticos no layout da Receita (ver `cnpj.bench.sintetico`).
+
+Sem opções extras mede só as etapas em processo (unzip, parse, transform,
+serialização do COPY, montagem e serialização do bulk). `--db` inclui o
+COPY e o SQL de indexação em tabelas temporárias; `--es` inclui o bulk
+num índice descartável. O resultado em JSON pode ser comparado com uma
+execução anterior (`--comparar`), falhando se alguma etapa perder mais que
+`--tolerancia` de vazão.
+
+Uso:
+    python manage.py bench_etl
+    python manage.py bench_etl --linhas 200000 --particoes 2 --output logs/bench_etl.json
+    python manage.py bench_etl --db --es --comparar logs/bench_etl_main.json
+"""
+
+import json
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cnpj.bench.etl import (
+    comparar,
+    criar_tabelas_temporarias,
+    medir_carga,
+    medir_indexacao,
+)
+from cnpj.bench.sintetico import gerar_competencia
+
+COMPETENCIA_BENCH = "2099-01"
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+class Command(BaseCommand):
+    help = "Mede a vazão por etapa do load_cnpj/index_es com ZIPs sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--linhas",
+            type=int,
+            default=100_000,
+            metavar="N",
+            help="Registros por arquivo particionado (padrão: 100000)",
+        )
+        parser.add_argument(
+            "--particoes",
+            type=int,
+            default=1,
+            metavar="N",
+            help="Arquivos por tipo particionado (padrão: 1)",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Semente do gerador (padrão: 42)")
+        parser.add_argument(
+            "--dir",
+            type=str,
+            default=None,
+            metavar="DIR",
+            help="Diretório dos ZIPs sintéticos (padrão: temporário, apagado ao final)",
+        )
+        parser.add_argument(
+            "--db",
+            action="store_true",
+            default=False,
+            help="Mede COPY e SQL de indexação (tabelas temporárias, sem tocar nos dados)",
+        )
+        parser.add_argument(
+            "--es",
+            action="store_true",
+            default=False,
+            help="Mede o bulk no Elasticsearch (índice <CNPJ_ES_INDEX>_bench, apagado ao final)",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            metavar="ARQUIVO",
+            help="Grava o resultado em JSON (para comparar entre commits)",
+        )
+        parser.add_argument(
+            "--comparar",
+            type=str,
+            default=None,
+            metavar="ARQUIVO",
+            help="JSON de uma execução anterior; falha se alguma etapa regredir",
+        )
+        parser.add_argument(
+            "--tolerancia",
+            type=float,
+            default=15.0,
+            metavar="PCT",
+            help="Queda de vazão tolerada por etapa, em %% (padrão: 15)",
+        )
+
+    def handle(self, *args, **options):
+        if options["linhas"] < 1 or options["particoes"] < 1:
+            raise CommandError("--linhas e --particoes devem ser >= 1.")
+
+        with tempfile.TemporaryDirectory(prefix="bench_etl_") as tmp:
+            destino = Path(options["dir"] or tmp)
+            self.stdout.write(
+                f"  Gerando ZIPs sintéticos em {destino} "
+                f"({options['particoes']} x {options['linhas']:,} linhas, seed={options['seed']})..."
+            )
+            zips = gerar_competencia(
+                destino, options["linhas"], options["particoes"], options["seed"]
+            )
+            resultado = self._medir(zips, options)
+
+        resultado["meta"] = {
+            "commit": _commit_atual(),
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "linhas": options["linhas"],
+            "particoes": options["particoes"],
+            "seed": options["seed"],
+            "db": options["db"],
+            "es": options["es"],
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+        }
+        self._imprimir(resultado)
+
+        if options["output"]:
+            out = Path(options["output"])
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"\n  ✔ Resultado gravado em {out}"))
+
+        if options["comparar"]:
+            anterior = json.loads(Path(options["comparar"]).read_text(encoding="utf-8"))
+            regressoes = comparar(resultado, anterior, options["tolerancia"] / 100)
+            if regressoes:
+                for etapa, antes, depois, variacao in regressoes:
+                    self.stdout.write(
+                        self.style.ERROR(f"  ✗ {etapa}: {antes:,} → {depois:,} ({variacao:+.1%})")
+                    )
+                raise CommandError(f"{len(regressoes)} etapa(s) regrediram além da tolerância.")
+            self.stdout.write(self.style.SUCCESS("  ✔ Nenhuma regressão além da tolerância."))
+
+    def _medir(self, zips, options) -> dict:
+        es_index = getattr(settings, "CNPJ_ES_INDEX", "cnpj_estabelecimentos") + "_bench"
+        conn = cur = es = indice_bench = None
+
+        try:
+            if options["db"]:
+                import psycopg2
+
+                from cnpj.management.commands.load_cnpj import _get_dsn
+
+                conn = psycopg2.connect(_get_dsn())
+                cur = conn.cursor()
+                criar_tabelas_temporarias(cur)
+            if options["es"]:
+                from elasticsearch_dsl.connections import get_connection
+
+                from cnpj.documents import EstabelecimentoDocument
+
+                es = get_connection()
+                indice_bench = EstabelecimentoDocument._index.clone(es_index)
+                indice_bench.delete(ignore=404)
+                indice_bench.create()
+
+            carga, dfs = medir_carga(zips, COMPETENCIA_BENCH, cur)
+            indice = medir_indexacao(dfs, COMPETENCIA_BENCH, es_index, cur=cur, es=es)
+        except CommandError:
+            raise
+        except Exception as exc:
+            raise CommandError(f"Erro no benchmark: {exc}") from exc
+        finally:
+            if conn is not None:
+                conn.rollback()
+                conn.close()  # tabelas temporárias somem com a conexão
+            if indice_bench is not None:
+                indice_bench.delete(ignore=404)
+
+        return {"carga": carga, "indice": indice}
+
+    def _imprimir(self, resultado: dict) -> None:
+        self.stdout.write(
+            f"\n  {'ETAPA':<34} {'SEG':>8} {'LINHAS':>10} {'LINHAS/S':>12} {'MB/S':>8}"
+        )
+        self.stdout.write(f"  {'-'*76}")
+        linhas = [
+            (f"{tipo}.{etapa}", r)
+            for tipo, etapas in resultado["carga"].items()
+            for etapa, r in etapas.items()
+        ] + [(f"indice.{etapa}", r) for etapa, r in resultado["indice"].items()]
+        for nome, r in linhas:
+            self.stdout.write(
+                f"  {nome:<34} {r['segundos']:>8.3f} {r['linhas']:>10,} "
+                f"{r['linhas_s']:>12,.0f} {r['mb_s']:>8.2f}"
+            )
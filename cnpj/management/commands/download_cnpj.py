@@ -6,6 +6,19 @@ Uso:
     python manage.py download_cnpj --start 2025-01 --end 2026-01
     python manage.py download_cnpj --only-latest
     python manage.py download_cnpj --start 2025-06 --end 2025-06
+    python manage.py download_cnpj --only-latest --parallel 6 --segments 4
+    python manage.py download_cnpj --only-latest --verify-zip
+
+Downloads interrompidos ficam em `<arquivo>.part` e são retomados via
+HTTP Range na próxima tentativa (ou execução), sem recomeçar do byte 0.
+O validador remoto (ETag/Last-Modified) do parcial fica em
+`<arquivo>.validador`; se o arquivo mudar no servidor, os parciais da
+versão antiga são descartados em vez de retomados.
+
+Cada competência tem um `manifest.json` com o Content-Length/ETag/Last-Modified
+e o sha256 de cada arquivo baixado. Na execução seguinte, um HEAD basta para
+decidir se o arquivo local ainda vale; ZIPs truncados por execuções antigas
+são retomados em vez de pulados.
 
 Modo Lite (economia de espaço/tempo):
     python manage.py download_cnpj --only-latest --slices 1
@@ -13,14 +26,22 @@ Modo Lite (economia de espaço/tempo):
     python manage.py download_cnpj --only-latest --lite
 """
 
+import hashlib
+import json
 import logging
+import os
+import shutil
+import threading
 import time
-from datetime import date
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
 from pathlib import Path
 
 import requests
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 BASE_URL = "https://arquivos.receitafederal.gov.br/public.php/dav/files/YggdBLfdninEJX9"
@@ -42,6 +63,15 @@ FILES_PARTICIONADOS = (
 )
 ALL_FILES = FILES_DOMINIO + FILES_PARTICIONADOS
 
+# Parâmetros do motor de download
+HTTP_TIMEOUT = 120
+CHUNK_BYTES = 1024 * 256
+PARALELO_DEFAULT = 4
+# Só vale a pena dividir em ranges arquivos grandes (Estabelecimentos*, Empresas*...)
+SEGMENTO_MIN_BYTES = 64 * 1024 * 1024
+# Registro por competência dos arquivos baixados (ver _Manifesto)
+MANIFESTO = "manifest.json"
+
 # Mapeamento tipo → prefixo de arquivo (para --skip-tables)
 TIPO_PREFIXO = {
     "empresa": "Empresas",
@@ -122,57 +152,429 @@ def _competencia_mais_recente() -> str:
     return f"{y:04d}-{m:02d}"
 
 
-def _download_arquivo(url: str, dest: Path, logger: logging.Logger, max_retries: int = 3) -> bool:
-    """Baixa um arquivo com retry e backoff exponencial. Retorna True em sucesso."""
-    # Skip se já existe e tem tamanho > 0
-    if dest.exists() and dest.stat().st_size > 0:
-        logger.info(f"SKIP (já existe): {dest.name}")
-        return True
+def _criar_sessao(pool_size: int) -> requests.Session:
+    """Sessão HTTP com pool de conexões keep-alive compartilhado entre as threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-    for tentativa in range(1, max_retries + 1):
-        try:
-            resp = requests.get(url, stream=True, timeout=120)
-            resp.raise_for_status()
-
-            total = int(resp.headers.get("content-length", 0))
-            dest.parent.mkdir(parents=True, exist_ok=True)
-
-            with (
-                open(dest, "wb") as f,
-                tqdm(
-                    total=total,
-                    unit="B",
-                    unit_scale=True,
-                    unit_divisor=1024,
-                    desc=f"  {dest.name}",
-                    leave=False,
-                    ncols=80,
-                ) as pbar,
-            ):
-                for chunk in resp.iter_content(chunk_size=1024 * 256):
-                    if chunk:
-                        f.write(chunk)
+
+def _espera_retry(exc: Exception, tentativa: int) -> float:
+    """Backoff exponencial; respeita `Retry-After` em 429/503 (servidor throttling)."""
+    resp = getattr(exc, "response", None)
+    if resp is not None and resp.status_code in (429, 503):
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return float(2**tentativa)
+
+
+def _info_remota(session: requests.Session, url: str) -> dict:
+    """
+    HEAD → metadados do arquivo remoto: tamanho (0 se desconhecido), se o
+    servidor aceita Range, ETag e Last-Modified (vazios se ausentes).
+    """
+    resp = session.head(url, allow_redirects=True, timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+    return {
+        "tamanho": int(resp.headers.get("content-length", 0) or 0),
+        "aceita_range": resp.headers.get("accept-ranges", "").lower() == "bytes",
+        "etag": resp.headers.get("etag", ""),
+        "last_modified": resp.headers.get("last-modified", ""),
+    }
+
+
+def _validador(remoto: dict) -> str:
+    """Valor para `If-Range`: ETag forte ou, na falta dele, o Last-Modified."""
+    etag = remoto.get("etag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return remoto.get("last_modified", "")
+
+
+def _baixar_range(
+    session: requests.Session,
+    url: str,
+    part: Path,
+    inicio: int = 0,
+    fim: int | None = None,
+    pbar: tqdm | None = None,
+    validador: str = "",
+) -> None:
+    """
+    Baixa os bytes [inicio, fim] de `url` anexando em `part`. Se `part` já tem
+    dados (tentativa anterior interrompida), retoma do ponto em que parou.
+
+    Com `validador`, a retomada vai com `If-Range`: se o arquivo mudou no
+    servidor, ele responde 200 com o arquivo inteiro em vez de um range
+    que misturaria duas versões.
+    """
+    ja_baixado = part.stat().st_size if part.exists() else 0
+    pos = inicio + ja_baixado
+    if fim is not None and pos > fim:
+        return  # segmento já completo
+
+    headers = {}
+    if pos > 0 or fim is not None:
+        headers["Range"] = f"bytes={pos}-{'' if fim is None else fim}"
+        if validador:
+            headers["If-Range"] = validador
+
+    with session.get(url, headers=headers, stream=True, timeout=HTTP_TIMEOUT) as resp:
+        if resp.status_code == 416 and fim is None:
+            return  # nada além do que já temos: arquivo completo
+        resp.raise_for_status()
+
+        modo = "ab"
+        if headers and resp.status_code != 206:
+            # Servidor ignorou o Range (ou o If-Range não bateu): só dá para
+            # recomeçar o arquivo inteiro
+            if pbar is not None:
+                pbar.update(-ja_baixado)
+            if inicio > 0 or fim is not None:
+                # O segmento não serve mais; os outros são descartados na
+                # próxima execução, pelo validador (ver `_conferir_parciais`)
+                part.unlink(missing_ok=True)
+                raise RuntimeError(
+                    "servidor não respeitou Range em download segmentado "
+                    "(arquivo remoto mudou?); segmento descartado"
+                )
+            modo = "wb"
+
+        with open(part, modo) as f:
+            for chunk in resp.iter_content(chunk_size=CHUNK_BYTES):
+                if chunk:
+                    f.write(chunk)
+                    if pbar is not None:
                         pbar.update(len(chunk))
 
-            logger.info(f"OK: {dest.name}")
-            return True
 
+def _descartar_parciais(dest: Path) -> None:
+    """Apaga os `.part*` de `dest` e o validador gravado para eles."""
+    for parcial in dest.parent.glob(f"{dest.name}.part*"):
+        parcial.unlink()
+    dest.with_name(dest.name + ".validador").unlink(missing_ok=True)
+
+
+def _conferir_parciais(dest: Path, validador: str, logger: logging.Logger) -> None:
+    """
+    Descarta os segmentos `.partK` de `dest` baixados de outra versão do
+    arquivo remoto (validador gravado diferente do atual, ou ausente) e grava
+    o validador atual para a próxima retomada. O `.part` único não precisa:
+    o `If-Range` já o faz recomeçar do zero. Sem validador (HEAD falhou), não
+    há como comparar e os segmentos ficam.
+    """
+    if not validador:
+        return
+    marca = dest.with_name(dest.name + ".validador")
+    anterior = marca.read_text() if marca.exists() else None
+    segmentos = list(dest.parent.glob(f"{dest.name}.part?*"))
+    if anterior != validador and segmentos:
+        logger.info(f"DESCARTANDO SEGMENTOS (arquivo remoto mudou): {dest.name}")
+        for seg in segmentos:
+            seg.unlink()
+    marca.write_text(validador)
+
+
+def _com_retry(func, descricao: str, logger: logging.Logger, max_retries: int) -> bool:
+    """Executa `func` com backoff; os `.part` são mantidos entre tentativas."""
+    for tentativa in range(1, max_retries + 1):
+        try:
+            func()
+            return True
         except Exception as exc:
-            espera = 2**tentativa
+            espera = _espera_retry(exc, tentativa)
             logger.warning(
-                f"Tentativa {tentativa}/{max_retries} falhou para {dest.name}: {exc}. "
-                f"Aguardando {espera}s..."
+                f"Tentativa {tentativa}/{max_retries} falhou para {descricao}: {exc}. "
+                f"Aguardando {espera:.0f}s..."
             )
-            # Remove arquivo parcial
-            if dest.exists():
-                dest.unlink()
             if tentativa < max_retries:
                 time.sleep(espera)
-
-    logger.error(f"FALHA DEFINITIVA: {dest.name}")
     return False
 
 
+def _download_segmentado(
+    session: requests.Session,
+    url: str,
+    dest: Path,
+    total: int,
+    segmentos: int,
+    pbar: tqdm,
+    logger: logging.Logger,
+    max_retries: int,
+    validador: str = "",
+) -> bool:
+    """
+    Baixa um arquivo grande em N ranges paralelos, cada um em seu próprio
+    `.partK` (retomável independentemente), e os concatena ao final.
+    """
+    tamanho = -(-total // segmentos)
+    partes = []
+    for i in range(segmentos):
+        inicio = i * tamanho
+        fim = min(total, inicio + tamanho) - 1
+        if inicio <= fim:
+            partes.append((dest.with_name(f"{dest.name}.part{i}"), inicio, fim))
+    pbar.update(sum(p.stat().st_size for p, _, _ in partes if p.exists()))
+
+    with ThreadPoolExecutor(max_workers=len(partes)) as pool:
+        resultados = list(
+            pool.map(
+                lambda seg: _com_retry(
+                    lambda: _baixar_range(session, url, seg[0], seg[1], seg[2], pbar, validador),
+                    seg[0].name,
+                    logger,
+                    max_retries,
+                ),
+                partes,
+            )
+        )
+    if not all(resultados):
+        return False
+
+    part = dest.with_name(dest.name + ".part")
+    with open(part, "wb") as out:
+        for seg_path, _, _ in partes:
+            with open(seg_path, "rb") as f:
+                shutil.copyfileobj(f, out, CHUNK_BYTES * 4)
+    for seg_path, _, _ in partes:
+        seg_path.unlink()
+    return True
+
+
+# ── manifesto e verificação de integridade ──────────────────────────────────
+
+
+class _Manifesto:
+    """
+    `data/raw/YYYY-MM/manifest.json`: por arquivo, os metadados remotos
+    (Content-Length, ETag, Last-Modified) do download e o estado local
+    (tamanho, mtime, sha256). Compartilhado pelas threads da competência;
+    cada gravação é atômica (tmp + os.replace).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._entradas = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._entradas = {}
+
+    def get(self, nome: str) -> dict | None:
+        with self._lock:
+            entrada = self._entradas.get(nome)
+            return dict(entrada) if entrada else None
+
+    def registrar(self, nome: str, entrada: dict) -> None:
+        with self._lock:
+            self._entradas[nome] = entrada
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(
+                json.dumps(self._entradas, indent=2, sort_keys=True, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.path)
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while bloco := f.read(CHUNK_BYTES * 4):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _zip_integro(path: Path) -> bool:
+    """
+    Checagem rápida do ZIP: lê só o diretório central (fim do arquivo) e
+    confere que cada membro cabe no arquivo. Nada é descomprimido.
+    """
+    tamanho = path.stat().st_size
+    try:
+        with zipfile.ZipFile(path) as zf:
+            membros = zf.infolist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+    return bool(membros) and all(m.header_offset + m.compress_size <= tamanho for m in membros)
+
+
+def _registrar(manifesto: _Manifesto | None, dest: Path, remoto: dict, zip_ok: bool) -> None:
+    if manifesto is None:
+        return
+    st = dest.stat()
+    manifesto.registrar(
+        dest.name,
+        {
+            "tamanho": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": _sha256(dest),
+            "etag": remoto.get("etag", ""),
+            "last_modified": remoto.get("last_modified", ""),
+            "zip_verificado": zip_ok,
+            "registrado_em": datetime.now().isoformat(timespec="seconds"),
+        },
+    )
+
+
+def _mesmo_remoto(entrada: dict, remoto: dict) -> bool:
+    """O arquivo registrado no manifesto ainda é o que o servidor anuncia?"""
+    if remoto["tamanho"] and entrada.get("tamanho") != remoto["tamanho"]:
+        return False
+    for campo in ("etag", "last_modified"):
+        if entrada.get(campo) and remoto.get(campo) and entrada[campo] != remoto[campo]:
+            return False
+    return True
+
+
+def _avaliar_existente(dest: Path, remoto: dict, entrada: dict | None) -> str:
+    """
+    Decide o que fazer com um `dest` que já existe em disco:
+      "skip"    — registrado no manifesto, intacto e igual ao remoto;
+      "adotar"  — sem manifesto (ou tocado), mas com o tamanho remoto: registra;
+      "retomar" — menor que o remoto (download antigo truncado): segue via Range;
+      "baixar"  — remoto mudou ou tamanho local inconsistente: recomeça do zero.
+    Sem metadados remotos (HEAD falhou), decide pelo manifesto ou pelo ZIP.
+    """
+    st = dest.stat()
+    intacto = (
+        entrada is not None
+        and entrada.get("tamanho") == st.st_size
+        and entrada.get("mtime_ns") == st.st_mtime_ns
+    )
+
+    if not remoto["tamanho"]:
+        if intacto:
+            return "skip"
+        return "adotar" if _zip_integro(dest) else "retomar"
+
+    if intacto:
+        return "skip" if _mesmo_remoto(entrada, remoto) else "baixar"
+    if st.st_size == remoto["tamanho"]:
+        return "adotar"
+    return "retomar" if st.st_size < remoto["tamanho"] else "baixar"
+
+
+def _download_arquivo(
+    url: str,
+    dest: Path,
+    logger: logging.Logger,
+    max_retries: int = 3,
+    session: requests.Session | None = None,
+    segmentos: int = 1,
+    manifesto: _Manifesto | None = None,
+    verificar_zip: bool = False,
+) -> bool:
+    """
+    Baixa um arquivo com retry, backoff e retomada via `Range`. Retorna True em sucesso.
+
+    Os bytes vão para `<dest>.part`, renomeado para `dest` só depois de
+    completo — uma falha nunca deixa um ZIP truncado com o nome final, e a
+    próxima tentativa (ou execução) continua de onde parou.
+
+    Um `dest` já existente só é pulado se bater com o HEAD remoto (ver
+    `_avaliar_existente`); com `verificar_zip`, o ZIP baixado passa pela
+    checagem do diretório central antes de ser aceito.
+    """
+    session = session or _criar_sessao(max(1, segmentos))
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + ".part")
+
+    remoto = {"tamanho": 0, "aceita_range": False, "etag": "", "last_modified": ""}
+    try:
+        remoto = _info_remota(session, url)
+    except Exception as exc:
+        logger.warning(f"HEAD falhou para {dest.name}: {exc} (seguindo sem tamanho remoto)")
+    total = remoto["tamanho"]
+
+    if dest.exists():
+        acao = _avaliar_existente(dest, remoto, manifesto.get(dest.name) if manifesto else None)
+        if acao == "adotar" and verificar_zip and not _zip_integro(dest):
+            acao = "baixar"
+        if acao == "skip":
+            logger.info(f"SKIP (íntegro): {dest.name}")
+            return True
+        if acao == "adotar":
+            _registrar(manifesto, dest, remoto, zip_ok=verificar_zip)
+            logger.info(f"SKIP (registrado no manifesto): {dest.name}")
+            return True
+        if acao == "retomar":
+            logger.info(f"RETOMANDO (arquivo local incompleto): {dest.name}")
+            os.replace(dest, part)
+        else:
+            logger.info(f"REBAIXANDO (arquivo remoto mudou): {dest.name}")
+            dest.unlink()
+            _descartar_parciais(dest)
+
+    validador = _validador(remoto)
+    _conferir_parciais(dest, validador, logger)
+    if total and part.exists() and part.stat().st_size > total:
+        # O Range pediria bytes além do fim (416, tomado por "completo")
+        logger.info(f"DESCARTANDO PARCIAL (maior que o remoto): {dest.name}")
+        part.unlink()
+    with tqdm(
+        total=total or None,
+        unit="B",
+        unit_scale=True,
+        unit_divisor=1024,
+        desc=f"  {dest.name}",
+        leave=False,
+        ncols=80,
+    ) as pbar:
+        if segmentos > 1 and remoto["aceita_range"] and total >= SEGMENTO_MIN_BYTES:
+            ok = _download_segmentado(
+                session, url, dest, total, segmentos, pbar, logger, max_retries, validador
+            )
+        else:
+            if part.exists():
+                pbar.update(part.stat().st_size)
+            ok = _com_retry(
+                lambda: _baixar_range(session, url, part, pbar=pbar, validador=validador),
+                dest.name,
+                logger,
+                max_retries,
+            )
+
+    if ok and total and part.stat().st_size != total:
+        logger.error(
+            f"TAMANHO DIVERGENTE: {dest.name} ({part.stat().st_size:,} de {total:,} bytes, "
+            "parcial descartado)"
+        )
+        _descartar_parciais(dest)
+        return False
+
+    if not ok:
+        logger.error(f"FALHA DEFINITIVA: {dest.name} (parcial mantido para retomada)")
+        return False
+
+    if verificar_zip and not _zip_integro(part):
+        logger.error(f"ZIP CORROMPIDO: {dest.name} (diretório central inválido, descartado)")
+        _descartar_parciais(dest)
+        return False
+
+    os.replace(part, dest)
+    dest.with_name(dest.name + ".validador").unlink(missing_ok=True)
+    _registrar(manifesto, dest, remoto, zip_ok=verificar_zip)
+    logger.info(f"OK: {dest.name}")
+    return True
+
+
+def _logger_competencia(competencia: str, logs_dir: Path | None = None) -> logging.Logger:
+    """Logger em arquivo `download_<competencia>.log` (criado uma vez por processo)."""
+    logs_dir = logs_dir or Path(getattr(settings, "CNPJ_LOGS_DIR", "logs"))
+    logger = logging.getLogger(f"download.{competencia}")
+    if not logger.handlers:
+        logs_dir.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(logs_dir / f"download_{competencia}.log", encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+    return logger
+
+
 class Command(BaseCommand):
     help = "Baixa os arquivos ZIP de CNPJ da Receita Federal para o intervalo de competências informado."
 
@@ -197,6 +599,23 @@ class Command(BaseCommand):
             default=False,
             help="Baixa apenas a competência mais recente (ignora --start/--end)",
         )
+        parser.add_argument(
+            "--parallel",
+            type=int,
+            default=PARALELO_DEFAULT,
+            metavar="N",
+            help=f"Downloads simultâneos de arquivos (padrão: {PARALELO_DEFAULT})",
+        )
+        parser.add_argument(
+            "--segments",
+            type=int,
+            default=1,
+            metavar="N",
+            help=(
+                "Divide cada arquivo grande (>= 64 MB) em N ranges baixados em paralelo "
+                "(padrão: 1, sem divisão)"
+            ),
+        )
         parser.add_argument(
             "--files",
             nargs="+",
@@ -204,6 +623,15 @@ class Command(BaseCommand):
             metavar="ARQUIVO",
             help="Baixa apenas os arquivos especificados (ex: Cnaes.zip Simples.zip)",
         )
+        parser.add_argument(
+            "--verify-zip",
+            action="store_true",
+            default=False,
+            help=(
+                "Confere o diretório central de cada ZIP baixado antes de aceitá-lo "
+                "(lê só o fim do arquivo)"
+            ),
+        )
         # ── Modo Lite ──────────────────────────────────────────────────────
         parser.add_argument(
             "--slices",
@@ -256,6 +684,13 @@ class Command(BaseCommand):
         if slices is not None and not (1 <= slices <= 10):
             raise CommandError("--slices deve ser um valor entre 1 e 10.")
 
+        paralelo: int = options["parallel"]
+        segmentos: int = options["segments"]
+        if paralelo < 1 or segmentos < 1:
+            raise CommandError("--parallel e --segments devem ser >= 1.")
+        # Uma conexão keep-alive por download/segmento simultâneo
+        session = _criar_sessao(paralelo * segmentos)
+
         if options["files"]:
             arquivos = options["files"]
         else:
@@ -276,6 +711,7 @@ class Command(BaseCommand):
                 f"{modo_info}"
                 f"  Download CNPJ RF — {len(competencias)} competência(s)\n"
                 f"  Arquivos por competência: {len(arquivos)}\n"
+                f"  Downloads simultâneos: {paralelo} (segmentos/arquivo: {segmentos})\n"
                 f"  Total de downloads: {len(competencias) * len(arquivos)}\n"
                 f"{'='*60}\n"
             )
@@ -285,29 +721,34 @@ class Command(BaseCommand):
         total_erros = 0
 
         for competencia in tqdm(competencias, desc="Competências", unit="comp", ncols=80):
-            # Logger por competência
-            log_path = logs_dir / f"download_{competencia}.log"
-            logger = logging.getLogger(f"download.{competencia}")
-            if not logger.handlers:
-                handler = logging.FileHandler(log_path, encoding="utf-8")
-                handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
-                logger.addHandler(handler)
-                logger.setLevel(logging.DEBUG)
+            logger = _logger_competencia(competencia, logs_dir)
 
             self.stdout.write(f"\n▶  Competência: {competencia}")
             comp_ok = 0
             comp_erros = 0
-
-            for arquivo in arquivos:
-                url = f"{BASE_URL}/{competencia}/{arquivo}"
-                dest = data_dir / competencia / arquivo
-                ok = _download_arquivo(url, dest, logger)
-                if ok:
-                    comp_ok += 1
-                    total_ok += 1
-                else:
-                    comp_erros += 1
-                    total_erros += 1
+            manifesto = _Manifesto(data_dir / competencia / MANIFESTO)
+
+            with ThreadPoolExecutor(max_workers=paralelo) as pool:
+                futures = [
+                    pool.submit(
+                        _download_arquivo,
+                        f"{BASE_URL}/{competencia}/{arquivo}",
+                        data_dir / competencia / arquivo,
+                        logger,
+                        session=session,
+                        segmentos=segmentos,
+                        manifesto=manifesto,
+                        verificar_zip=options["verify_zip"],
+                    )
+                    for arquivo in arquivos
+                ]
+                for future in as_completed(futures):
+                    if future.result():
+                        comp_ok += 1
+                        total_ok += 1
+                    else:
+                        comp_erros += 1
+                        total_erros += 1
 
             status_str = self.style.SUCCESS(f"✓ {comp_ok}") + (
                 f" | {self.style.ERROR(f'✗ {comp_erros}')}" if comp_erros else ""
@@ -0,0 +1,52 @@
+"""
+Management command que reconstrói o grafo de vínculos societários
+(`cnpj_vinculo`, ver `cnpj.grafo`) a partir dos Sócios já carregados.
+
+O `load_cnpj` e o `pipeline_cnpj` já chamam a reconstrução ao fim da carga
+dos Sócios; este comando serve para recalcular sem recarregar (ex.: após
+uma carga anterior a esta tabela).
+
+Uso:
+    python manage.py grafo_cnpj --competencia 2026-02
+    python manage.py grafo_cnpj --all
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cnpj.grafo import construir_vinculos
+
+
+class Command(BaseCommand):
+    help = "Reconstrói a lista de adjacência empresa–sócio (cnpj_vinculo) por competência."
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument(
+            "--competencia",
+            type=str,
+            metavar="YYYY-MM",
+            help="Competência a reconstruir (ex: 2026-02)",
+        )
+        group.add_argument(
+            "--all",
+            action="store_true",
+            default=False,
+            help="Reconstrói todas as competências com sócios no banco",
+        )
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            with connection.cursor() as cur:
+                cur.execute("SELECT DISTINCT competencia FROM cnpj_socio ORDER BY competencia")
+                competencias = [r[0] for r in cur.fetchall()]
+            if not competencias:
+                raise CommandError("Nenhuma competência com sócios no banco.")
+        else:
+            competencias = [options["competencia"]]
+
+        for competencia in competencias:
+            vinculos, segundos = construir_vinculos(competencia)
+            self.stdout.write(
+                self.style.SUCCESS(f"  🕸  {competencia}: {vinculos:,} vínculos em {segundos}s")
+            )
@@ -13,14 +13,17 @@ Uso:
 import logging
 import time
 from concurrent.futures import ProcessPoolExecutor, as_completed
-from datetime import datetime
-from pathlib import Path
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
 from tqdm import tqdm
 
+from cnpj.documents import sugestao
+from cnpj.perfil import TOP_PADRAO, Perfil, perfilado
+from cnpj.perfil import configurar_worker as configurar_perfil
+from cnpj.telemetria import Telemetria, configurar_worker, emitir, fila_atual
+
 logger = logging.getLogger(__name__)
 
 # Configurações de performance
@@ -29,13 +32,6 @@ LOTE_SIZE = 150_000  # docs delegados a 1 worker na pool
 MAX_WORKERS_DEFAULT = 4
 
 
-def _log(log_path: str, msg: str) -> None:
-    ts = datetime.now().strftime("%H:%M:%S")
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {msg}\n")
-        f.flush()
-
-
 def _get_competencias_disponiveis() -> list[str]:
     with connection.cursor() as cur:
         cur.execute("SELECT DISTINCT competencia FROM cnpj_estabelecimento ORDER BY competencia")
@@ -51,13 +47,123 @@ def _count_estabelecimentos(competencia: str) -> int:
         return cur.fetchone()[0]
 
 
+# Uma linha de SQL_LOTE por estabelecimento, já com empresa e Simples. O nº
+# de estabelecimentos e o estabelecimento principal (a matriz ou, sem matriz,
+# o de menor cnpj_ordem) saem de um único GROUP BY restrito às raízes do lote,
+# não de uma subconsulta por linha
+SQL_LOTE = """
+    WITH lote AS (
+        SELECT * FROM cnpj_estabelecimento
+        WHERE competencia = %(competencia)s
+        ORDER BY id
+        LIMIT %(limite)s OFFSET %(offset)s
+    ),
+    raizes AS (
+        SELECT
+            cnpj_basico,
+            count(*) AS estabelecimentos,
+            coalesce(
+                min(cnpj_ordem) FILTER (WHERE identificador_matriz_filial = '1'),
+                min(cnpj_ordem)
+            ) AS ordem_principal
+        FROM cnpj_estabelecimento
+        WHERE competencia = %(competencia)s
+          AND cnpj_basico IN (SELECT cnpj_basico FROM lote)
+        GROUP BY cnpj_basico
+    )
+    SELECT
+        e.cnpj_basico,
+        e.cnpj_ordem,
+        e.cnpj_dv,
+        e.nome_fantasia,
+        e.situacao_cadastral,
+        e.uf,
+        e.municipio,
+        e.cnae_fiscal_principal,
+        e.cnaes_secundarios,
+        emp.porte,
+        e.competencia,
+        emp.razao_social,
+        s.opcao_simples,
+        s.opcao_mei,
+        r.estabelecimentos,
+        e.cnpj_ordem = r.ordem_principal AS principal
+    FROM lote e
+    JOIN raizes r
+        ON r.cnpj_basico = e.cnpj_basico
+    LEFT JOIN cnpj_empresa emp
+        ON emp.cnpj_basico = e.cnpj_basico
+       AND emp.competencia  = e.competencia
+    LEFT JOIN cnpj_simples s
+        ON s.cnpj_basico = e.cnpj_basico
+       AND s.competencia  = e.competencia
+    ORDER BY e.id
+"""
+
+
+def _acao_es(row: tuple, es_index_name: str) -> dict:
+    """Linha de SQL_LOTE → ação de bulk do ES."""
+    (
+        cnpj_b,
+        cnpj_o,
+        cnpj_dv,
+        nome_fantasia,
+        situacao,
+        uf,
+        municipio,
+        cnae,
+        cnaes_secundarios,
+        porte,
+        comp,
+        razao_social,
+        opcao_simples,
+        opcao_mei,
+        estabelecimentos,
+        principal,
+    ) = row
+
+    # ID único combinando CNPJ 14 + mês (evita conflitos no ES)
+    doc_id = f"{cnpj_b or ''}{cnpj_o or ''}{cnpj_dv or ''}_{comp or ''}"
+
+    return {
+        "_index": es_index_name,
+        "_id": doc_id,
+        "_source": {
+            "cnpj": f"{cnpj_b or ''}{cnpj_o or ''}{cnpj_dv or ''}",
+            "cnpj_basico": cnpj_b or "",
+            "cnpj_ordem": cnpj_o or "",
+            "cnpj_dv": cnpj_dv or "",
+            "razao_social": razao_social or "",
+            "nome_fantasia": nome_fantasia or "",
+            "situacao_cadastral": situacao or "",
+            "uf": uf or "",
+            "municipio": municipio or "",
+            "cnae_fiscal_principal": cnae or "",
+            "cnaes_secundarios": cnaes_secundarios or [],
+            "porte": porte or "",
+            "competencia": comp or "",
+            "opcao_simples": opcao_simples or "",
+            "opcao_mei": opcao_mei or "",
+            # Uma entrada por empresa: repetida em cada filial, a mesma razão
+            # social ocuparia as sugestões inteiras
+            "sugestao": (
+                sugestao(razao_social, nome_fantasia, situacao, estabelecimentos)
+                if principal
+                else None
+            ),
+        },
+    }
+
+
 # =======================================================================
 # LÓGICA DO WORKER (EXECUTADO EM OUTRO PROCESSO NATIVO)
 # =======================================================================
 
 
-def _init_worker():
+def _init_worker(fila=None, perfil_dir=None):
     """Fecha conexões clonadas do processo pai p/ evitar bugs no psycopg2/Elastic"""
+    configurar_worker(fila)
+    configurar_perfil(perfil_dir)
     connection.close()
 
     # Ao trabalhar com ProcessPool, conexões HTTP persistentes do ES
@@ -72,6 +178,7 @@ def _init_worker():
     connections.configure(**settings.ELASTICSEARCH_DSL)
 
 
+@perfilado
 def _worker_index_lote(
     lote_id: int,
     competencia: str,
@@ -79,49 +186,20 @@ def _worker_index_lote(
     limite: int,
     es_index_name: str,
     batch_size: int,
-    log_path: str,
 ) -> int:
     """
     Função executada pelo ProcessPoolExecutor.
     Lê uma fatia da tabela de `offset_inicial` até `offset_inicial + limite`.
+    Emite um evento `bulk` por lote com o tempo do SQL e do bulk e as rejeições.
     """
     from elasticsearch.helpers import bulk
     from elasticsearch_dsl.connections import get_connection
 
     # Cria/Recupera conexão HTTP do Elasticsearch própria da Thread
     es = get_connection()
+    ev = {"competencia": competencia, "arquivo": "indice", "lote": lote_id}
 
-    sql = """
-        SELECT
-            e.cnpj_basico,
-            e.cnpj_ordem,
-            e.cnpj_dv,
-            e.nome_fantasia,
-            e.situacao_cadastral,
-            e.uf,
-            e.municipio,
-            e.cnae_fiscal_principal,
-            emp.porte,
-            e.competencia,
-            emp.razao_social,
-            s.opcao_simples,
-            s.opcao_mei
-        FROM cnpj_estabelecimento e
-        LEFT JOIN cnpj_empresa emp
-            ON emp.cnpj_basico = e.cnpj_basico
-           AND emp.competencia  = e.competencia
-        LEFT JOIN cnpj_simples s
-            ON s.cnpj_basico = e.cnpj_basico
-           AND s.competencia  = e.competencia
-        WHERE e.competencia = %s
-        ORDER BY e.id
-        LIMIT %s OFFSET %s
-    """
-
-    _log(
-        log_path,
-        f"WORKER-{lote_id}\t{competencia}\tINICIANDO lote {limite:,} a partir do offset {offset_inicial:,}",
-    )
+    emitir("lote_inicio", **ev, offset=offset_inicial, limite=limite)
 
     total_indexed = 0
     offset_interno = 0
@@ -131,57 +209,26 @@ def _worker_index_lote(
             fetch_size = min(batch_size, limite - offset_interno)
 
             # Fetch no PG
-            cur.execute(sql, [competencia, fetch_size, offset_inicial + offset_interno])
+            t_sql = time.perf_counter()
+            cur.execute(
+                SQL_LOTE,
+                {
+                    "competencia": competencia,
+                    "limite": fetch_size,
+                    "offset": offset_inicial + offset_interno,
+                },
+            )
             rows = cur.fetchall()
+            sql_s = time.perf_counter() - t_sql
 
             if not rows:
                 break
 
             # Transforma rows em Doc Dicts do ES
-            actions = []
-            for row in rows:
-                (
-                    cnpj_b,
-                    cnpj_o,
-                    cnpj_dv,
-                    nome_fantasia,
-                    situacao,
-                    uf,
-                    municipio,
-                    cnae,
-                    porte,
-                    comp,
-                    razao_social,
-                    opcao_simples,
-                    opcao_mei,
-                ) = row
-
-                # ID único combinando CNPJ 14 + mês (evita conflitos no ES)
-                doc_id = f"{cnpj_b or ''}{cnpj_o or ''}{cnpj_dv or ''}_{comp or ''}"
-
-                actions.append(
-                    {
-                        "_index": es_index_name,
-                        "_id": doc_id,
-                        "_source": {
-                            "cnpj_basico": cnpj_b or "",
-                            "cnpj_ordem": cnpj_o or "",
-                            "cnpj_dv": cnpj_dv or "",
-                            "razao_social": razao_social or "",
-                            "nome_fantasia": nome_fantasia or "",
-                            "situacao_cadastral": situacao or "",
-                            "uf": uf or "",
-                            "municipio": municipio or "",
-                            "cnae_fiscal_principal": cnae or "",
-                            "porte": porte or "",
-                            "competencia": comp or "",
-                            "opcao_simples": opcao_simples or "",
-                            "opcao_mei": opcao_mei or "",
-                        },
-                    }
-                )
+            actions = [_acao_es(row, es_index_name) for row in rows]
 
             # Dispara Bulk no Elasticsearch
+            t_bulk = time.perf_counter()
             try:
                 success, errors = bulk(
                     es,
@@ -191,14 +238,25 @@ def _worker_index_lote(
                     chunk_size=fetch_size,
                 )
                 total_indexed += success
-                if errors:
-                    _log(log_path, f"WORKER-{lote_id}\tBULK_ERRORS\t{len(errors)} erros")
+                emitir(
+                    "bulk",
+                    **ev,
+                    linhas=len(rows),
+                    ok=success,
+                    rejeitados=len(errors),
+                    # 429: fila de escrita do ES cheia (es_rejected_execution_exception)
+                    rejeitados_429=sum(
+                        1 for e in errors if next(iter(e.values()), {}).get("status") == 429
+                    ),
+                    sql_s=round(sql_s, 4),
+                    bulk_s=round(time.perf_counter() - t_bulk, 4),
+                )
             except Exception as exc:
-                _log(log_path, f"WORKER-{lote_id}\tBULK_EXCEPTION\t{exc}")
+                emitir("erro", **ev, erro=str(exc))
 
             offset_interno += len(rows)
 
-    _log(log_path, f"WORKER-{lote_id}\tFIM\tIndexou {total_indexed:,} docs.")
+    emitir("lote_fim", **ev, docs=total_indexed)
     return total_indexed
 
 
@@ -213,14 +271,15 @@ def _index_competencia_paralelo(
     es_index_name: str,
     chunk_size: int,
     workers: int,
-    log_path: str,
+    perfil_dir=None,
 ) -> int:
     from elasticsearch_dsl.connections import get_connection
 
     es = get_connection()
 
+    ev = {"competencia": competencia, "arquivo": "indice"}
+
     if replace:
-        _log(log_path, f"DELETE_BY_QUERY\t{competencia}\tapagando docs anteriores...")
         try:
             es.delete_by_query(
                 index=es_index_name,
@@ -228,13 +287,13 @@ def _index_competencia_paralelo(
                 conflicts="proceed",
                 refresh=True,
             )
-            _log(log_path, f"DELETE_BY_QUERY\t{competencia}\tOK")
+            emitir("delete_by_query", **ev, ok=True)
         except Exception as e:
-            _log(log_path, f"DELETE_BY_QUERY\t{competencia}\tErro ou índice vazio ({e})")
+            emitir("delete_by_query", **ev, ok=False, erro=str(e))  # ou índice vazio
 
     # Quantos registros existem no PG pra essa competência
     total_rows = _count_estabelecimentos(competencia)
-    _log(log_path, f"MASTER\t{competencia}\tTotal detectado no DB: {total_rows:,} estabelecimentos")
+    emitir("inicio", **ev, total=total_rows)
 
     if total_rows == 0:
         return 0
@@ -246,12 +305,14 @@ def _index_competencia_paralelo(
     for i in range(num_lotes):
         offset = i * LOTE_SIZE
         limite = LOTE_SIZE if (offset + LOTE_SIZE) <= total_rows else (total_rows - offset)
-        lotes_args.append((i, competencia, offset, limite, es_index_name, chunk_size, log_path))
+        lotes_args.append((i, competencia, offset, limite, es_index_name, chunk_size))
 
     total_indexed = 0
 
     # Cria Pool Paralelo (N Workers)
-    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(fila_atual(), perfil_dir)
+    ) as executor:
         # Agenda tudo
         futures = {}
         for args in lotes_args:
@@ -269,17 +330,18 @@ def _index_competencia_paralelo(
 
         for future in as_completed(futures):
             args = futures[future]
-            lote_id, _, _, limite, _, _, _ = args
+            lote_id, _, _, limite, _, _ = args
             try:
                 qtd_lote = future.result()
                 total_indexed += qtd_lote
                 pbar.update(limite)
             except Exception as exc:
-                _log(log_path, f"MASTER\tWORKER-{lote_id} ESTOUROU: {exc}")
+                emitir("erro", **ev, lote=lote_id, erro=f"worker estourou: {exc}")
                 pbar.update(limite)  # Atualiza do mesmo jeito p/ barra não travar
 
         pbar.close()
 
+    emitir("fim", **ev, status="OK", docs=total_indexed)
     return total_indexed
 
 
@@ -326,6 +388,22 @@ class Command(BaseCommand):
             metavar="N",
             help=f"Qtd. de processos independentes (padrão: {MAX_WORKERS_DEFAULT}).",
         )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            default=False,
+            help=(
+                "Roda cada lote sob cProfile e grava o perfil combinado, por etapa, "
+                "ao lado do JSONL da telemetria"
+            ),
+        )
+        parser.add_argument(
+            "--profile-top",
+            type=int,
+            default=TOP_PADRAO,
+            metavar="N",
+            help=f"Funções listadas por etapa no relatório do --profile (padrão: {TOP_PADRAO})",
+        )
 
     def handle(self, *args, **options):
         try:
@@ -361,13 +439,6 @@ class Command(BaseCommand):
             except Exception as exc:
                 self.stdout.write(self.style.WARNING(f"  ⚠  Não pre-iniciou o index: {exc}"))
 
-        # ── Setup de Log ─────────────────────────────────────────────────────────
-        log_dir = Path(getattr(settings, "CNPJ_LOGS_DIR", "logs"))
-        log_dir.mkdir(parents=True, exist_ok=True)
-        ts_inicio = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_path = str(log_dir / f"index_parallel_{ts_inicio}.log")
-        log_nome = Path(log_path).name
-
         self.stdout.write(
             self.style.SUCCESS(
                 f"\n{'='*60}\n"
@@ -379,48 +450,66 @@ class Command(BaseCommand):
                 f"{'='*60}\n"
             )
         )
-        self.stdout.write(
-            self.style.WARNING(
-                f"  📄 Log em tempo real:\n"
-                f"     No host      → tail -f ./logs/{log_nome}\n"
-                f"     No container → docker compose exec django tail -f {log_path}"
-            )
-        )
-
-        _log(
-            log_path,
-            f"=== INICIO INDEX ES P-POOL | index={es_index_name} | workers={workers} | batch={chunk_size} ===",
-        )
 
         total_geral = 0
         t0 = time.monotonic()
 
-        for competencia in competencias:
-            self.stdout.write(self.style.HTTP_INFO(f"\n▶  Competência Atual: {competencia}"))
-            t_comp = time.monotonic()
+        with Telemetria("index_es") as tel:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"  📄 Telemetria (JSONL) em tempo real:\n"
+                    f"     No host      → tail -f ./logs/{tel.caminho.name}\n"
+                    f"     No container → docker compose exec django tail -f {tel.caminho}\n"
+                    f"     Progresso    → GET /api/etl/progresso/"
+                )
+            )
+            emitir("config", indice=es_index_name, workers=workers, batch=chunk_size)
+            perfil = (
+                Perfil("index_es", tel.caminho.with_suffix(""), options["profile_top"])
+                if options["profile"]
+                else None
+            )
 
-            try:
-                qtd = _index_competencia_paralelo(
-                    competencia=competencia,
-                    replace=options["replace"],
-                    es_index_name=es_index_name,
-                    chunk_size=chunk_size,
-                    workers=workers,
-                    log_path=log_path,
+            for competencia in competencias:
+                self.stdout.write(self.style.HTTP_INFO(f"\n▶  Competência Atual: {competencia}"))
+                t_comp = time.monotonic()
+
+                try:
+                    qtd = _index_competencia_paralelo(
+                        competencia=competencia,
+                        replace=options["replace"],
+                        es_index_name=es_index_name,
+                        chunk_size=chunk_size,
+                        workers=workers,
+                        perfil_dir=perfil and perfil.diretorio,
+                    )
+                except Exception as exc:
+                    self.stdout.write(self.style.ERROR(f"  ERRO GERAL em {competencia}: {exc}"))
+                    emitir(
+                        "fim",
+                        competencia=competencia,
+                        arquivo="indice",
+                        status="ERRO",
+                        erro=str(exc),
+                    )
+                    continue
+
+                elapsed = round(time.monotonic() - t_comp, 1)
+                total_geral += qtd
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"  ✔ Concluído {competencia}: {qtd:,} indexados em {elapsed}s"
+                    )
                 )
-            except Exception as exc:
-                self.stdout.write(self.style.ERROR(f"  ERRO GERAL em {competencia}: {exc}"))
-                _log(log_path, f"ERRO\t{competencia}\t{exc}")
-                continue
 
-            elapsed = round(time.monotonic() - t_comp, 1)
-            total_geral += qtd
-            _log(log_path, f"MASTER\tFIM\t{competencia}\t{qtd:,} docs em {elapsed}s")
-            self.stdout.write(
-                self.style.SUCCESS(f"  ✔ Concluído {competencia}: {qtd:,} indexados em {elapsed}s")
-            )
+            elapsed_total = round(time.monotonic() - t0, 1)
+            emitir("resumo", docs=total_geral, segundos=elapsed_total)
+
+        if perfil is not None:
+            relatorio = perfil.relatorio()
+            if relatorio is not None:
+                self.stdout.write(self.style.WARNING(f"  🔬 Perfil dos workers: {relatorio}"))
 
-        elapsed_total = round(time.monotonic() - t0, 1)
         self.stdout.write(
             self.style.SUCCESS(
                 f"\n{'='*60}\n"
@@ -430,6 +519,3 @@ class Command(BaseCommand):
                 f"{'='*60}\n"
             )
         )
-        _log(
-            log_path, f"=== RESUMO FINAL: {total_geral:,} docs consolidados em {elapsed_total}s ==="
-        )
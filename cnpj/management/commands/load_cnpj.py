@@ -9,6 +9,14 @@ Uso:
     python manage.py load_cnpj --all
     python manage.py load_cnpj --competencia 2025-06 --workers 6
     python manage.py load_cnpj --competencia 2025-06 --replace
+    python manage.py load_cnpj --competencia 2025-06 --profile   # cProfile dos workers
+
+Ao fim de cada competência com Sócios, o grafo de vínculos (`cnpj_vinculo`,
+ver `cnpj.grafo`) é reconstruído; `--skip-grafo` deixa para o `grafo_cnpj`.
+
+Streaming direto do HTTP (sem gravar os ZIPs em data/raw):
+    python manage.py load_cnpj --competencia 2026-02 --stream
+    python manage.py load_cnpj --competencia 2026-02 --stream --base-url http://espelho.local/cnpj
 
 Modo Lite (economia de espaço/tempo):
     python manage.py load_cnpj --competencia 2026-02 --lite
@@ -20,17 +28,23 @@ import io
 import logging
 import zipfile
 from concurrent.futures import ProcessPoolExecutor, as_completed
-from datetime import datetime
+from contextlib import contextmanager
 from pathlib import Path
 
 import pandas as pd
 import psycopg2
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from tqdm import tqdm
 
+from cnpj.grafo import construir_vinculos
 from cnpj.models import CargaLog
+from cnpj.perfil import TOP_PADRAO, Perfil, perfilado
+from cnpj.perfil import configurar_worker as configurar_perfil
+from cnpj.telemetria import Telemetria, configurar_worker, emitir, fila_atual
+
+from .download_cnpj import ALL_FILES, BASE_URL
 
 logger = logging.getLogger(__name__)
 
@@ -110,6 +124,12 @@ COLUNAS = {
     "motivo": ["codigo", "descricao"],
 }
 
+# Colunas calculadas na transformação (não existem no CSV), carregadas no
+# mesmo COPY: os CNAEs secundários explodidos num array com índice GIN
+COLUNAS_DERIVADAS = {
+    "estabelecimento": ["cnaes_secundarios"],
+}
+
 ARQUIVO_TIPO = {
     "Empresas": "empresa",
     "Estabelecimentos": "estabelecimento",
@@ -234,6 +254,12 @@ def _normalizar_col(serie: pd.Series) -> pd.Series:
     return s
 
 
+def _array_cnaes(serie: pd.Series) -> pd.Series:
+    """'4712100,5611201' → literal de array do PostgreSQL '{4712100,5611201}' (vetorizado)."""
+    codigos = serie.str.replace(r"[^0-9]+", ",", regex=True).str.strip(",")
+    return ("{" + codigos + "}").where(codigos.notna() & (codigos != ""), None)
+
+
 def _transformar_chunk(df: pd.DataFrame, tipo: str, competencia: str | None) -> pd.DataFrame:
     """Aplica todas as transformações no chunk (vetorizado)."""
     colunas_data = COLUNAS_DATA.get(tipo, [])
@@ -251,6 +277,9 @@ def _transformar_chunk(df: pd.DataFrame, tipo: str, competencia: str | None) ->
             "***" + cpf.str[3:9] + "**",
         )
 
+    if tipo == "estabelecimento" and "cnae_fiscal_secundaria" in df.columns:
+        df["cnaes_secundarios"] = _array_cnaes(df["cnae_fiscal_secundaria"])
+
     # Parse de datas (vetorizado por coluna)
     for col_data in colunas_data:
         if col_data in df.columns:
@@ -276,20 +305,30 @@ def _get_dsn() -> str:
     )
 
 
-def _copy_dataframe_raw(df: pd.DataFrame, tabela: str, colunas: list[str], dsn: str) -> int:
-    """Carrega DataFrame no PostgreSQL via COPY usando conexão psycopg2 própria."""
+def _buffer_copy(df: pd.DataFrame, colunas: list[str]) -> io.StringIO:
+    """Serializa o DataFrame no formato esperado pelo COPY (TSV, vazio = NULL)."""
     buf = io.StringIO()
     df[colunas].to_csv(buf, index=False, header=False, sep="\t", na_rep="")
     buf.seek(0)
+    return buf
+
+
+def _copy_buffer(cur, buf: io.StringIO, tabela: str, colunas: list[str]) -> None:
+    cols_str = ", ".join(colunas)
+    cur.copy_expert(
+        f"COPY {tabela} ({cols_str}) FROM STDIN WITH (FORMAT CSV, DELIMITER E'\\t', NULL '')",
+        buf,
+    )
+
+
+def _copy_dataframe_raw(df: pd.DataFrame, tabela: str, colunas: list[str], dsn: str) -> int:
+    """Carrega DataFrame no PostgreSQL via COPY usando conexão psycopg2 própria."""
+    buf = _buffer_copy(df, colunas)
 
     conn = psycopg2.connect(dsn)
     try:
         with conn.cursor() as cur:
-            cols_str = ", ".join(colunas)
-            cur.copy_expert(
-                f"COPY {tabela} ({cols_str}) FROM STDIN WITH (FORMAT CSV, DELIMITER E'\\t', NULL '')",
-                buf,
-            )
+            _copy_buffer(cur, buf, tabela, colunas)
         conn.commit()
     finally:
         conn.close()
@@ -298,16 +337,62 @@ def _copy_dataframe_raw(df: pd.DataFrame, tabela: str, colunas: list[str], dsn:
 
 
 # ─────────────────────────────────────────────
-# LOG EM ARQUIVO
+# LEITURA DO CSV (ZIP local ou remoto)
 # ─────────────────────────────────────────────
 
 
-def _log(log_path: str, msg: str) -> None:
-    """Grava uma linha no arquivo de log com timestamp e flush imediato."""
-    ts = datetime.now().strftime("%H:%M:%S")
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {msg}\n")
-        f.flush()
+@contextmanager
+def _abrir_csv(origem: str):
+    """
+    Abre o CSV (primeiro membro) do ZIP em `origem` como stream binário.
+    `origem` é um caminho local ou uma URL http(s) — neste caso o ZIP é
+    descomprimido conforme chega, sem ser gravado em disco.
+    """
+    if origem.startswith(("http://", "https://")):
+        from cnpj.zip_http import abrir_membro_remoto
+
+        with abrir_membro_remoto(origem) as stream:
+            yield stream
+        return
+
+    with zipfile.ZipFile(origem, "r") as zf:
+        nomes = zf.namelist()
+        if not nomes:
+            raise OSError(f"Nenhum CSV em {Path(origem).name}")
+        with zf.open(nomes[0]) as stream:
+            yield stream
+
+
+class _LeituraContada(io.RawIOBase):
+    """Repassa as leituras do stream do CSV contando os bytes (telemetria)."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._stream.readinto(b)
+        self.bytes += n or 0
+        return n
+
+
+def _ler_csv(csv_file, colunas: list[str], chunksize: int = CHUNK_SIZE):
+    """Leitor em chunks do CSV da Receita (ISO-8859-1, `;`, sem cabeçalho)."""
+    return pd.read_csv(
+        csv_file,
+        sep=";",
+        encoding="iso-8859-1",
+        header=None,
+        names=colunas,
+        dtype=str,
+        chunksize=chunksize,
+        on_bad_lines="skip",
+        keep_default_na=False,
+        na_values=[""],
+    )
 
 
 # ─────────────────────────────────────────────
@@ -315,32 +400,43 @@ def _log(log_path: str, msg: str) -> None:
 # ─────────────────────────────────────────────
 
 
+def _init_worker(fila=None, perfil_dir=None) -> None:
+    """Initializer do pool: telemetria e, com --profile, cProfile por tarefa."""
+    configurar_worker(fila)
+    configurar_perfil(perfil_dir)
+
+
+@perfilado
 def _worker(args: tuple) -> tuple[str, int, list[str], float]:
     """
     Worker executado em processo separado pelo ProcessPoolExecutor.
-    Recebe (zip_path_str, competencia, replace, dsn, log_path).
+    Recebe (zip_path_str, competencia, replace, dsn).
     Retorna (zip_name, qtd_registros, lista_erros, elapsed_segundos).
+
+    O progresso sai como eventos de telemetria (`cnpj.telemetria.emitir`):
+    `inicio`, um `chunk` por lote com o tempo de cada etapa, `erro` e `fim`.
     """
     import time
 
-    zip_path_str, competencia, replace, dsn, log_path = args
+    zip_path_str, competencia, replace, dsn = args
     zip_path = Path(zip_path_str)
     t0 = time.monotonic()
+    ev = {"competencia": competencia, "arquivo": zip_path.name}
 
     tipo = _tipo_do_arquivo(zip_path.name)
     if tipo is None:
-        _log(log_path, f"ERRO\t{zip_path.name}\tTipo não identificado")
+        emitir("fim", **ev, status="ERRO", linhas=0, segundos=0.0, erro="Tipo não identificado")
         return zip_path.name, 0, [f"Tipo não identificado: {zip_path.name}"], 0.0
 
     colunas_base = COLUNAS[tipo]
     tabela_db = DB_TABELA[tipo]
     eh_dominio = tipo in TABELAS_DOMINIO
 
-    colunas_insert = colunas_base.copy()
+    colunas_insert = colunas_base + COLUNAS_DERIVADAS.get(tipo, [])
     if not eh_dominio:
         colunas_insert.append("competencia")
 
-    _log(log_path, f"INICIO\t{zip_path.name}\t→ {tabela_db}")
+    emitir("inicio", **ev, tabela=tabela_db)
 
     if replace:
         conn = psycopg2.connect(dsn)
@@ -348,7 +444,7 @@ def _worker(args: tuple) -> tuple[str, int, list[str], float]:
             with conn.cursor() as cur:
                 if eh_dominio:
                     cur.execute(f"TRUNCATE TABLE {tabela_db} CASCADE")
-                    _log(log_path, f"TRUNCATE\t{tabela_db}")
+                    emitir("truncate", **ev, tabela=tabela_db)
             conn.commit()
         finally:
             conn.close()
@@ -357,43 +453,46 @@ def _worker(args: tuple) -> tuple[str, int, list[str], float]:
     erros = []
 
     try:
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            csv_name = zf.namelist()[0] if zf.namelist() else None
-            if not csv_name:
-                _log(log_path, f"ERRO\t{zip_path.name}\tNenhum CSV no ZIP")
-                return zip_path.name, 0, [f"Nenhum CSV em {zip_path.name}"], 0.0
-
-            with zf.open(csv_name) as csv_file:
-                reader = pd.read_csv(
-                    csv_file,
-                    sep=";",
-                    encoding="iso-8859-1",
-                    header=None,
-                    names=colunas_base,
-                    dtype=str,
-                    chunksize=CHUNK_SIZE,
-                    on_bad_lines="skip",
-                    keep_default_na=False,
-                    na_values=[""],
-                )
-                for i, chunk in enumerate(reader):
-                    try:
-                        chunk = _transformar_chunk(chunk, tipo, competencia)
-                        inseridos = _copy_dataframe_raw(chunk, tabela_db, colunas_insert, dsn)
-                        total += inseridos
-                        _log(log_path, f"CHUNK\t{zip_path.name}\tchunk={i}  acumulado={total:,}")
-                    except Exception as exc:
-                        msg = f"Chunk {i} de {zip_path.name}: {exc}"
-                        erros.append(msg)
-                        _log(log_path, f"ERRO_CHUNK\t{zip_path.name}\t{exc}")
+        with _abrir_csv(zip_path_str) as stream:
+            contador = _LeituraContada(stream)
+            leitor = iter(_ler_csv(io.BufferedReader(contador), colunas_base))
+            i, lidos = 0, 0
+            while True:
+                t_parse = time.perf_counter()
+                chunk = next(leitor, None)
+                if chunk is None:
+                    break
+                parse_s = time.perf_counter() - t_parse
+                try:
+                    t_transform = time.perf_counter()
+                    chunk = _transformar_chunk(chunk, tipo, competencia)
+                    t_copy = time.perf_counter()
+                    inseridos = _copy_dataframe_raw(chunk, tabela_db, colunas_insert, dsn)
+                    total += inseridos
+                    emitir(
+                        "chunk",
+                        **ev,
+                        chunk=i,
+                        linhas=inseridos,
+                        bytes=contador.bytes - lidos,
+                        acumulado=total,
+                        parse_s=round(parse_s, 4),
+                        transform_s=round(t_copy - t_transform, 4),
+                        copy_s=round(time.perf_counter() - t_copy, 4),
+                    )
+                except Exception as exc:
+                    erros.append(f"Chunk {i} de {zip_path.name}: {exc}")
+                    emitir("erro", **ev, chunk=i, erro=str(exc))
+                lidos = contador.bytes
+                i += 1
 
     except Exception as exc:
         erros.append(f"Erro ao abrir {zip_path.name}: {exc}")
-        _log(log_path, f"ERRO\t{zip_path.name}\t{exc}")
+        emitir("erro", **ev, erro=str(exc))
 
     elapsed = round(time.monotonic() - t0, 1)
     status = "OK" if not erros else ("PARCIAL" if total > 0 else "ERRO")
-    _log(log_path, f"FIM\t{zip_path.name}\t{total:,} reg\t{elapsed}s\t{status}")
+    emitir("fim", **ev, status=status, linhas=total, segundos=elapsed, erros=len(erros))
     return zip_path.name, total, erros, elapsed
 
 
@@ -406,6 +505,19 @@ def _tipo_do_arquivo(nome_arquivo: str) -> str | None:
     return None
 
 
+def _registrar_resultado(log: CargaLog, qtd: int, erros: list[str]) -> None:
+    """Fecha o CargaLog de um ZIP com o resultado do worker."""
+    log.qtd_registros = qtd
+    log.fim = timezone.now()
+    if erros:
+        log.status = "PARCIAL" if qtd > 0 else "ERRO"
+        log.erro = "\n".join(erros[:10])
+    else:
+        log.status = "SUCESSO"
+    # Só os campos do resultado: bytes_lidos/metricas são da telemetria
+    log.save(update_fields=["qtd_registros", "fim", "status", "erro"])
+
+
 # ─────────────────────────────────────────────
 # COMMAND
 # ─────────────────────────────────────────────
@@ -434,6 +546,22 @@ class Command(BaseCommand):
             default=False,
             help="Remove dados existentes antes de inserir",
         )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            default=False,
+            help=(
+                "Lê os ZIPs direto do HTTP, descomprimindo conforme chegam, sem gravá-los "
+                "em data/raw (exige --competencia)"
+            ),
+        )
+        parser.add_argument(
+            "--base-url",
+            type=str,
+            default=BASE_URL,
+            metavar="URL",
+            help="Origem dos ZIPs no modo --stream (padrão: servidor da Receita)",
+        )
         parser.add_argument(
             "--workers",
             type=int,
@@ -467,6 +595,28 @@ class Command(BaseCommand):
             default=False,
             help="Atalho para --slices 1 --skip-tables simples (mínimo para testes)",
         )
+        parser.add_argument(
+            "--skip-grafo",
+            action="store_true",
+            default=False,
+            help="Não reconstrói o grafo de vínculos (cnpj_vinculo) após carregar os Sócios",
+        )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            default=False,
+            help=(
+                "Roda cada worker sob cProfile e grava o perfil combinado, por etapa, "
+                "ao lado do JSONL da telemetria"
+            ),
+        )
+        parser.add_argument(
+            "--profile-top",
+            type=int,
+            default=TOP_PADRAO,
+            metavar="N",
+            help=f"Funções listadas por etapa no relatório do --profile (padrão: {TOP_PADRAO})",
+        )
 
     def handle(self, *args, **options):
         data_dir: Path = getattr(settings, "CNPJ_DATA_DIR", Path("data/raw"))
@@ -485,8 +635,6 @@ class Command(BaseCommand):
                 skip_tables.append("simples")
 
         if slices is not None and not (1 <= slices <= 10):
-            from django.core.management.base import CommandError
-
             raise CommandError("--slices deve ser um valor entre 1 e 10.")
 
         modo_info = ""
@@ -508,6 +656,9 @@ class Command(BaseCommand):
                 raise CommandError(f"Nenhuma competência encontrada em {data_dir}")
         else:
             competencias = [options["competencia"]]
+        if options["stream"] and options["all"]:
+            raise CommandError("--stream exige --competencia (não há diretório local a listar).")
+        base_url = options["base_url"].rstrip("/")
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -520,110 +671,130 @@ class Command(BaseCommand):
 
         resumo_total = {"arquivos": 0, "registros": 0, "erros": 0}
 
-        for competencia in competencias:
-            comp_dir = data_dir / competencia
-            if not comp_dir.exists():
-                self.stdout.write(self.style.WARNING(f"Diretório não encontrado: {comp_dir}"))
-                continue
-
-            zips = sorted(comp_dir.glob("*.zip"))
-            if not zips:
-                self.stdout.write(self.style.WARNING(f"Nenhum ZIP em {comp_dir}"))
-                continue
-
-            # Aplica filtro lite
-            if slices is not None or skip_tables:
-                zips_orig = len(zips)
-                zips = _filtrar_zips(zips, slices, skip_tables)
-                self.stdout.write(
-                    self.style.WARNING(f"   ⚡ Lite: {len(zips)}/{zips_orig} arquivos selecionados")
-                )
-
-            self.stdout.write(
-                self.style.HTTP_INFO(
-                    f"\n▶  Competência: {competencia} ({len(zips)} arquivos, {workers} workers)"
-                )
-            )
-
-            # Cria registros de log no banco (processo principal, antes de fazer fork)
-            logs_map: dict[str, CargaLog] = {}
-            for zp in zips:
-                log = CargaLog.objects.create(
-                    arquivo=zp.name,
-                    competencia=competencia,
-                    status="INICIADO",
-                )
-                logs_map[zp.name] = log
-
-            # Arquivo de log em tempo real
-            log_dir = Path(getattr(settings, "CNPJ_LOGS_DIR", "logs"))
-            log_dir.mkdir(parents=True, exist_ok=True)
-            ts_inicio = datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_path = str(log_dir / f"etl_{competencia}_{ts_inicio}.log")
-
-            _log(log_path, f"=== ETL CNPJ — competência {competencia} | {workers} workers ===")
-            _log(log_path, f"Arquivos: {len(zips)}")
-            for zp in zips:
-                _log(log_path, f"FILA\t{zp.name}")
-
+        with Telemetria("load_cnpj") as tel:
             # Deriva o caminho relativo ao host (./logs/...) a partir do caminho absoluto do container
-            log_nome = Path(log_path).name
             self.stdout.write(
                 self.style.WARNING(
-                    f"  📄 Log em tempo real:\n"
-                    f"     No host  → tail -f ./logs/{log_nome}\n"
-                    f"     No container → docker compose exec django tail -f {log_path}"
+                    f"  📄 Telemetria (JSONL) em tempo real:\n"
+                    f"     No host  → tail -f ./logs/{tel.caminho.name}\n"
+                    f"     No container → docker compose exec django tail -f {tel.caminho}\n"
+                    f"     Progresso   → GET /api/etl/progresso/"
                 )
             )
+            perfil = (
+                Perfil("load_cnpj", tel.caminho.with_suffix(""), options["profile_top"])
+                if options["profile"]
+                else None
+            )
 
-            # Argumentos para cada worker (inclui log_path)
-            tarefas = [(str(zp), competencia, options["replace"], dsn, log_path) for zp in zips]
-
-            concluidos = 0
-            total_zips = len(zips)
-
-            with ProcessPoolExecutor(max_workers=workers) as pool:
-                futures: dict = {pool.submit(_worker, t): t[0] for t in tarefas}
-
-                tqdm.write(f"\n  {'ARQUIVO':<35} {'REGISTROS':>12}  {'TEMPO':>6}  STATUS")
-                tqdm.write(f"  {'-'*68}")
+            for competencia in competencias:
+                comp_dir = data_dir / competencia
+                if options["stream"]:
+                    zips = [Path(nome) for nome in ALL_FILES]
+                elif not comp_dir.exists():
+                    self.stdout.write(self.style.WARNING(f"Diretório não encontrado: {comp_dir}"))
+                    continue
+                else:
+                    zips = sorted(comp_dir.glob("*.zip"))
+                if not zips:
+                    self.stdout.write(self.style.WARNING(f"Nenhum ZIP em {comp_dir}"))
+                    continue
+
+                # Aplica filtro lite
+                if slices is not None or skip_tables:
+                    zips_orig = len(zips)
+                    zips = _filtrar_zips(zips, slices, skip_tables)
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"   ⚡ Lite: {len(zips)}/{zips_orig} arquivos selecionados"
+                        )
+                    )
 
-                pbar = tqdm(
-                    as_completed(futures),
-                    total=total_zips,
-                    desc="  total",
-                    unit="zip",
-                    ncols=72,
-                    leave=True,
+                self.stdout.write(
+                    self.style.HTTP_INFO(
+                        f"\n▶  Competência: {competencia} ({len(zips)} arquivos, {workers} workers)"
+                    )
                 )
-                for future in pbar:
-                    zip_name_str = Path(futures[future]).name
-                    log = logs_map[zip_name_str]
-                    concluidos += 1
-
-                    try:
-                        _, qtd, erros, elapsed = future.result()
-                    except Exception as exc:
-                        qtd, erros, elapsed = 0, [str(exc)], 0.0
-
-                    log.qtd_registros = qtd
-                    log.fim = timezone.now()
-
-                    if erros:
-                        log.status = "PARCIAL" if qtd > 0 else "ERRO"
-                        log.erro = "\n".join(erros[:10])
-                        status_str = "ERRO" if qtd == 0 else "PARCIAL"
+
+                # Cria registros de log no banco (processo principal, antes de fazer fork)
+                logs_map: dict[str, CargaLog] = {}
+                for zp in zips:
+                    log = CargaLog.objects.create(
+                        arquivo=zp.name,
+                        competencia=competencia,
+                        status="INICIADO",
+                    )
+                    logs_map[zp.name] = log
+                    tel.vincular(competencia, zp.name, log.pk)
+                emitir("fila", competencia=competencia, arquivos=[zp.name for zp in zips])
+
+                tarefas = [
+                    (
+                        f"{base_url}/{competencia}/{zp.name}" if options["stream"] else str(zp),
+                        competencia,
+                        options["replace"],
+                        dsn,
+                    )
+                    for zp in zips
+                ]
+
+                concluidos = 0
+                total_zips = len(zips)
+
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(fila_atual(), perfil and perfil.diretorio),
+                ) as pool:
+                    futures: dict = {pool.submit(_worker, t): t[0] for t in tarefas}
+
+                    tqdm.write(f"\n  {'ARQUIVO':<35} {'REGISTROS':>12}  {'TEMPO':>6}  STATUS")
+                    tqdm.write(f"  {'-'*68}")
+
+                    pbar = tqdm(
+                        as_completed(futures),
+                        total=total_zips,
+                        desc="  total",
+                        unit="zip",
+                        ncols=72,
+                        leave=True,
+                    )
+                    for future in pbar:
+                        zip_name_str = Path(futures[future]).name
+                        log = logs_map[zip_name_str]
+                        concluidos += 1
+
+                        try:
+                            _, qtd, erros, elapsed = future.result()
+                        except Exception as exc:
+                            qtd, erros, elapsed = 0, [str(exc)], 0.0
+
+                        _registrar_resultado(log, qtd, erros)
+                        status_str = {"SUCESSO": "OK"}.get(log.status, log.status)
                         tqdm.write(f"  {zip_name_str:<35} {qtd:>12,}  {elapsed:>5}s  {status_str}")
                         for e in erros[:2]:
                             tqdm.write(f"      ⚠  {e}")
-                    else:
-                        log.status = "SUCESSO"
-                        tqdm.write(f"  {zip_name_str:<35} {qtd:>12,}  {elapsed:>5}s  OK")
-                    log.save()
 
-                    resumo_total["arquivos"] += 1
-                    resumo_total["registros"] += qtd
-                    resumo_total["erros"] += len(erros)
+                        resumo_total["arquivos"] += 1
+                        resumo_total["registros"] += qtd
+                        resumo_total["erros"] += len(erros)
+
+                if not options["skip_grafo"] and any(
+                    _tipo_do_arquivo(zp.name) == "socio" for zp in zips
+                ):
+                    vinculos, segundos = construir_vinculos(competencia)
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"  🕸  Grafo de vínculos: {vinculos:,} vínculos em {segundos}s"
+                        )
+                    )
+
+            emitir("resumo", **resumo_total)
+
+        if perfil is not None:
+            relatorio = perfil.relatorio()
+            if relatorio is not None:
+                self.stdout.write(self.style.WARNING(f"  🔬 Perfil dos workers: {relatorio}"))
 
         resumo_str = (
             f"\n{'='*60}\n"
@@ -634,9 +805,3 @@ class Command(BaseCommand):
             f"{'='*60}\n"
         )
         self.stdout.write(self.style.SUCCESS(resumo_str))
-        # Grava resumo final no log
-        if "log_path" in locals():
-            _log(log_path, "=== RESUMO FINAL ===")
-            _log(log_path, f"Arquivos:  {resumo_total['arquivos']}")
-            _log(log_path, f"Registros: {resumo_total['registros']:,}")
-            _log(log_path, f"Erros:     {resumo_total['erros']}")
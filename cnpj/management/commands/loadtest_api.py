@@ -0,0 +1,386 @@
+"""
+Management command de teste de carga HTTP da API sob o Gunicorn.
+
+Sobe o Gunicorn com o `gunicorn.conf.py` de produção num perfil de serviço
+(`--perfil`, com `--workers`/`--threads`) ou usa um servidor já no ar via
+`--url`, dispara o mix de `cnpj.bench.carga_http` com `--concorrencia`
+clientes e reporta vazão, p50/p95/p99 e a média de consultas SQL e
+requisições ao ES por requisição, por categoria. Falha se o p95 de alguma
+categoria passar do orçamento ou se houver erros demais.
+
+Perfis (`PERFIS`): `legado` (workers sync, conexão nova ao PostgreSQL por
+requisição, sem preload — o deploy antigo), `sync` e `gthread` (conexões
+persistentes + preload) e `asgi` (Uvicorn + views async). Com `--perfil`
+repetido o mesmo mix roda contra cada perfil em sequência e o relatório
+compara vazão e p95 por categoria.
+
+`--popular` antes semeia o PostgreSQL e o Elasticsearch com uma
+competência sintética (`cnpj.bench.sintetico` → load_cnpj → index_es).
+Ela passa a ser a competência mais recente: use um banco de desenvolvimento.
+
+Uso:
+    python manage.py loadtest_api --popular --linhas 200000
+    python manage.py loadtest_api --workers 4 --threads 4 --concorrencia 32
+    python manage.py loadtest_api --url http://localhost:8000 --orcamento detalhe=80
+    python manage.py loadtest_api --perfil legado --perfil gthread --perfil asgi
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from cnpj.bench.carga_http import (
+    MIX_PADRAO,
+    ORCAMENTO_P95_MS,
+    avaliar_orcamento,
+    executar_carga,
+    montar_mix,
+    resumir,
+)
+from cnpj.bench.sintetico import gerar_competencia
+
+COMPETENCIA_LOADTEST = "2099-01"
+GUNICORN_TIMEOUT_INICIO = 60
+
+# Perfis de serviço: ambiente lido pelo gunicorn.conf.py e pelo settings.
+# Todos partem de `_PERFIL_BASE`, para não herdar o ambiente de quem roda.
+_PERFIL_BASE = {
+    "CNPJ_ASYNC": "False",
+    "GUNICORN_WORKER_CLASS": "sync",
+    "GUNICORN_THREADS": "1",
+    "GUNICORN_PRELOAD": "True",
+    "DB_CONN_MAX_AGE": "60",
+}
+PERFIS = {
+    "legado": {"GUNICORN_PRELOAD": "False", "DB_CONN_MAX_AGE": "0"},
+    "sync": {},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread", "GUNICORN_THREADS": "4"},
+    "asgi": {
+        "CNPJ_ASYNC": "True",
+        "GUNICORN_WORKER_CLASS": "uvicorn.workers.UvicornWorker",
+        "DB_CONN_MAX_AGE": "0",
+    },
+}
+
+
+def ambiente_perfil(perfil: str, workers: int, threads: int | None = None) -> dict[str, str]:
+    """Variáveis de ambiente do perfil (`threads` sobrepõe a do perfil)."""
+    env = {**_PERFIL_BASE, **PERFIS[perfil], "GUNICORN_WORKERS": str(workers)}
+    if threads is not None:
+        env["GUNICORN_THREADS"] = str(threads)
+    return env
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _iniciar_gunicorn(ambiente: dict[str, str], porta: int) -> subprocess.Popen:
+    """
+    Sobe o Gunicorn pelo `gunicorn.conf.py` no perfil dado, com a
+    instrumentação ligada (sem log por requisição), e espera responder.
+    """
+    env = {
+        **os.environ,
+        **ambiente,
+        "CNPJ_INSTRUMENTACAO": "True",
+        "CNPJ_LOG_REQUISICOES": "WARNING",
+        "GUNICORN_ACCESSLOG": "",
+    }
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--config",
+            "gunicorn.conf.py",
+            "--bind",
+            f"127.0.0.1:{porta}",
+            "--log-level",
+            "warning",
+        ],
+        cwd=settings.BASE_DIR,
+        env=env,
+    )
+    limite = time.monotonic() + GUNICORN_TIMEOUT_INICIO
+    while time.monotonic() < limite:
+        if proc.poll() is not None:
+            raise CommandError(f"Gunicorn encerrou ao iniciar (código {proc.returncode}).")
+        try:
+            requests.get(f"http://127.0.0.1:{porta}/api/competencias/", timeout=2)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.5)
+    _parar(proc)
+    raise CommandError(f"Gunicorn não respondeu em {GUNICORN_TIMEOUT_INICIO}s.")
+
+
+def _parar(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _pares(valores: list[str], opcao: str) -> dict[str, float]:
+    """["detalhe=80", ...] → {"detalhe": 80.0}."""
+    resultado = {}
+    for v in valores:
+        nome, sep, numero = v.partition("=")
+        try:
+            if not sep:
+                raise ValueError
+            resultado[nome.strip()] = float(numero)
+        except ValueError as exc:
+            raise CommandError(f"{opcao}: esperado categoria=valor, recebido '{v}'.") from exc
+    return resultado
+
+
+class Command(BaseCommand):
+    help = "Teste de carga HTTP da API (Gunicorn) com orçamento de latência por categoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--popular",
+            action="store_true",
+            default=False,
+            help=f"Semeia PG e ES com a competência sintética {COMPETENCIA_LOADTEST} antes",
+        )
+        parser.add_argument(
+            "--linhas",
+            type=int,
+            default=100_000,
+            metavar="N",
+            help="CNPJs básicos sintéticos (semeados e usados no mix; padrão: 100000)",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Semente dos dados e do mix")
+        parser.add_argument(
+            "--url",
+            type=str,
+            default=None,
+            help="Servidor já no ar (não sobe o Gunicorn; contagens exigem CNPJ_INSTRUMENTACAO)",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4, metavar="N", help="Workers do Gunicorn (padrão: 4)"
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=None,
+            metavar="N",
+            help="Threads por worker (padrão: a do perfil; não se aplica ao asgi)",
+        )
+        parser.add_argument(
+            "--perfil",
+            action="append",
+            choices=tuple(PERFIS),
+            default=[],
+            help="Perfil de serviço (repetível: compara os perfis; padrão: sync)",
+        )
+        parser.add_argument(
+            "--concorrencia",
+            type=int,
+            default=16,
+            metavar="N",
+            help="Clientes simultâneos (padrão: 16)",
+        )
+        parser.add_argument(
+            "--requisicoes",
+            type=int,
+            default=2_000,
+            metavar="N",
+            help="Requisições medidas (padrão: 2000)",
+        )
+        parser.add_argument(
+            "--aquecimento",
+            type=int,
+            default=200,
+            metavar="N",
+            help="Requisições de aquecimento descartadas (padrão: 200)",
+        )
+        parser.add_argument(
+            "--mix",
+            action="append",
+            default=[],
+            metavar="CATEGORIA=PESO",
+            help=f"Altera o peso de uma categoria (padrão: {MIX_PADRAO})",
+        )
+        parser.add_argument(
+            "--orcamento",
+            action="append",
+            default=[],
+            metavar="CATEGORIA=MS",
+            help=f"Altera o orçamento de p95 de uma categoria (padrão: {ORCAMENTO_P95_MS})",
+        )
+        parser.add_argument(
+            "--max-erros",
+            type=float,
+            default=1.0,
+            metavar="PCT",
+            help="Taxa de erros (5xx/conexão) tolerada por categoria, em %% (padrão: 1)",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            metavar="ARQUIVO",
+            help="Grava o resultado em JSON",
+        )
+
+    def handle(self, *args, **options):
+        if options["linhas"] < 1 or options["concorrencia"] < 1 or options["requisicoes"] < 1:
+            raise CommandError("--linhas, --concorrencia e --requisicoes devem ser >= 1.")
+
+        pesos = {**MIX_PADRAO, **_pares(options["mix"], "--mix")}
+        desconhecidas = set(pesos) - set(MIX_PADRAO)
+        if desconhecidas:
+            raise CommandError(f"Categorias desconhecidas: {', '.join(sorted(desconhecidas))}")
+        pesos = {c: p for c, p in pesos.items() if p > 0}
+        orcamento = {**ORCAMENTO_P95_MS, **_pares(options["orcamento"], "--orcamento")}
+
+        perfis = list(dict.fromkeys(options["perfil"])) or ["sync"]
+        if options["url"] and len(perfis) > 1:
+            raise CommandError("Vários --perfil sobem um servidor cada; não combina com --url.")
+
+        if options["popular"]:
+            self._popular(options["linhas"], options["seed"])
+
+        mix = montar_mix(
+            options["linhas"],
+            options["aquecimento"] + options["requisicoes"],
+            options["seed"],
+            pesos,
+        )
+        aquecimento, medidas = mix[: options["aquecimento"]], mix[options["aquecimento"] :]
+
+        resultados = {}
+        for perfil in perfis:
+            ambiente = ambiente_perfil(perfil, options["workers"], options["threads"])
+            resultado = self._medir(perfil, ambiente, aquecimento, medidas, options)
+            resultado["config"] = {
+                "url": options["url"],
+                "perfil": None if options["url"] else perfil,
+                "ambiente": None if options["url"] else ambiente,
+                "workers": None if options["url"] else options["workers"],
+                "threads": None if options["url"] else int(ambiente["GUNICORN_THREADS"]),
+                "concorrencia": options["concorrencia"],
+                "requisicoes": options["requisicoes"],
+                "linhas": options["linhas"],
+                "seed": options["seed"],
+                "mix": pesos,
+                "orcamento_p95_ms": orcamento,
+            }
+            if len(perfis) > 1:
+                self.stdout.write(f"\n  [{perfil}]")
+            self._imprimir(resultado)
+            resultados[perfil] = resultado
+
+        if len(perfis) > 1:
+            self._imprimir_comparacao(resultados)
+            saida = resultados
+        else:
+            saida = resultados[perfis[0]]
+
+        if options["output"]:
+            out = Path(options["output"])
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(json.dumps(saida, indent=2), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"\n  ✔ Resultado gravado em {out}"))
+
+        violacoes = []
+        for perfil, resultado in resultados.items():
+            prefixo = f"[{perfil}] " if len(resultados) > 1 else ""
+            violacoes += [
+                prefixo + v
+                for v in avaliar_orcamento(resultado, orcamento, options["max_erros"] / 100)
+            ]
+        if violacoes:
+            for v in violacoes:
+                self.stdout.write(self.style.ERROR(f"  ✗ {v}"))
+            raise CommandError(f"{len(violacoes)} violação(ões) do orçamento de latência.")
+        self.stdout.write(self.style.SUCCESS("  ✔ Dentro do orçamento de latência."))
+
+    def _medir(
+        self, perfil: str, ambiente: dict, aquecimento: list, medidas: list, options: dict
+    ) -> dict:
+        """Sobe o servidor no perfil (se não houver `--url`), dispara o mix e resume."""
+        proc = None
+        base_url = options["url"]
+        if not base_url:
+            porta = _porta_livre()
+            self.stdout.write(
+                f"  Subindo Gunicorn, perfil {perfil} ({ambiente['GUNICORN_WORKERS']} workers "
+                f"{ambiente['GUNICORN_WORKER_CLASS']} x {ambiente['GUNICORN_THREADS']} threads, "
+                f"preload={ambiente['GUNICORN_PRELOAD']}, "
+                f"CONN_MAX_AGE={ambiente['DB_CONN_MAX_AGE']}) em 127.0.0.1:{porta}..."
+            )
+            proc = _iniciar_gunicorn(ambiente, porta)
+            base_url = f"http://127.0.0.1:{porta}"
+
+        try:
+            if aquecimento:
+                executar_carga(base_url, aquecimento, options["concorrencia"])
+            self.stdout.write(
+                f"  Disparando {len(medidas):,} requisições com "
+                f"{options['concorrencia']} clientes..."
+            )
+            amostras, segundos = executar_carga(base_url, medidas, options["concorrencia"])
+        finally:
+            if proc is not None:
+                _parar(proc)
+        return resumir(amostras, segundos)
+
+    def _popular(self, linhas: int, seed: int) -> None:
+        data_dir = Path(getattr(settings, "CNPJ_DATA_DIR", Path("data/raw")))
+        destino = data_dir / COMPETENCIA_LOADTEST
+        self.stdout.write(f"  Gerando {linhas:,} CNPJs sintéticos em {destino}...")
+        gerar_competencia(destino, linhas, seed=seed)
+        call_command("load_cnpj", competencia=COMPETENCIA_LOADTEST, replace=True)
+        call_command("index_es", competencia=COMPETENCIA_LOADTEST, replace=True)
+
+        from cnpj.documents import EstabelecimentoDocument
+
+        EstabelecimentoDocument._index.refresh()
+
+    def _imprimir(self, resultado: dict) -> None:
+        self.stdout.write(
+            f"\n  {'CATEGORIA':<16} {'N':>6} {'RPS':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+            f"{'ERROS':>6} {'SQL':>6} {'ES':>5}"
+        )
+        self.stdout.write(f"  {'-'*80}")
+        linhas = list(resultado["categorias"].items()) + [("TOTAL", resultado["total"])]
+        for nome, r in linhas:
+            sql = "-" if r["sql_media"] is None else f"{r['sql_media']:.1f}"
+            es = "-" if r["es_media"] is None else f"{r['es_media']:.1f}"
+            self.stdout.write(
+                f"  {nome:<16} {r['n']:>6} {r['rps']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+                f"{r['p99']:>8.1f} {r['erros']:>6} {sql:>6} {es:>5}"
+            )
+
+    def _imprimir_comparacao(self, resultados: dict[str, dict]) -> None:
+        """RPS e p95 (ms) de cada perfil, lado a lado, por categoria."""
+        perfis = list(resultados)
+        cabecalho = "".join(f" {'RPS ' + p:>13} {'p95 ' + p:>13}" for p in perfis)
+        self.stdout.write(f"\n  {'CATEGORIA':<16}{cabecalho}")
+        self.stdout.write(f"  {'-' * (16 + 28 * len(perfis))}")
+        primeiro = resultados[perfis[0]]
+        for nome in [*primeiro["categorias"], "TOTAL"]:
+            colunas = ""
+            for p in perfis:
+                r = resultados[p]
+                c = r["total"] if nome == "TOTAL" else r["categorias"].get(nome)
+                colunas += " " * 27 + "-" if c is None else f" {c['rps']:>13.1f} {c['p95']:>13.1f}"
+            self.stdout.write(f"  {nome:<16}{colunas}")
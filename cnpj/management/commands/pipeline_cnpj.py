@@ -0,0 +1,498 @@
+"""
+Management command que encadeia download → carga → indexação em fluxo
+contínuo, sem esperar cada etapa terminar para todos os arquivos.
+
+Cada ZIP entra na fila de carga assim que seu download termina e passa na
+verificação (manifesto + diretório central do ZIP). A fila de carga é por
+prioridade: tabelas de domínio primeiro, depois Simples, Empresas,
+Estabelecimentos e Sócios. Com `--index`, a competência começa a ser
+indexada no Elasticsearch assim que as cargas de Estabelecimentos, Empresas
+e Simples dela terminam — Sócios não entra no índice e segue carregando em
+paralelo. Terminadas as cargas, o grafo de vínculos societários
+(`cnpj_vinculo`, ver `cnpj.grafo`) é reconstruído para cada competência
+com Sócios (`--skip-grafo` desliga).
+
+Cada etapa tem seu próprio limite de concorrência (`--download-parallel`,
+`--load-workers`, `--index-concurrency`). Ao final, o resumo mostra o
+tempo até a primeira linha no PostgreSQL e até a competência estar
+pesquisável ("tempo até dado fresco").
+
+Uso:
+    python manage.py pipeline_cnpj --only-latest --index
+    python manage.py pipeline_cnpj --competencia 2026-02 --lite --replace --index
+    python manage.py pipeline_cnpj --competencia 2026-01 2026-02 --load-workers 6
+"""
+
+import heapq
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cnpj.grafo import construir_vinculos
+from cnpj.models import CargaLog
+from cnpj.telemetria import Telemetria, configurar_worker, fila_atual
+
+from .download_cnpj import (
+    ALL_FILES,
+    BASE_URL,
+    MANIFESTO,
+    PARALELO_DEFAULT,
+    _competencia_mais_recente,
+    _criar_sessao,
+    _download_arquivo,
+    _filtrar_arquivos,
+    _logger_competencia,
+    _Manifesto,
+)
+from .index_es import CHUNK_SIZE_DEFAULT, _index_competencia_paralelo
+from .load_cnpj import (
+    TABELAS_DOMINIO,
+    _get_dsn,
+    _registrar_resultado,
+    _tipo_do_arquivo,
+    _worker,
+)
+
+# Ordem da fila de carga (menor primeiro); domínio tem prioridade 0
+PRIORIDADE_TIPO = {"simples": 1, "empresa": 2, "estabelecimento": 3, "socio": 4}
+# Tabelas que alimentam o documento do ES (ver index_es._worker_index_lote)
+TIPOS_INDICE = {"estabelecimento", "empresa", "simples"}
+
+
+def _prioridade(arquivo: str) -> int:
+    tipo = _tipo_do_arquivo(arquivo)
+    return 0 if tipo in TABELAS_DOMINIO else PRIORIDADE_TIPO.get(tipo, 5)
+
+
+# ─────────────────────────────────────────────
+# TAREFAS DE CADA ETAPA (top-level: precisam ser picklable)
+# ─────────────────────────────────────────────
+
+
+def _baixar(competencia, arquivo, data_dir, session, segmentos, manifestos) -> bool:
+    return _download_arquivo(
+        f"{BASE_URL}/{competencia}/{arquivo}",
+        data_dir / competencia / arquivo,
+        _logger_competencia(competencia),
+        session=session,
+        segmentos=segmentos,
+        manifesto=manifestos[competencia],
+        verificar_zip=True,
+    )
+
+
+def _carregar(competencia, arquivo, data_dir, replace, dsn):
+    """Carga de um ZIP num processo do pool. Retorna (qtd, erros)."""
+    zip_path = Path(data_dir) / competencia / arquivo
+    _, qtd, erros, _ = _worker((str(zip_path), competencia, replace, dsn))
+    return qtd, erros
+
+
+def _indexar(competencia, replace, es_index, batch_size, workers) -> int:
+    try:
+        return _index_competencia_paralelo(
+            competencia=competencia,
+            replace=replace,
+            es_index_name=es_index,
+            chunk_size=batch_size,
+            workers=workers,
+        )
+    finally:
+        connection.close()  # conexão da thread de indexação
+
+
+# ─────────────────────────────────────────────
+# AGENDADOR
+# ─────────────────────────────────────────────
+
+
+class _Pipeline:
+    """
+    Agenda as três etapas sobre executores independentes.
+
+    `baixar(competencia, arquivo) -> bool`, `carregar(competencia, arquivo)
+    -> (qtd, erros)` e `indexar(competencia) -> int` são submetidos aos
+    respectivos pools. Downloads entram todos de uma vez (o próprio pool
+    limita a concorrência, na ordem de prioridade); cargas ficam num heap e
+    só são submetidas quando há vaga, para que um ZIP de domínio recém-baixado
+    passe na frente de Sócios já enfileirados.
+    """
+
+    def __init__(
+        self,
+        arquivos: dict[str, list[str]],
+        baixar,
+        carregar,
+        indexar=None,
+        pool_download=None,
+        pool_carga=None,
+        pool_indice=None,
+        max_cargas: int = 1,
+        ao_evento=None,
+    ):
+        self.arquivos = arquivos
+        self.baixar = baixar
+        self.carregar = carregar
+        self.indexar = indexar
+        self.pool_download = pool_download
+        self.pool_carga = pool_carga
+        self.pool_indice = pool_indice
+        self.max_cargas = max_cargas
+        self.ao_evento = ao_evento or (lambda etapa, competencia, arquivo, info: None)
+
+        # Arquivos que precisam estar carregados para indexar cada competência
+        self._faltam_indice = {
+            comp: {a for a in arqs if _tipo_do_arquivo(a) in TIPOS_INDICE}
+            for comp, arqs in arquivos.items()
+        }
+        self.resultado = {
+            "downloads_ok": 0,
+            "downloads_erro": 0,
+            "cargas_ok": 0,
+            "cargas_erro": 0,
+            "registros": 0,
+            "indexados": 0,
+            "primeira_linha_s": None,
+            "competencias": {comp: {"indexada_s": None, "docs": 0} for comp in arquivos},
+        }
+
+    def _bloquear_indice(self, competencia: str, arquivo: str) -> None:
+        """Falha num arquivo que alimenta o índice: a competência não é indexada."""
+        if arquivo in self._faltam_indice.get(competencia, ()):
+            self._faltam_indice[competencia] = None
+
+    def executar(self) -> dict:
+        t0 = time.monotonic()
+        pendentes = {}
+        fila_carga = []
+        em_carga = 0
+        seq = 0
+
+        ordem = sorted(
+            ((comp, arq) for comp, arqs in self.arquivos.items() for arq in arqs),
+            key=lambda ca: (_prioridade(ca[1]), ca[0], ca[1]),
+        )
+        for comp, arq in ordem:
+            futuro = self.pool_download.submit(self.baixar, comp, arq)
+            pendentes[futuro] = ("download", comp, arq)
+
+        while pendentes:
+            feitos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                etapa, comp, arq = pendentes.pop(futuro)
+                try:
+                    retorno = futuro.result()
+                    falha = None
+                except Exception as exc:
+                    retorno, falha = None, exc
+
+                if etapa == "download":
+                    if retorno and not falha:
+                        self.resultado["downloads_ok"] += 1
+                        heapq.heappush(fila_carga, (_prioridade(arq), seq, comp, arq))
+                        seq += 1
+                    else:
+                        self.resultado["downloads_erro"] += 1
+                        self._bloquear_indice(comp, arq)
+                    self.ao_evento(etapa, comp, arq, falha or retorno)
+
+                elif etapa == "carga":
+                    em_carga -= 1
+                    qtd, erros = retorno if not falha else (0, [str(falha)])
+                    self.resultado["registros"] += qtd
+                    if erros:
+                        self.resultado["cargas_erro"] += 1
+                        self._bloquear_indice(comp, arq)
+                    else:
+                        self.resultado["cargas_ok"] += 1
+                        if qtd and self.resultado["primeira_linha_s"] is None:
+                            self.resultado["primeira_linha_s"] = round(time.monotonic() - t0, 1)
+                        faltam = self._faltam_indice.get(comp)
+                        if faltam is not None:
+                            faltam.discard(arq)
+                    self.ao_evento(etapa, comp, arq, (qtd, erros))
+
+                    faltam = self._faltam_indice.get(comp)
+                    if self.indexar and faltam is not None and not faltam:
+                        self._faltam_indice[comp] = None  # dispara uma vez só
+                        futuro = self.pool_indice.submit(self.indexar, comp)
+                        pendentes[futuro] = ("indice", comp, None)
+                        self.ao_evento("indice_inicio", comp, None, None)
+
+                else:  # indice
+                    docs = 0 if falha else retorno
+                    self.resultado["indexados"] += docs
+                    self.resultado["competencias"][comp]["docs"] = docs
+                    if not falha:
+                        self.resultado["competencias"][comp]["indexada_s"] = round(
+                            time.monotonic() - t0, 1
+                        )
+                    self.ao_evento(etapa, comp, None, falha or docs)
+
+            while fila_carga and em_carga < self.max_cargas:
+                _, _, comp, arq = heapq.heappop(fila_carga)
+                futuro = self.pool_carga.submit(self.carregar, comp, arq)
+                pendentes[futuro] = ("carga", comp, arq)
+                em_carga += 1
+                self.ao_evento("carga_inicio", comp, arq, None)
+
+        self.resultado["total_s"] = round(time.monotonic() - t0, 1)
+        return self.resultado
+
+
+# ─────────────────────────────────────────────
+# COMMAND
+# ─────────────────────────────────────────────
+
+
+class Command(BaseCommand):
+    help = "Baixa, carrega e (opcionalmente) indexa competências CNPJ em fluxo contínuo."
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument(
+            "--competencia",
+            nargs="+",
+            metavar="YYYY-MM",
+            help="Competência(s) a processar (ex: 2026-02)",
+        )
+        group.add_argument(
+            "--only-latest",
+            action="store_true",
+            default=False,
+            help="Processa apenas a competência mais recente",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            default=False,
+            help="Recarrega domínios e apaga documentos da competência no ES antes de indexar",
+        )
+        parser.add_argument(
+            "--download-parallel",
+            type=int,
+            default=PARALELO_DEFAULT,
+            metavar="N",
+            help=f"Downloads simultâneos (padrão: {PARALELO_DEFAULT})",
+        )
+        parser.add_argument(
+            "--segments",
+            type=int,
+            default=1,
+            metavar="N",
+            help="Ranges paralelos por arquivo grande (padrão: 1)",
+        )
+        parser.add_argument(
+            "--load-workers",
+            type=int,
+            default=4,
+            metavar="N",
+            help="Processos de carga simultâneos (padrão: 4)",
+        )
+        parser.add_argument(
+            "--index",
+            action="store_true",
+            default=False,
+            help="Indexa cada competência no ES assim que Estabelecimentos/Empresas/Simples carregarem",
+        )
+        parser.add_argument(
+            "--index-concurrency",
+            type=int,
+            default=1,
+            metavar="N",
+            help="Competências indexadas ao mesmo tempo (padrão: 1)",
+        )
+        parser.add_argument(
+            "--index-workers",
+            type=int,
+            default=4,
+            metavar="N",
+            help="Processos do index_es por competência (padrão: 4)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=CHUNK_SIZE_DEFAULT,
+            metavar="N",
+            help=f"Registros por requisição bulk no ES (padrão: {CHUNK_SIZE_DEFAULT})",
+        )
+        # ── Modo Lite ──────────────────────────────────────────────────────
+        parser.add_argument(
+            "--slices",
+            type=int,
+            default=None,
+            metavar="N",
+            help="Processa apenas os N primeiros ZIPs de cada tipo particionado (1-10)",
+        )
+        parser.add_argument(
+            "--skip-tables",
+            nargs="+",
+            default=[],
+            choices=["empresa", "estabelecimento", "socio", "simples"],
+            metavar="TIPO",
+            help="Ignora os arquivos dos tipos informados",
+        )
+        parser.add_argument(
+            "--lite",
+            action="store_true",
+            default=False,
+            help="Atalho para --slices 1 --skip-tables simples",
+        )
+        parser.add_argument(
+            "--skip-grafo",
+            action="store_true",
+            default=False,
+            help="Não reconstrói o grafo de vínculos (cnpj_vinculo) após carregar os Sócios",
+        )
+
+    def handle(self, *args, **options):
+        data_dir: Path = getattr(settings, "CNPJ_DATA_DIR", Path("data/raw"))
+
+        competencias = (
+            [_competencia_mais_recente()] if options["only_latest"] else options["competencia"]
+        )
+
+        slices = options["slices"]
+        skip_tables: list[str] = list(options["skip_tables"])
+        if options["lite"]:
+            slices = slices or 1
+            if "simples" not in skip_tables:
+                skip_tables.append("simples")
+        if slices is not None and not (1 <= slices <= 10):
+            raise CommandError("--slices deve ser um valor entre 1 e 10.")
+
+        limites = [
+            options["download_parallel"],
+            options["segments"],
+            options["load_workers"],
+            options["index_concurrency"],
+            options["index_workers"],
+        ]
+        if min(limites) < 1:
+            raise CommandError("Os limites de concorrência devem ser >= 1.")
+
+        selecionados = _filtrar_arquivos(ALL_FILES, slices, skip_tables)
+        arquivos = {comp: list(selecionados) for comp in competencias}
+
+        # Configuração Django não sobrevive ao fork; pega DSN antes de criar workers
+        dsn = _get_dsn()
+        manifestos = {comp: _Manifesto(data_dir / comp / MANIFESTO) for comp in competencias}
+        es_index: str = getattr(settings, "CNPJ_ES_INDEX", "cnpj_estabelecimentos")
+
+        if options["index"]:
+            try:
+                from cnpj.documents import EstabelecimentoDocument
+
+                EstabelecimentoDocument.init()
+            except Exception as exc:
+                raise CommandError(f"Erro ao preparar o índice ES: {exc}") from exc
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{'='*60}\n"
+                f"  Pipeline CNPJ — {', '.join(competencias)}\n"
+                f"  Arquivos por competência: {len(selecionados)}\n"
+                f"  Downloads: {options['download_parallel']} | Cargas: {options['load_workers']}"
+                f" | Indexação: {'%d' % options['index_concurrency'] if options['index'] else 'não'}\n"
+                f"{'='*60}\n"
+            )
+        )
+        logs_carga: dict[tuple[str, str], CargaLog] = {}
+
+        def ao_evento(etapa, comp, arq, info):
+            if etapa == "download":
+                ok = info is True
+                estilo = self.style.SUCCESS if ok else self.style.ERROR
+                self.stdout.write(estilo(f"  ⬇ {comp}/{arq}: {'OK' if ok else f'FALHA {info}'}"))
+            elif etapa == "carga_inicio":
+                log = CargaLog.objects.create(arquivo=arq, competencia=comp, status="INICIADO")
+                logs_carga[(comp, arq)] = log
+                tel.vincular(comp, arq, log.pk)
+            elif etapa == "carga":
+                qtd, erros = info
+                _registrar_resultado(logs_carga[(comp, arq)], qtd, erros)
+                estilo = self.style.ERROR if erros else self.style.SUCCESS
+                self.stdout.write(estilo(f"  ⛁ {comp}/{arq}: {qtd:,} registros"))
+                for e in erros[:2]:
+                    self.stdout.write(f"      ⚠  {e}")
+            elif etapa == "indice_inicio":
+                self.stdout.write(self.style.HTTP_INFO(f"  ⚙ {comp}: indexação iniciada"))
+            elif etapa == "indice":
+                if isinstance(info, Exception):
+                    self.stdout.write(self.style.ERROR(f"  ⚙ {comp}: indexação falhou ({info})"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"  ⚙ {comp}: {info:,} docs indexados"))
+
+        session = _criar_sessao(options["download_parallel"] * options["segments"])
+        with (
+            Telemetria("pipeline_cnpj") as tel,
+            ThreadPoolExecutor(max_workers=options["download_parallel"]) as pool_download,
+            ProcessPoolExecutor(
+                max_workers=options["load_workers"],
+                initializer=configurar_worker,
+                initargs=(fila_atual(),),
+            ) as pool_carga,
+            ThreadPoolExecutor(max_workers=options["index_concurrency"]) as pool_indice,
+        ):
+            pipeline = _Pipeline(
+                arquivos,
+                baixar=partial(
+                    _baixar,
+                    data_dir=data_dir,
+                    session=session,
+                    segmentos=options["segments"],
+                    manifestos=manifestos,
+                ),
+                carregar=partial(
+                    _carregar,
+                    data_dir=str(data_dir),
+                    replace=options["replace"],
+                    dsn=dsn,
+                ),
+                indexar=partial(
+                    _indexar,
+                    replace=options["replace"],
+                    es_index=es_index,
+                    batch_size=options["batch_size"],
+                    workers=options["index_workers"],
+                )
+                if options["index"]
+                else None,
+                pool_download=pool_download,
+                pool_carga=pool_carga,
+                pool_indice=pool_indice,
+                max_cargas=options["load_workers"],
+                ao_evento=ao_evento,
+            )
+            r = pipeline.executar()
+
+        grafo = {}
+        if not options["skip_grafo"] and any(_tipo_do_arquivo(a) == "socio" for a in selecionados):
+            for comp in competencias:
+                grafo[comp] = construir_vinculos(comp)
+
+        primeira = r["primeira_linha_s"]
+        linhas = [
+            f"\n{'='*60}",
+            "  Pipeline Concluído",
+            f"  Downloads:  {r['downloads_ok']} ok | {r['downloads_erro']} erro",
+            f"  Cargas:     {r['cargas_ok']} ok | {r['cargas_erro']} erro",
+            f"  Registros:  {r['registros']:,}",
+            f"  1ª linha no PostgreSQL: {'-' if primeira is None else f'{primeira}s'}",
+        ]
+        if options["index"]:
+            for comp, info in r["competencias"].items():
+                fresco = info["indexada_s"]
+                linhas.append(
+                    f"  {comp} pesquisável em: "
+                    + ("não indexada" if fresco is None else f"{fresco}s ({info['docs']:,} docs)")
+                )
+        for comp, (vinculos, segundos) in grafo.items():
+            linhas.append(f"  {comp} grafo: {vinculos:,} vínculos em {segundos}s")
+        linhas += [f"  Tempo total: {r['total_s']}s", f"{'='*60}\n"]
+        self.stdout.write(self.style.SUCCESS("\n".join(linhas)))
@@ -34,6 +34,7 @@ class Command(BaseCommand):
             "cnpj_estabelecimento",
             "cnpj_socio",
             "cnpj_simples",
+            "cnpj_vinculo",
             "cnpj_cnae",
             "cnpj_municipio",
             "cnpj_pais",
@@ -0,0 +1,159 @@
+"""
+Métricas HTTP por rota no formato de exposição do Prometheus.
+
+Cada processo acumula histogramas (duração total, tempo de SQL e de ES) e
+contadores (requisições, consultas SQL, requisições ES, `took`, bytes) por
+`(rota, método, status)`. A rota é o padrão do URLconf
+(`api/cnpj/<str:cnpj_basico>/`), não o caminho, para a cardinalidade não
+crescer com os CNPJs consultados.
+
+Com vários workers do Gunicorn cada processo só vê as próprias
+requisições. Se `CNPJ_METRICAS_DIR` estiver definido, cada processo grava
+um snapshot `<pid>.json` nesse diretório (no máximo a cada
+`INTERVALO_SNAPSHOT_S`) e o `/metrics` soma os snapshots de todos — os de
+workers já encerrados continuam contando, como esperado de contadores.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Limites dos buckets dos histogramas, em segundos
+BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INTERVALO_SNAPSHOT_S = 1.0
+
+HISTOGRAMAS = {
+    "cnpj_http_request_duration_seconds": "Duração da requisição (até o primeiro byte)",
+    "cnpj_http_sql_duration_seconds": "Tempo em consultas SQL por requisição",
+    "cnpj_http_es_duration_seconds": "Tempo em requisições ao Elasticsearch por requisição",
+}
+CONTADORES = {
+    "cnpj_http_sql_queries_total": "Consultas SQL executadas",
+    "cnpj_http_es_requests_total": "Requisições ao Elasticsearch",
+    "cnpj_http_es_took_seconds_total": "Soma do `took` informado pelo Elasticsearch",
+    "cnpj_http_response_bytes_total": "Bytes de corpo enviados (respostas não streaming)",
+}
+ROTULOS = ("rota", "metodo", "status")
+_LE_INF = 'le="+Inf"'
+
+
+class Registro:
+    """Histogramas e contadores de um processo. Thread-safe."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        # (métrica, rota, método, status) → [contagens por bucket..., soma, n]
+        self._histogramas: dict[tuple, list] = {}
+        # (métrica, rota, método, status) → valor
+        self._contadores: dict[tuple, float] = {}
+        self._ultimo_snapshot = 0.0
+
+    def observar(self, rotulos: tuple, segundos: dict[str, float], totais: dict[str, float]):
+        """
+        Registra uma requisição. `segundos`: métrica de histograma → valor;
+        `totais`: métrica de contador → incremento.
+        """
+        with self._trava:
+            for nome, valor in segundos.items():
+                h = self._histogramas.setdefault((nome, *rotulos), [0] * len(BUCKETS_S) + [0.0, 0])
+                for i, limite in enumerate(BUCKETS_S):
+                    if valor <= limite:
+                        h[i] += 1
+                h[-2] += valor
+                h[-1] += 1
+            for nome, valor in totais.items():
+                chave = (nome, *rotulos)
+                self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def snapshot(self) -> dict:
+        with self._trava:
+            return {
+                "histogramas": [[*k, v] for k, v in self._histogramas.items()],
+                "contadores": [[*k, v] for k, v in self._contadores.items()],
+            }
+
+    def gravar(self, diretorio: Path, forcar: bool = False) -> None:
+        """Grava o snapshot do processo em `diretorio/<pid>.json` (atômico)."""
+        agora = time.monotonic()
+        if not forcar and agora - self._ultimo_snapshot < INTERVALO_SNAPSHOT_S:
+            return
+        self._ultimo_snapshot = agora
+        diretorio.mkdir(parents=True, exist_ok=True)
+        destino = diretorio / f"{os.getpid()}.json"
+        tmp = destino.with_suffix(f".tmp{threading.get_ident()}")
+        tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(tmp, destino)
+
+
+def agregar(snapshots: list[dict]) -> dict:
+    """Soma snapshots de vários processos (bucket a bucket)."""
+    histogramas: dict[tuple, list] = {}
+    contadores: dict[tuple, float] = {}
+    for snap in snapshots:
+        for *chave, valores in snap["histogramas"]:
+            acc = histogramas.setdefault(tuple(chave), [0] * len(valores))
+            for i, v in enumerate(valores):
+                acc[i] += v
+        for *chave, valor in snap["contadores"]:
+            contadores[tuple(chave)] = contadores.get(tuple(chave), 0) + valor
+    return {
+        "histogramas": [[*k, v] for k, v in histogramas.items()],
+        "contadores": [[*k, v] for k, v in contadores.items()],
+    }
+
+
+def ler_snapshots(diretorio: Path) -> list[dict]:
+    snapshots = []
+    for arquivo in sorted(diretorio.glob("*.json")):
+        try:
+            snapshots.append(json.loads(arquivo.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue  # worker gravando/encerrando: entra na próxima coleta
+    return snapshots
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(valores, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(ROTULOS, valores, strict=True)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}"
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def renderizar(snapshot: dict) -> str:
+    """Snapshot → texto no formato de exposição do Prometheus (0.0.4)."""
+    linhas = []
+    por_metrica: dict[str, list] = {}
+    for nome, *rotulos, valores in snapshot["histogramas"]:
+        por_metrica.setdefault(nome, []).append((rotulos, valores))
+    for nome, ajuda in HISTOGRAMAS.items():
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} histogram"]
+        for rotulos, valores in sorted(por_metrica.get(nome, [])):
+            *buckets, soma, n = valores
+            for limite, qtd in zip(BUCKETS_S, buckets, strict=True):
+                le = f'le="{limite}"'
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos, le)} {qtd}")
+            linhas.append(f"{nome}_bucket{_rotulos(rotulos, _LE_INF)} {n}")
+            linhas.append(f"{nome}_sum{_rotulos(rotulos)} {_numero(soma)}")
+            linhas.append(f"{nome}_count{_rotulos(rotulos)} {n}")
+
+    por_metrica = {}
+    for nome, *rotulos, valor in snapshot["contadores"]:
+        por_metrica.setdefault(nome, []).append((rotulos, valor))
+    for nome, ajuda in CONTADORES.items():
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+        for rotulos, valor in sorted(por_metrica.get(nome, [])):
+            linhas.append(f"{nome}{_rotulos(rotulos)} {_numero(valor)}")
+    return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
@@ -0,0 +1,141 @@
+"""
+Middlewares do portal CNPJ.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metricas
+from .instrumentacao import medir
+
+HEADER_SQL = "X-Consultas-SQL"
+HEADER_ES = "X-Requisicoes-ES"
+# Rótulo das requisições que não casam com nenhuma rota (404 do resolver)
+ROTA_DESCONHECIDA = "<sem rota>"
+
+logger = logging.getLogger("cnpj.requisicoes")
+
+
+def _rota(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else ROTA_DESCONHECIDA
+
+
+def _tamanho(response) -> int | None:
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def _server_timing(m, total_ms: float) -> str:
+    """
+    `app` é o tempo fora de SQL e ES: lógica da view, montagem e
+    serialização da resposta.
+    """
+    app_ms = max(0.0, total_ms - m.sql_ms - m.es_ms)
+    return ", ".join(
+        (
+            f'sql;dur={m.sql_ms:.1f};desc="qtd={m.sql}"',
+            f'es;dur={m.es_ms:.1f};desc="qtd={m.es}"',
+            f"es-took;dur={m.es_took_ms:.1f}",
+            f"app;dur={app_ms:.1f}",
+            f"total;dur={total_ms:.1f}",
+        )
+    )
+
+
+class InstrumentacaoMiddleware:
+    """
+    Mede cada requisição (tempo total, consultas SQL, requisições ao ES,
+    `took`, tamanho da resposta) e publica o resultado em três lugares:
+
+    - headers `Server-Timing` (DevTools do navegador) e `X-Consultas-SQL` /
+      `X-Requisicoes-ES` (lidos pelo `loadtest_api`);
+    - uma linha JSON por requisição no logger `cnpj.requisicoes`;
+    - os histogramas por rota de `cnpj.metricas`, expostos em `/metrics`.
+
+    Desligado com `CNPJ_INSTRUMENTACAO=False`. Em respostas em streaming
+    mede só o que foi executado antes do primeiro byte.
+
+    Funciona nos dois modos (WSGI e ASGI): sob ASGI não força o Django a
+    adaptar a cadeia de middlewares para síncrona a cada requisição.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "CNPJ_INSTRUMENTACAO", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        diretorio = getattr(settings, "CNPJ_METRICAS_DIR", "")
+        self.metricas_dir = Path(diretorio) if diretorio else None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        t0 = time.perf_counter()
+        with medir() as m:
+            response = self.get_response(request)
+        return self._publicar(request, response, m, t0)
+
+    async def __acall__(self, request):
+        t0 = time.perf_counter()
+        with medir() as m:
+            response = await self.get_response(request)
+        return self._publicar(request, response, m, t0)
+
+    def _publicar(self, request, response, m, t0: float):
+        total_ms = (time.perf_counter() - t0) * 1000
+
+        response["Server-Timing"] = _server_timing(m, total_ms)
+        response[HEADER_SQL] = str(m.sql)
+        response[HEADER_ES] = str(m.es)
+
+        rota, tamanho = _rota(request), _tamanho(response)
+        rotulos = (rota, request.method, str(response.status_code))
+        metricas.registro.observar(
+            rotulos,
+            {
+                "cnpj_http_request_duration_seconds": total_ms / 1000,
+                "cnpj_http_sql_duration_seconds": m.sql_ms / 1000,
+                "cnpj_http_es_duration_seconds": m.es_ms / 1000,
+            },
+            {
+                "cnpj_http_sql_queries_total": m.sql,
+                "cnpj_http_es_requests_total": m.es,
+                "cnpj_http_es_took_seconds_total": m.es_took_ms / 1000,
+                "cnpj_http_response_bytes_total": tamanho or 0,
+            },
+        )
+        if self.metricas_dir is not None:
+            metricas.registro.gravar(self.metricas_dir)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                json.dumps(
+                    {
+                        "rota": rota,
+                        "caminho": request.path,
+                        "metodo": request.method,
+                        "status": response.status_code,
+                        "ms": round(total_ms, 1),
+                        "sql": m.sql,
+                        "sql_ms": round(m.sql_ms, 1),
+                        "es": m.es,
+                        "es_ms": round(m.es_ms, 1),
+                        "es_took_ms": round(m.es_took_ms, 1),
+                        "bytes": tamanho,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.19 on 2026-10-19 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cnpj', '0004_remove_estabelecimento_idx_estab_uf_municipio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargalog',
+            name='bytes_lidos',
+            field=models.BigIntegerField(default=0, verbose_name='Bytes Lidos'),
+        ),
+        migrations.AddField(
+            model_name='cargalog',
+            name='metricas',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Métricas'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.19 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cnpj', '0006_cargalog_metricas'),
+    ]
+
+    # Cria o novo índice antes de remover o antigo (prefixo dele), para o
+    # detalhe por CNPJ não ficar sem índice no meio da migração.
+    operations = [
+        migrations.AddIndex(
+            model_name='estabelecimento',
+            index=models.Index(fields=['cnpj_basico', 'competencia', 'cnpj_ordem'], name='idx_estab_cnpj_comp_ordem'),
+        ),
+        migrations.RemoveIndex(
+            model_name='estabelecimento',
+            name='idx_estab_cnpj_comp',
+        ),
+    ]
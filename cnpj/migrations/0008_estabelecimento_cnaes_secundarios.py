@@ -0,0 +1,37 @@
+# Generated by Django 4.2.19 on 2026-10-19 05:24
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cnpj', '0007_estabelecimento_idx_cnpj_comp_ordem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estabelecimento',
+            name='cnaes_secundarios',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=7), blank=True, null=True, size=None, verbose_name='CNAEs Secundários (lista)'),
+        ),
+        # Preenche as linhas já carregadas antes de criar o índice (mais rápido
+        # que manter o GIN durante o UPDATE); cargas novas vêm do load_cnpj
+        migrations.RunSQL(
+            sql="""
+                UPDATE cnpj_estabelecimento
+                SET cnaes_secundarios = string_to_array(
+                    trim(both ',' from regexp_replace(cnae_fiscal_secundaria, '[^0-9]+', ',', 'g')),
+                    ','
+                )
+                WHERE cnae_fiscal_secundaria ~ '[0-9]'
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='estabelecimento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['cnaes_secundarios'], name='idx_estab_cnaes_sec_gin'),
+        ),
+    ]
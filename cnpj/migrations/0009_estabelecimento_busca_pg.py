@@ -0,0 +1,22 @@
+# Generated by Django 4.2.19 on 2026-10-19 05:28
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cnpj', '0008_estabelecimento_cnaes_secundarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='estabelecimento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['competencia', 'uf', 'municipio', 'situacao_cadastral', 'cnae_fiscal_principal'], name='idx_estab_filtros_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='estabelecimento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nome_fantasia'], name='idx_estab_fantasia_gin', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.19 on 2026-10-19 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cnpj', '0009_estabelecimento_busca_pg'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vinculo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.CharField(max_length=7, verbose_name='Competência')),
+                ('origem', models.CharField(max_length=170, verbose_name='Nó de Origem')),
+                ('destino', models.CharField(max_length=170, verbose_name='Nó de Destino')),
+                ('relacao', models.CharField(choices=[('S', 'Tem como sócio'), ('P', 'É sócio de')], max_length=1, verbose_name='Relação')),
+            ],
+            options={
+                'verbose_name': 'Vínculo Societário',
+                'verbose_name_plural': 'Vínculos Societários',
+                'db_table': 'cnpj_vinculo',
+                'indexes': [models.Index(fields=['competencia', 'origem', 'destino', 'relacao'], name='idx_vinculo_comp_origem')],
+            },
+        ),
+    ]
@@ -7,6 +7,7 @@ Tabelas principais: possuem campo competencia (YYYY-MM) p/ manutenção do hist
 Todos os campos de código são CharField para preservar zeros à esquerda.
 """
 
+from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
@@ -167,6 +168,14 @@ class Estabelecimento(models.Model):
         "CNAE Fiscal Principal", max_length=7, blank=True, null=True, db_index=True
     )
     cnae_fiscal_secundaria = models.TextField("CNAEs Secundários", blank=True, null=True)
+    # cnae_fiscal_secundaria explodido na carga, um código por item: busca
+    # reversa ("quem tem o CNAE X como secundário") pelo índice GIN
+    cnaes_secundarios = ArrayField(
+        models.CharField(max_length=7),
+        verbose_name="CNAEs Secundários (lista)",
+        blank=True,
+        null=True,
+    )
     tipo_logradouro = models.CharField("Tipo Logradouro", max_length=20, blank=True, null=True)
     logradouro = models.CharField("Logradouro", max_length=60, blank=True, null=True)
     numero = models.CharField("Número", max_length=6, blank=True, null=True)
@@ -193,12 +202,33 @@ class Estabelecimento(models.Model):
         verbose_name = "Estabelecimento"
         verbose_name_plural = "Estabelecimentos"
         indexes = [
-            models.Index(fields=["cnpj_basico", "competencia"], name="idx_estab_cnpj_comp"),
+            # Inclui cnpj_ordem: paginação por cursor das filiais (keyset) sem ordenar
+            models.Index(
+                fields=["cnpj_basico", "competencia", "cnpj_ordem"],
+                name="idx_estab_cnpj_comp_ordem",
+            ),
             models.Index(fields=["uf", "municipio", "competencia"], name="idx_estab_uf_municipio"),
             models.Index(
                 fields=["cnae_fiscal_principal", "competencia"], name="idx_estab_cnae_comp"
             ),
             models.Index(fields=["situacao_cadastral", "competencia"], name="idx_estab_sit_comp"),
+            # `cnaes_secundarios @> ARRAY[...]`
+            GinIndex(fields=["cnaes_secundarios"], name="idx_estab_cnaes_sec_gin"),
+            # Busca de reserva no PostgreSQL (cnpj.busca_pg): os filtros exatos em
+            # qualquer combinação num só índice (btree_gin) e trigram no nome fantasia
+            GinIndex(
+                fields=[
+                    "competencia",
+                    "uf",
+                    "municipio",
+                    "situacao_cadastral",
+                    "cnae_fiscal_principal",
+                ],
+                name="idx_estab_filtros_gin",
+            ),
+            GinIndex(
+                fields=["nome_fantasia"], name="idx_estab_fantasia_gin", opclasses=["gin_trgm_ops"]
+            ),
         ]
 
     def __str__(self):
@@ -318,6 +348,42 @@ class Simples(models.Model):
         return f"{self.cnpj_basico} — Simples:{self.opcao_simples} MEI:{self.opcao_mei} ({self.competencia})"
 
 
+# ─────────────────────────────────────────────
+# TABELAS DERIVADAS (reconstruídas após a carga)
+# ─────────────────────────────────────────────
+
+
+class Vinculo(models.Model):
+    """
+    Lista de adjacência do grafo empresa–sócio (`cnpj.grafo`), gerada de
+    `cnpj_socio` por competência. Cada vínculo é gravado nos dois sentidos
+    (`relacao` S: destino é sócio da origem; P: origem é sócio do destino).
+    Nós: empresa = CNPJ básico; pessoa física = "PF:<cpf mascarado>:<nome>".
+    """
+
+    RELACAO_CHOICES = [("S", "Tem como sócio"), ("P", "É sócio de")]
+
+    competencia = models.CharField("Competência", max_length=7)
+    origem = models.CharField("Nó de Origem", max_length=170)
+    destino = models.CharField("Nó de Destino", max_length=170)
+    relacao = models.CharField("Relação", max_length=1, choices=RELACAO_CHOICES)
+
+    class Meta:
+        db_table = "cnpj_vinculo"
+        verbose_name = "Vínculo Societário"
+        verbose_name_plural = "Vínculos Societários"
+        indexes = [
+            # Vizinhos de um nó direto do índice (index-only scan), já em ordem
+            models.Index(
+                fields=["competencia", "origem", "destino", "relacao"],
+                name="idx_vinculo_comp_origem",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.origem} —{self.relacao}→ {self.destino} ({self.competencia})"
+
+
 # ─────────────────────────────────────────────
 # AUDITORIA
 # ─────────────────────────────────────────────
@@ -338,6 +404,9 @@ class CargaLog(models.Model):
     inicio = models.DateTimeField("Início", auto_now_add=True)
     fim = models.DateTimeField("Fim", blank=True, null=True)
     erro = models.TextField("Mensagem de Erro", blank=True, null=True)
+    # Preenchidos ao vivo pela telemetria do ETL (cnpj.telemetria)
+    bytes_lidos = models.BigIntegerField("Bytes Lidos", default=0)
+    metricas = models.JSONField("Métricas", default=dict, blank=True)
 
     class Meta:
         db_table = "cnpj_carga_log"
@@ -0,0 +1,271 @@
+"""
+Motores da busca de estabelecimentos e o disjuntor (circuit breaker) que
+escolhe entre eles.
+
+`buscar(filtros, inicio, tamanho)` tenta o Elasticsearch e, se ele falhar
+ou passar de `CNPJ_ES_TIMEOUT_BUSCA`, responde a mesma página pelo
+PostgreSQL (`cnpj.busca_pg`). Depois de `CNPJ_ES_FALHAS_DISJUNTOR` falhas
+seguidas o disjuntor abre: por `CNPJ_ES_DISJUNTOR_ABERTO_S` segundos as
+buscas vão direto ao PostgreSQL, sem esperar o timeout do ES a cada
+requisição. Passado esse tempo, uma requisição de teste vai ao ES
+(meio-aberto): sucesso fecha o disjuntor, falha o reabre.
+
+`buscar_cnpj(filtros, cnpj)` é o caminho do CNPJ completo: um `GET` pelo
+`_id` do documento (`<cnpj14>_<competencia>`) no ES ou a leitura pelo índice
+(cnpj_basico, competencia, cnpj_ordem) no PostgreSQL — sem query de busca
+nem score —, sob o mesmo disjuntor.
+
+`abuscar` e `abuscar_cnpj` são as versões assíncronas (views de
+`cnpj.views_async`, deploy ASGI): o ES vai pelo cliente async do
+elasticsearch-dsl, sem prender uma thread enquanto espera; a reserva no
+PostgreSQL roda via `sync_to_async`, porque o psycopg2 não tem API async.
+
+O estado é por processo (cada worker do Gunicorn decide sozinho).
+"""
+
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MOTOR_ES = "es"
+MOTOR_PG = "pg"
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio-aberto"
+
+
+class Resultado(NamedTuple):
+    total: int
+    hits: list[dict]
+    motor: str
+
+
+class Disjuntor:
+    """Circuit breaker simples: conta falhas seguidas e abre por um intervalo."""
+
+    def __init__(self, falhas_max: int, aberto_s: float, relogio=time.monotonic):
+        self.falhas_max = falhas_max
+        self.aberto_s = aberto_s
+        self._relogio = relogio
+        self._trava = threading.Lock()
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._testando = False
+
+    @property
+    def estado(self) -> str:
+        with self._trava:
+            return self._estado()
+
+    def _estado(self) -> str:
+        if self._falhas < self.falhas_max:
+            return FECHADO
+        if self._relogio() < self._aberto_ate:
+            return ABERTO
+        return MEIO_ABERTO
+
+    def permite(self) -> bool:
+        """Se a próxima chamada pode ir ao ES (no meio-aberto, só uma por vez)."""
+        with self._trava:
+            estado = self._estado()
+            if estado == FECHADO:
+                return True
+            if estado == MEIO_ABERTO and not self._testando:
+                self._testando = True
+                return True
+            return False
+
+    def sucesso(self) -> None:
+        with self._trava:
+            self._falhas = 0
+            self._testando = False
+
+    def falha(self) -> None:
+        with self._trava:
+            self._falhas += 1
+            self._testando = False
+            if self._falhas >= self.falhas_max:
+                self._aberto_ate = self._relogio() + self.aberto_s
+
+
+_disjuntor = None
+_disjuntor_trava = threading.Lock()
+
+
+def disjuntor_es() -> Disjuntor:
+    global _disjuntor
+    with _disjuntor_trava:
+        if _disjuntor is None:
+            _disjuntor = Disjuntor(
+                getattr(settings, "CNPJ_ES_FALHAS_DISJUNTOR", 3),
+                getattr(settings, "CNPJ_ES_DISJUNTOR_ABERTO_S", 30.0),
+            )
+        return _disjuntor
+
+
+def _cliente_es(**opcoes):
+    from elasticsearch_dsl.connections import get_connection
+
+    return get_connection().options(
+        request_timeout=getattr(settings, "CNPJ_ES_TIMEOUT_BUSCA", 5.0), **opcoes
+    )
+
+
+def buscar_es(query, ordem: list, inicio: int, tamanho: int) -> tuple[int, list[dict]]:
+    """Página da busca no índice; `(total, hits)` com o `_source` de cada hit."""
+    from cnpj.documents import EstabelecimentoDocument
+
+    s = EstabelecimentoDocument.search().using(_cliente_es()).query(query).sort(*ordem)
+    response = s[inicio : inicio + tamanho].execute()
+    return response.hits.total.value, [h.to_dict() for h in response]
+
+
+def buscar_cnpj_es(cnpj: str, competencia: str) -> dict | None:
+    """`_source` do estabelecimento pelo `_id` do documento, ou None."""
+    from cnpj.documents import EstabelecimentoDocument
+
+    doc = _cliente_es(ignore_status=404).get(
+        index=EstabelecimentoDocument._index._name, id=f"{cnpj}_{competencia}"
+    )
+    return doc["_source"] if doc.get("found") else None
+
+
+def buscar_cnpj(filtros: dict, cnpj: str) -> Resultado:
+    """Estabelecimento de CNPJ completo (0 ou 1 hit) que atenda aos filtros."""
+    from cnpj.search import casa_filtros
+
+    def pelo_es():
+        fonte = buscar_cnpj_es(cnpj, filtros["competencia"])
+        hits = [fonte] if fonte is not None and casa_filtros(fonte, filtros) else []
+        return len(hits), hits
+
+    # No PostgreSQL o CNPJ completo vira igualdade em (basico, ordem, DV)
+    return _pelo_es_ou_pg(pelo_es, filtros, 0, 1)
+
+
+def buscar(filtros: dict, inicio: int, tamanho: int) -> Resultado:
+    """Página da busca pelo ES ou, com ele fora, pelo PostgreSQL."""
+    from cnpj.search import montar_query, ordenacao
+
+    def pelo_es():
+        query, tem_texto = montar_query(filtros)
+        return buscar_es(query, ordenacao(tem_texto), inicio, tamanho)
+
+    return _pelo_es_ou_pg(pelo_es, filtros, inicio, tamanho)
+
+
+def _falhou(disjuntor: Disjuntor, exc: Exception) -> None:
+    disjuntor.falha()
+    logger.warning(
+        "Busca no Elasticsearch falhou; usando o PostgreSQL (disjuntor %s): %s",
+        disjuntor.estado,
+        exc,
+    )
+
+
+def _pelo_es_ou_pg(pelo_es, filtros: dict, inicio: int, tamanho: int) -> Resultado:
+    """Roda `pelo_es()` se o disjuntor deixar; senão (ou se falhar), `busca_pg`."""
+    from cnpj import busca_pg
+
+    disjuntor = disjuntor_es()
+    if disjuntor.permite():
+        try:
+            total, hits = pelo_es()
+        except Exception as exc:
+            _falhou(disjuntor, exc)
+        else:
+            disjuntor.sucesso()
+            return Resultado(total, hits, MOTOR_ES)
+
+    total, hits = busca_pg.buscar(filtros, inicio, tamanho)
+    return Resultado(total, hits, MOTOR_PG)
+
+
+# ── versões assíncronas (ASGI) ───────────────────────────────────────────────
+
+
+def cliente_es_async(request_timeout: float | None = None, **opcoes):
+    """
+    Cliente `AsyncElasticsearch` do processo (criado na primeira chamada, com
+    os mesmos hosts de `ELASTICSEARCH_DSL`), por padrão com o timeout da busca.
+    """
+    from elasticsearch_dsl import async_connections
+
+    try:
+        cliente = async_connections.get_connection()
+    except KeyError:
+        cliente = async_connections.create_connection(**settings.ELASTICSEARCH_DSL["default"])
+    if request_timeout is None:
+        request_timeout = getattr(settings, "CNPJ_ES_TIMEOUT_BUSCA", 5.0)
+    return cliente.options(request_timeout=request_timeout, **opcoes)
+
+
+async def abuscar_es(query, ordem: list, inicio: int, tamanho: int) -> tuple[int, list[dict]]:
+    """Versão async de `buscar_es`."""
+    from elasticsearch_dsl import AsyncSearch
+
+    from cnpj.documents import EstabelecimentoDocument
+
+    s = AsyncSearch(using=cliente_es_async(), index=EstabelecimentoDocument._index._name)
+    s = s.query(query).sort(*ordem)[inicio : inicio + tamanho]
+    response = await s.execute()
+    return response.hits.total.value, [h.to_dict() for h in response]
+
+
+async def abuscar_cnpj_es(cnpj: str, competencia: str) -> dict | None:
+    """Versão async de `buscar_cnpj_es`."""
+    from cnpj.documents import EstabelecimentoDocument
+
+    doc = await cliente_es_async(ignore_status=404).get(
+        index=EstabelecimentoDocument._index._name, id=f"{cnpj}_{competencia}"
+    )
+    return doc["_source"] if doc.get("found") else None
+
+
+async def abuscar_cnpj(filtros: dict, cnpj: str) -> Resultado:
+    """Versão async de `buscar_cnpj`."""
+    from cnpj.search import casa_filtros
+
+    async def pelo_es():
+        fonte = await abuscar_cnpj_es(cnpj, filtros["competencia"])
+        hits = [fonte] if fonte is not None and casa_filtros(fonte, filtros) else []
+        return len(hits), hits
+
+    return await _apelo_es_ou_pg(pelo_es, filtros, 0, 1)
+
+
+async def abuscar(filtros: dict, inicio: int, tamanho: int) -> Resultado:
+    """Versão async de `buscar`."""
+    from cnpj.search import montar_query, ordenacao
+
+    async def pelo_es():
+        query, tem_texto = montar_query(filtros)
+        return await abuscar_es(query, ordenacao(tem_texto), inicio, tamanho)
+
+    return await _apelo_es_ou_pg(pelo_es, filtros, inicio, tamanho)
+
+
+async def _apelo_es_ou_pg(pelo_es, filtros: dict, inicio: int, tamanho: int) -> Resultado:
+    """`_pelo_es_ou_pg` com `await pelo_es()` e a reserva numa thread."""
+    from asgiref.sync import sync_to_async
+
+    from cnpj import busca_pg
+
+    disjuntor = disjuntor_es()
+    if disjuntor.permite():
+        try:
+            total, hits = await pelo_es()
+        except Exception as exc:
+            _falhou(disjuntor, exc)
+        else:
+            disjuntor.sucesso()
+            return Resultado(total, hits, MOTOR_ES)
+
+    total, hits = await sync_to_async(busca_pg.buscar)(filtros, inicio, tamanho)
+    return Resultado(total, hits, MOTOR_PG)
@@ -0,0 +1,150 @@
+"""
+Perfilamento (cProfile) dos workers do ETL: `load_cnpj --profile` e
+`index_es --profile`.
+
+O trabalho pesado roda em filhos do `ProcessPoolExecutor`, fora do alcance
+de um profiler no processo principal. Com `--profile`, o initializer do
+pool liga `configurar_worker(diretorio)` e cada tarefa decorada com
+`@perfilado` roda sob um `cProfile.Profile` próprio, gravado em
+`<diretorio>/<pid>_<n>.prof`. No fim, `Perfil.relatorio()` junta todos os
+`.prof` e grava, ao lado do JSONL da telemetria:
+
+- `<comando>_<ts>_perfil.prof` — perfil combinado (pstats, snakeviz);
+- `<comando>_<ts>_perfil.txt`  — tempo próprio por etapa e as N funções
+  mais caras de cada uma.
+
+As etapas vêm do módulo de cada função (`ETAPAS`): descompressão do ZIP,
+parse do CSV, transformação (pandas/numpy), serialização, PostgreSQL e rede.
+"""
+
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import shutil
+from pathlib import Path
+
+TOP_PADRAO = 20
+
+# Etapa → trechos de "arquivo:função" que a identificam. A ordem importa:
+# a primeira que casar vence (parse do pandas antes do pandas genérico).
+ETAPAS = (
+    ("descompressao", ("zipfile", "zlib", "_compression", "gzip")),
+    ("parse", ("pandas/io/parsers", "pandas._libs.parsers", "TextReader", "codecs", "decode")),
+    ("serializacao", ("pandas/io/formats", "json", "orjson", "serializer")),
+    ("postgres", ("psycopg2",)),
+    ("rede", ("socket", "ssl", "http/client", "urllib3", "requests/", "elastic_transport")),
+    ("transformacao", ("pandas", "numpy")),
+)
+ETAPA_OUTROS = "outros"
+
+# Diretório dos .prof deste worker (None: sem perfilamento)
+_diretorio: Path | None = None
+_sequencia = itertools.count()
+
+
+def configurar_worker(diretorio) -> None:
+    """Chamado pelo initializer do pool: liga o perfilamento das tarefas."""
+    global _diretorio
+    _diretorio = Path(diretorio) if diretorio else None
+
+
+def perfilado(func):
+    """Roda a tarefa sob cProfile se o worker estiver configurado; senão, direto."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _diretorio is None:
+            return func(*args, **kwargs)
+        perfil = cProfile.Profile()
+        try:
+            return perfil.runcall(func, *args, **kwargs)
+        finally:
+            perfil.dump_stats(_diretorio / f"{os.getpid()}_{next(_sequencia)}.prof")
+
+    return wrapper
+
+
+def etapa_da_funcao(arquivo: str, funcao: str) -> str:
+    chave = f"{arquivo}:{funcao}".replace("\\", "/")
+    for etapa, trechos in ETAPAS:
+        if any(t in chave for t in trechos):
+            return etapa
+    return ETAPA_OUTROS
+
+
+def _nome(arquivo: str, linha: int, funcao: str) -> str:
+    if arquivo == "~":
+        return funcao  # built-in / método C
+    partes = Path(arquivo).parts
+    return f"{'/'.join(partes[-2:])}:{linha}({funcao})"
+
+
+def resumir_etapas(stats: pstats.Stats, top: int = TOP_PADRAO) -> dict[str, dict]:
+    """
+    Tempo próprio (tottime) por etapa e as `top` funções mais caras de cada
+    uma: `{etapa: {"segundos": s, "funcoes": [(nome, chamadas, tottime, cumtime)]}}`.
+    """
+    etapas: dict[str, dict] = {}
+    for (arquivo, linha, funcao), (_, chamadas, tottime, cumtime, _) in stats.stats.items():
+        e = etapas.setdefault(etapa_da_funcao(arquivo, funcao), {"segundos": 0.0, "funcoes": []})
+        e["segundos"] += tottime
+        e["funcoes"].append((_nome(arquivo, linha, funcao), chamadas, tottime, cumtime))
+    for e in etapas.values():
+        e["funcoes"] = sorted(e["funcoes"], key=lambda f: f[2], reverse=True)[:top]
+    return dict(sorted(etapas.items(), key=lambda item: item[1]["segundos"], reverse=True))
+
+
+def _texto(stats: pstats.Stats, comando: str, arquivos: int, top: int) -> str:
+    etapas = resumir_etapas(stats, top)
+    total = sum(e["segundos"] for e in etapas.values()) or 1e-9
+    linhas = [
+        f"Perfil combinado de {comando}: {arquivos} tarefa(s) perfilada(s), "
+        f"{total:.2f}s de CPU/espera nos workers",
+        "",
+        f"  {'ETAPA':<16} {'SEGUNDOS':>10} {'%':>6}",
+    ]
+    for etapa, e in etapas.items():
+        linhas.append(f"  {etapa:<16} {e['segundos']:>10.2f} {100 * e['segundos'] / total:>6.1f}")
+    for etapa, e in etapas.items():
+        linhas += ["", f"── {etapa} (top {top} por tempo próprio)"]
+        linhas.append(f"  {'TOTTIME':>9} {'CUMTIME':>9} {'CHAMADAS':>10}  FUNÇÃO")
+        for nome, chamadas, tottime, cumtime in e["funcoes"]:
+            linhas.append(f"  {tottime:>9.3f} {cumtime:>9.3f} {chamadas:>10}  {nome}")
+
+    # Visão tradicional do pstats por tempo acumulado, para seguir a árvore
+    saida = io.StringIO()
+    stats.stream = saida
+    stats.sort_stats("cumulative").print_stats(top)
+    linhas += ["", "── acumulado (pstats)", saida.getvalue()]
+    return "\n".join(linhas)
+
+
+class Perfil:
+    """
+    Lado do processo principal: cria o diretório temporário dos `.prof`
+    dos workers (`diretorio`, a repassar ao initializer) e, em
+    `relatorio()`, combina tudo ao lado de `base` (sem extensão).
+    """
+
+    def __init__(self, comando: str, base: Path, top: int = TOP_PADRAO):
+        self.comando = comando
+        self.top = top
+        self.diretorio = base.with_name(f"{base.name}_perfil")
+        self.prof = base.with_name(f"{base.name}_perfil.prof")
+        self.txt = base.with_name(f"{base.name}_perfil.txt")
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+
+    def relatorio(self) -> Path | None:
+        """Combina os `.prof` dos workers; retorna o caminho do relatório (ou None)."""
+        arquivos = sorted(self.diretorio.glob("*.prof"))
+        if not arquivos:
+            shutil.rmtree(self.diretorio, ignore_errors=True)
+            return None
+        stats = pstats.Stats(*map(str, arquivos))
+        stats.dump_stats(self.prof)
+        self.txt.write_text(_texto(stats, self.comando, len(arquivos), self.top), encoding="utf-8")
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+        return self.txt
@@ -0,0 +1,176 @@
+"""
+Montagem das queries Elasticsearch da busca de estabelecimentos.
+
+Os filtros exatos (competência, UF, município, situação, porte, Simples/MEI,
+prefixo de CNAE principal ou de CNPJ, CNAE secundário) vão em `bool.filter`: não participam do score e
+podem ser reaproveitados pelo filter cache do ES entre requisições. Só o
+texto livre (`multi_match` em razão social / nome fantasia) é pontuado.
+
+Um CNPJ completo (14 dígitos) nem chega aqui na `api_busca`: é um lookup
+pontual pelo `_id` do documento (`cnpj.motores.buscar_cnpj`), com os demais
+filtros conferidos em `casa_filtros`.
+
+Buscas apenas com filtros não têm relevância a ordenar — usam `constant_score`
+e ordenação por `_doc`, a mais barata possível.
+"""
+
+from elasticsearch_dsl import Q as ESQ
+
+# Parâmetros de querystring aceitos pela busca (além de competencia/page/cursor)
+PARAMS_FILTRO = (
+    "q",
+    "uf",
+    "municipio",
+    "cnae",
+    "cnae_secundario",
+    "situacao",
+    "porte",
+    "simples",
+    "mei",
+)
+
+
+def filtros_busca(params, competencia: str) -> dict:
+    """Normaliza os parâmetros GET da busca num dicionário de filtros."""
+    filtros = {"competencia": competencia}
+    for nome in PARAMS_FILTRO:
+        valor = (params.get(nome) or "").strip()
+        if nome in ("uf", "simples", "mei"):
+            valor = valor.upper()
+        if nome == "cnae_secundario":
+            valor = "".join(filter(str.isdigit, valor))  # aceita "4751-2/01"
+        if nome in ("simples", "mei") and valor not in ("S", "N"):
+            valor = ""
+        if valor:
+            filtros[nome] = valor
+    return filtros
+
+
+def cnpj_da_busca(q: str) -> str | None:
+    """Dígitos do CNPJ se `q` for só um CNPJ (com ou sem máscara), senão None."""
+    cnpj_limpo = "".join(filter(str.isdigit, q))
+    if cnpj_limpo and q.replace(".", "").replace("/", "").replace("-", "").strip() == cnpj_limpo:
+        return cnpj_limpo
+    return None
+
+
+def cnpj_exato(filtros: dict) -> str | None:
+    """Os 14 dígitos se a busca livre for um CNPJ completo, senão None."""
+    cnpj = cnpj_da_busca(filtros.get("q", ""))
+    return cnpj if cnpj and len(cnpj) == 14 else None
+
+
+# Pesos do módulo 11 para o 2º dígito verificador; o 1º usa os 12 últimos
+_PESOS_DV = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def cnpj_dv_valido(cnpj: str) -> bool:
+    """Confere os dois dígitos verificadores de um CNPJ de 14 dígitos."""
+    if len(cnpj) != 14 or not cnpj.isdigit() or len(set(cnpj)) == 1:
+        return False
+    digitos = [int(c) for c in cnpj]
+    for n in (12, 13):
+        resto = sum(d * p for d, p in zip(digitos[:n], _PESOS_DV[-n:])) % 11
+        if digitos[n] != (0 if resto < 2 else 11 - resto):
+            return False
+    return True
+
+
+# Filtro → campo do `_source` comparado por igualdade em `casa_filtros`
+_CAMPOS_FILTRO = (
+    ("uf", "uf"),
+    ("municipio", "municipio"),
+    ("situacao", "situacao_cadastral"),
+    ("porte", "porte"),
+    ("simples", "opcao_simples"),
+    ("mei", "opcao_mei"),
+)
+
+
+def casa_filtros(fonte: dict, filtros: dict) -> bool:
+    """
+    Se um documento já obtido (get pelo `_id`) atende aos filtros exatos,
+    com a mesma semântica dos `bool.filter` de `montar_query`.
+    """
+    for nome, campo in _CAMPOS_FILTRO:
+        if (valor := filtros.get(nome)) and fonte.get(campo) != valor:
+            return False
+    if (cnae := filtros.get("cnae")) and not (fonte.get("cnae_fiscal_principal") or "").startswith(
+        cnae[:7]
+    ):
+        return False
+    if cnae_sec := filtros.get("cnae_secundario"):
+        if not any(c.startswith(cnae_sec[:7]) for c in fonte.get("cnaes_secundarios") or []):
+            return False
+    return True
+
+
+def montar_query(filtros: dict, filter_context: bool = True):
+    """
+    Retorna `(query, tem_texto)` para os filtros informados.
+
+    `filter_context=False` reproduz o comportamento antigo (tudo em
+    `bool.must`) e existe apenas para comparação no `bench_busca`.
+    """
+    filtros_exatos = [ESQ("term", competencia=filtros["competencia"])]
+    texto = []
+
+    if q := filtros.get("q"):
+        if cnpj := cnpj_da_busca(q):
+            # Parcial: prefixo atendido pelo `index_prefixes` do campo `cnpj`
+            if len(cnpj) >= 14:
+                filtros_exatos.append(ESQ("term", cnpj=cnpj))
+            else:
+                filtros_exatos.append(ESQ("prefix", cnpj=cnpj))
+        else:
+            texto.append(
+                ESQ(
+                    "multi_match",
+                    query=q,
+                    fields=["razao_social", "nome_fantasia"],
+                    type="best_fields",
+                    operator="and",
+                    fuzziness="AUTO",
+                )
+            )
+
+    if uf := filtros.get("uf"):
+        filtros_exatos.append(ESQ("term", uf=uf))
+    if municipio := filtros.get("municipio"):
+        filtros_exatos.append(ESQ("term", municipio=municipio))
+    if cnae := filtros.get("cnae"):
+        filtros_exatos.append(ESQ("prefix", cnae_fiscal_principal=cnae[:7]))
+    if cnae_sec := filtros.get("cnae_secundario"):
+        # Código completo: term (casa com qualquer item do array); parcial: prefixo
+        if len(cnae_sec) >= 7:
+            filtros_exatos.append(ESQ("term", cnaes_secundarios=cnae_sec[:7]))
+        else:
+            filtros_exatos.append(ESQ("prefix", cnaes_secundarios=cnae_sec))
+    if situacao := filtros.get("situacao"):
+        filtros_exatos.append(ESQ("term", situacao_cadastral=situacao))
+    if porte := filtros.get("porte"):
+        filtros_exatos.append(ESQ("term", porte=porte))
+    if simples := filtros.get("simples"):
+        filtros_exatos.append(ESQ("term", opcao_simples=simples))
+    if mei := filtros.get("mei"):
+        filtros_exatos.append(ESQ("term", opcao_mei=mei))
+
+    tem_texto = bool(texto)
+
+    if not filter_context:
+        return ESQ("bool", must=filtros_exatos + texto), tem_texto
+    if not tem_texto:
+        return ESQ("constant_score", filter=ESQ("bool", filter=filtros_exatos)), False
+    return ESQ("bool", must=texto, filter=filtros_exatos), True
+
+
+def ordenacao(tem_texto: bool, pit: bool = False) -> list:
+    """
+    Ordenação da busca. Com PIT, `_shard_doc` é o desempate estável exigido
+    pelo search_after; sem texto não há score, então só a ordem física conta.
+    """
+    if pit:
+        if tem_texto:
+            return [{"_score": {"order": "desc"}}, {"_shard_doc": {"order": "asc"}}]
+        return [{"_shard_doc": {"order": "asc"}}]
+    return [{"_score": {"order": "desc"}}] if tem_texto else ["_doc"]
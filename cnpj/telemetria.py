@@ -0,0 +1,289 @@
+"""
+Telemetria estruturada do ETL (load_cnpj, index_es, pipeline_cnpj).
+
+Os workers não escrevem em arquivo: `emitir()` põe um evento (dict) numa
+`multiprocessing.Queue`, e um único escritor no processo principal consome
+a fila e
+
+- grava cada evento como uma linha JSON em `logs/<comando>_<ts>.jsonl`;
+- agrega por arquivo (linhas/s, MB/s, latência por etapa, tempo de COPY,
+  tempo e rejeições do bulk, pico de RSS do worker);
+- publica periodicamente o agregado em `logs/progresso/<comando>_<ts>.json`
+  (lido pelo `GET /api/etl/progresso/`) e nas `metricas` do `CargaLog`
+  de cada arquivo.
+
+Uso no processo principal:
+
+    with Telemetria("load_cnpj") as tel:
+        tel.vincular(competencia, arquivo, carga_log.pk)
+        ProcessPoolExecutor(initializer=configurar_worker, initargs=(fila_atual(),))
+
+Fora de um `Telemetria` (testes, bench) `emitir()` não faz nada.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+from cnpj.bench import resumo_latencias
+
+INTERVALO_PUBLICACAO_S = 2.0
+DIRETORIO_PROGRESSO = "progresso"
+
+# Fila do processo corrente: no principal, a do Telemetria ativo; nos
+# workers, a recebida pelo initializer do pool
+_fila = None
+
+
+def configurar_worker(fila) -> None:
+    """Initializer dos pools: liga `emitir()` à fila do escritor."""
+    global _fila
+    _fila = fila
+
+
+def fila_atual():
+    """Fila a repassar ao initializer dos pools (None sem telemetria)."""
+    return _fila
+
+
+def _rss_mb() -> float | None:
+    """RSS atual do processo (Linux: /proc/self/statm)."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def emitir(evento: str, **campos) -> None:
+    """Envia um evento ao escritor. Nunca bloqueia nem falha a carga."""
+    if _fila is None:
+        return
+    campos.update(evento=evento, ts=round(time.time(), 3), pid=os.getpid(), rss_mb=_rss_mb())
+    try:
+        _fila.put_nowait(campos)
+    except (queue.Full, ValueError, OSError):
+        pass
+
+
+def _novo_agregado(ev: dict) -> dict:
+    return {
+        "competencia": ev.get("competencia"),
+        "arquivo": ev.get("arquivo"),
+        "status": "EM_CURSO",
+        "inicio": ev["ts"],
+        "atualizado": ev["ts"],
+        "linhas": 0,
+        "bytes": 0,
+        "chunks": 0,
+        "copy_s": 0.0,
+        "bulk_s": 0.0,
+        "docs": 0,
+        "rejeitados": 0,
+        "rss_mb_max": None,
+        "etapas": {},
+    }
+
+
+def _resumo_agregado(a: dict) -> dict:
+    """Agregado interno → forma publicada (taxas e percentis por etapa)."""
+    segundos = max(a["atualizado"] - a["inicio"], 1e-9)
+    resumo = {
+        k: v
+        for k, v in a.items()
+        if k not in ("etapas", "inicio", "atualizado", "bulk_s", "docs", "rejeitados")
+    }
+    resumo.update(
+        inicio=datetime.fromtimestamp(a["inicio"]).isoformat(timespec="seconds"),
+        segundos=round(segundos, 1),
+        linhas_s=round(a["linhas"] / segundos, 1),
+        mb_s=round(a["bytes"] / segundos / 1024 / 1024, 2),
+        copy_s=round(a["copy_s"], 2),
+        etapas_ms={
+            etapa: resumo_latencias([s * 1000 for s in duracoes])
+            for etapa, duracoes in a["etapas"].items()
+        },
+    )
+    if a["docs"] or a["bulk_s"]:
+        resumo.update(
+            docs=a["docs"],
+            docs_s=round(a["docs"] / segundos, 1),
+            bulk_s=round(a["bulk_s"], 2),
+            rejeitados=a["rejeitados"],
+        )
+    return resumo
+
+
+class Telemetria:
+    """
+    Escritor único da telemetria: uma thread do processo principal consome
+    a fila. Use como context manager; ao sair, drena a fila e publica o
+    estado final.
+    """
+
+    def __init__(self, comando: str, logs_dir: Path | None = None):
+        logs_dir = Path(logs_dir or getattr(settings, "CNPJ_LOGS_DIR", "logs"))
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.comando = comando
+        self.caminho = logs_dir / f"{comando}_{ts}.jsonl"
+        self.progresso = logs_dir / DIRETORIO_PROGRESSO / f"{comando}_{ts}_{os.getpid()}.json"
+        self.fila = multiprocessing.Queue()
+        self._agregados: dict[tuple, dict] = {}
+        self._carga_logs: dict[tuple, int] = {}
+        self._sujos: set[tuple] = set()
+        self._trava = threading.Lock()
+        self._inicio = time.time()
+        self._ativo = False
+        self._thread = None
+        self._fila_anterior = None
+
+    # ── processo principal ───────────────────────────────────────────────
+
+    def __enter__(self):
+        global _fila
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.progresso.parent.mkdir(parents=True, exist_ok=True)
+        self._fila_anterior, _fila = _fila, self.fila
+        self._ativo = True
+        self._thread = threading.Thread(target=self._consumir, name="telemetria", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        global _fila
+        _fila = self._fila_anterior
+        self.fila.put(None)
+        self._thread.join()
+        self.fila.close()
+        self.fila.join_thread()
+        return False
+
+    def vincular(self, competencia: str, arquivo: str, carga_log_id: int) -> None:
+        """Associa um arquivo ao CargaLog que recebe suas métricas."""
+        with self._trava:
+            self._carga_logs[(competencia, arquivo)] = carga_log_id
+
+    # ── escritor ─────────────────────────────────────────────────────────
+
+    def _consumir(self) -> None:
+        from django.db import connection
+
+        ultimo = time.monotonic()
+        try:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                while True:
+                    try:
+                        ev = self.fila.get(timeout=INTERVALO_PUBLICACAO_S)
+                    except queue.Empty:
+                        ev = False
+                    if ev is None:
+                        break
+                    if ev:
+                        f.write(json.dumps(ev, ensure_ascii=False, default=str) + "\n")
+                        self._agregar(ev)
+                    if time.monotonic() - ultimo >= INTERVALO_PUBLICACAO_S:
+                        f.flush()
+                        self._publicar()
+                        ultimo = time.monotonic()
+            self._ativo = False
+            self._publicar()
+        finally:
+            connection.close()  # conexão própria desta thread
+
+    def _agregar(self, ev: dict) -> None:
+        chave = (ev.get("competencia"), ev.get("arquivo"))
+        if chave == (None, None):
+            return
+        a = self._agregados.get(chave)
+        if a is None:
+            a = self._agregados[chave] = _novo_agregado(ev)
+        a["atualizado"] = ev["ts"]
+        if ev.get("rss_mb") is not None:
+            a["rss_mb_max"] = max(a["rss_mb_max"] or 0, ev["rss_mb"])
+        for etapa in ("parse", "transform", "copy", "sql", "bulk"):
+            if (duracao := ev.get(f"{etapa}_s")) is not None:
+                a["etapas"].setdefault(etapa, []).append(duracao)
+
+        tipo = ev["evento"]
+        if tipo == "chunk":
+            a["chunks"] += 1
+            a["linhas"] += ev.get("linhas", 0)
+            a["bytes"] += ev.get("bytes", 0)
+            a["copy_s"] += ev.get("copy_s", 0)
+        elif tipo == "bulk":
+            a["chunks"] += 1
+            a["linhas"] += ev.get("linhas", 0)
+            a["docs"] += ev.get("ok", 0)
+            a["rejeitados"] += ev.get("rejeitados", 0)
+            a["bulk_s"] += ev.get("bulk_s", 0)
+        elif tipo == "fim":
+            a["status"] = ev.get("status", "OK")
+        self._sujos.add(chave)
+
+    def _publicar(self) -> None:
+        """Grava o snapshot de progresso e as métricas nos CargaLogs alterados."""
+        arquivos = [_resumo_agregado(a) for a in self._agregados.values()]
+        snapshot = {
+            "comando": self.comando,
+            "pid": os.getpid(),
+            "ativo": self._ativo,
+            "inicio": datetime.fromtimestamp(self._inicio).isoformat(timespec="seconds"),
+            "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+            "eventos": str(self.caminho),
+            "totais": {
+                "arquivos": len(arquivos),
+                "em_curso": sum(1 for a in arquivos if a["status"] == "EM_CURSO"),
+                "linhas": sum(a["linhas"] for a in arquivos),
+                "bytes": sum(a["bytes"] for a in arquivos),
+            },
+            "arquivos": arquivos,
+        }
+        tmp = self.progresso.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.progresso)
+
+        with self._trava:
+            pendentes = [(c, self._carga_logs[c]) for c in self._sujos if c in self._carga_logs]
+        self._sujos.clear()
+        if pendentes:
+            self._atualizar_carga_logs(pendentes)
+
+    def _atualizar_carga_logs(self, pendentes: list[tuple]) -> None:
+        from cnpj.models import CargaLog
+
+        for chave, pk in pendentes:
+            r = _resumo_agregado(self._agregados[chave])
+            try:
+                # update(): não disputa com o save() do resultado final no comando
+                CargaLog.objects.filter(pk=pk).update(
+                    qtd_registros=r["linhas"],
+                    bytes_lidos=r["bytes"],
+                    metricas={k: v for k, v in r.items() if k not in ("competencia", "arquivo")},
+                )
+            except Exception:
+                pass  # banco indisponível não derruba a telemetria
+
+
+def ler_progresso(logs_dir: Path | None = None, limite: int = 10) -> list[dict]:
+    """Snapshots de progresso mais recentes (ativos primeiro)."""
+    logs_dir = Path(logs_dir or getattr(settings, "CNPJ_LOGS_DIR", "logs"))
+    arquivos = sorted(
+        (logs_dir / DIRETORIO_PROGRESSO).glob("*.json"),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    execucoes = []
+    for arquivo in arquivos[:limite]:
+        try:
+            execucoes.append(json.loads(arquivo.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return sorted(execucoes, key=lambda e: not e.get("ativo"))
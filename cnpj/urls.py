@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views, views_html
+from . import views, views_async, views_html
 
 app_name = "cnpj"
 
+# Deploy ASGI (CNPJ_ASYNC): busca e autocomplete pelas views async
+_api = views_async if settings.CNPJ_ASYNC else views
+
 urlpatterns = [
     # Rotas Frontend (HTML)
     path("", views_html.home, name="home"),
@@ -12,6 +16,21 @@ urlpatterns = [
     # Rotas API (JSON)
     path("api/stats/", views.api_stats, name="api_stats"),
     path("api/competencias/", views.api_competencias, name="api_competencias"),
-    path("api/busca/", views.api_busca, name="api_busca"),
+    path("api/busca/", _api.api_busca, name="api_busca"),
+    path("api/facets/", views.api_facets, name="api_facets"),
+    path("api/suggest/", _api.api_suggest, name="api_suggest"),
+    path("api/export/", views.api_export, name="api_export"),
+    path("api/cnpj/lookup", views.api_cnpj_lookup, name="api_cnpj_lookup"),
     path("api/cnpj/<str:cnpj_basico>/", views.api_cnpj_detalhe, name="api_cnpj_detalhe"),
+    path("api/cnpj/<str:cnpj_basico>/filiais/", views.api_cnpj_filiais, name="api_cnpj_filiais"),
+    path("api/cnpj/<str:cnpj_basico>/socios/", views.api_cnpj_socios, name="api_cnpj_socios"),
+    path("api/cnpj/<str:cnpj_basico>/grafo/", views.api_cnpj_grafo, name="api_cnpj_grafo"),
+    path(
+        "api/cnpj/<str:cnpj_basico>/historico/",
+        views.api_cnpj_historico,
+        name="api_cnpj_historico",
+    ),
+    # Observabilidade
+    path("api/etl/progresso/", views.api_etl_progresso, name="api_etl_progresso"),
+    path("metrics", views.metrics, name="metrics"),
 ]
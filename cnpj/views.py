@@ -5,29 +5,88 @@ Endpoints:
   GET /api/stats/               — estatísticas gerais (home)
   GET /api/competencias/        — lista competências disponíveis
   GET /api/busca/               — busca com filtros + paginação
+  GET /api/facets/              — contagens por UF, município, CNAE, situação e porte
+  GET /api/suggest/             — autocomplete de razão social / nome fantasia
+  GET /api/export/              — exportação em streaming (CSV, CSV.gz, Parquet)
   GET /api/cnpj/<cnpj_basico>/  — detalhe completo de empresa
+  GET /api/cnpj/<cnpj_basico>/filiais/ — filiais paginadas por cursor (cnpj_ordem)
+  GET /api/cnpj/<cnpj_basico>/socios/  — sócios paginados por cursor
+  GET /api/cnpj/<cnpj_basico>/grafo/   — rede de vínculos societários (BFS limitada)
+  GET /api/cnpj/<cnpj_basico>/historico/ — alterações entre competências seguidas
+  POST /api/cnpj/lookup         — consulta em lote (NDJSON em streaming)
+  GET /api/etl/progresso/       — progresso ao vivo das cargas/indexações (telemetria do ETL)
+  GET /metrics                  — métricas HTTP por rota (Prometheus)
 """
 
+import base64
+import hashlib
+import json
 import time
+from urllib.parse import urlencode
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from django.views.decorators.cache import cache_page
-from django.views.decorators.http import require_GET
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
 from .models import (
     CargaLog,
     Cnae,
-    Empresa,
     Estabelecimento,
     Municipio,
-    Natureza,
-    Qualificacao,
-    Simples,
-    Socio,
 )
 
 PAGE_SIZE = 25
 
+# from/size só é usado em páginas rasas: acima de `index.max_result_window`
+# o ES recusa a busca, e o custo cresce com a profundidade. Daí em diante a
+# paginação é feita por cursor (point-in-time + search_after).
+MAX_RESULT_WINDOW = 10_000
+PIT_KEEP_ALIVE = "2m"
+CURSOR_INICIO = "*"
+
+# Facetas: nome na resposta → (campo no índice ES, qtd. máxima de buckets).
+# Município e CNAE têm cardinalidade alta; o tamanho vem do param `limite`.
+FACETAS = {
+    "uf": ("uf", 30),
+    "municipio": ("municipio", None),
+    "cnae": ("cnae_fiscal_principal", None),
+    "situacao": ("situacao_cadastral", 10),
+    "porte": ("porte", 10),
+}
+FACETS_LIMITE_PADRAO = 20
+FACETS_LIMITE_MAX = 100
+FACETS_CACHE_TIMEOUT = 60 * 60
+VERSAO_DADOS_TIMEOUT = 60 * 5
+
+ERRO_DV_CNPJ = "CNPJ inválido: dígitos verificadores não conferem."
+
+# Autocomplete: sugestões por requisição, mínimo de caracteres e cache (a
+# resposta depende só de q/competência/limite e da versão dos dados)
+SUGGEST_LIMITE_PADRAO = 8
+SUGGEST_LIMITE_MAX = 20
+SUGGEST_MIN_CARACTERES = 2
+SUGGEST_MAX_CARACTERES = 50
+SUGGEST_CACHE_TIMEOUT = 60 * 60
+SUGGEST_MAX_AGE = 60 * 5
+SUGGEST_TIMEOUT_ES = 1.0
+
+# Filiais e sócios do detalhe: itens por página (cursor)
+PAGINA_LISTA = 50
+PAGINA_LISTA_MAX = 200
+
+# Histórico de alterações: muda só com uma nova carga (chave pela versão dos dados)
+HISTORICO_CACHE_TIMEOUT = 60 * 60 * 24
+HISTORICO_MAX_AGE = 60 * 5
+
+# Consulta em lote: entradas resolvidas por vez (uma query por tabela a cada lote)
+LOOKUP_LOTE = 1_000
+
 # ── helpers ────────────────────────────────────────────────────────────────
 
 
@@ -95,6 +154,76 @@ def _format_cnpj(basico, ordem="0001", dv="00"):
     return f"{b[:2]}.{b[2:5]}.{b[5:8]}/{o}-{d}"
 
 
+def _versao_dados():
+    """
+    Identificador da versão dos dados carregados, para compor chaves de cache.
+    Muda a cada nova carga registrada em CargaLog (início ou conclusão).
+    """
+    versao = cache.get("cnpj:versao_dados")
+    if versao is None:
+        agg = CargaLog.objects.aggregate(ultimo_id=Max("id"), ultimo_fim=Max("fim"))
+        fim = agg["ultimo_fim"].isoformat() if agg["ultimo_fim"] else ""
+        versao = f"{agg['ultimo_id'] or 0}-{fim}"
+        cache.set("cnpj:versao_dados", versao, VERSAO_DADOS_TIMEOUT)
+    return versao
+
+
+class _CorpoAsync:
+    """
+    Iterador síncrono de uma resposta em streaming servido como assíncrono
+    (deploy ASGI): cada pedaço vem por `sync_to_async`, um por vez. Com um
+    iterador síncrono o Django 4.2 sob ASGI faz `sync_to_async(list)` e monta
+    a resposta inteira em memória antes do primeiro byte. Sem `__iter__` de
+    propósito — é assim que o `StreamingHttpResponse` reconhece o modo async.
+    """
+
+    _FIM = object()
+
+    def __init__(self, iterador):
+        from asgiref.sync import sync_to_async
+
+        self._iterador = iterador
+        self._proximo = sync_to_async(lambda: next(iterador, self._FIM))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        pedaco = await self._proximo()
+        if pedaco is self._FIM:
+            raise StopAsyncIteration
+        return pedaco
+
+    def close(self):
+        # Chamado pelo Django (em thread) ao fim da resposta: fecha o gerador
+        # síncrono e o que ele segura (PIT, vaga de exportação)
+        if hasattr(self._iterador, "close"):
+            self._iterador.close()
+
+
+def _corpo_streaming(iterador):
+    """Corpo do `StreamingHttpResponse`: assíncrono sob ASGI (`CNPJ_ASYNC`)."""
+    return _CorpoAsync(iterador) if settings.CNPJ_ASYNC else iterador
+
+
+def _encode_cursor(pit_id, search_after):
+    """(PIT, sort values do último hit) → token opaco base64url."""
+    raw = json.dumps({"pit": pit_id, "after": list(search_after)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token):
+    """Token opaco → (pit_id, search_after). Levanta ValueError se inválido."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        pit_id, search_after = data["pit"], data["after"]
+    except (ValueError, TypeError, KeyError) as exc:
+        raise ValueError("cursor inválido") from exc
+    if not isinstance(pit_id, str) or not isinstance(search_after, list):
+        raise ValueError("cursor inválido")
+    return pit_id, search_after
+
+
 # ── endpoints ──────────────────────────────────────────────────────────────
 
 
@@ -136,93 +265,130 @@ def api_busca(request):
     """
     GET /api/busca/ — busca com filtros + paginação via Elasticsearch.
 
+    Com o ES fora do ar, a paginação por `page` é respondida pelo PostgreSQL
+    (`cnpj.motores`: disjuntor + busca trigram); `motor` na resposta diz
+    qual atendeu. O cursor (PIT) só existe no ES: sem ele, 503.
+
+    `q` com um CNPJ completo não passa pela busca: os dígitos verificadores
+    são conferidos (400 se inválidos) e o estabelecimento é lido pelo `_id`
+    do documento (`motores.buscar_cnpj`), numa página única de 0 ou 1 item.
+
     Query params:
       q            — razão social / nome fantasia / CNPJ (busca livre)
       competencia  — YYYY-MM (padrão: mais recente)
       uf           — sigla UF
       municipio    — código do município
       cnae         — código CNAE principal
+      cnae_secundario — código CNAE secundário (7 dígitos; menos = prefixo)
       situacao     — código situação (02=Ativa, 04=Inapta…)
       porte        — código porte (01, 03, 05)
       simples      — S ou N
       mei          — S ou N
-      page         — página (padrão: 1)
+      page         — página (padrão: 1), limitada às primeiras 10.000 posições
+      cursor       — paginação profunda: "*" abre um cursor, depois repassar o
+                     `next_cursor` da resposta junto com os mesmos filtros
     """
-    from elasticsearch_dsl import Q as ESQ
+    from elasticsearch_dsl.connections import get_connection
 
     from cnpj.documents import EstabelecimentoDocument
+    from cnpj.motores import MOTOR_ES, buscar, buscar_cnpj
+    from cnpj.search import cnpj_dv_valido, cnpj_exato, filtros_busca, montar_query, ordenacao
 
-    t0 = time.time()
+    t0 = time.perf_counter()
 
     competencia = request.GET.get("competencia") or _latest_competencia()
     if not competencia:
         return JsonResponse({"results": [], "total": 0, "paginas": 0}, status=200)
 
-    # ── Constrói query ES ─────────────────────────────────────────────────────
-    must = [ESQ("term", competencia=competencia)]
+    filtros = filtros_busca(request.GET, competencia)
+    cursor = request.GET.get("cursor", "").strip()
+    page = None
+    pit_id = None
+    next_cursor = None
+    motor = MOTOR_ES
 
-    q = request.GET.get("q", "").strip()
-    if q:
-        cnpj_limpo = "".join(filter(str.isdigit, q))
-        is_cnpj = (
-            cnpj_limpo
-            and q.replace(".", "").replace("/", "").replace("-", "").strip() == cnpj_limpo
-        )
-        if is_cnpj:
-            must.append(ESQ("prefix", cnpj_basico=cnpj_limpo[:8]))
-        else:
-            must.append(
-                ESQ(
-                    "multi_match",
-                    query=q,
-                    fields=["razao_social", "nome_fantasia"],
-                    type="best_fields",
-                    operator="and",
-                    fuzziness="AUTO",
-                )
+    if (cnpj := cnpj_exato(filtros)) is not None:
+        if not cnpj_dv_valido(cnpj):
+            return JsonResponse({"error": ERRO_DV_CNPJ}, status=400)
+        page = 1
+        try:
+            total, hits, motor = buscar_cnpj(filtros, cnpj)
+        except Exception as exc:
+            return JsonResponse({"error": f"Busca indisponível: {exc}"}, status=503)
+    elif cursor:
+        query, tem_texto = montar_query(filtros)
+        s = EstabelecimentoDocument.search().query(query)
+        # PIT + search_after: visão estável do índice e custo constante por página.
+        search_after = None
+        if cursor != CURSOR_INICIO:
+            try:
+                pit_id, search_after = _decode_cursor(cursor)
+            except ValueError:
+                return JsonResponse({"error": "Cursor inválido."}, status=400)
+        try:
+            if pit_id is None:
+                pit_id = get_connection().open_point_in_time(
+                    index=EstabelecimentoDocument._index._name, keep_alive=PIT_KEEP_ALIVE
+                )["id"]
+            # Com PIT o índice vem do próprio PIT
+            s = (
+                s.index()
+                .sort(*ordenacao(tem_texto, pit=True))
+                .extra(pit={"id": pit_id, "keep_alive": PIT_KEEP_ALIVE})[:PAGE_SIZE]
             )
+            if search_after:
+                s = s.extra(search_after=search_after)
+            response = s.execute()
+        except Exception as exc:
+            return JsonResponse({"error": f"Erro no Elasticsearch: {exc}"}, status=503)
+        # O ES pode devolver um id de PIT atualizado a cada página
+        pit_id = getattr(response, "pit_id", None) or pit_id
+        total = response.hits.total.value
+        hits = list(response)
+        if len(hits) == PAGE_SIZE:
+            next_cursor = _encode_cursor(pit_id, hits[-1].meta.sort)
+        else:
+            # Última página: libera o PIT no cluster sem esperar o keep_alive
+            try:
+                get_connection().close_point_in_time(id=pit_id)
+            except Exception:
+                pass
+        hits = [h.to_dict() for h in hits]
+    else:
+        try:
+            page = max(1, int(request.GET.get("page", 1)))
+        except ValueError:
+            return JsonResponse({"error": "Página inválida."}, status=400)
+        start = (page - 1) * PAGE_SIZE
+        if start + PAGE_SIZE > MAX_RESULT_WINDOW:
+            return _erro_janela()
+        # ES, ou o PostgreSQL se o ES falhar / o disjuntor estiver aberto
+        try:
+            total, hits, motor = buscar(filtros, start, PAGE_SIZE)
+        except Exception as exc:
+            return JsonResponse({"error": f"Busca indisponível: {exc}"}, status=503)
 
-    if uf := request.GET.get("uf", "").strip().upper():
-        must.append(ESQ("term", uf=uf))
-
-    if municipio := request.GET.get("municipio", "").strip():
-        must.append(ESQ("term", municipio=municipio))
-
-    if cnae := request.GET.get("cnae", "").strip():
-        must.append(ESQ("prefix", cnae_fiscal_principal=cnae[:7]))
-
-    if situacao := request.GET.get("situacao", "").strip():
-        must.append(ESQ("term", situacao_cadastral=situacao))
-
-    if porte := request.GET.get("porte", "").strip():
-        must.append(ESQ("term", porte=porte))
-
-    if (simples := request.GET.get("simples", "").strip().upper()) in ("S", "N"):
-        must.append(ESQ("term", opcao_simples=simples))
-
-    if (mei := request.GET.get("mei", "").strip().upper()) in ("S", "N"):
-        must.append(ESQ("term", opcao_mei=mei))
+    return _resposta_busca(t0, hits, total, page, next_cursor, competencia, motor)
 
-    # ── Paginação ─────────────────────────────────────────────────────────────
-    page = max(1, int(request.GET.get("page", 1)))
-    start = (page - 1) * PAGE_SIZE
 
-    s = EstabelecimentoDocument.search().query(ESQ("bool", must=must))[start : start + PAGE_SIZE]
+def _erro_janela() -> JsonResponse:
+    return JsonResponse(
+        {
+            "error": (
+                f"Paginação por `page` limitada a {MAX_RESULT_WINDOW:,} resultados. "
+                "Use `cursor=*` para percorrer além desse ponto."
+            )
+        },
+        status=400,
+    )
 
-    try:
-        response = s.execute()
-    except Exception as exc:
-        return JsonResponse({"error": f"Erro no Elasticsearch: {exc}"}, status=503)
 
-    total = response.hits.total.value
+def _resposta_busca(t0, hits, total, page, next_cursor, competencia, motor) -> JsonResponse:
+    """Resposta da `api_busca` (e da versão async): hits + descrições do PG."""
     num_pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
 
-    # ── Enriquece com descrições do PG ────────────────────────────────────────
-    hits = list(response)
-    cnae_codigos = {
-        h.cnae_fiscal_principal for h in hits if getattr(h, "cnae_fiscal_principal", None)
-    }
-    mun_codigos = {h.municipio for h in hits if getattr(h, "municipio", None)}
+    cnae_codigos = {h["cnae_fiscal_principal"] for h in hits if h.get("cnae_fiscal_principal")}
+    mun_codigos = {h["municipio"] for h in hits if h.get("municipio")}
 
     cnae_map = dict(Cnae.objects.filter(codigo__in=cnae_codigos).values_list("codigo", "descricao"))
     mun_map = dict(
@@ -231,191 +397,689 @@ def api_busca(request):
 
     results = []
     for h in hits:
-        cnpj_b = getattr(h, "cnpj_basico", "")
-        cnpj_o = getattr(h, "cnpj_ordem", "")
-        cnpj_d = getattr(h, "cnpj_dv", "")
-        sit = getattr(h, "situacao_cadastral", "")
-        por = getattr(h, "porte", "")
-        cnae_c = getattr(h, "cnae_fiscal_principal", "")
-        mun_c = getattr(h, "municipio", "")
+        cnpj_b = h.get("cnpj_basico", "")
+        cnpj_o = h.get("cnpj_ordem", "")
+        cnpj_d = h.get("cnpj_dv", "")
+        sit = h.get("situacao_cadastral", "")
+        por = h.get("porte", "")
+        cnae_c = h.get("cnae_fiscal_principal", "")
+        mun_c = h.get("municipio", "")
 
         results.append(
             {
                 "cnpj_basico": cnpj_b,
                 "cnpj": _format_cnpj(cnpj_b, cnpj_o, cnpj_d),
-                "razao_social": getattr(h, "razao_social", ""),
-                "nome_fantasia": getattr(h, "nome_fantasia", ""),
+                "razao_social": h.get("razao_social", ""),
+                "nome_fantasia": h.get("nome_fantasia", ""),
                 "situacao": SITUACAO_LABEL.get(sit, sit),
                 "situacao_codigo": sit,
                 "municipio": mun_map.get(mun_c, ""),
                 "municipio_codigo": mun_c,
-                "uf": getattr(h, "uf", ""),
+                "uf": h.get("uf", ""),
                 "cnae_principal": cnae_c,
                 "cnae_descricao": cnae_map.get(cnae_c, ""),
                 "porte": PORTE_LABEL.get(por, ""),
             }
         )
 
-    elapsed = round(time.time() - t0, 3)
+    elapsed = round(time.perf_counter() - t0, 3)
     return JsonResponse(
         {
             "results": results,
             "total": total,
             "pagina": page,
             "paginas": num_pages,
+            "next_cursor": next_cursor,
             "competencia": competencia,
+            "motor": motor,
             "elapsed": elapsed,
         }
     )
 
 
+def _resposta_sugestoes(payload: dict) -> JsonResponse:
+    resp = JsonResponse(payload)
+    patch_cache_control(resp, public=True, max_age=SUGGEST_MAX_AGE)
+    return resp
+
+
+def _params_sugestao(request) -> tuple[str, int, str]:
+    """`(q normalizado, limite, competência)`; ValueError se `limite` não for inteiro."""
+    q = " ".join(request.GET.get("q", "").split()).upper()[:SUGGEST_MAX_CARACTERES]
+    limite = min(SUGGEST_LIMITE_MAX, max(1, int(request.GET.get("limite", SUGGEST_LIMITE_PADRAO))))
+    return q, limite, request.GET.get("competencia", "")
+
+
+def _chave_sugestao(q: str, competencia: str, limite: int) -> str:
+    assinatura = urlencode({"q": q, "competencia": competencia, "limite": limite})
+    return f"cnpj:suggest:{_versao_dados()}:{hashlib.md5(assinatura.encode()).hexdigest()}"
+
+
+def _consulta_sugestao(s, q: str, competencia: str, limite: int):
+    """Completion suggester sobre `s` (Search ou AsyncSearch), sem hits."""
+    return (
+        s.source(["cnpj_basico", "cnpj_ordem", "cnpj_dv", "situacao_cadastral", "uf"])
+        .extra(size=0)
+        .suggest(
+            "sugestoes",
+            q,
+            completion={
+                "field": "sugestao",
+                "size": limite,
+                "skip_duplicates": True,
+                "contexts": {"competencia": [competencia]},
+            },
+        )
+    )
+
+
+def _payload_sugestoes(response, q: str, competencia: str) -> dict:
+    sugestoes = []
+    for opcao in response.suggest.sugestoes[0].options:
+        fonte = opcao._source
+        sit = fonte.situacao_cadastral or ""
+        sugestoes.append(
+            {
+                "texto": opcao.text,
+                "cnpj_basico": fonte.cnpj_basico,
+                "cnpj": _format_cnpj(fonte.cnpj_basico, fonte.cnpj_ordem, fonte.cnpj_dv),
+                "situacao": SITUACAO_LABEL.get(sit, sit),
+                "uf": fonte.uf or "",
+            }
+        )
+    return {"q": q, "competencia": competencia, "sugestoes": sugestoes}
+
+
 @require_GET
-def api_cnpj_detalhe(request, cnpj_basico):
+def api_suggest(request):
     """
-    GET /api/cnpj/<cnpj_basico>/ — detalhe completo de empresa.
+    GET /api/suggest/ — autocomplete de razão social / nome fantasia.
+
+    Consulta o completion suggester do índice (campo `sugestao`, preenchido
+    pelo index_es com peso por situação ativa e nº de estabelecimentos): um
+    lookup de prefixo em memória no ES, sem o `multi_match` fuzzy da busca.
+    Respostas ficam no cache por (q, competência, limite, versão dos dados)
+    e saem com `Cache-Control: public`.
 
     Query params:
+      q           — prefixo digitado (mín. 2 caracteres)
       competencia — YYYY-MM (padrão: mais recente)
+      limite      — qtd. de sugestões (padrão: 8, máx.: 20)
     """
-    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
-    competencia = request.GET.get("competencia") or _latest_competencia()
+    from elasticsearch_dsl.connections import get_connection
+
+    from cnpj.documents import EstabelecimentoDocument
+
+    try:
+        q, limite, competencia = _params_sugestao(request)
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro `limite` inválido."}, status=400)
 
+    if len(q) < SUGGEST_MIN_CARACTERES:
+        return _resposta_sugestoes({"q": q, "sugestoes": []})
+
+    cache_key = _chave_sugestao(q, competencia, limite)
+    if (payload := cache.get(cache_key)) is not None:
+        return _resposta_sugestoes(payload)
+
+    competencia = competencia or _latest_competencia()
     if not competencia:
-        return JsonResponse({"error": "Nenhuma competência disponível."}, status=404)
+        return _resposta_sugestoes({"q": q, "sugestoes": []})
+    cliente = get_connection().options(request_timeout=SUGGEST_TIMEOUT_ES)
+    s = EstabelecimentoDocument.search().using(cliente)
+    try:
+        response = _consulta_sugestao(s, q, competencia, limite).execute()
+    except Exception as exc:
+        return JsonResponse({"error": f"Erro no Elasticsearch: {exc}"}, status=503)
+
+    payload = _payload_sugestoes(response, q, competencia)
+    cache.set(cache_key, payload, SUGGEST_CACHE_TIMEOUT)
+    return _resposta_sugestoes(payload)
+
+
+@require_GET
+def api_facets(request):
+    """
+    GET /api/facets/ — contagens agregadas para dashboards.
+
+    Aceita os mesmos filtros de /api/busca/ e devolve, numa única ida ao ES
+    (size=0), as contagens por UF, município, CNAE, situação e porte com as
+    descrições das tabelas de domínio. A resposta fica em cache por
+    combinação de filtros e versão dos dados.
+
+    Query params extras:
+      limite — qtd. de buckets de município e CNAE (padrão: 20, máx.: 100)
+    """
+    from cnpj.documents import EstabelecimentoDocument
+    from cnpj.search import filtros_busca, montar_query
+
+    competencia = request.GET.get("competencia") or _latest_competencia()
+    if not competencia:
+        return JsonResponse({"total": 0, "facets": {}}, status=200)
+
+    try:
+        limite = int(request.GET.get("limite", FACETS_LIMITE_PADRAO))
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro `limite` inválido."}, status=400)
+    limite = min(FACETS_LIMITE_MAX, max(1, limite))
+
+    filtros = filtros_busca(request.GET, competencia)
+    assinatura = urlencode(sorted(filtros.items())) + f"&limite={limite}"
+    cache_key = f"cnpj:facets:{_versao_dados()}:{hashlib.md5(assinatura.encode()).hexdigest()}"
+    if (payload := cache.get(cache_key)) is not None:
+        return JsonResponse(payload)
+
+    query, _ = montar_query(filtros)
+    s = EstabelecimentoDocument.search().query(query).extra(size=0, track_total_hits=True)
+    for nome, (campo, tamanho) in FACETAS.items():
+        s.aggs.bucket(nome, "terms", field=campo, size=tamanho or limite)
 
-    # Estabelecimento matriz (ordem=0001)
     try:
-        estab = Estabelecimento.objects.get(
-            cnpj_basico=cnpj_basico,
-            cnpj_ordem="0001",
-            competencia=competencia,
+        response = s.execute()
+    except Exception as exc:
+        return JsonResponse({"error": f"Erro no Elasticsearch: {exc}"}, status=503)
+
+    buckets = {
+        nome: [(b.key, b.doc_count) for b in getattr(response.aggregations, nome).buckets]
+        for nome in FACETAS
+    }
+
+    # Descrições: só os códigos presentes nos buckets vão ao PG
+    mun_map = dict(
+        Municipio.objects.filter(codigo__in=[k for k, _ in buckets["municipio"]]).values_list(
+            "codigo", "descricao"
         )
-    except Estabelecimento.DoesNotExist:
-        # Fallback: qualquer estab deste CNPJ
-        estab = (
-            Estabelecimento.objects.filter(cnpj_basico=cnpj_basico, competencia=competencia)
-            .order_by("cnpj_ordem")
-            .first()
+    )
+    cnae_map = dict(
+        Cnae.objects.filter(codigo__in=[k for k, _ in buckets["cnae"]]).values_list(
+            "codigo", "descricao"
         )
-        if not estab:
-            return JsonResponse({"error": "CNPJ não encontrado."}, status=404)
+    )
+    descricoes = {
+        "uf": {},
+        "municipio": mun_map,
+        "cnae": cnae_map,
+        "situacao": SITUACAO_LABEL,
+        "porte": PORTE_LABEL,
+    }
 
-    # Empresa
-    empresa = Empresa.objects.filter(cnpj_basico=cnpj_basico, competencia=competencia).first()
+    payload = {
+        "competencia": competencia,
+        "total": response.hits.total.value,
+        "facets": {
+            nome: [
+                {"codigo": codigo, "descricao": descricoes[nome].get(codigo, codigo), "total": qtd}
+                for codigo, qtd in itens
+            ]
+            for nome, itens in buckets.items()
+        },
+    }
+    cache.set(cache_key, payload, FACETS_CACHE_TIMEOUT)
+    return JsonResponse(payload)
 
-    # Sócios
-    socios_qs = Socio.objects.filter(cnpj_basico=cnpj_basico, competencia=competencia)
-    qual_map = dict(Qualificacao.objects.values_list("codigo", "descricao"))
-    nat_map = dict(Natureza.objects.values_list("codigo", "descricao"))
 
-    socios = []
-    for s in socios_qs:
-        socios.append(
-            {
-                "nome": s.nome_socio or "",
-                "tipo": IDENTIFICADOR_SOCIO_LABEL.get(s.identificador_socio or "", "PF"),
-                "cpfCnpj": s.cnpj_cpf_socio or "",
-                "qualificacao": qual_map.get(
-                    s.qualificacao_socio or "", s.qualificacao_socio or ""
-                ),
-                "dataEntrada": _fmt_date(s.data_entrada_sociedade),
-                "faixaEtaria": FAIXA_ETARIA_LABEL.get(s.faixa_etaria or "", ""),
-                "representanteLegal": {
-                    "nome": s.nome_representante or "",
-                    "cpf": s.representante_legal or "",
-                    "qualificacao": qual_map.get(s.qualificacao_representante or "", ""),
-                }
-                if s.representante_legal
-                else None,
-            }
+@require_GET
+def api_export(request):
+    """
+    GET /api/export/ — exporta o resultado completo de uma busca em streaming.
+
+    Aceita os mesmos filtros de /api/busca/ e percorre o ES com PIT +
+    search_after em lotes, sem acumular o resultado em memória.
+
+    Query params extras:
+      formato — csv (padrão) ou parquet
+      gzip    — 1 para CSV comprimido (.csv.gz); no Parquet, codec gzip
+      limite  — máximo de linhas (padrão e teto: CNPJ_EXPORT_MAX_ROWS)
+    """
+    from cnpj.export import (
+        FORMATOS,
+        StreamExportacao,
+        abrir_pit,
+        iterar_lotes,
+        liberar_slot,
+        reservar_slot,
+        stream_csv,
+        stream_parquet,
+    )
+    from cnpj.search import filtros_busca, montar_query
+
+    formato = request.GET.get("formato", "csv").strip().lower()
+    if formato not in FORMATOS:
+        return JsonResponse({"error": f"Formato inválido; use {', '.join(FORMATOS)}."}, status=400)
+    if formato == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return JsonResponse({"error": "Exportação Parquet requer pyarrow."}, status=400)
+    gzip = request.GET.get("gzip", "").strip().lower() in ("1", "true", "s")
+
+    max_rows = getattr(settings, "CNPJ_EXPORT_MAX_ROWS", 1_000_000)
+    try:
+        limite = int(request.GET.get("limite", max_rows))
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro `limite` inválido."}, status=400)
+    limite = min(max_rows, max(1, limite))
+
+    competencia = request.GET.get("competencia") or _latest_competencia()
+    if not competencia:
+        return JsonResponse({"error": "Nenhuma competência disponível."}, status=404)
+
+    query, tem_texto = montar_query(filtros_busca(request.GET, competencia))
+
+    if (vaga := reservar_slot()) is None:
+        response = JsonResponse(
+            {"error": "Limite de exportações simultâneas atingido; tente novamente."},
+            status=429,
         )
+        response["Retry-After"] = "30"
+        return response
 
-    # Simples / MEI
-    simples_obj = Simples.objects.filter(cnpj_basico=cnpj_basico, competencia=competencia).first()
-
-    # CNAEs
-    cnae_map = dict(Cnae.objects.values_list("codigo", "descricao"))
-    cnae_principal = estab.cnae_fiscal_principal or ""
-    cnae_principal_desc = cnae_map.get(cnae_principal, "")
-
-    cnae_secundarios = []
-    if estab.cnae_fiscal_secundaria:
-        for cod in estab.cnae_fiscal_secundaria.replace(",", " ").split():
-            cod = cod.strip().zfill(7)
-            if cod:
-                cnae_secundarios.append(
-                    {
-                        "codigo": cod,
-                        "descricao": cnae_map.get(cod, ""),
-                    }
-                )
-
-    # Município
-    mun_map = dict(Municipio.objects.values_list("codigo", "descricao"))
-    municipio_desc = mun_map.get(estab.municipio or "", "")
-
-    # Natureza jurídica
-    nat_desc = nat_map.get(empresa.natureza_juridica if empresa else "", "")
-    qual_resp_desc = qual_map.get(empresa.qualificacao_responsavel if empresa else "", "")
-
-    # Competências disponíveis
-    competencias_disponiveis = sorted(
-        Estabelecimento.objects.filter(cnpj_basico=cnpj_basico)
-        .values_list("competencia", flat=True)
-        .distinct(),
-        reverse=True,
+    try:
+        pit_id = abrir_pit()
+        # Tabelas de domínio pequenas: carregadas uma vez por exportação
+        mun_map = dict(Municipio.objects.values_list("codigo", "descricao"))
+        cnae_map = dict(Cnae.objects.values_list("codigo", "descricao"))
+    except Exception as exc:
+        liberar_slot(vaga)
+        return JsonResponse({"error": f"Erro ao iniciar exportação: {exc}"}, status=503)
+
+    serializar = stream_parquet if formato == "parquet" else stream_csv
+    lotes = iterar_lotes(pit_id, query, tem_texto, limite)
+    content_type, ext = FORMATOS[formato]
+    if gzip and formato == "csv":
+        content_type, ext = "application/gzip", "csv.gz"
+
+    response = StreamingHttpResponse(
+        _corpo_streaming(StreamExportacao(serializar(lotes, mun_map, cnae_map, gzip=gzip), vaga)),
+        content_type=content_type,
     )
+    response["Content-Disposition"] = f'attachment; filename="cnpj_{competencia}.{ext}"'
+    return response
+
+
+def _socio_json(s: dict) -> dict:
+    """Linha de sócio de `cnpj.detalhe` → formato da API."""
+    return {
+        "nome": s["nome_socio"] or "",
+        "tipo": IDENTIFICADOR_SOCIO_LABEL.get(s["identificador_socio"] or "", "PF"),
+        "cpfCnpj": s["cnpj_cpf_socio"] or "",
+        "qualificacao": s["qualificacao_socio_descricao"] or s["qualificacao_socio"] or "",
+        "dataEntrada": _fmt_date(s["data_entrada_sociedade"]),
+        "faixaEtaria": FAIXA_ETARIA_LABEL.get(s["faixa_etaria"] or "", ""),
+        "representanteLegal": {
+            "nome": s["nome_representante"] or "",
+            "cpf": s["representante_legal"] or "",
+            "qualificacao": s["qualificacao_representante_descricao"] or "",
+        }
+        if s["representante_legal"]
+        else None,
+    }
+
+
+def _filial_json(e: dict) -> dict:
+    """Linha de estabelecimento de `cnpj.detalhe` → formato da API (filiais)."""
+    return {
+        "cnpj": _format_cnpj(e["cnpj_basico"], e["cnpj_ordem"], e["cnpj_dv"]),
+        "cnpj_ordem": e["cnpj_ordem"],
+        "nome_fantasia": e["nome_fantasia"] or "",
+        "situacao": SITUACAO_LABEL.get(
+            e["situacao_cadastral"] or "", e["situacao_cadastral"] or ""
+        ),
+        "situacao_codigo": e["situacao_cadastral"] or "",
+        "data_situacao": _fmt_date(e["data_situacao_cadastral"]),
+        "data_abertura": _fmt_date(e["data_inicio_atividade"]),
+        "cnae_principal": {
+            "codigo": e["cnae_fiscal_principal"] or "",
+            "descricao": e["cnae_principal_descricao"] or "",
+        },
+        "endereco": {
+            "logradouro": f"{e['tipo_logradouro'] or ''} {e['logradouro'] or ''}".strip(),
+            "numero": e["numero"] or "",
+            "complemento": e["complemento"] or "",
+            "bairro": e["bairro"] or "",
+            "municipio": e["municipio_descricao"] or "",
+            "municipio_codigo": e["municipio"] or "",
+            "uf": e["uf"] or "",
+            "cep": e["cep"] or "",
+        },
+        "telefone": f"({e['ddd1']}) {e['telefone1']}" if e["ddd1"] and e["telefone1"] else "",
+        "email": e["correio_eletronico"] or "",
+    }
+
+
+def _limite_pagina(request) -> int:
+    """Param `limite` das listas paginadas (ValueError se inválido)."""
+    return min(PAGINA_LISTA_MAX, max(1, int(request.GET.get("limite", PAGINA_LISTA))))
+
+
+@require_GET
+def api_cnpj_detalhe(request, cnpj_basico):
+    """
+    GET /api/cnpj/<cnpj_basico>/ — detalhe completo de empresa.
+
+    Query params:
+      competencia — YYYY-MM (padrão: mais recente)
+
+    Uma única consulta ao banco (`cnpj.detalhe.carregar_detalhe`).
+    """
+    from .detalhe import carregar_detalhe
+
+    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
+    dados = carregar_detalhe(cnpj_basico, request.GET.get("competencia") or None)
+    competencia = dados["competencia"]
+
+    if not competencia:
+        return JsonResponse({"error": "Nenhuma competência disponível."}, status=404)
+    if not dados["estabelecimentos"]:
+        return JsonResponse({"error": "CNPJ não encontrado."}, status=404)
+
+    # Estabelecimento matriz (ordem=0001) ou, sem ela, o de menor ordem
+    estab = dados["estabelecimentos"][0]
+    empresa = dados["empresa"] or {}
+    simples_obj = dados["simples"] or {}
+
+    socios = [_socio_json(s) for s in dados["socios"]]
+
+    natureza = empresa.get("natureza_juridica") or ""
+    nat_desc = empresa.get("natureza_descricao") or ""
 
     return JsonResponse(
         {
             "cnpj_basico": cnpj_basico,
-            "cnpj": _format_cnpj(estab.cnpj_basico, estab.cnpj_ordem, estab.cnpj_dv),
+            "cnpj": _format_cnpj(estab["cnpj_basico"], estab["cnpj_ordem"], estab["cnpj_dv"]),
             "competencia": competencia,
-            "competencias_disponiveis": list(competencias_disponiveis),
-            "razao_social": empresa.razao_social if empresa else "",
-            "nome_fantasia": estab.nome_fantasia or "",
+            "competencias_disponiveis": dados["competencias"],
+            "razao_social": empresa.get("razao_social") or "",
+            "nome_fantasia": estab["nome_fantasia"] or "",
             "situacao": SITUACAO_LABEL.get(
-                estab.situacao_cadastral or "", estab.situacao_cadastral or ""
+                estab["situacao_cadastral"] or "", estab["situacao_cadastral"] or ""
             ),
-            "situacao_codigo": estab.situacao_cadastral or "",
-            "data_situacao": _fmt_date(estab.data_situacao_cadastral),
-            "data_abertura": _fmt_date(estab.data_inicio_atividade),
-            "natureza_juridica": f"{empresa.natureza_juridica} - {nat_desc}"
-            if empresa and nat_desc
-            else (empresa.natureza_juridica if empresa else ""),
-            "porte": PORTE_LABEL.get(empresa.porte if empresa else "", ""),
-            "capital_social": empresa.capital_social if empresa else "",
-            "qualificacao_responsavel": qual_resp_desc,
-            "ente_federativo": empresa.ente_federativo_responsavel if empresa else "",
-            "cnae_principal": {"codigo": cnae_principal, "descricao": cnae_principal_desc},
-            "cnaes_secundarios": cnae_secundarios,
+            "situacao_codigo": estab["situacao_cadastral"] or "",
+            "data_situacao": _fmt_date(estab["data_situacao_cadastral"]),
+            "data_abertura": _fmt_date(estab["data_inicio_atividade"]),
+            "natureza_juridica": f"{natureza} - {nat_desc}" if natureza and nat_desc else natureza,
+            "porte": PORTE_LABEL.get(empresa.get("porte") or "", ""),
+            "capital_social": empresa.get("capital_social", ""),
+            "qualificacao_responsavel": empresa.get("qualificacao_responsavel_descricao") or "",
+            "ente_federativo": empresa.get("ente_federativo_responsavel") or "",
+            "cnae_principal": {
+                "codigo": estab["cnae_fiscal_principal"] or "",
+                "descricao": estab["cnae_principal_descricao"] or "",
+            },
+            "cnaes_secundarios": dados["cnaes_secundarios"],
             "endereco": {
-                "logradouro": f"{estab.tipo_logradouro or ''} {estab.logradouro or ''}".strip(),
-                "numero": estab.numero or "",
-                "complemento": estab.complemento or "",
-                "bairro": estab.bairro or "",
-                "municipio": municipio_desc,
-                "municipio_codigo": estab.municipio or "",
-                "uf": estab.uf or "",
-                "cep": estab.cep or "",
+                "logradouro": f"{estab['tipo_logradouro'] or ''} {estab['logradouro'] or ''}".strip(),
+                "numero": estab["numero"] or "",
+                "complemento": estab["complemento"] or "",
+                "bairro": estab["bairro"] or "",
+                "municipio": estab["municipio_descricao"] or "",
+                "municipio_codigo": estab["municipio"] or "",
+                "uf": estab["uf"] or "",
+                "cep": estab["cep"] or "",
             },
-            "telefone": f"({estab.ddd1}) {estab.telefone1}"
-            if estab.ddd1 and estab.telefone1
+            "telefone": f"({estab['ddd1']}) {estab['telefone1']}"
+            if estab["ddd1"] and estab["telefone1"]
             else "",
-            "email": estab.correio_eletronico or "",
-            "situacao_especial": estab.situacao_especial or "",
+            "email": estab["correio_eletronico"] or "",
+            "situacao_especial": estab["situacao_especial"] or "",
             "simples_nacional": {
-                "optante": (simples_obj.opcao_simples or "") == "S" if simples_obj else False,
-                "data_opcao": _fmt_date(simples_obj.data_opcao_simples) if simples_obj else "",
-                "data_exclusao": _fmt_date(simples_obj.data_exclusao_simples)
-                if simples_obj
-                else "",
+                "optante": (simples_obj.get("opcao_simples") or "") == "S",
+                "data_opcao": _fmt_date(simples_obj.get("data_opcao_simples")),
+                "data_exclusao": _fmt_date(simples_obj.get("data_exclusao_simples")),
             },
             "mei": {
-                "optante": (simples_obj.opcao_mei or "") == "S" if simples_obj else False,
-                "data_opcao": _fmt_date(simples_obj.data_opcao_mei) if simples_obj else "",
-                "data_exclusao": _fmt_date(simples_obj.data_exclusao_mei) if simples_obj else "",
+                "optante": (simples_obj.get("opcao_mei") or "") == "S",
+                "data_opcao": _fmt_date(simples_obj.get("data_opcao_mei")),
+                "data_exclusao": _fmt_date(simples_obj.get("data_exclusao_mei")),
             },
             "socios": socios,
         }
     )
+
+
+@require_GET
+def api_cnpj_filiais(request, cnpj_basico):
+    """
+    GET /api/cnpj/<cnpj_basico>/filiais/ — filiais da empresa (sem a matriz),
+    paginadas por cursor: keyset em `cnpj_ordem`, custo constante por página
+    mesmo em empresas com dezenas de milhares de estabelecimentos.
+
+    Query params:
+      competencia — YYYY-MM (padrão: mais recente)
+      depois      — cursor (`proximo` da página anterior)
+      limite      — itens por página (padrão: 50, máx.: 200)
+      uf, situacao — filtros exatos
+    """
+    from .detalhe import pagina_filiais
+
+    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
+    depois = request.GET.get("depois", "")
+    if depois and not (depois.isdigit() and len(depois) == 4):
+        return JsonResponse({"error": "Cursor `depois` inválido."}, status=400)
+    try:
+        limite = _limite_pagina(request)
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro `limite` inválido."}, status=400)
+
+    pagina = pagina_filiais(
+        cnpj_basico,
+        request.GET.get("competencia") or None,
+        depois=depois,
+        limite=limite,
+        uf=request.GET.get("uf", "").upper() or None,
+        situacao=request.GET.get("situacao") or None,
+    )
+    return JsonResponse(
+        {
+            "competencia": pagina["competencia"],
+            "filiais": [_filial_json(e) for e in pagina["itens"]],
+            "proximo": pagina["proximo"],
+        }
+    )
+
+
+@require_GET
+def api_cnpj_socios(request, cnpj_basico):
+    """
+    GET /api/cnpj/<cnpj_basico>/socios/ — quadro societário paginado por
+    cursor (keyset no id do sócio).
+
+    Query params:
+      competencia — YYYY-MM (padrão: mais recente)
+      depois      — cursor (`proximo` da página anterior)
+      limite      — itens por página (padrão: 50, máx.: 200)
+    """
+    from .detalhe import pagina_socios
+
+    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
+    try:
+        depois = int(request.GET.get("depois") or 0)
+        limite = _limite_pagina(request)
+    except ValueError:
+        return JsonResponse({"error": "Parâmetros `depois`/`limite` inválidos."}, status=400)
+
+    pagina = pagina_socios(
+        cnpj_basico, request.GET.get("competencia") or None, depois=depois, limite=limite
+    )
+    return JsonResponse(
+        {
+            "competencia": pagina["competencia"],
+            "socios": [_socio_json(s) for s in pagina["itens"]],
+            "proximo": pagina["proximo"],
+        }
+    )
+
+
+@require_GET
+def api_cnpj_historico(request, cnpj_basico):
+    """
+    GET /api/cnpj/<cnpj_basico>/historico/ — o que mudou na empresa de uma
+    competência para a seguinte: situação, endereço e CNAEs da matriz
+    (campo a campo, `de` → `para`) e sócios que entraram ou saíram.
+
+    As diferenças são calculadas no SQL (`cnpj.detalhe.historico_alteracoes`);
+    a resposta fica em cache até a próxima carga (chave pela versão dos dados).
+    """
+    from .detalhe import historico_alteracoes
+
+    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
+    cache_key = f"cnpj:historico:{_versao_dados()}:{cnpj_basico}"
+    if (payload := cache.get(cache_key)) is None:
+        dados = historico_alteracoes(cnpj_basico)
+        if not dados["competencias"]:
+            return JsonResponse({"error": "CNPJ não encontrado."}, status=404)
+        payload = {"cnpj_basico": cnpj_basico, **dados}
+        cache.set(cache_key, payload, HISTORICO_CACHE_TIMEOUT)
+
+    resp = JsonResponse(payload)
+    patch_cache_control(resp, public=True, max_age=HISTORICO_MAX_AGE)
+    return resp
+
+
+@require_GET
+def api_cnpj_grafo(request, cnpj_basico):
+    """
+    GET /api/cnpj/<cnpj_basico>/grafo/ — empresas e pessoas ligadas pelo
+    quadro societário, até `depth` saltos (empresa → sócio → empresa...).
+
+    Query params:
+      competencia — YYYY-MM (padrão: mais recente com vínculos)
+      depth       — profundidade da busca (padrão: 2, máx.: 3)
+
+    Lê a lista de adjacência pré-calculada (`cnpj.grafo.vizinhanca`): uma
+    consulta por nível, com teto de vizinhos por nó — nós de grau alto
+    (holdings, sócios de centenas de empresas) voltam com `truncado`.
+    """
+    from .grafo import PROFUNDIDADE_MAX, PROFUNDIDADE_PADRAO, vizinhanca
+
+    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
+    try:
+        profundidade = int(request.GET.get("depth", PROFUNDIDADE_PADRAO))
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro `depth` inválido."}, status=400)
+    if not 1 <= profundidade <= PROFUNDIDADE_MAX:
+        return JsonResponse(
+            {"error": f"Parâmetro `depth` deve estar entre 1 e {PROFUNDIDADE_MAX}."}, status=400
+        )
+
+    grafo = vizinhanca(cnpj_basico, request.GET.get("competencia") or None, profundidade)
+    if not grafo["competencia"]:
+        return JsonResponse({"error": "Nenhuma competência disponível."}, status=404)
+    if not grafo["encontrado"]:
+        return JsonResponse({"error": "CNPJ não encontrado."}, status=404)
+
+    return JsonResponse(
+        {
+            "cnpj_basico": cnpj_basico,
+            "competencia": grafo["competencia"],
+            "depth": profundidade,
+            "nos": grafo["nos"],
+            "arestas": grafo["arestas"],
+            "truncado": grafo["truncado"],
+        }
+    )
+
+
+@csrf_exempt
+@require_POST
+def api_cnpj_lookup(request):
+    """
+    POST /api/cnpj/lookup — consulta em lote para enriquecimento de listas.
+
+    Corpo JSON:
+      cnpjs        — lista de CNPJs básicos (8) ou completos (14), com ou sem máscara
+      fields       — projeção opcional: ["empresa.razao_social", "estabelecimento.uf",
+                     "socios", ...]; só as tabelas/colunas pedidas são consultadas
+      competencia  — YYYY-MM (padrão: mais recente)
+
+    Resposta: NDJSON (uma linha por entrada, na mesma ordem), gerado em
+    streaming a cada lote de LOOKUP_LOTE entradas. Datas em ISO 8601.
+    """
+    from cnpj.lookup import normalizar_cnpj, parse_campos, resolver_lote
+
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Corpo JSON inválido."}, status=400)
+
+    cnpjs = body.get("cnpjs") if isinstance(body, dict) else None
+    if not isinstance(cnpjs, list) or not cnpjs:
+        return JsonResponse({"error": "Informe `cnpjs` como lista não vazia."}, status=400)
+
+    limite = getattr(settings, "CNPJ_LOOKUP_MAX", 10_000)
+    if len(cnpjs) > limite:
+        return JsonResponse(
+            {"error": f"Máximo de {limite:,} CNPJs por requisição; divida a lista em lotes."},
+            status=413,
+        )
+
+    try:
+        campos = parse_campos(body.get("fields"))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    competencia = body.get("competencia") or _latest_competencia()
+    if not competencia:
+        return JsonResponse({"error": "Nenhuma competência disponível."}, status=404)
+
+    def gerar():
+        for i in range(0, len(cnpjs), LOOKUP_LOTE):
+            lote = cnpjs[i : i + LOOKUP_LOTE]
+            chaves = [normalizar_cnpj(c) for c in lote]
+            resolvidos = resolver_lote([c for c in chaves if c], competencia, campos)
+            for entrada, chave in zip(lote, chaves):
+                if chave is None:
+                    item = {"entrada": entrada, "erro": "CNPJ inválido"}
+                else:
+                    item = {"entrada": entrada, **next(resolvidos)}
+                yield json.dumps(item, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+    response = StreamingHttpResponse(
+        _corpo_streaming(gerar()), content_type="application/x-ndjson; charset=utf-8"
+    )
+    response["X-Competencia"] = competencia
+    return response
+
+
+@require_GET
+def api_etl_progresso(request):
+    """
+    GET /api/etl/progresso/ — progresso das execuções recentes de load_cnpj,
+    index_es e pipeline_cnpj (ativas primeiro), publicado pela telemetria do
+    ETL a cada poucos segundos: linhas/s, MB/s, latência por etapa, RSS.
+
+    Query params:
+      limite — qtd. de execuções (padrão: 5, máx.: 50)
+    """
+    from .telemetria import ler_progresso
+
+    try:
+        limite = min(50, max(1, int(request.GET.get("limite", 5))))
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro `limite` inválido."}, status=400)
+    return JsonResponse({"execucoes": ler_progresso(limite=limite)})
+
+
+@require_GET
+def metrics(request):
+    """
+    GET /metrics — métricas HTTP por rota no formato do Prometheus.
+
+    Com `CNPJ_METRICAS_DIR` soma os snapshots de todos os workers; sem ele,
+    devolve só os do processo que atendeu a requisição.
+    """
+    from pathlib import Path
+
+    from django.http import HttpResponse
+
+    from . import metricas
+
+    diretorio = getattr(settings, "CNPJ_METRICAS_DIR", "")
+    if diretorio:
+        metricas.registro.gravar(Path(diretorio), forcar=True)
+        snapshot = metricas.agregar(metricas.ler_snapshots(Path(diretorio)))
+    else:
+        snapshot = metricas.registro.snapshot()
+    return HttpResponse(
+        metricas.renderizar(snapshot), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
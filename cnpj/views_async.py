@@ -0,0 +1,198 @@
+"""
+Versões assíncronas das views da API presas ao Elasticsearch (deploy ASGI).
+
+Com `CNPJ_ASYNC=True` o `cnpj/urls.py` liga estas views no lugar das de
+`cnpj.views` e o entrypoint sobe o Gunicorn com workers do Uvicorn:
+
+  GET /api/busca/    — mesma resposta da `views.api_busca`
+  GET /api/suggest/  — mesma resposta da `views.api_suggest`
+
+As idas ao ES usam o cliente async do elasticsearch-dsl
+(`motores.cliente_es_async`): enquanto uma busca espera o cluster, o
+mesmo worker atende outras requisições, em vez de cada busca lenta prender
+um processo/thread. O PostgreSQL continua síncrono (psycopg2, sem API
+async no Django 4.2): competência, versão dos dados, descrições de
+CNAE/município e a reserva `busca_pg` rodam via `sync_to_async`, agrupadas
+numa ida à thread por etapa. As demais rotas seguem síncronas — sob ASGI o
+Django as executa na thread de `sync_to_async` do worker. Export e lookup
+(streaming) entregam o corpo como iterador async (`views._corpo_streaming`),
+um lote por vez.
+
+Os decorators `require_GET`/`cache_page` do Django 4.2 não aceitam views
+async; o método é conferido por `_somente_get`.
+"""
+
+import functools
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+from .views import (
+    CURSOR_INICIO,
+    ERRO_DV_CNPJ,
+    MAX_RESULT_WINDOW,
+    PAGE_SIZE,
+    PIT_KEEP_ALIVE,
+    SUGGEST_CACHE_TIMEOUT,
+    SUGGEST_MIN_CARACTERES,
+    SUGGEST_TIMEOUT_ES,
+    _chave_sugestao,
+    _consulta_sugestao,
+    _decode_cursor,
+    _encode_cursor,
+    _erro_janela,
+    _latest_competencia,
+    _params_sugestao,
+    _payload_sugestoes,
+    _resposta_busca,
+    _resposta_sugestoes,
+)
+
+
+def _somente_get(view):
+    """`require_GET` para views async."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def _pagina_cursor(filtros: dict, cursor: str):
+    """
+    Página do cursor (PIT + search_after) pelo cliente async.
+    Retorna `(total, hits, next_cursor)`; ValueError se o cursor for inválido.
+    """
+    from elasticsearch_dsl import AsyncSearch
+
+    from cnpj.documents import EstabelecimentoDocument
+    from cnpj.motores import cliente_es_async
+    from cnpj.search import montar_query, ordenacao
+
+    pit_id, search_after = None, None
+    if cursor != CURSOR_INICIO:
+        pit_id, search_after = _decode_cursor(cursor)
+
+    cliente = cliente_es_async()
+    if pit_id is None:
+        pit_id = (
+            await cliente.open_point_in_time(
+                index=EstabelecimentoDocument._index._name, keep_alive=PIT_KEEP_ALIVE
+            )
+        )["id"]
+    query, tem_texto = montar_query(filtros)
+    s = (
+        AsyncSearch(using=cliente)
+        .query(query)
+        .sort(*ordenacao(tem_texto, pit=True))
+        .extra(pit={"id": pit_id, "keep_alive": PIT_KEEP_ALIVE})[:PAGE_SIZE]
+    )
+    if search_after:
+        s = s.extra(search_after=search_after)
+    response = await s.execute()
+
+    pit_id = getattr(response, "pit_id", None) or pit_id
+    hits = list(response)
+    next_cursor = None
+    if len(hits) == PAGE_SIZE:
+        next_cursor = _encode_cursor(pit_id, hits[-1].meta.sort)
+    else:
+        try:
+            await cliente.close_point_in_time(id=pit_id)
+        except Exception:
+            pass
+    return response.hits.total.value, [h.to_dict() for h in hits], next_cursor
+
+
+@_somente_get
+async def api_busca(request):
+    """GET /api/busca/ — versão async de `cnpj.views.api_busca` (mesmos params)."""
+    from cnpj.motores import MOTOR_ES, abuscar, abuscar_cnpj
+    from cnpj.search import cnpj_dv_valido, cnpj_exato, filtros_busca
+
+    t0 = time.perf_counter()
+
+    competencia = request.GET.get("competencia") or await sync_to_async(_latest_competencia)()
+    if not competencia:
+        return JsonResponse({"results": [], "total": 0, "paginas": 0}, status=200)
+
+    filtros = filtros_busca(request.GET, competencia)
+    cursor = request.GET.get("cursor", "").strip()
+    page = None
+    next_cursor = None
+    motor = MOTOR_ES
+
+    if (cnpj := cnpj_exato(filtros)) is not None:
+        if not cnpj_dv_valido(cnpj):
+            return JsonResponse({"error": ERRO_DV_CNPJ}, status=400)
+        page = 1
+        try:
+            total, hits, motor = await abuscar_cnpj(filtros, cnpj)
+        except Exception as exc:
+            return JsonResponse({"error": f"Busca indisponível: {exc}"}, status=503)
+    elif cursor:
+        try:
+            total, hits, next_cursor = await _pagina_cursor(filtros, cursor)
+        except ValueError:
+            return JsonResponse({"error": "Cursor inválido."}, status=400)
+        except Exception as exc:
+            return JsonResponse({"error": f"Erro no Elasticsearch: {exc}"}, status=503)
+    else:
+        try:
+            page = max(1, int(request.GET.get("page", 1)))
+        except ValueError:
+            return JsonResponse({"error": "Página inválida."}, status=400)
+        start = (page - 1) * PAGE_SIZE
+        if start + PAGE_SIZE > MAX_RESULT_WINDOW:
+            return _erro_janela()
+        try:
+            total, hits, motor = await abuscar(filtros, start, PAGE_SIZE)
+        except Exception as exc:
+            return JsonResponse({"error": f"Busca indisponível: {exc}"}, status=503)
+
+    # Descrições de CNAE/município (PG) + serialização numa ida só à thread
+    return await sync_to_async(_resposta_busca)(
+        t0, hits, total, page, next_cursor, competencia, motor
+    )
+
+
+@_somente_get
+async def api_suggest(request):
+    """GET /api/suggest/ — versão async de `cnpj.views.api_suggest` (mesmos params)."""
+    from elasticsearch_dsl import AsyncSearch
+
+    from cnpj.documents import EstabelecimentoDocument
+    from cnpj.motores import cliente_es_async
+
+    try:
+        q, limite, competencia = _params_sugestao(request)
+    except ValueError:
+        return JsonResponse({"error": "Parâmetro `limite` inválido."}, status=400)
+
+    if len(q) < SUGGEST_MIN_CARACTERES:
+        return _resposta_sugestoes({"q": q, "sugestoes": []})
+
+    cache_key = await sync_to_async(_chave_sugestao)(q, competencia, limite)
+    if (payload := await cache.aget(cache_key)) is not None:
+        return _resposta_sugestoes(payload)
+
+    competencia = competencia or await sync_to_async(_latest_competencia)()
+    if not competencia:
+        return _resposta_sugestoes({"q": q, "sugestoes": []})
+    s = AsyncSearch(
+        using=cliente_es_async(request_timeout=SUGGEST_TIMEOUT_ES),
+        index=EstabelecimentoDocument._index._name,
+    )
+    try:
+        response = await _consulta_sugestao(s, q, competencia, limite).execute()
+    except Exception as exc:
+        return JsonResponse({"error": f"Erro no Elasticsearch: {exc}"}, status=503)
+
+    payload = _payload_sugestoes(response, q, competencia)
+    await cache.aset(cache_key, payload, SUGGEST_CACHE_TIMEOUT)
+    return _resposta_sugestoes(payload)
@@ -5,9 +5,8 @@ from django.core.paginator import Paginator
 from django.db.models import Subquery
 from django.shortcuts import render
 
-from .models import CargaLog, Cnae, Empresa, Estabelecimento, Municipio, Simples, Socio
+from .models import CargaLog, Cnae, Empresa, Estabelecimento, Municipio, Simples
 from .views import (
-    FAIXA_ETARIA_LABEL,
     PORTE_LABEL,
     SITUACAO_LABEL,
     _format_cnpj,
@@ -23,22 +22,23 @@ def home(request):
         reverse=True,
     )
     ultima = competencias[0] if competencias else None
-    total_empresas = Estabelecimento.objects.filter(competencia=ultima).count() if ultima else 0
     total_cargas = CargaLog.objects.filter(status="SUCESSO").count()
 
+    # Total de empresas e gráficos vêm de /api/facets/ (agregação no ES),
+    # carregados pelo navegador — sem COUNT(*) na tabela de estabelecimentos.
     return render(
         request,
         "cnpj/home.html",
         {
             "competencias": competencias,
-            "total_empresas": total_empresas,
+            "ultima_competencia": ultima,
             "total_cargas": total_cargas,
         },
     )
 
 
 def busca(request):
-    t0 = time.time()
+    t0 = time.perf_counter()
     competencias = sorted(
         Estabelecimento.objects.values_list("competencia", flat=True).distinct(), reverse=True
     )
@@ -141,7 +141,7 @@ def busca(request):
                 empresas_map[e.cnpj_basico].porte, ""
             )
 
-    elapsed = round(time.time() - t0, 3)
+    elapsed = round(time.perf_counter() - t0, 3)
 
     return render(
         request,
@@ -163,15 +163,24 @@ def busca(request):
 
 
 def detalhe(request, cnpj_basico):
-    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
-    competencia = request.GET.get("competencia") or _latest_competencia()
+    from .detalhe import carregar_detalhe, linhas_estabelecimentos
 
-    estabelecimentos = Estabelecimento.objects.filter(
-        cnpj_basico=cnpj_basico, competencia=competencia
-    ).order_by("cnpj_ordem")
-    empresa = Empresa.objects.filter(cnpj_basico=cnpj_basico, competencia=competencia).first()
+    cnpj_basico = cnpj_basico.replace(".", "").replace("/", "").replace("-", "").zfill(8)
+    # Uma consulta: matriz, empresa, Simples, histórico e os totais agregados
+    # no SQL; filiais e sócios vêm sob demanda das APIs paginadas
+    dados = carregar_detalhe(
+        cnpj_basico,
+        request.GET.get("competencia") or None,
+        estabelecimentos=1,
+        socios=0,
+        resumo=True,
+    )
+    competencia = dados["competencia"] or ""
+    # Cada conjunto é materializado uma vez, com descrições e campos derivados
+    estabelecimentos = linhas_estabelecimentos(dados)
+    empresa = dados["empresa"]
 
-    if not estabelecimentos.exists() and not empresa:
+    if not estabelecimentos and not empresa:
         return render(
             request,
             "cnpj/detalhe.html",
@@ -182,61 +191,30 @@ def detalhe(request, cnpj_basico):
             },
         )
 
-    for e in estabelecimentos:
-        e.cnpj_formatado = _format_cnpj(e.cnpj_basico, e.cnpj_ordem, e.cnpj_dv)
-        e.situacao_descricao = SITUACAO_LABEL.get(e.situacao_cadastral, e.situacao_cadastral)
-        e.endereco_completo = (
-            f"{e.tipo_logradouro or ''} {e.logradouro or ''}, {e.numero or ''}".strip()
-        )
-        if e.complemento:
-            e.endereco_completo += f" - {e.complemento}"
-        if e.bairro:
-            e.endereco_completo += f", {e.bairro}"
-        if e.cep:
-            e.endereco_completo += f" - CEP: {e.cep}"
-
-    socios = Socio.objects.filter(cnpj_basico=cnpj_basico, competencia=competencia)
-    for s in socios:
-        s.faixa_etaria_descricao = FAIXA_ETARIA_LABEL.get(s.faixa_etaria, "")
-
-    simples = Simples.objects.filter(cnpj_basico=cnpj_basico, competencia=competencia).first()
-
-    competencias = sorted(
-        Estabelecimento.objects.filter(cnpj_basico=cnpj_basico)
-        .values_list("competencia", flat=True)
-        .distinct(),
-        reverse=True,
-    )
+    competencias = dados["competencias"]
 
     if empresa:
-        empresa.porte_descricao = PORTE_LABEL.get(empresa.porte, "")
-
-    cnae_principal_desc = ""
-    if estabelecimentos.exists() and estabelecimentos.first().cnae_fiscal_principal:
-        cnae_obj = Cnae.objects.filter(
-            codigo=estabelecimentos.first().cnae_fiscal_principal
-        ).first()
-        if cnae_obj:
-            cnae_principal_desc = cnae_obj.descricao
-
-    mun_desc = ""
-    if estabelecimentos.exists() and estabelecimentos.first().municipio:
-        m_obj = Municipio.objects.filter(codigo=estabelecimentos.first().municipio).first()
-        if m_obj:
-            mun_desc = m_obj.descricao
+        empresa["porte_descricao"] = PORTE_LABEL.get(empresa["porte"], "")
+
+    res = dados["resumo"] or {}
+    total_estabs = res.get("estabelecimentos", len(estabelecimentos))
+    resumo = {
+        "estabelecimentos": total_estabs,
+        # A linha retornada é a matriz; o restante são filiais
+        "filiais": max(total_estabs - len(estabelecimentos), 0),
+        "socios": res.get("socios", 0),
+        "por_uf": [(uf or "—", n) for uf, n in res.get("por_uf", {}).items()],
+        "por_situacao": [
+            (SITUACAO_LABEL.get(sit, sit or "—"), n)
+            for sit, n in res.get("por_situacao", {}).items()
+        ],
+    }
 
     # Histórico de situação (Matriz) para o chart.js
-    hist = Estabelecimento.objects.filter(cnpj_basico=cnpj_basico, cnpj_ordem="0001").order_by(
-        "competencia"
-    )
-    historico_labels = json.dumps([h.competencia for h in hist])
+    hist = dados["historico"]
+    historico_labels = json.dumps([h["competencia"] for h in hist])
     historico_data = json.dumps(
-        [
-            int(h.situacao_cadastral)
-            if h.situacao_cadastral and h.situacao_cadastral.isdigit()
-            else 0
-            for h in hist
-        ]
+        [int(h["situacao"]) if h["situacao"] and h["situacao"].isdigit() else 0 for h in hist]
     )
 
     return render(
@@ -248,11 +226,9 @@ def detalhe(request, cnpj_basico):
             "competencias": competencias,
             "competencias_cnpj": competencias,
             "empresa": empresa,
-            "estabelecimentos": estabelecimentos,
-            "socios": socios,
-            "simples": simples,
-            "cnae_principal_desc": cnae_principal_desc,
-            "municipio_desc": mun_desc,
+            "matriz": estabelecimentos[0] if estabelecimentos else None,
+            "resumo": resumo,
+            "simples": dados["simples"],
             "historico_labels": historico_labels,
             "historico_data": historico_data,
         },
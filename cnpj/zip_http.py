@@ -0,0 +1,259 @@
+"""
+Leitura de ZIPs remotos direto do HTTP, sem gravar o arquivo em disco.
+
+Os ZIPs da Receita têm um único CSV comprimido com deflate. O caminho
+rápido lê o cabeçalho local do membro no início da resposta e descomprime
+o corpo à medida que chega: em memória fica só o bloco HTTP corrente e a
+saída pedida pelo leitor (`read(n)`), nunca o arquivo. Quedas no meio da
+transferência são retomadas com `Range` a partir do último byte recebido.
+
+Quando o cabeçalho local não basta (membro armazenado sem tamanho,
+criptografado ou com método desconhecido), o diretório central é
+necessário: o arquivo remoto é aberto como um arquivo seekable em que cada
+leitura vira um `Range`, e o `zipfile` faz o resto.
+"""
+
+import io
+import struct
+import time
+import zlib
+
+import requests
+from requests.exceptions import ChunkedEncodingError
+
+HTTP_TIMEOUT = 120
+BLOCO_BYTES = 1024 * 256
+# Buffer do modo Range (cada recarga é uma requisição)
+BUFFER_RANGE_BYTES = 8 * 1024 * 1024
+MAX_RETRIES = 3
+
+_CABECALHO_LOCAL = struct.Struct("<4s5H3I2H")
+_ASSINATURA_LOCAL = b"PK\x03\x04"
+_ASSINATURA_DESCRITOR = b"PK\x07\x08"
+_FLAG_CRIPTOGRAFADO = 0x1
+_FLAG_DESCRITOR = 0x8
+_DEFLATE = 8
+
+
+def _blocos_http(session: requests.Session, url: str, inicio: int = 0):
+    """
+    Gera o corpo de `url` a partir de `inicio`, em blocos de BLOCO_BYTES.
+    Se a conexão cair, pede o restante com `Range` (até MAX_RETRIES vezes).
+    """
+    pos = inicio
+    tentativa = 0
+    while True:
+        headers = {"Range": f"bytes={pos}-"} if pos else {}
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=HTTP_TIMEOUT) as resp:
+                resp.raise_for_status()
+                if pos and resp.status_code != 206:
+                    raise OSError(f"{url}: servidor ignorou Range; não é possível retomar")
+                for bloco in resp.iter_content(chunk_size=BLOCO_BYTES):
+                    pos += len(bloco)
+                    yield bloco
+            return
+        except (requests.ConnectionError, requests.Timeout, ChunkedEncodingError) as exc:
+            tentativa += 1
+            if tentativa > MAX_RETRIES:
+                raise OSError(f"{url}: conexão perdida no byte {pos:,} ({exc})") from exc
+            time.sleep(2**tentativa)
+
+
+class _MembroDeflate(io.RawIOBase):
+    """
+    Descomprime um membro deflate conforme os bytes chegam. Confere o
+    CRC-32 ao final (do cabeçalho local ou do data descriptor).
+    """
+
+    def __init__(self, blocos, inicial: bytes, crc: int, tamanho: int, descritor: bool):
+        self._blocos = blocos
+        self._entrada = inicial
+        self._d = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._crc_esperado = crc
+        self._tamanho_esperado = tamanho
+        self._descritor = descritor
+        self._crc = 0
+        self._tamanho = 0
+        self._verificado = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _proximo_bloco(self) -> bytes:
+        bloco = next(self._blocos, b"")
+        if not bloco:
+            raise OSError("ZIP truncado: o stream terminou antes do fim do membro")
+        return bloco
+
+    def readinto(self, b) -> int:
+        while not self._d.eof:
+            if not self._entrada:
+                self._entrada = self._proximo_bloco()
+            dados = self._d.decompress(self._entrada, len(b))
+            self._entrada = self._d.unconsumed_tail
+            if dados:
+                n = len(dados)
+                b[:n] = dados
+                self._crc = zlib.crc32(dados, self._crc)
+                self._tamanho += n
+                return n
+        self._verificar()
+        return 0
+
+    def _verificar(self) -> None:
+        if self._verificado:
+            return
+        self._verificado = True
+        crc, tamanho = self._crc_esperado, self._tamanho_esperado
+        if self._descritor:
+            # Tamanhos do descritor podem ter 4 ou 8 bytes (ZIP64): confere só o CRC
+            resto = self._d.unused_data
+            while len(resto) < 8 and (bloco := next(self._blocos, b"")):
+                resto += bloco
+            if resto.startswith(_ASSINATURA_DESCRITOR):
+                resto = resto[4:]
+            if len(resto) < 4:
+                raise OSError("ZIP truncado: data descriptor ausente")
+            crc, tamanho = struct.unpack_from("<I", resto)[0], 0xFFFFFFFF
+        if crc != self._crc:
+            raise OSError(f"CRC divergente no membro do ZIP ({self._crc:08x} != {crc:08x})")
+        if tamanho not in (0xFFFFFFFF, self._tamanho & 0xFFFFFFFF):
+            raise OSError(f"Tamanho divergente no membro do ZIP ({self._tamanho:,} bytes)")
+
+    def close(self) -> None:
+        if not self.closed:
+            self._blocos.close()  # fecha a resposta HTTP
+        super().close()
+
+
+class ArquivoHTTP(io.RawIOBase):
+    """Arquivo remoto somente-leitura e seekable: cada leitura é um `Range`."""
+
+    def __init__(self, session: requests.Session, url: str, tamanho: int):
+        self._session = session
+        self._url = url
+        self._tamanho = tamanho
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._tamanho}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, b) -> int:
+        if self._pos >= self._tamanho or not len(b):
+            return 0
+        fim = min(self._pos + len(b), self._tamanho) - 1
+        for tentativa in range(1, MAX_RETRIES + 1):
+            try:
+                resp = self._session.get(
+                    self._url, headers={"Range": f"bytes={self._pos}-{fim}"}, timeout=HTTP_TIMEOUT
+                )
+                resp.raise_for_status()
+                break
+            except (requests.ConnectionError, requests.Timeout):
+                if tentativa == MAX_RETRIES:
+                    raise
+                time.sleep(2**tentativa)
+        if resp.status_code != 206:
+            raise OSError(f"{self._url}: servidor não aceita Range")
+        n = len(resp.content)
+        b[:n] = resp.content
+        self._pos += n
+        return n
+
+
+def _abrir_via_range(session: requests.Session, url: str):
+    """Fallback: diretório central via Range + zipfile. Retorna (zip, membro)."""
+    import zipfile
+
+    resp = session.head(url, allow_redirects=True, timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+    tamanho = int(resp.headers.get("content-length", 0) or 0)
+    if not tamanho:
+        raise OSError(f"{url}: tamanho desconhecido, impossível ler o diretório central")
+    bruto = io.BufferedReader(ArquivoHTTP(session, url, tamanho), BUFFER_RANGE_BYTES)
+    zf = zipfile.ZipFile(bruto)
+    nomes = zf.namelist()
+    if not nomes:
+        zf.close()
+        raise OSError(f"Nenhum arquivo em {url}")
+    return zf, zf.open(nomes[0])
+
+
+class _MembroRange(io.RawIOBase):
+    """Adapta o membro aberto pelo zipfile, fechando também o ZipFile."""
+
+    def __init__(self, zf, membro):
+        self._zf = zf
+        self._membro = membro
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        dados = self._membro.read(len(b))
+        b[: len(dados)] = dados
+        return len(dados)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._membro.close()
+            self._zf.close()
+        super().close()
+
+
+def abrir_membro_remoto(url: str, session: requests.Session | None = None) -> io.BufferedReader:
+    """
+    Abre o primeiro membro do ZIP em `url` como stream binário (descomprimido).
+
+    Tenta o caminho de streaming pelo cabeçalho local; se o membro não puder
+    ser lido assim, recorre ao diretório central via Range. Use como
+    context manager (fecha a conexão).
+    """
+    session = session or requests.Session()
+    blocos = _blocos_http(session, url)
+
+    inicio = b""
+    try:
+        while len(inicio) < _CABECALHO_LOCAL.size:
+            bloco = next(blocos, b"")
+            if not bloco:
+                break
+            inicio += bloco
+        if len(inicio) >= _CABECALHO_LOCAL.size:
+            (assinatura, _, flags, metodo, _, _, crc, _, tamanho, n_nome, n_extra) = (
+                _CABECALHO_LOCAL.unpack_from(inicio)
+            )
+            dados = _CABECALHO_LOCAL.size + n_nome + n_extra
+            if (
+                assinatura == _ASSINATURA_LOCAL
+                and metodo == _DEFLATE
+                and not flags & _FLAG_CRIPTOGRAFADO
+            ):
+                while len(inicio) < dados:
+                    bloco = next(blocos, b"")
+                    if not bloco:
+                        raise OSError(f"ZIP truncado no cabeçalho local: {url}")
+                    inicio += bloco
+                membro = _MembroDeflate(
+                    blocos, inicio[dados:], crc, tamanho, bool(flags & _FLAG_DESCRITOR)
+                )
+                return io.BufferedReader(membro, BLOCO_BYTES)
+    except Exception:
+        blocos.close()
+        raise
+
+    blocos.close()
+    zf, membro = _abrir_via_range(session, url)
+    return io.BufferedReader(_MembroRange(zf, membro), BLOCO_BYTES)
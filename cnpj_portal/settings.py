@@ -12,6 +12,10 @@ SECRET_KEY = config("DJANGO_SECRET_KEY", default="dev-secret-key-change-in-produ
 DEBUG = config("DJANGO_DEBUG", default=False, cast=bool)
 ALLOWED_HOSTS = config("DJANGO_ALLOWED_HOSTS", default="localhost,127.0.0.1").split(",")
 
+# Deploy ASGI: liga as views async de busca/autocomplete (cnpj.views_async)
+# e faz o Gunicorn subir com workers do Uvicorn (gunicorn.conf.py)
+CNPJ_ASYNC = config("CNPJ_ASYNC", default=False, cast=bool)
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -26,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "cnpj.middleware.InstrumentacaoMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -55,6 +60,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "cnpj_portal.wsgi.application"
+ASGI_APPLICATION = "cnpj_portal.asgi.application"
 
 # Banco de dados
 _db_url = config(
@@ -80,6 +86,14 @@ def _parse_db_url(url: str) -> dict:
 
 
 DATABASES = {"default": _parse_db_url(_db_url)}
+# Conexões persistentes: cada worker/thread reaproveita a conexão entre
+# requisições por até DB_CONN_MAX_AGE segundos, conferida antes do reuso.
+# Sob ASGI a conexão pertence ao contexto da requisição e não seria
+# reaproveitada — padrão 0 (use um pooler, ex.: PgBouncer).
+DATABASES["default"]["CONN_MAX_AGE"] = config(
+    "DB_CONN_MAX_AGE", default=0 if CNPJ_ASYNC else 60, cast=int
+)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
 
 CACHES = {
     "default": {
@@ -104,6 +118,20 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Paginação padrão
 CNPJ_PAGE_SIZE = 25
 
+# Máximo de CNPJs por requisição em POST /api/cnpj/lookup
+CNPJ_LOOKUP_MAX = config("CNPJ_LOOKUP_MAX", default=10_000, cast=int)
+
+# Exportação em streaming (GET /api/export/): teto de linhas e exportações
+# simultâneas no deploy (todos os workers; vagas em advisory locks do PostgreSQL)
+CNPJ_EXPORT_MAX_ROWS = config("CNPJ_EXPORT_MAX_ROWS", default=1_000_000, cast=int)
+CNPJ_EXPORT_MAX_CONCURRENT = config("CNPJ_EXPORT_MAX_CONCURRENT", default=2, cast=int)
+
+# Instrumentação por requisição (Server-Timing, log estruturado e /metrics).
+# Com vários workers do Gunicorn, CNPJ_METRICAS_DIR (diretório compartilhado)
+# faz o /metrics somar os contadores de todos os processos.
+CNPJ_INSTRUMENTACAO = config("CNPJ_INSTRUMENTACAO", default=True, cast=bool)
+CNPJ_METRICAS_DIR = config("CNPJ_METRICAS_DIR", default="")
+
 # Diretório de dados brutos
 CNPJ_DATA_DIR = BASE_DIR / "data" / "raw"
 CNPJ_LOGS_DIR = BASE_DIR / "logs"
@@ -120,7 +148,36 @@ _es_url = config("ES_URL", default="http://elasticsearch:9200")
 ELASTICSEARCH_DSL = {
     "default": {
         "hosts": _es_url,
+        # Pool HTTP por nó (urllib3 / aiohttp no cliente async): cubra as
+        # requisições simultâneas de um worker (threads ou tasks async)
+        "connections_per_node": config("CNPJ_ES_CONEXOES_POR_NO", default=10, cast=int),
+        "request_timeout": config("CNPJ_ES_TIMEOUT", default=10.0, cast=float),
+        "max_retries": config("CNPJ_ES_MAX_RETRIES", default=2, cast=int),
+        # Timeout não é repetido: o da busca já desvia para o PostgreSQL
+        "retry_on_timeout": False,
     }
 }
 # Nome do índice principal
 CNPJ_ES_INDEX = config("CNPJ_ES_INDEX", default="cnpj_estabelecimentos")
+# Busca com o ES fora: timeout por busca e disjuntor que desvia para o
+# PostgreSQL após N falhas seguidas, por um intervalo (cnpj.motores)
+CNPJ_ES_TIMEOUT_BUSCA = config("CNPJ_ES_TIMEOUT_BUSCA", default=5.0, cast=float)
+CNPJ_ES_FALHAS_DISJUNTOR = config("CNPJ_ES_FALHAS_DISJUNTOR", default=3, cast=int)
+CNPJ_ES_DISJUNTOR_ABERTO_S = config("CNPJ_ES_DISJUNTOR_ABERTO_S", default=30.0, cast=float)
+
+# ── Logging ─────────────────────────────────────────────────────────────────
+# Uma linha JSON por requisição em `cnpj.requisicoes` (InstrumentacaoMiddleware);
+# CNPJ_LOG_REQUISICOES=WARNING silencia.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"mensagem": {"format": "%(message)s"}},
+    "handlers": {"requisicoes": {"class": "logging.StreamHandler", "formatter": "mensagem"}},
+    "loggers": {
+        "cnpj.requisicoes": {
+            "handlers": ["requisicoes"],
+            "level": config("CNPJ_LOG_REQUISICOES", default="INFO"),
+            "propagate": False,
+        },
+    },
+}
@@ -27,10 +27,7 @@ python manage.py migrate --noinput
 echo "==> Coletando arquivos estáticos..."
 python manage.py collectstatic --noinput
 
+# Aplicação (WSGI/ASGI), workers, threads, preload etc. vêm do ambiente:
+# ver gunicorn.conf.py (GUNICORN_* e CNPJ_ASYNC)
 echo "==> Iniciando Gunicorn..."
-exec gunicorn cnpj_portal.wsgi:application \
-  --bind 0.0.0.0:8000 \
-  --workers 4 \
-  --timeout 300 \
-  --access-logfile - \
-  --error-logfile -
+exec gunicorn --config gunicorn.conf.py
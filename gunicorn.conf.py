@@ -0,0 +1,42 @@
+"""
+Perfil de serviço do Gunicorn, lido do ambiente (entrypoint.sh e loadtest_api).
+
+  CNPJ_ASYNC              aplicação ASGI (cnpj_portal.asgi) em vez da WSGI
+  GUNICORN_WORKERS        processos (padrão: 4)
+  GUNICORN_THREADS        threads por processo (padrão: 1; com mais de 1 o
+                          worker sync vira gthread)
+  GUNICORN_WORKER_CLASS   sync | gthread | uvicorn.workers.UvicornWorker
+                          (padrão: Uvicorn com CNPJ_ASYNC, senão sync)
+  GUNICORN_TIMEOUT        segundos sem resposta até reciclar o worker (300:
+                          exportações e lookups em lote são longos)
+  GUNICORN_KEEPALIVE      segundos de keep-alive HTTP (padrão: 5)
+  GUNICORN_MAX_REQUESTS   recicla o worker após N requisições (0 = nunca)
+  GUNICORN_PRELOAD        importa Django, models e views uma vez no master,
+                          antes do fork (padrão: True)
+
+Com `preload_app` as conexões (PostgreSQL, Elasticsearch) continuam sendo
+abertas só nos workers: o Django e os clientes do ES conectam sob demanda.
+"""
+
+# Nomes sem "_" viram configurações do Gunicorn
+from decouple import config as _config
+
+_async = _config("CNPJ_ASYNC", default=False, cast=bool)
+
+wsgi_app = "cnpj_portal.asgi:application" if _async else "cnpj_portal.wsgi:application"
+bind = _config("GUNICORN_BIND", default="0.0.0.0:8000")
+workers = _config("GUNICORN_WORKERS", default=4, cast=int)
+threads = _config("GUNICORN_THREADS", default=1, cast=int)
+worker_class = _config(
+    "GUNICORN_WORKER_CLASS",
+    default="uvicorn.workers.UvicornWorker" if _async else "sync",
+)
+timeout = _config("GUNICORN_TIMEOUT", default=300, cast=int)
+keepalive = _config("GUNICORN_KEEPALIVE", default=5, cast=int)
+max_requests = _config("GUNICORN_MAX_REQUESTS", default=0, cast=int)
+max_requests_jitter = max_requests // 10
+preload_app = _config("GUNICORN_PRELOAD", default=True, cast=bool)
+
+accesslog = _config("GUNICORN_ACCESSLOG", default="-") or None
+errorlog = "-"
+loglevel = _config("GUNICORN_LOGLEVEL", default="info")
@@ -1,8 +1,32 @@
-from unittest.mock import patch
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
+import pytest
 from django.urls import reverse
 
-from cnpj.views import _format_cnpj
+from cnpj.views import PAGE_SIZE, _decode_cursor, _encode_cursor, _format_cnpj
+
+
+def _fonte(i):
+    """`_source` mínimo com os campos lidos por api_busca."""
+    return {
+        "cnpj_basico": f"{i:08d}",
+        "cnpj_ordem": "0001",
+        "cnpj_dv": "00",
+        "razao_social": f"EMPRESA {i}",
+        "nome_fantasia": "",
+        "situacao_cadastral": "02",
+        "porte": "01",
+        "cnae_fiscal_principal": "6201501",
+        "municipio": "7107",
+        "uf": "SP",
+    }
+
+
+def _fake_hit(i):
+    """Hit ES mínimo: `_source` via `to_dict()` e o sort em `meta`."""
+    fonte = _fonte(i)
+    return SimpleNamespace(**fonte, to_dict=lambda: fonte, meta=SimpleNamespace(sort=[1.0, i]))
 
 
 class TestCnpjApiEndpoints:
@@ -50,3 +74,166 @@ class TestCnpjApiEndpoints:
         formatado = _format_cnpj("123", "1", "9")
         # 3 dígitos básicos devem virar 00000123 -> "00.000.123/0001-09"
         assert formatado == "00.000.123/0001-09"
+
+
+class TestBuscaCursor:
+    def test_cursor_roundtrip(self):
+        """O cursor opaco preserva o id do PIT e os sort values do último hit"""
+        token = _encode_cursor("pit-abc", [3.5, 1234])
+        assert "=" not in token
+        assert _decode_cursor(token) == ("pit-abc", [3.5, 1234])
+
+    def test_cursor_invalido_retorna_400(self, client):
+        url = reverse("cnpj:api_busca")
+        response = client.get(url, {"competencia": "2026-01", "cursor": "nao-e-um-cursor"})
+        assert response.status_code == 400
+
+    def test_page_invalida_retorna_400(self, client):
+        url = reverse("cnpj:api_busca")
+        response = client.get(url, {"competencia": "2026-01", "page": "abc"})
+        assert response.status_code == 400
+
+    def test_page_profunda_exige_cursor(self, client):
+        """Páginas além de max_result_window são recusadas e orientam o uso do cursor"""
+        url = reverse("cnpj:api_busca")
+        response = client.get(url, {"competencia": "2026-01", "page": 401})
+        assert response.status_code == 400
+        assert "cursor" in response.json()["error"]
+
+    @patch("cnpj.views.Municipio.objects.filter")
+    @patch("cnpj.views.Cnae.objects.filter")
+    @patch("elasticsearch_dsl.connections.get_connection")
+    @patch("cnpj.documents.EstabelecimentoDocument.search")
+    def test_cursor_inicio_abre_pit_e_devolve_next_cursor(
+        self, mock_search, mock_conn, mock_cnae, mock_mun, client
+    ):
+        mock_cnae.return_value.values_list.return_value = []
+        mock_mun.return_value.values_list.return_value = []
+        mock_conn.return_value.open_point_in_time.return_value = {"id": "pit-1"}
+
+        s = MagicMock()
+        for metodo in ("query", "index", "sort", "extra"):
+            getattr(s, metodo).return_value = s
+        s.__getitem__.return_value = s
+        mock_search.return_value = s
+
+        resp_es = MagicMock()
+        resp_es.pit_id = "pit-2"
+        resp_es.hits.total.value = 100_000
+        resp_es.__iter__.return_value = iter([_fake_hit(i) for i in range(PAGE_SIZE)])
+        s.execute.return_value = resp_es
+
+        url = reverse("cnpj:api_busca")
+        response = client.get(url, {"competencia": "2026-01", "uf": "SP", "cursor": "*"})
+        assert response.status_code == 200
+
+        data = response.json()
+        assert len(data["results"]) == PAGE_SIZE
+        assert _decode_cursor(data["next_cursor"]) == ("pit-2", [1.0, PAGE_SIZE - 1])
+        s.extra.assert_any_call(pit={"id": "pit-1", "keep_alive": "2m"})
+
+
+class TestFacets:
+    @patch("cnpj.views._versao_dados", return_value="7-2026-02-01")
+    @patch("cnpj.views.Municipio.objects.filter")
+    @patch("cnpj.views.Cnae.objects.filter")
+    @patch("cnpj.documents.EstabelecimentoDocument.search")
+    def test_facets_uma_ida_ao_es_e_cache(
+        self, mock_search, mock_cnae, mock_mun, mock_versao, client
+    ):
+        mock_cnae.return_value.values_list.return_value = [("6201501", "Desenvolvimento")]
+        mock_mun.return_value.values_list.return_value = [("7107", "SAO PAULO")]
+
+        s = MagicMock()
+        s.query.return_value = s
+        s.extra.return_value = s
+        mock_search.return_value = s
+
+        buckets = {
+            "uf": [("SP", 10)],
+            "municipio": [("7107", 10)],
+            "cnae": [("6201501", 4)],
+            "situacao": [("02", 9), ("08", 1)],
+            "porte": [("01", 10)],
+        }
+        resp_es = MagicMock()
+        resp_es.hits.total.value = 10
+        for nome, itens in buckets.items():
+            getattr(resp_es.aggregations, nome).buckets = [
+                SimpleNamespace(key=k, doc_count=n) for k, n in itens
+            ]
+        s.execute.return_value = resp_es
+
+        url = reverse("cnpj:api_facets")
+        params = {"competencia": "2026-01", "uf": "sp"}
+        data = client.get(url, params).json()
+
+        assert data["total"] == 10
+        assert data["facets"]["municipio"] == [
+            {"codigo": "7107", "descricao": "SAO PAULO", "total": 10}
+        ]
+        assert data["facets"]["situacao"][0]["descricao"] == "ATIVA"
+        assert s.aggs.bucket.call_count == 5
+
+        # Mesma combinação de filtros e versão de dados → servida do cache
+        assert client.get(url, params).json() == data
+        assert s.execute.call_count == 1
+
+
+class TestCnpjLookup:
+    def test_parse_campos_projecao(self):
+        from cnpj.lookup import parse_campos
+
+        campos = parse_campos("empresa.razao_social, estabelecimento.uf,socios")
+        assert campos["empresa"] == ["razao_social"]
+        assert campos["estabelecimento"] == ["uf"]
+        assert "nome_socio" in campos["socios"]
+        assert "simples" not in campos
+        assert set(parse_campos(None)) == {"empresa", "estabelecimento", "simples", "socios"}
+
+    def test_normalizar_cnpj(self):
+        from cnpj.lookup import normalizar_cnpj
+
+        assert normalizar_cnpj("33.000.167/0001-01") == "33000167000101"
+        assert normalizar_cnpj("191") == "00000191"
+        assert normalizar_cnpj(191000100) == "00000191000100"
+        assert normalizar_cnpj("abc") is None
+
+    def test_lookup_rejeita_lista_acima_do_limite(self, client, settings):
+        settings.CNPJ_LOOKUP_MAX = 2
+        url = reverse("cnpj:api_cnpj_lookup")
+        body = {"cnpjs": ["1", "2", "3"], "competencia": "2026-01"}
+        response = client.post(url, body, content_type="application/json")
+        assert response.status_code == 413
+
+    def test_lookup_rejeita_campo_desconhecido(self, client):
+        url = reverse("cnpj:api_cnpj_lookup")
+        body = {"cnpjs": ["1"], "fields": ["empresa.senha"], "competencia": "2026-01"}
+        response = client.post(url, body, content_type="application/json")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("fields", [5, {"empresa": 1}, [1], ["empresa", None], True])
+    def test_lookup_rejeita_fields_de_tipo_invalido(self, client, fields):
+        url = reverse("cnpj:api_cnpj_lookup")
+        body = {"cnpjs": ["1"], "fields": fields, "competencia": "2026-01"}
+        response = client.post(url, body, content_type="application/json")
+        assert response.status_code == 400
+        assert "fields" in response.json()["error"]
+
+    @patch("cnpj.lookup.resolver_lote")
+    def test_lookup_stream_ndjson_na_ordem_de_entrada(self, mock_resolver, client):
+        import json
+
+        mock_resolver.side_effect = lambda chaves, comp, campos: iter(
+            {"cnpj": c, "cnpj_basico": c[:8], "encontrado": True} for c in chaves
+        )
+        url = reverse("cnpj:api_cnpj_lookup")
+        body = {"cnpjs": ["33.000.167/0001-01", "xx", "191"], "competencia": "2026-01"}
+        response = client.post(url, body, content_type="application/json")
+
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("application/x-ndjson")
+        linhas = [json.loads(linha) for linha in b"".join(response.streaming_content).splitlines()]
+        assert [item.get("cnpj") for item in linhas] == ["33000167000101", None, "00000191"]
+        assert linhas[1]["erro"] == "CNPJ inválido"
+        mock_resolver.assert_called_once()
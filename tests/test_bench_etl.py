@@ -0,0 +1,49 @@
+"""
+Testes do benchmark do ETL: fixtures sintéticas no layout da Receita,
+medição das etapas em processo e comparação entre execuções.
+"""
+
+import io
+import zipfile
+
+from cnpj.bench.etl import comparar, medir_carga, medir_indexacao
+from cnpj.bench.sintetico import gerar_competencia
+from cnpj.management.commands.load_cnpj import COLUNAS, _ler_csv
+
+
+def test_fixtures_deterministicas_no_layout_da_receita(tmp_path):
+    a = gerar_competencia(tmp_path / "a", linhas=300, seed=7)
+    b = gerar_competencia(tmp_path / "b", linhas=300, seed=7)
+    assert [p.read_bytes() for p in a] == [p.read_bytes() for p in b]
+
+    estab = next(p for p in a if p.name == "Estabelecimentos0.zip")
+    with zipfile.ZipFile(estab) as zf:
+        bruto = zf.read(zf.namelist()[0])
+    assert bruto.startswith(b'"00000000";"0001";')
+    bruto.decode("iso-8859-1")  # nada fora do latin-1
+
+    (df,) = list(_ler_csv(io.BytesIO(bruto), COLUNAS["estabelecimento"]))
+    assert len(df) == 300
+    assert df["uf"].str.len().eq(2).all()
+
+
+def test_medir_etapas_sem_banco(tmp_path):
+    zips = gerar_competencia(tmp_path, linhas=200)
+    carga, dfs = medir_carga(zips, "2099-01")
+
+    assert set(carga) == {"empresa", "estabelecimento", "socio", "simples", "cnae", "municipio"}
+    assert set(carga["empresa"]) == {"unzip", "parse", "transform", "copy_serialize"}
+    assert carga["socio"]["transform"]["linhas"] == 200
+
+    indice = medir_indexacao(dfs, "2099-01", "bench")
+    assert set(indice) == {"index_docs", "index_serialize"}
+    assert indice["index_docs"]["linhas"] == 200
+
+
+def test_comparar_aponta_regressao():
+    def res(vazao):
+        etapa = {"segundos": 1.0, "linhas": 10, "linhas_s": vazao, "mb_s": 0.0}
+        return {"carga": {"empresa": {"parse": etapa}}, "indice": {}}
+
+    assert comparar(res(90), res(100), tolerancia=0.15) == []
+    assert comparar(res(80), res(100), tolerancia=0.15) == [("carga.empresa.parse", 100, 80, -0.2)]
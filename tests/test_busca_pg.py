@@ -0,0 +1,161 @@
+"""
+Testes da busca de reserva no PostgreSQL (`cnpj.busca_pg`) e do disjuntor
+que desvia a `api_busca` para ela quando o Elasticsearch falha
+(`cnpj.motores`).
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.http import QueryDict
+from django.urls import reverse
+
+from cnpj import busca_pg, motores
+from cnpj.motores import ABERTO, FECHADO, MEIO_ABERTO, MOTOR_ES, MOTOR_PG, Disjuntor
+from cnpj.search import filtros_busca
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def disjuntor():
+    """Disjuntor novo (3 falhas, 30s) com relógio controlado, no lugar do global."""
+    relogio = Relogio()
+    d = Disjuntor(3, 30.0, relogio=relogio)
+    d.relogio = relogio
+    with patch("cnpj.motores._disjuntor", d):
+        yield d
+
+
+@pytest.fixture
+def banco():
+    cursor = MagicMock()
+    conexao = MagicMock()
+    conexao.cursor.return_value.__enter__.return_value = cursor
+    with patch("cnpj.busca_pg.connection", conexao):
+        yield cursor
+
+
+def _linha(i: int) -> tuple:
+    return (
+        f"{i:08d}", "0001", "00", f"PADARIA {i}", None, "02", "SP", "7107", "1091102", "01",
+        "2026-02",
+    )  # fmt: skip
+
+
+class TestDisjuntor:
+    def test_abre_apos_falhas_seguidas_e_testa_depois_do_intervalo(self, disjuntor):
+        for _ in range(2):
+            disjuntor.falha()
+        assert disjuntor.estado == FECHADO and disjuntor.permite()
+
+        disjuntor.falha()
+        assert disjuntor.estado == ABERTO
+        assert not disjuntor.permite()
+
+        disjuntor.relogio.agora = 31
+        assert disjuntor.estado == MEIO_ABERTO
+        assert disjuntor.permite()  # uma requisição de teste...
+        assert not disjuntor.permite()  # ...por vez
+
+        disjuntor.falha()
+        assert disjuntor.estado == ABERTO
+
+        disjuntor.relogio.agora = 62
+        assert disjuntor.permite()
+        disjuntor.sucesso()
+        assert disjuntor.estado == FECHADO
+
+    def test_sucesso_zera_a_contagem(self, disjuntor):
+        disjuntor.falha()
+        disjuntor.falha()
+        disjuntor.sucesso()
+        disjuntor.falha()
+        assert disjuntor.estado == FECHADO
+
+
+class TestMotores:
+    def test_falha_do_es_cai_no_pg_e_disjuntor_aberto_nem_tenta_o_es(self, disjuntor):
+        filtros = {"competencia": "2026-02", "uf": "SP"}
+        with (
+            patch("cnpj.motores.buscar_es", side_effect=TimeoutError("timeout")) as es,
+            patch("cnpj.busca_pg.buscar", return_value=(1, [{"cnpj_basico": "1"}])) as pg,
+        ):
+            for _ in range(3):
+                assert motores.buscar(filtros, 0, 25).motor == MOTOR_PG
+            assert es.call_count == 3 and disjuntor.estado == ABERTO
+
+            assert motores.buscar(filtros, 25, 25) == (1, [{"cnpj_basico": "1"}], MOTOR_PG)
+            assert es.call_count == 3
+            pg.assert_called_with(filtros, 25, 25)
+
+    def test_es_saudavel(self, disjuntor):
+        with (
+            patch("cnpj.motores.buscar_es", return_value=(5, [])),
+            patch("cnpj.busca_pg.buscar") as pg,
+        ):
+            assert motores.buscar({"competencia": "2026-02"}, 0, 25) == (5, [], MOTOR_ES)
+        pg.assert_not_called()
+
+
+class TestBuscaPg:
+    def test_texto_livre_usa_trigram_e_filtros(self, banco):
+        banco.fetchone.return_value = (2,)
+        banco.fetchall.return_value = [_linha(1), _linha(2)]
+        filtros = filtros_busca(
+            QueryDict("q=padaria&uf=sp&cnae=1091&cnae_secundario=4721102&mei=S"), "2026-02"
+        )
+
+        total, hits = busca_pg.buscar(filtros, 0, 25)
+
+        assert total == 2
+        assert hits[0]["razao_social"] == "PADARIA 1"
+        assert hits[0]["nome_fantasia"] == ""
+        (sql_total, params), (sql_pagina, params_pagina) = (
+            c.args for c in banco.execute.call_args_list
+        )
+        assert "%(q)s <%% emp.razao_social" in sql_total
+        assert "%(q)s <%% e.nome_fantasia" in sql_total
+        assert "LIMIT 10000" in sql_total
+        assert "ORDER BY ranking.score DESC" in sql_pagina
+        assert params["uf"] == "SP" and params["cnae"] == "1091%" and params["mei"] == "S"
+        assert "e.cnaes_secundarios @> ARRAY[%(cnae_secundario)s]" in sql_total
+        assert params_pagina["tamanho"] == 25 and params_pagina["inicio"] == 0
+
+    def test_cnpj_vira_prefixo_e_pagina_alem_do_total_nao_consulta(self, banco):
+        banco.fetchone.return_value = (3,)
+        filtros = filtros_busca(QueryDict("q=12.345.678"), "2026-02")
+
+        assert busca_pg.buscar(filtros, 25, 25) == (3, [])
+
+        sql, params = banco.execute.call_args.args
+        assert banco.execute.call_count == 1
+        assert "ranking" not in sql
+        assert params["cnpj"] == "12345678%"
+
+
+@patch("cnpj.views.Municipio.objects.filter")
+@patch("cnpj.views.Cnae.objects.filter")
+def test_api_busca_com_es_fora_responde_pelo_pg(mock_cnae, mock_mun, disjuntor, banco, client):
+    mock_cnae.return_value.values_list.return_value = [("1091102", "Padaria")]
+    mock_mun.return_value.values_list.return_value = [("7107", "SAO PAULO")]
+    banco.fetchone.return_value = (1,)
+    banco.fetchall.return_value = [_linha(7)]
+
+    with patch("cnpj.motores.buscar_es", side_effect=ConnectionError("es fora")):
+        resp = client.get(reverse("cnpj:api_busca"), {"competencia": "2026-02", "q": "padaria"})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["motor"] == "pg"
+    assert data["total"] == 1
+    (item,) = data["results"]
+    assert item["cnpj"] == "00.000.007/0001-00"
+    assert item["cnae_descricao"] == "Padaria"
+    assert item["municipio"] == "SAO PAULO"
@@ -0,0 +1,61 @@
+"""
+Testes dos CNAEs secundários normalizados: explodidos no `load_cnpj`
+(array do PostgreSQL carregado no mesmo COPY), indexados no ES como array
+de keywords e filtráveis na busca (`cnae_secundario`).
+"""
+
+import pandas as pd
+from django.http import QueryDict
+
+from cnpj.management.commands.index_es import _acao_es
+from cnpj.management.commands.load_cnpj import (
+    COLUNAS,
+    COLUNAS_DERIVADAS,
+    _buffer_copy,
+    _transformar_chunk,
+)
+from cnpj.search import filtros_busca, montar_query
+
+
+def _chunk(secundarias: list) -> pd.DataFrame:
+    colunas = COLUNAS["estabelecimento"]
+    linhas = [dict.fromkeys(colunas, "") for _ in secundarias]
+    for linha, sec in zip(linhas, secundarias):
+        linha.update(cnpj_basico="12345678", cnpj_ordem="0001", cnae_fiscal_secundaria=sec)
+    return pd.DataFrame(linhas, columns=colunas)
+
+
+def test_transformacao_explode_cnaes_em_array():
+    df = _transformar_chunk(
+        _chunk(["4712100,5611201", "0111301", "", None]), "estabelecimento", "2026-02"
+    )
+
+    assert list(df["cnaes_secundarios"]) == ["{4712100,5611201}", "{0111301}", None, None]
+
+    colunas = COLUNAS["estabelecimento"] + COLUNAS_DERIVADAS["estabelecimento"] + ["competencia"]
+    primeira = _buffer_copy(df, colunas).getvalue().splitlines()[0].split("\t")
+    assert primeira[colunas.index("cnaes_secundarios")] == "{4712100,5611201}"
+
+
+def test_acao_es_indexa_array_de_keywords():
+    row = (
+        "12345678", "0001", "90", "LOJA", "02", "SP", "7107", "4711302",
+        ["4712100", "5611201"], "05", "2026-02", "MERCADO", "S", "N", 3, True,
+    )  # fmt: skip
+    fonte = _acao_es(row, "idx")["_source"]
+    assert fonte["cnaes_secundarios"] == ["4712100", "5611201"]
+
+    sem = _acao_es(row[:8] + (None,) + row[9:], "idx")["_source"]
+    assert sem["cnaes_secundarios"] == []
+
+
+def test_filtro_cnae_secundario():
+    filtros = filtros_busca(QueryDict("cnae_secundario=4751-2/01"), "2026-02")
+    assert filtros["cnae_secundario"] == "4751201"
+
+    filtro = montar_query(filtros)[0].to_dict()["constant_score"]["filter"]["bool"]["filter"]
+    assert {"term": {"cnaes_secundarios": "4751201"}} in filtro
+
+    parcial = filtros_busca(QueryDict("cnae_secundario=4751"), "2026-02")
+    filtro = montar_query(parcial)[0].to_dict()["constant_score"]["filter"]["bool"]["filter"]
+    assert {"prefix": {"cnaes_secundarios": "4751"}} in filtro
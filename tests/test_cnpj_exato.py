@@ -0,0 +1,144 @@
+"""
+Testes do caminho rápido do CNPJ completo na `api_busca`: dígitos
+verificadores conferidos antes de tudo e lookup pontual pelo `_id` do
+documento (ES) ou pelo índice do CNPJ (PostgreSQL), sem query de busca.
+"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.http import QueryDict
+from django.urls import reverse
+
+from cnpj import motores
+from cnpj.busca_pg import _condicoes
+from cnpj.motores import MOTOR_ES, MOTOR_PG, Disjuntor
+from cnpj.search import casa_filtros, cnpj_dv_valido, cnpj_exato, filtros_busca
+
+FONTE = {
+    "cnpj": "33000167000101",
+    "cnpj_basico": "33000167",
+    "cnpj_ordem": "0001",
+    "cnpj_dv": "01",
+    "razao_social": "PETROLEO BRASILEIRO S A PETROBRAS",
+    "nome_fantasia": "PETROBRAS",
+    "situacao_cadastral": "02",
+    "uf": "RJ",
+    "municipio": "6001",
+    "cnae_fiscal_principal": "0600001",
+    "cnaes_secundarios": ["1921700", "4681801"],
+    "porte": "05",
+    "opcao_simples": "N",
+    "opcao_mei": "N",
+    "competencia": "2026-02",
+}
+
+
+@pytest.fixture
+def disjuntor():
+    d = Disjuntor(3, 30.0)
+    with patch("cnpj.motores._disjuntor", d):
+        yield d
+
+
+@pytest.fixture
+def es():
+    """Cliente ES falso devolvido por `_cliente_es` (GET pelo `_id`)."""
+    cliente = MagicMock()
+    cliente.get.return_value = {"found": True, "_source": FONTE}
+    with patch("cnpj.motores._cliente_es", return_value=cliente):
+        yield cliente
+
+
+@pytest.mark.parametrize(
+    ("cnpj", "valido"),
+    [
+        ("33000167000101", True),
+        ("11222333000181", True),
+        ("33000167000102", False),
+        ("33000167000111", False),
+        ("11111111111111", False),
+        ("3300016700010", False),
+    ],
+)
+def test_dv_cnpj(cnpj, valido):
+    assert cnpj_dv_valido(cnpj) is valido
+
+
+def test_so_cnpj_completo_vai_pelo_caminho_exato():
+    assert cnpj_exato(filtros_busca(QueryDict("q=33.000.167/0001-01"), "2026-02")) == (
+        "33000167000101"
+    )
+    assert cnpj_exato(filtros_busca(QueryDict("q=33.000.167/0001"), "2026-02")) is None
+    assert cnpj_exato(filtros_busca(QueryDict("q=padaria 2000"), "2026-02")) is None
+
+
+def test_casa_filtros_tem_a_semantica_da_query():
+    def filtros(qs):
+        return filtros_busca(QueryDict(qs), "2026-02")
+
+    assert casa_filtros(FONTE, filtros("uf=rj&situacao=02&cnae=06&cnae_secundario=4681"))
+    assert not casa_filtros(FONTE, filtros("uf=SP"))
+    assert not casa_filtros(FONTE, filtros("mei=S"))
+    assert not casa_filtros(FONTE, filtros("cnae_secundario=4711302"))
+
+
+def test_pg_usa_igualdade_na_raiz_e_prefixo_no_resto():
+    where, params, texto = _condicoes(filtros_busca(QueryDict("q=33000167000101"), "2026-02"))
+    assert texto is None
+    assert "e.cnpj_basico = %(cnpj_basico)s" in where
+    assert params["cnpj_basico"] == "33000167" and params["cnpj"] == "000101%"
+
+
+class TestBuscarCnpj:
+    def test_get_pelo_id_do_documento(self, disjuntor, es):
+        filtros = filtros_busca(QueryDict("q=33000167000101&uf=RJ"), "2026-02")
+        assert motores.buscar_cnpj(filtros, "33000167000101") == (1, [FONTE], MOTOR_ES)
+        assert es.get.call_args.kwargs["id"] == "33000167000101_2026-02"
+
+        filtros["uf"] = "SP"
+        assert motores.buscar_cnpj(filtros, "33000167000101") == (0, [], MOTOR_ES)
+
+    def test_es_fora_le_pelo_pg(self, disjuntor, es):
+        es.get.side_effect = ConnectionError("es fora")
+        filtros = filtros_busca(QueryDict("q=33000167000101"), "2026-02")
+        with patch("cnpj.busca_pg.buscar", return_value=(1, [FONTE])) as pg:
+            assert motores.buscar_cnpj(filtros, "33000167000101").motor == MOTOR_PG
+        pg.assert_called_once_with(filtros, 0, 1)
+
+    def test_tempo_de_servidor_abaixo_de_1ms(self, disjuntor, es):
+        """Validação do DV + lookup + filtros, sem a ida à rede: custo de CPU do caminho."""
+        filtros = filtros_busca(QueryDict("q=33.000.167/0001-01&uf=RJ"), "2026-02")
+        n = 1_000
+        t0 = time.perf_counter()
+        for _ in range(n):
+            cnpj = cnpj_exato(filtros)
+            assert cnpj_dv_valido(cnpj)
+            motores.buscar_cnpj(filtros, cnpj)
+        assert (time.perf_counter() - t0) / n < 0.001
+
+
+@patch("cnpj.views.Municipio.objects.filter")
+@patch("cnpj.views.Cnae.objects.filter")
+def test_api_busca_cnpj_completo_nao_faz_busca(mock_cnae, mock_mun, disjuntor, es, client):
+    mock_cnae.return_value.values_list.return_value = []
+    mock_mun.return_value.values_list.return_value = [("6001", "RIO DE JANEIRO")]
+
+    with patch("cnpj.documents.EstabelecimentoDocument.search") as mock_search:
+        resp = client.get(
+            reverse("cnpj:api_busca"), {"competencia": "2026-02", "q": "33.000.167/0001-01"}
+        )
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total"] == 1 and data["paginas"] == 1 and data["motor"] == "es"
+    assert data["results"][0]["cnpj"] == "33.000.167/0001-01"
+    assert data["results"][0]["municipio"] == "RIO DE JANEIRO"
+    mock_search.assert_not_called()
+
+
+def test_api_busca_cnpj_com_dv_invalido(es, client):
+    resp = client.get(reverse("cnpj:api_busca"), {"competencia": "2026-02", "q": "33000167000102"})
+    assert resp.status_code == 400
+    es.get.assert_not_called()
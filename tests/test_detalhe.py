@@ -0,0 +1,377 @@
+"""
+Testes do detalhe de empresa: o payload inteiro (API e página HTML) sai de
+uma única consulta ao banco (`cnpj.detalhe.carregar_detalhe`); a página HTML
+traz só a matriz e os totais, e filiais/sócios vêm das APIs paginadas por
+cursor (`pagina_filiais`/`pagina_socios`). O histórico de alterações entre
+competências também sai de uma consulta, com as diferenças calculadas no SQL.
+"""
+
+import json
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.urls import reverse
+
+from cnpj.detalhe import (
+    SQL_HISTORICO,
+    carregar_detalhe,
+    historico_alteracoes,
+    linhas_estabelecimentos,
+    pagina_filiais,
+    pagina_socios,
+)
+
+
+def _estab(ordem: str, **extra) -> dict:
+    return {
+        "id": int(ordem),
+        "cnpj_basico": "12345678",
+        "cnpj_ordem": ordem,
+        "cnpj_dv": "90",
+        "identificador_matriz_filial": "1" if ordem == "0001" else "2",
+        "nome_fantasia": "LOJA",
+        "situacao_cadastral": "02",
+        "data_situacao_cadastral": "2015-03-10",
+        "data_inicio_atividade": "2001-07-01",
+        "cnae_fiscal_principal": "4711302",
+        "cnae_fiscal_secundaria": "4712100,5611201",
+        "cnaes_secundarios": ["4712100", "5611201"],
+        "tipo_logradouro": "RUA",
+        "logradouro": "DAS FLORES",
+        "numero": "10",
+        "complemento": None,
+        "bairro": "CENTRO",
+        "cep": "01001000",
+        "uf": "SP",
+        "municipio": "7107",
+        "ddd1": "11",
+        "telefone1": "33334444",
+        "correio_eletronico": "contato@exemplo.com",
+        "situacao_especial": None,
+        "competencia": "2026-02",
+        "cnae_principal_descricao": "Supermercados",
+        "municipio_descricao": "SAO PAULO",
+        **extra,
+    }
+
+
+def _socio(id_: int = 1, **extra) -> dict:
+    return {
+        "id": id_,
+        "nome_socio": "FULANO DE TAL",
+        "identificador_socio": "2",
+        "cnpj_cpf_socio": "***123456**",
+        "qualificacao_socio": "49",
+        "qualificacao_socio_descricao": "Sócio-Administrador",
+        "data_entrada_sociedade": "2001-07-01",
+        "faixa_etaria": "5",
+        "representante_legal": None,
+        "nome_representante": None,
+        "qualificacao_representante": None,
+        "qualificacao_representante_descricao": None,
+        **extra,
+    }
+
+
+def _payload(**extra) -> dict:
+    return {
+        "competencia": "2026-02",
+        "competencias": ["2026-02", "2026-01"],
+        "estabelecimentos": [_estab("0001"), _estab("0002", uf="RJ")],
+        "empresa": {
+            "cnpj_basico": "12345678",
+            "razao_social": "MERCADO EXEMPLO LTDA",
+            "natureza_juridica": "2062",
+            "natureza_descricao": "Sociedade Empresária Limitada",
+            "qualificacao_responsavel": "49",
+            "qualificacao_responsavel_descricao": "Sócio-Administrador",
+            "capital_social": "100000,00",
+            "porte": "05",
+            "ente_federativo_responsavel": None,
+        },
+        "simples": {
+            "opcao_simples": "S",
+            "data_opcao_simples": "2010-01-01",
+            "data_exclusao_simples": None,
+            "opcao_mei": "N",
+            "data_opcao_mei": None,
+            "data_exclusao_mei": None,
+        },
+        "socios": [_socio()],
+        "cnaes_secundarios": [
+            {"codigo": "4712100", "descricao": "Minimercados"},
+            {"codigo": "5611201", "descricao": "Restaurantes"},
+        ],
+        "cnaes": {"4712100": "Minimercados", "5611201": "Restaurantes"},
+        "historico": [
+            {"competencia": "2026-01", "situacao": "02"},
+            {"competencia": "2026-02", "situacao": "02"},
+        ],
+        "resumo": None,
+        **extra,
+    }
+
+
+def _resultado(**extra) -> tuple:
+    return (json.dumps(_payload(**extra)),)
+
+
+def _pagina(itens: list) -> tuple:
+    return (json.dumps({"competencia": "2026-02", "itens": itens}),)
+
+
+@pytest.fixture
+def banco():
+    """Cursor falso de `cnpj.detalhe`; qualquer outra ida ao banco falha no pytest-django."""
+    cursor = MagicMock()
+    cursor.fetchone.return_value = _resultado()
+    conexao = MagicMock()
+    conexao.cursor.return_value.__enter__.return_value = cursor
+    with patch("cnpj.detalhe.connection", conexao):
+        yield cursor
+
+
+def test_carregar_detalhe_uma_consulta_e_datas(banco):
+    dados = carregar_detalhe("12345678", "2026-02", estabelecimentos=None)
+
+    banco.execute.assert_called_once()
+    sql, params = banco.execute.call_args.args
+    assert params == {
+        "cnpj_basico": "12345678",
+        "competencia": "2026-02",
+        "limite": None,
+        "limite_socios": None,
+        "resumo": False,
+    }
+    assert "LATERAL" in sql and "json_agg" in sql
+    # sem resumo, nem os totais de estabelecimentos nem a contagem de sócios leem o banco
+    assert sql.count("WHERE %(resumo)s AND cnpj_basico") == 2
+    assert dados["estabelecimentos"][0]["data_inicio_atividade"] == date(2001, 7, 1)
+    assert dados["socios"][0]["data_entrada_sociedade"] == date(2001, 7, 1)
+    assert dados["simples"]["data_opcao_simples"] == date(2010, 1, 1)
+    assert dados["simples"]["data_exclusao_simples"] is None
+
+
+def test_api_detalhe_uma_ida_ao_banco(banco, client):
+    resp = client.get(reverse("cnpj:api_cnpj_detalhe", args=["12.345.678"]))
+
+    assert resp.status_code == 200
+    banco.execute.assert_called_once()
+    assert banco.execute.call_args.args[1]["limite"] == 1
+    data = resp.json()
+    assert data["cnpj"] == "12.345.678/0001-90"
+    assert data["competencias_disponiveis"] == ["2026-02", "2026-01"]
+    assert data["natureza_juridica"] == "2062 - Sociedade Empresária Limitada"
+    assert data["cnae_principal"] == {"codigo": "4711302", "descricao": "Supermercados"}
+    assert [c["codigo"] for c in data["cnaes_secundarios"]] == ["4712100", "5611201"]
+    assert data["endereco"]["municipio"] == "SAO PAULO"
+    assert data["data_abertura"] == "01/07/2001"
+    assert data["simples_nacional"] == {
+        "optante": True,
+        "data_opcao": "01/01/2010",
+        "data_exclusao": "",
+    }
+    assert data["socios"][0]["tipo"] == "PJ"
+    assert data["socios"][0]["qualificacao"] == "Sócio-Administrador"
+
+
+def test_api_detalhe_404(banco, client):
+    banco.fetchone.return_value = _resultado(estabelecimentos=[])
+    resp = client.get(reverse("cnpj:api_cnpj_detalhe", args=["99999999"]))
+    assert resp.status_code == 404
+    assert resp.json() == {"error": "CNPJ não encontrado."}
+
+    banco.fetchone.return_value = _resultado(competencia=None, estabelecimentos=[])
+    resp = client.get(reverse("cnpj:api_cnpj_detalhe", args=["99999999"]))
+    assert resp.json() == {"error": "Nenhuma competência disponível."}
+
+
+def _resumo(filiais: int = 1) -> dict:
+    return {
+        "estabelecimentos": filiais + 1,
+        "por_uf": {"RJ": filiais, "SP": 1},
+        "por_situacao": {"02": filiais, "08": 1},
+        "socios": 7,
+    }
+
+
+def test_html_detalhe_matriz_e_totais(banco, client):
+    banco.fetchone.return_value = _resultado(
+        estabelecimentos=[_estab("0001")], socios=[], resumo=_resumo()
+    )
+    resp = client.get(reverse("cnpj:detalhe", args=["12345678"]), {"competencia": "2026-02"})
+
+    assert resp.status_code == 200
+    banco.execute.assert_called_once()
+    params = banco.execute.call_args.args[1]
+    assert (params["limite"], params["limite_socios"], params["resumo"]) == (1, 0, True)
+    html = resp.content.decode()
+    assert "MERCADO EXEMPLO LTDA" in html
+    assert "12.345.678/0001-90" in html
+    assert "Estabelecimentos (2)" in html
+    assert "Sócios (7)" in html
+    assert "Minimercados" in html
+    assert resp.context["resumo"]["por_situacao"] == [("ATIVA", 1), ("BAIXADA", 1)]
+    assert reverse("cnpj:api_cnpj_filiais", args=["12345678"]) in html
+    assert resp.context["historico_labels"] == json.dumps(["2026-01", "2026-02"])
+
+
+def test_linhas_com_campos_derivados_e_cnaes_resolvidos(banco):
+    dados = carregar_detalhe("12345678", estabelecimentos=None)
+    matriz, filial = linhas_estabelecimentos(dados)
+
+    assert matriz.cnpj_formatado == "12.345.678/0001-90"
+    assert filial.cnpj_formatado == "12.345.678/0002-90"
+    assert matriz.situacao_descricao == "ATIVA"
+    assert matriz.endereco_completo == "RUA DAS FLORES, 10, CENTRO - CEP: 01001000"
+    assert [(c.codigo, c.descricao) for c in filial.cnaes_secundarios_desc] == [
+        ("4712100", "Minimercados"),
+        ("5611201", "Restaurantes"),
+    ]
+
+
+def test_html_detalhe_milhares_de_filiais_so_totais(banco, client):
+    """Regressão: a página não cresce com o número de filiais (ficam para a API)."""
+    banco.fetchone.return_value = _resultado(
+        estabelecimentos=[_estab("0001")], socios=[], resumo=_resumo(filiais=3_000)
+    )
+
+    resp = client.get(reverse("cnpj:detalhe", args=["12345678"]))
+
+    assert resp.status_code == 200
+    banco.execute.assert_called_once()
+    html = resp.content.decode()
+    assert "Estabelecimentos (3001)" in html
+    assert "3000 filiais" in html
+    assert "RJ · 3000" in html
+    assert "12.345.678/0002-90" not in html
+
+
+def test_pagina_filiais_keyset(banco):
+    banco.fetchone.return_value = _pagina([_estab(f"{i:04d}") for i in (2, 3, 4)])
+
+    pagina = pagina_filiais("12345678", "2026-02", depois="0001", limite=2, uf="RJ")
+
+    sql, params = banco.execute.call_args.args
+    assert "cnpj_ordem > %(depois)s" in sql
+    assert params["limite"] == 3 and params["depois"] == "0001" and params["uf"] == "RJ"
+    assert [e["cnpj_ordem"] for e in pagina["itens"]] == ["0002", "0003"]
+    assert pagina["proximo"] == "0003"
+    assert pagina["itens"][0]["data_inicio_atividade"] == date(2001, 7, 1)
+
+
+def test_pagina_socios_ultima_pagina(banco):
+    banco.fetchone.return_value = _pagina([_socio(10), _socio(11)])
+
+    pagina = pagina_socios("12345678", None, depois=9, limite=2)
+
+    assert [s["id"] for s in pagina["itens"]] == [10, 11]
+    assert pagina["proximo"] is None
+
+
+def test_api_filiais(banco, client):
+    banco.fetchone.return_value = _pagina([_estab("0002", uf="RJ"), _estab("0003")])
+    url = reverse("cnpj:api_cnpj_filiais", args=["12345678"])
+
+    resp = client.get(url, {"competencia": "2026-02", "limite": "1", "uf": "rj"})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["proximo"] == "0002"
+    (filial,) = data["filiais"]
+    assert filial["cnpj"] == "12.345.678/0002-90"
+    assert filial["situacao"] == "ATIVA"
+    assert filial["endereco"]["uf"] == "RJ"
+    assert filial["cnae_principal"]["descricao"] == "Supermercados"
+    assert banco.execute.call_args.args[1]["uf"] == "RJ"
+
+    assert client.get(url, {"depois": "x"}).status_code == 400
+    assert client.get(url, {"limite": "abc"}).status_code == 400
+
+
+def test_api_socios(banco, client):
+    banco.fetchone.return_value = _pagina([_socio(5)])
+    url = reverse("cnpj:api_cnpj_socios", args=["12345678"])
+
+    resp = client.get(url, {"depois": "4"})
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["proximo"] is None
+    assert data["socios"][0]["qualificacao"] == "Sócio-Administrador"
+    assert banco.execute.call_args.args[1]["depois"] == 4
+    assert client.get(url, {"depois": "-"}).status_code == 400
+
+
+def _historico() -> tuple:
+    socio = {
+        "identificador_socio": "1",
+        "cnpj_cpf_socio": "***123456**",
+        "qualificacao_socio": "49",
+    }
+    return (
+        json.dumps(
+            {
+                "competencias": ["2026-01", "2026-02", "2026-03"],
+                "campos": [
+                    {"competencia": "2026-02", "anterior": "2026-01", "campo": "uf",
+                     "de": "SP", "para": "RJ"},
+                    {"competencia": "2026-02", "anterior": "2026-01",
+                     "campo": "situacao_cadastral", "de": "02", "para": "04"},
+                ],
+                "socios": [
+                    {"competencia": "2026-03", "anterior": "2026-02", "movimento": "entrada",
+                     "nome_socio": "BELTRANO", **socio},
+                    {"competencia": "2026-03", "anterior": "2026-02", "movimento": "saida",
+                     "nome_socio": "FULANO", **socio},
+                ],
+            }
+        ),
+    )  # fmt: skip
+
+
+def test_historico_diferencas_numa_consulta(banco):
+    banco.fetchone.return_value = _historico()
+
+    dados = historico_alteracoes("12345678")
+
+    banco.execute.assert_called_once_with(SQL_HISTORICO, {"cnpj_basico": "12345678"})
+    assert dados["competencias"] == ["2026-01", "2026-02", "2026-03"]
+    fev, mar = dados["alteracoes"]
+    assert (fev["competencia"], fev["anterior"]) == ("2026-02", "2026-01")
+    assert fev["campos"] == [
+        {"campo": "situacao_cadastral", "grupo": "situacao", "de": "02", "para": "04"},
+        {"campo": "uf", "grupo": "endereco", "de": "SP", "para": "RJ"},
+    ]
+    assert fev["socios"] == {"entradas": [], "saidas": []}
+    assert mar["campos"] == []
+    assert [s["nome_socio"] for s in mar["socios"]["entradas"]] == ["BELTRANO"]
+    assert [s["nome_socio"] for s in mar["socios"]["saidas"]] == ["FULANO"]
+    assert "competencia" not in mar["socios"]["saidas"][0]
+
+
+def test_sql_historico_usa_janela_sobre_a_matriz():
+    assert "lag(campos) OVER w" in SQL_HISTORICO
+    assert "'cnae_fiscal_principal', cnae_fiscal_principal" in SQL_HISTORICO
+    assert "%(cnpj_basico)s" in SQL_HISTORICO
+
+
+@patch("cnpj.views._versao_dados", return_value="historico-1")
+def test_api_historico_em_cache_por_versao(_versao, banco, client):
+    banco.fetchone.return_value = _historico()
+    url = reverse("cnpj:api_cnpj_historico", args=["12.345.678"])
+
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert "public" in resp["Cache-Control"]
+    assert resp.json()["cnpj_basico"] == "12345678"
+    assert len(resp.json()["alteracoes"]) == 2
+
+    # Mesma versão dos dados → sem nova ida ao banco
+    assert client.get(url).json() == resp.json()
+    banco.execute.assert_called_once()
+
+    _versao.return_value = "historico-2"
+    banco.fetchone.return_value = (json.dumps({"competencias": [], "campos": [], "socios": []}),)
+    assert client.get(url).status_code == 404
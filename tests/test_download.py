@@ -0,0 +1,258 @@
+"""
+Testes do motor de download contra um servidor HTTP local que simula o
+servidor da Receita: quedas no meio da transferência, throttling (503) e
+troca do arquivo remoto (ETag).
+"""
+
+import io
+import json
+import logging
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cnpj.management.commands import download_cnpj
+from cnpj.management.commands.download_cnpj import (
+    _criar_sessao,
+    _download_arquivo,
+    _Manifesto,
+    _zip_integro,
+)
+
+CONTEUDO = os.urandom(2 * 1024 * 1024)
+logger = logging.getLogger("test.download")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    conteudo = CONTEUDO
+    quedas = 0  # próximas N respostas GET caem na metade
+    throttles = 0  # próximas N respostas GET são 503 + Retry-After
+    ranges: list = []
+    etag = '"v1"'
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.conteudo)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+
+    def do_GET(self):
+        cls = type(self)
+        if cls.throttles > 0:
+            cls.throttles -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        rng = self.headers.get("Range")
+        cls.ranges.append(rng)
+        inicio, fim = 0, len(self.conteudo) - 1
+        if rng and self.headers.get("If-Range", cls.etag) != cls.etag:
+            rng = None  # versão mudou: If-Range manda o arquivo inteiro
+        if rng:
+            a, _, b = rng.removeprefix("bytes=").partition("-")
+            inicio, fim = int(a), int(b) if b else fim
+            if inicio > len(self.conteudo) - 1:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(self.conteudo)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{fim}/{len(self.conteudo)}")
+        else:
+            self.send_response(200)
+        corpo = self.conteudo[inicio : fim + 1]
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+
+        if cls.quedas > 0:
+            cls.quedas -= 1
+            self.wfile.write(corpo[: len(corpo) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(corpo)
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    monkeypatch.setattr(download_cnpj.time, "sleep", lambda s: None)
+    _Handler.quedas = 0
+    _Handler.throttles = 0
+    _Handler.ranges = []
+    _Handler.conteudo = CONTEUDO
+    _Handler.etag = '"v1"'
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_queda_retoma_via_range(servidor, tmp_path):
+    """Uma queda no meio não recomeça do zero: a 2ª requisição pede só o restante"""
+    _Handler.quedas = 1
+    dest = tmp_path / "Empresas0.zip"
+
+    assert _download_arquivo(f"{servidor}/Empresas0.zip", dest, logger)
+    assert dest.read_bytes() == CONTEUDO
+    assert not dest.with_name("Empresas0.zip.part").exists()
+    assert _Handler.ranges[0] is None
+    retomada = int(_Handler.ranges[1].removeprefix("bytes=").rstrip("-"))
+    assert 0 < retomada <= len(CONTEUDO) // 2
+
+
+def test_throttling_respeita_retry_after(servidor, tmp_path):
+    _Handler.throttles = 2
+    dest = tmp_path / "Cnaes.zip"
+
+    assert _download_arquivo(f"{servidor}/Cnaes.zip", dest, logger, max_retries=3)
+    assert dest.read_bytes() == CONTEUDO
+
+
+def test_falha_definitiva_mantem_parcial(servidor, tmp_path):
+    _Handler.quedas = 2
+    dest = tmp_path / "Socios0.zip"
+
+    assert not _download_arquivo(f"{servidor}/Socios0.zip", dest, logger, max_retries=2)
+    assert not dest.exists()
+    # ... e a execução seguinte continua do parcial
+    assert _download_arquivo(f"{servidor}/Socios0.zip", dest, logger)
+    assert dest.read_bytes() == CONTEUDO
+
+
+def test_download_segmentado_com_queda(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(download_cnpj, "SEGMENTO_MIN_BYTES", 1)
+    _Handler.quedas = 1
+    dest = tmp_path / "Estabelecimentos0.zip"
+    session = _criar_sessao(4)
+
+    assert _download_arquivo(
+        f"{servidor}/Estabelecimentos0.zip", dest, logger, session=session, segmentos=4
+    )
+    assert dest.read_bytes() == CONTEUDO
+    assert all(r and r.startswith("bytes=") for r in _Handler.ranges)
+    assert not list(tmp_path.glob("*.part*"))
+
+
+def test_segmentos_de_versao_antiga_sao_descartados(servidor, tmp_path, monkeypatch):
+    """Segmentos de um download interrompido não se misturam com o arquivo novo"""
+    monkeypatch.setattr(download_cnpj, "SEGMENTO_MIN_BYTES", 1)
+    _Handler.quedas = 4
+    dest = tmp_path / "Estabelecimentos1.zip"
+    url = f"{servidor}/Estabelecimentos1.zip"
+    session = _criar_sessao(4)
+
+    assert not _download_arquivo(url, dest, logger, max_retries=1, session=session, segmentos=4)
+    assert len(list(tmp_path.glob("*.part?*"))) == 4
+
+    novo = os.urandom(len(CONTEUDO))
+    _Handler.conteudo = novo
+    _Handler.etag = '"v2"'
+    assert _download_arquivo(url, dest, logger, session=session, segmentos=4)
+    assert dest.read_bytes() == novo
+    assert not list(tmp_path.glob("Estabelecimentos1.zip.*"))
+
+
+def test_segmento_com_if_range_divergente_e_descartado(servidor, tmp_path):
+    """Se o arquivo muda no meio, o 200 do If-Range apaga o segmento em vez de travar a retomada"""
+    seg = tmp_path / "Socios1.zip.part1"
+    seg.write_bytes(CONTEUDO[1000:1500])
+    sessao = _criar_sessao(1)
+
+    with pytest.raises(RuntimeError, match="segmento descartado"):
+        download_cnpj._baixar_range(
+            sessao, f"{servidor}/Socios1.zip", seg, 1000, 1999, validador='"v0"'
+        )
+    assert not seg.exists()
+
+    download_cnpj._baixar_range(
+        sessao, f"{servidor}/Socios1.zip", seg, 1000, 1999, validador='"v1"'
+    )
+    assert seg.read_bytes() == CONTEUDO[1000:2000]
+
+
+def test_arquivo_truncado_e_retomado_nao_pulado(servidor, tmp_path):
+    """Um ZIP truncado de execução antiga (sem manifesto) continua via Range"""
+    dest = tmp_path / "Empresas1.zip"
+    dest.write_bytes(CONTEUDO[:1000])
+
+    assert _download_arquivo(f"{servidor}/Empresas1.zip", dest, logger)
+    assert dest.read_bytes() == CONTEUDO
+    assert _Handler.ranges == ["bytes=1000-"]
+
+
+def test_parcial_maior_que_o_remoto_e_descartado(servidor, tmp_path):
+    """Um `.part` maior que o arquivo remoto (que encolheu) não fica preso no 416"""
+    dest = tmp_path / "Empresas2.zip"
+    dest.with_name("Empresas2.zip.part").write_bytes(os.urandom(len(CONTEUDO) + 10))
+
+    assert _download_arquivo(f"{servidor}/Empresas2.zip", dest, logger)
+    assert dest.read_bytes() == CONTEUDO
+    assert _Handler.ranges == [None]
+
+
+def test_tamanho_divergente_descarta_parcial(servidor, tmp_path, monkeypatch):
+    dest = tmp_path / "Empresas3.zip"
+    remoto = {"tamanho": len(CONTEUDO) - 10, "aceita_range": True, "etag": '"v1"'}
+    monkeypatch.setattr(download_cnpj, "_info_remota", lambda s, u: remoto | {"last_modified": ""})
+
+    assert not _download_arquivo(f"{servidor}/Empresas3.zip", dest, logger)
+    assert not list(tmp_path.glob("Empresas3.zip*"))
+
+
+def test_reexecucao_pula_pelo_manifesto(servidor, tmp_path):
+    dest = tmp_path / "Cnaes.zip"
+    manifesto = _Manifesto(tmp_path / "manifest.json")
+    url = f"{servidor}/Cnaes.zip"
+
+    assert _download_arquivo(url, dest, logger, manifesto=manifesto)
+    entrada = json.loads((tmp_path / "manifest.json").read_text())["Cnaes.zip"]
+    assert entrada["tamanho"] == len(CONTEUDO)
+    assert entrada["etag"] == '"v1"'
+    assert len(entrada["sha256"]) == 64
+
+    _Handler.ranges = []
+    assert _download_arquivo(url, dest, logger, manifesto=_Manifesto(manifesto.path))
+    assert _Handler.ranges == []  # só o HEAD
+
+
+def test_etag_diferente_forca_novo_download(servidor, tmp_path):
+    dest = tmp_path / "Simples.zip"
+    manifesto = _Manifesto(tmp_path / "manifest.json")
+    url = f"{servidor}/Simples.zip"
+    assert _download_arquivo(url, dest, logger, manifesto=manifesto)
+
+    novo = os.urandom(len(CONTEUDO))
+    _Handler.conteudo = novo
+    _Handler.etag = '"v2"'
+    assert _download_arquivo(url, dest, logger, manifesto=manifesto)
+    assert dest.read_bytes() == novo
+    assert manifesto.get("Simples.zip")["etag"] == '"v2"'
+
+
+def test_verificacao_zip(servidor, tmp_path):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("K3241.K03200Y0.D60214.EMPRECSV", "x" * 10_000)
+    _Handler.conteudo = buf.getvalue()
+
+    ok = tmp_path / "Empresas2.zip"
+    assert _download_arquivo(f"{servidor}/Empresas2.zip", ok, logger, verificar_zip=True)
+    assert _zip_integro(ok)
+
+    _Handler.conteudo = CONTEUDO  # bytes aleatórios: sem diretório central
+    ruim = tmp_path / "Empresas3.zip"
+    assert not _download_arquivo(f"{servidor}/Empresas3.zip", ruim, logger, verificar_zip=True)
+    assert not ruim.exists()
+    assert not list(tmp_path.glob("Empresas3.zip*"))
@@ -0,0 +1,118 @@
+import csv
+import gzip
+import io
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.urls import reverse
+
+from cnpj import export
+from cnpj.export import COLUNAS_EXPORT, StreamExportacao, stream_csv, stream_parquet
+
+LOTES = [
+    [
+        {
+            "cnpj_basico": "33000167",
+            "cnpj_ordem": "0001",
+            "cnpj_dv": "01",
+            "uf": "RJ",
+            "municipio": "6001",
+            "cnae_fiscal_principal": "0600001",
+        },
+    ],
+    [
+        {
+            "cnpj_basico": "00000000",
+            "cnpj_ordem": "0001",
+            "cnpj_dv": "91",
+            "uf": "DF",
+            "municipio": "9701",
+            "cnae_fiscal_principal": "6422100",
+        },
+    ],
+]
+MUN = {"6001": "RIO DE JANEIRO", "9701": "BRASILIA"}
+CNAE = {"6422100": "Bancos múltiplos, com carteira comercial"}
+
+
+class TestStreamExportacao:
+    def test_csv_gzip_em_blocos(self):
+        blocos = list(stream_csv(iter(LOTES), MUN, CNAE, gzip=True))
+        assert len(blocos) > 1  # streaming: não é um único blob
+
+        linhas = list(csv.reader(io.StringIO(gzip.decompress(b"".join(blocos)).decode())))
+        assert linhas[0] == COLUNAS_EXPORT
+        assert linhas[1][0] == "33000167000101"
+        assert linhas[2][-2:] == ["BRASILIA", "Bancos múltiplos, com carteira comercial"]
+
+    def test_parquet_um_row_group_por_lote(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+
+        dados = b"".join(stream_parquet(iter(LOTES), MUN, CNAE))
+        arquivo = pq.ParquetFile(io.BytesIO(dados))
+        assert arquivo.metadata.num_row_groups == 2
+        assert arquivo.read().column("uf").to_pylist() == ["RJ", "DF"]
+
+    def test_close_libera_vaga_uma_unica_vez(self):
+        with patch.object(export, "liberar_slot") as mock_liberar:
+            stream = StreamExportacao(iter([b"x"]), 1)
+            stream.close()
+            stream.close()
+        mock_liberar.assert_called_once_with(1)
+
+    @patch("cnpj.export.reservar_slot", return_value=None)
+    def test_export_sem_vaga_retorna_429(self, mock_slot, client):
+        response = client.get(reverse("cnpj:api_export"), {"competencia": "2026-01"})
+        assert response.status_code == 429
+        assert response["Retry-After"]
+
+    def test_export_formato_invalido(self, client):
+        response = client.get(
+            reverse("cnpj:api_export"), {"competencia": "2026-01", "formato": "xlsx"}
+        )
+        assert response.status_code == 400
+
+
+class _AdvisoryLocks:
+    """Advisory locks de um PostgreSQL falso, compartilhados pelas conexões dos "workers"."""
+
+    def __init__(self):
+        self.donos = {}
+
+    def conexao(self):
+        """Conexão de um worker: sessão própria, mesmo servidor."""
+        sessao = object()
+        cursor = MagicMock()
+
+        def execute(sql, params):
+            chave = tuple(params)
+            if "pg_try_advisory_lock" in sql:
+                livre = self.donos.get(chave, sessao) is sessao
+                if livre:
+                    self.donos[chave] = sessao
+                cursor.fetchone.return_value = (livre,)
+            elif "pg_advisory_unlock" in sql and self.donos.get(chave) is sessao:
+                del self.donos[chave]
+
+        cursor.execute.side_effect = execute
+        conexao = MagicMock()
+        conexao.cursor.return_value.__enter__.return_value = cursor
+        return conexao
+
+
+def test_limite_de_exportacoes_compartilhado_entre_workers(settings):
+    """Workers sync de 1 thread: cada um segura uma exportação, mas o teto é do deploy."""
+    settings.CNPJ_EXPORT_MAX_CONCURRENT = 2
+    pg = _AdvisoryLocks()
+    workers = [pg.conexao() for _ in range(3)]
+
+    vagas = []
+    for conexao in workers:
+        with patch("cnpj.export.connection", conexao):
+            vagas.append(export.reservar_slot())
+    assert vagas == [0, 1, None]  # o 3º worker recebe 429
+
+    with patch("cnpj.export.connection", workers[0]):
+        export.liberar_slot(0)
+    with patch("cnpj.export.connection", workers[2]):
+        assert export.reservar_slot() == 0
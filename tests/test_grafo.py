@@ -0,0 +1,179 @@
+"""
+Testes do grafo de vínculos societários: a busca em largura sobre a lista
+de adjacência (`cnpj.grafo.vizinhanca`) faz uma consulta por nível, agrupa
+a mesma pessoa física entre empresas e não explode em nós de grau alto; a
+API valida a profundidade.
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.urls import reverse
+
+from cnpj import grafo
+from cnpj.grafo import SQL_CONSTRUIR, SQL_RAZOES, SQL_VIZINHOS, construir_vinculos, vizinhanca
+
+PF = "PF:***123456**:FULANO DE TAL"
+
+
+class _Cursor:
+    """Cursor falso que responde às consultas de `cnpj.grafo` a partir de pares empresa–sócio."""
+
+    def __init__(self, pares, razoes=None, competencia="2026-02"):
+        self.adj = {}
+        for empresa, socio in pares:
+            self.adj.setdefault(empresa, []).append((socio, "S"))
+            self.adj.setdefault(socio, []).append((empresa, "P"))
+        for vizinhos in self.adj.values():
+            vizinhos.sort()
+        self.razoes = razoes or {}
+        self.competencia = competencia
+        self.consultas = []
+        self._linhas = []
+
+    def execute(self, sql, params=None):
+        self.consultas.append(sql)
+        if sql == SQL_VIZINHOS:
+            linhas = [
+                (no, destino, relacao)
+                for no in params["nos"]
+                for destino, relacao in self.adj.get(no, [])[: params["limite"]]
+            ]
+            self._linhas = linhas[: params["limite_nivel"]]
+        elif sql == SQL_RAZOES:
+            self._linhas = [(c, self.razoes[c]) for c in params["cnpjs"] if c in self.razoes]
+        else:
+            self._linhas = [(self.competencia,)]
+
+    def fetchall(self):
+        return self._linhas
+
+    def fetchone(self):
+        return self._linhas[0]
+
+
+@pytest.fixture
+def banco():
+    def usar(cursor):
+        conexao.cursor.return_value.__enter__.return_value = cursor
+        return cursor
+
+    conexao = MagicMock()
+    with patch("cnpj.grafo.connection", conexao):
+        yield usar
+
+
+def test_bfs_por_nivel_com_pessoa_fisica(banco):
+    # 11111111 tem como sócios a PF e a empresa 22222222; a mesma PF é sócia de 33333333
+    cur = banco(
+        _Cursor(
+            [("11111111", PF), ("11111111", "22222222"), ("33333333", PF)],
+            razoes={"11111111": "HOLDING SA", "33333333": "OUTRA LTDA"},
+        )
+    )
+
+    g = vizinhanca("11111111", profundidade=2)
+
+    assert g["competencia"] == "2026-02"
+    nos = {n["id"]: n for n in g["nos"]}
+    assert [n["id"] for n in g["nos"]][0] == "11111111"
+    assert nos["11111111"]["nome"] == "HOLDING SA"
+    assert nos[PF] == {
+        "id": PF,
+        "tipo": "PF",
+        "nome": "FULANO DE TAL",
+        "documento": "***123456**",
+        "profundidade": 1,
+        "truncado": False,
+    }
+    assert nos["33333333"]["profundidade"] == 2
+    assert {(a["empresa"], a["socio"]) for a in g["arestas"]} == {
+        ("11111111", PF),
+        ("11111111", "22222222"),
+        ("33333333", PF),
+    }
+    assert g["truncado"] is False
+    # competência + 2 níveis + razões sociais
+    assert cur.consultas.count(SQL_VIZINHOS) == 2
+    assert len(cur.consultas) == 4
+
+
+def test_profundidade_limita_a_busca(banco):
+    cur = banco(_Cursor([("11111111", PF), ("33333333", PF)]))
+
+    g = vizinhanca("11111111", competencia="2026-02", profundidade=1)
+
+    assert {n["id"] for n in g["nos"]} == {"11111111", PF}
+    assert cur.consultas == [SQL_VIZINHOS, SQL_RAZOES]
+
+
+def test_holding_de_grau_alto_e_truncada(banco):
+    participacoes = [(f"{i:08d}", "99999999") for i in range(1, 5_001)]
+    cur = banco(_Cursor(participacoes))
+
+    g = vizinhanca("99999999", competencia="2026-02", profundidade=3, max_vizinhos=100)
+
+    raiz = g["nos"][0]
+    assert raiz["id"] == "99999999" and raiz["truncado"] is True
+    assert len(g["nos"]) == 101
+    assert g["truncado"] is True
+    # as participadas só apontam de volta para a raiz: nível 2 não traz nós novos
+    assert cur.consultas.count(SQL_VIZINHOS) == 2
+
+
+def test_teto_de_nos(banco):
+    banco(_Cursor([("11111111", f"{i:08d}") for i in range(20_000_000, 20_000_050)]))
+
+    g = vizinhanca("11111111", competencia="2026-02", max_nos=10)
+
+    assert len(g["nos"]) == 10
+    assert len(g["arestas"]) == 9
+    assert g["truncado"] is True
+
+
+def test_raiz_sem_vinculos_nem_empresa(banco):
+    banco(_Cursor([]))
+    assert vizinhanca("12345678")["encontrado"] is False
+
+
+def test_construir_vinculos():
+    cur = MagicMock(rowcount=42)
+    conexao = MagicMock()
+    conexao.cursor.return_value.__enter__.return_value = cur
+    with patch("cnpj.grafo.connection", conexao), patch("cnpj.grafo.transaction"):
+        vinculos, _ = construir_vinculos("2026-02")
+
+    assert vinculos == 42
+    sqls = [c.args[0] for c in cur.execute.call_args_list]
+    assert sqls[0].startswith("DELETE FROM cnpj_vinculo")
+    assert sqls[1] == SQL_CONSTRUIR
+    assert cur.execute.call_args_list[1].args[1] == {
+        "competencia": "2026-02",
+        "prefixo_pf": grafo.PREFIXO_PF,
+    }
+    assert sqls[2] == "ANALYZE cnpj_vinculo"
+
+
+def test_api_grafo(client):
+    resultado = {
+        "competencia": "2026-02",
+        "nos": [{"id": "12345678", "tipo": "PJ", "profundidade": 0, "truncado": False}],
+        "arestas": [],
+        "truncado": False,
+        "encontrado": True,
+    }
+    url = reverse("cnpj:api_cnpj_grafo", args=["12.345.678"])
+    with patch("cnpj.grafo.vizinhanca", return_value=resultado) as vz:
+        resp = client.get(url, {"depth": "3"})
+
+        assert resp.status_code == 200
+        data = json.loads(resp.content)
+        assert data["depth"] == 3 and data["nos"] == resultado["nos"]
+        vz.assert_called_once_with("12345678", None, 3)
+
+        assert client.get(url, {"depth": "4"}).status_code == 400
+        assert client.get(url, {"depth": "x"}).status_code == 400
+
+        vz.return_value = resultado | {"encontrado": False}
+        assert client.get(url).status_code == 404
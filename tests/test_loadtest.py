@@ -0,0 +1,229 @@
+"""
+Testes do teste de carga HTTP e da instrumentação: mix determinístico,
+disparo concorrente contra um servidor local, orçamento de latência,
+medição de SQL/ES por requisição e métricas no formato do Prometheus.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from cnpj.bench.carga_http import (
+    MIX_PADRAO,
+    avaliar_orcamento,
+    executar_carga,
+    montar_mix,
+    resumir,
+)
+from cnpj.instrumentacao import _contar_sql, medir
+from cnpj.middleware import HEADER_ES, HEADER_SQL, InstrumentacaoMiddleware
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Responde como a API (com os headers de contagem) ou como o ES (GET /)."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        caminho = urlsplit(self.path)
+        status = 500 if parse_qs(caminho.query).get("q") == ["falha"] else 200
+        corpo = json.dumps({"version": {"number": "8.13.0"}, "took": 7}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header(HEADER_SQL, "3")
+        self.send_header(HEADER_ES, "1")
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_mix_deterministico_e_cobre_categorias():
+    mix = montar_mix(basicos=50_000, n=2_000, seed=7)
+
+    assert mix == montar_mix(basicos=50_000, n=2_000, seed=7)
+    assert mix != montar_mix(basicos=50_000, n=2_000, seed=8)
+    assert {c for c, _ in mix} == set(MIX_PADRAO)
+    for categoria, caminho in mix:
+        if categoria == "detalhe":
+            assert caminho.startswith("/api/cnpj/") and int(caminho.split("/")[3]) < 50_000
+        elif categoria == "stats":
+            assert caminho == "/api/stats/"
+        else:
+            assert caminho.startswith("/api/busca/?")
+        if categoria == "pagina_profunda":
+            pagina = int(parse_qs(urlsplit(caminho).query)["page"][0])
+            assert 200 <= pagina <= 400  # metade final da janela de 10.000
+
+
+def test_mix_respeita_pesos():
+    mix = montar_mix(basicos=1_000, n=500, pesos={"detalhe": 1, "stats": 0})
+    assert {c for c, _ in mix} == {"detalhe"}
+
+
+def test_carga_resumo_e_orcamento(servidor):
+    mix = [("stats", "/api/stats/")] * 40 + [("nome_fuzzy", "/api/busca/?q=falha")] * 10
+
+    amostras, segundos = executar_carga(servidor, mix, concorrencia=8)
+    resumo = resumir(amostras, segundos)
+
+    assert resumo["total"]["n"] == 50
+    assert resumo["categorias"]["stats"]["erros"] == 0
+    assert resumo["categorias"]["stats"]["sql_media"] == 3
+    assert resumo["categorias"]["stats"]["es_max"] == 1
+    assert resumo["categorias"]["nome_fuzzy"]["erros"] == 10
+    assert {"p50", "p95", "p99", "rps"} <= set(resumo["total"])
+
+    violacoes = avaliar_orcamento(resumo, {"stats": 0.0001}, max_erros=0.01)
+    assert any(v.startswith("stats: p95") for v in violacoes)
+    assert any(v.startswith("nome_fuzzy: 10/10") for v in violacoes)
+    assert avaliar_orcamento(resumo, {"stats": 60_000}, max_erros=1.0) == []
+
+
+def test_conexao_recusada_conta_como_erro():
+    amostras, _ = executar_carga("http://127.0.0.1:1", [("stats", "/api/stats/")], 1, timeout=2)
+    assert amostras[0]["status"] == 0
+
+
+def test_middleware_conta_sql_e_es(servidor, settings):
+    from elasticsearch import Elasticsearch
+
+    settings.CNPJ_INSTRUMENTACAO = True
+    es = Elasticsearch(servidor)
+
+    def view(request):
+        for sql in ("SELECT 1", "SELECT 2"):
+            # O wrapper instalado pela medição é o mais externo
+            connection.execute_wrappers[-1](lambda *a: None, sql, None, False, {})
+        es.info()
+        return HttpResponse("ok")
+
+    response = InstrumentacaoMiddleware(view)(RequestFactory().get("/api/stats/"))
+
+    assert response[HEADER_SQL] == "2"
+    assert response[HEADER_ES] == "1"
+    timing = dict(item.split(";", 1)[0:2] for item in response["Server-Timing"].split(", "))
+    assert timing["es"].endswith('desc="qtd=1"')
+    assert timing["es-took"] == "dur=7.0"
+    # Wrapper instalado uma vez por conexão; fora da medição não conta nada
+    assert connection.execute_wrappers.count(_contar_sql) == 1
+    es.info()  # fora da medição: nada é contado nem quebra
+
+
+def test_middleware_desligado(settings):
+    from django.core.exceptions import MiddlewareNotUsed
+
+    settings.CNPJ_INSTRUMENTACAO = False
+    with pytest.raises(MiddlewareNotUsed):
+        InstrumentacaoMiddleware(lambda r: HttpResponse())
+
+
+def test_medicoes_isoladas_por_thread():
+    contagens = []
+
+    def trabalho(n):
+        with medir() as m:
+            for _ in range(n):
+                connection.execute_wrappers[-1](lambda *a: None, "SELECT 1", None, False, {})
+        contagens.append((n, m.sql))
+
+    threads = [threading.Thread(target=trabalho, args=(n,)) for n in (1, 5, 9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(contagens) == [(1, 1), (5, 5), (9, 9)]
+
+
+def test_metricas_por_rota_e_log(client, settings, caplog, tmp_path, monkeypatch, request):
+    import logging
+
+    from cnpj import metricas
+
+    settings.CNPJ_METRICAS_DIR = str(tmp_path)
+    monkeypatch.setattr(metricas, "registro", metricas.Registro())
+    # O logger não propaga para a raiz (settings.LOGGING)
+    logger = logging.getLogger("cnpj.requisicoes")
+    logger.addHandler(caplog.handler)
+    request.addfinalizer(lambda: logger.removeHandler(caplog.handler))
+
+    with caplog.at_level("INFO", logger="cnpj.requisicoes"):
+        for cnpj in ("00000001", "00000002"):
+            # Busca inválida: responde 400 sem tocar no banco
+            client.get("/api/busca/", {"competencia": "2026-02", "cursor": f"x{cnpj}"})
+        resposta = client.get("/metrics")
+
+    assert resposta.status_code == 200
+    assert resposta["Content-Type"].startswith("text/plain; version=0.0.4")
+    texto = resposta.content.decode()
+    rotulos = 'rota="api/busca/",metodo="GET",status="400"'
+    assert f'cnpj_http_request_duration_seconds_bucket{{{rotulos},le="+Inf"}} 2' in texto
+    assert f"cnpj_http_request_duration_seconds_count{{{rotulos}}} 2" in texto
+    assert "# TYPE cnpj_http_sql_queries_total counter" in texto
+    assert list(tmp_path.glob("*.json"))
+
+    linhas = [json.loads(r.getMessage()) for r in caplog.records if r.name == "cnpj.requisicoes"]
+    assert linhas[0]["rota"] == "api/busca/"
+    assert linhas[0]["status"] == 400
+    assert {"sql", "sql_ms", "es", "es_ms", "es_took_ms", "bytes"} <= set(linhas[0])
+
+
+def test_agregar_soma_processos():
+    from cnpj import metricas
+
+    a, b = metricas.Registro(), metricas.Registro()
+    rotulos = ("api/stats/", "GET", "200")
+    a.observar(
+        rotulos, {"cnpj_http_request_duration_seconds": 0.02}, {"cnpj_http_sql_queries_total": 3}
+    )
+    b.observar(
+        rotulos, {"cnpj_http_request_duration_seconds": 3.0}, {"cnpj_http_sql_queries_total": 1}
+    )
+
+    texto = metricas.renderizar(metricas.agregar([a.snapshot(), b.snapshot()]))
+
+    base = 'rota="api/stats/",metodo="GET",status="200"'
+    assert f'cnpj_http_request_duration_seconds_bucket{{{base},le="0.025"}} 1' in texto
+    assert f'cnpj_http_request_duration_seconds_bucket{{{base},le="5.0"}} 2' in texto
+    assert f"cnpj_http_request_duration_seconds_sum{{{base}}} 3.02" in texto
+    assert f"cnpj_http_sql_queries_total{{{base}}} 4" in texto
+
+
+def test_perfis_de_servico_no_gunicorn_conf(monkeypatch, settings):
+    import runpy
+
+    from gunicorn.config import KNOWN_SETTINGS
+
+    from cnpj.management.commands.loadtest_api import ambiente_perfil
+
+    legado = ambiente_perfil("legado", workers=2)
+    assert legado["GUNICORN_PRELOAD"] == "False" and legado["DB_CONN_MAX_AGE"] == "0"
+    assert ambiente_perfil("gthread", workers=2, threads=8)["GUNICORN_THREADS"] == "8"
+
+    for nome, valor in ambiente_perfil("asgi", workers=3).items():
+        monkeypatch.setenv(nome, valor)
+    conf = runpy.run_path(str(settings.BASE_DIR / "gunicorn.conf.py"))
+
+    assert conf["wsgi_app"] == "cnpj_portal.asgi:application"
+    assert conf["worker_class"] == "uvicorn.workers.UvicornWorker"
+    assert conf["workers"] == 3 and conf["preload_app"] is True
+    # Nomes públicos do arquivo são todos configurações conhecidas do Gunicorn
+    conhecidas = {c.name for c in KNOWN_SETTINGS}
+    assert {n for n in conf if not n.startswith("_")} <= conhecidas
@@ -0,0 +1,63 @@
+"""
+Testes do --profile do ETL: cProfile por tarefa nos workers do pool e
+relatório combinado por etapa.
+"""
+
+import json
+import pstats
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from cnpj.perfil import Perfil, configurar_worker, etapa_da_funcao, perfilado
+
+
+@perfilado
+def _tarefa(n: int) -> int:
+    dados = json.dumps([{"cnpj": f"{i:014d}"} for i in range(n)]).encode()
+    return len(zlib.decompress(zlib.compress(dados)))
+
+
+def test_etapa_da_funcao():
+    assert etapa_da_funcao("~", "<built-in method zlib.decompress>") == "descompressao"
+    assert (
+        etapa_da_funcao("~", "<method 'read_low_memory' of 'pandas._libs.parsers.TextReader'>")
+        == "parse"
+    )
+    assert etapa_da_funcao("/x/pandas/core/frame.py", "apply") == "transformacao"
+    assert (
+        etapa_da_funcao("~", "<method 'copy_expert' of 'psycopg2.extensions.cursor' objects>")
+        == "postgres"
+    )
+    assert etapa_da_funcao("/x/urllib3/connectionpool.py", "urlopen") == "rede"
+    assert etapa_da_funcao("/x/cnpj/views.py", "busca") == "outros"
+
+
+def test_sem_profile_nao_grava_nada(tmp_path):
+    assert _tarefa(10) > 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_perfil_combina_workers_por_etapa(tmp_path):
+    perfil = Perfil("teste", tmp_path / "teste_20260101_000000", top=5)
+    with ProcessPoolExecutor(
+        max_workers=2, initializer=configurar_worker, initargs=(perfil.diretorio,)
+    ) as pool:
+        assert all(r > 0 for r in pool.map(_tarefa, [2_000] * 4))
+    assert len(list(perfil.diretorio.glob("*.prof"))) == 4
+
+    relatorio = perfil.relatorio()
+    assert relatorio == tmp_path / "teste_20260101_000000_perfil.txt"
+    texto = relatorio.read_text(encoding="utf-8")
+    assert "4 tarefa(s)" in texto
+    assert "── descompressao" in texto
+    assert "── serializacao" in texto
+    assert not perfil.diretorio.exists()
+
+    funcoes = {f[2] for f in pstats.Stats(str(perfil.prof)).stats}
+    assert "_tarefa" in funcoes
+
+
+def test_relatorio_sem_tarefas(tmp_path):
+    perfil = Perfil("teste", tmp_path / "vazio")
+    assert perfil.relatorio() is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,92 @@
+"""
+Testes do agendador do pipeline_cnpj com etapas falsas em threads:
+prioridade da fila de carga, limite de concorrência e gatilho da indexação.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cnpj.management.commands.pipeline_cnpj import _Pipeline
+
+ARQUIVOS = [
+    "Socios0.zip",
+    "Estabelecimentos0.zip",
+    "Empresas0.zip",
+    "Simples.zip",
+    "Cnaes.zip",
+    "Municipios.zip",
+]
+
+
+class _Etapas:
+    def __init__(self, falhar_download=()):
+        self.falhar_download = set(falhar_download)
+        self.cargas = []
+        self.indexadas = []
+        self.simultaneas = 0
+        self.pico = 0
+        self._lock = threading.Lock()
+
+    def baixar(self, competencia, arquivo):
+        return arquivo not in self.falhar_download
+
+    def carregar(self, competencia, arquivo):
+        with self._lock:
+            self.cargas.append(arquivo)
+            self.simultaneas += 1
+            self.pico = max(self.pico, self.simultaneas)
+        time.sleep(0.01)
+        with self._lock:
+            self.simultaneas -= 1
+        return 10, []
+
+    def indexar(self, competencia):
+        self.indexadas.append((competencia, list(self.cargas)))
+        return 42
+
+
+def _executar(etapas, max_cargas=1):
+    with ThreadPoolExecutor(1) as pd, ThreadPoolExecutor(4) as pc, ThreadPoolExecutor(1) as pi:
+        return _Pipeline(
+            {"2026-02": ARQUIVOS},
+            baixar=etapas.baixar,
+            carregar=etapas.carregar,
+            indexar=etapas.indexar,
+            pool_download=pd,
+            pool_carga=pc,
+            pool_indice=pi,
+            max_cargas=max_cargas,
+        ).executar()
+
+
+def test_dominio_primeiro_e_indice_antes_de_socios():
+    etapas = _Etapas()
+    r = _executar(etapas)
+
+    assert etapas.cargas[:2] == ["Cnaes.zip", "Municipios.zip"]
+    assert etapas.cargas[-1] == "Socios0.zip"
+    competencia, carregados = etapas.indexadas[0]
+    assert competencia == "2026-02"
+    assert {"Simples.zip", "Empresas0.zip", "Estabelecimentos0.zip"} <= set(carregados)
+    assert "Socios0.zip" not in carregados
+    assert r["registros"] == 60
+    assert r["competencias"]["2026-02"]["docs"] == 42
+    assert r["primeira_linha_s"] is not None
+
+
+def test_respeita_limite_de_cargas():
+    etapas = _Etapas()
+    _executar(etapas, max_cargas=2)
+    assert etapas.pico <= 2
+    assert len(etapas.cargas) == len(ARQUIVOS)
+
+
+def test_falha_de_download_bloqueia_indice():
+    etapas = _Etapas(falhar_download={"Empresas0.zip"})
+    r = _executar(etapas)
+
+    assert r["downloads_erro"] == 1
+    assert "Empresas0.zip" not in etapas.cargas
+    assert etapas.indexadas == []
+    assert r["competencias"]["2026-02"]["indexada_s"] is None
@@ -0,0 +1,45 @@
+from django.http import QueryDict
+
+from cnpj.bench import percentil
+from cnpj.search import filtros_busca, montar_query, ordenacao
+
+
+class TestMontarQuery:
+    def test_filtros_exatos_vao_para_filter_context(self):
+        """Só o texto livre é pontuado; filtros exatos ficam em bool.filter"""
+        filtros = filtros_busca(
+            QueryDict("q=padaria&uf=sp&cnae=4721102&situacao=02&simples=x"), "2026-01"
+        )
+        assert filtros["uf"] == "SP"
+        assert "simples" not in filtros
+
+        query, tem_texto = montar_query(filtros)
+        corpo = query.to_dict()["bool"]
+
+        assert tem_texto
+        assert [list(c)[0] for c in corpo["must"]] == ["multi_match"]
+        assert {"term": {"competencia": "2026-01"}} in corpo["filter"]
+        assert {"prefix": {"cnae_fiscal_principal": "4721102"}} in corpo["filter"]
+        assert {"term": {"situacao_cadastral": "02"}} in corpo["filter"]
+
+    def test_busca_so_com_filtros_usa_constant_score(self):
+        filtros = filtros_busca(QueryDict("q=33.000.167/0001&uf=RJ"), "2026-01")
+        query, tem_texto = montar_query(filtros)
+
+        assert not tem_texto
+        filtro = query.to_dict()["constant_score"]["filter"]["bool"]["filter"]
+        assert {"prefix": {"cnpj": "330001670001"}} in filtro
+        assert ordenacao(tem_texto) == ["_doc"]
+        assert ordenacao(tem_texto, pit=True) == [{"_shard_doc": {"order": "asc"}}]
+
+    def test_modo_legado_pontua_tudo(self):
+        filtros = filtros_busca(QueryDict("q=padaria&uf=SP"), "2026-01")
+        query, _ = montar_query(filtros, filter_context=False)
+        assert len(query.to_dict()["bool"]["must"]) == 3
+
+
+def test_percentil_nearest_rank():
+    valores = [float(v) for v in range(1, 101)]
+    assert percentil(valores, 50) == 50.0
+    assert percentil(valores, 95) == 95.0
+    assert percentil([], 95) == 0.0
@@ -0,0 +1,107 @@
+"""
+Testes do autocomplete (`GET /api/suggest/`): peso das entradas do
+completion suggester e a view, servida do cache com `Cache-Control` público.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.urls import reverse
+
+from cnpj.documents import PESO_ATIVA, peso_sugestao, sugestao
+from cnpj.management.commands.index_es import SQL_LOTE, _acao_es
+
+
+def test_peso_prioriza_ativas_e_depois_estabelecimentos():
+    assert peso_sugestao("02", 1) > peso_sugestao("08", 10_000)
+    assert peso_sugestao("02", 40) > peso_sugestao("02", 3)
+    assert peso_sugestao("02", None) == PESO_ATIVA + 1
+    assert peso_sugestao("08", 10_000) == PESO_ATIVA - 1
+
+
+def test_sugestao_sem_repetir_nomes():
+    assert sugestao("PADARIA X LTDA", "PADARIA X", "02", 2) == {
+        "input": ["PADARIA X LTDA", "PADARIA X"],
+        "weight": PESO_ATIVA + 2,
+    }
+    assert sugestao("MERCADO Y", "MERCADO Y", "08", 1)["input"] == ["MERCADO Y"]
+    assert sugestao("", None, "02", 1) is None
+
+
+def test_sugestao_so_no_estabelecimento_principal():
+    matriz = (
+        "12345678", "0001", "90", "PADARIA X", "02", "SP", "7107", "1091102",
+        None, "05", "2026-02", "PADARIA X LTDA", "N", "N", 3, True,
+    )  # fmt: skip
+    filial = matriz[:1] + ("0002", "71") + matriz[3:-1] + (False,)
+
+    assert _acao_es(matriz, "idx")["_source"]["sugestao"]["weight"] == PESO_ATIVA + 3
+    assert _acao_es(filial, "idx")["_source"]["sugestao"] is None
+    # contagem por raiz num GROUP BY só, sem subconsulta correlacionada por linha
+    assert SQL_LOTE.count("count(*)") == 1 and "GROUP BY cnpj_basico" in SQL_LOTE
+
+
+def _opcao(texto, cnpj_basico):
+    fonte = SimpleNamespace(
+        cnpj_basico=cnpj_basico, cnpj_ordem="0001", cnpj_dv="91", situacao_cadastral="02", uf="SP"
+    )
+    return SimpleNamespace(text=texto, _source=fonte)
+
+
+@patch("cnpj.views._versao_dados", return_value="suggest-1")
+@patch("elasticsearch_dsl.connections.get_connection")
+@patch("cnpj.documents.EstabelecimentoDocument.search")
+def test_api_suggest_cache_e_cabecalhos(mock_search, mock_conn, mock_versao, client):
+    s = MagicMock()
+    s.using.return_value = s
+    s.source.return_value = s
+    s.extra.return_value = s
+    s.suggest.return_value = s
+    resp_es = MagicMock()
+    resp_es.suggest.sugestoes = [
+        SimpleNamespace(options=[_opcao("PADARIA X", "12345678"), _opcao("PADOCA", "87654321")])
+    ]
+    s.execute.return_value = resp_es
+    mock_search.return_value = s
+
+    url = reverse("cnpj:api_suggest")
+    params = {"q": "  pad  ", "competencia": "2026-02", "limite": "500"}
+    resp = client.get(url, params)
+
+    assert resp.status_code == 200
+    assert "public" in resp["Cache-Control"] and "max-age" in resp["Cache-Control"]
+    data = resp.json()
+    assert data["q"] == "PAD"
+    assert data["sugestoes"][0] == {
+        "texto": "PADARIA X",
+        "cnpj_basico": "12345678",
+        "cnpj": "12.345.678/0001-91",
+        "situacao": "ATIVA",
+        "uf": "SP",
+    }
+    _, texto = s.suggest.call_args.args
+    completion = s.suggest.call_args.kwargs["completion"]
+    assert texto == "PAD"
+    assert completion["size"] == 20
+    assert completion["contexts"] == {"competencia": ["2026-02"]}
+
+    # Mesmo prefixo (normalizado) → servido do cache, sem ir ao ES
+    assert client.get(url, {**params, "q": "PAD"}).json() == data
+    assert s.execute.call_count == 1
+
+
+def test_api_suggest_prefixo_curto_nao_consulta(client):
+    with patch("cnpj.documents.EstabelecimentoDocument.search") as mock_search:
+        resp = client.get(reverse("cnpj:api_suggest"), {"q": "a"})
+    assert resp.json() == {"q": "A", "sugestoes": []}
+    mock_search.assert_not_called()
+
+
+@patch("cnpj.views._versao_dados", return_value="suggest-vazio")
+@patch("cnpj.views._latest_competencia", return_value=None)
+def test_api_suggest_sem_competencia_nao_consulta(mock_latest, mock_versao, client):
+    with patch("cnpj.documents.EstabelecimentoDocument.search") as mock_search:
+        resp = client.get(reverse("cnpj:api_suggest"), {"q": "padaria"})
+    assert resp.status_code == 200
+    assert resp.json() == {"q": "PADARIA", "sugestoes": []}
+    mock_search.assert_not_called()
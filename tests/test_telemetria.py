@@ -0,0 +1,84 @@
+"""
+Testes da telemetria do ETL: eventos emitidos por workers de outro processo
+chegam ao escritor único, viram JSONL e um snapshot de progresso agregado
+por arquivo, exposto em /api/etl/progresso/.
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from django.test import RequestFactory
+
+from cnpj import telemetria
+from cnpj.telemetria import Telemetria, configurar_worker, emitir, fila_atual, ler_progresso
+
+
+def test_emitir_sem_telemetria_nao_faz_nada():
+    assert fila_atual() is None
+    emitir("chunk", competencia="2026-02", arquivo="Empresas0.zip", linhas=10)
+
+
+def test_eventos_dos_workers_viram_jsonl_e_progresso(tmp_path):
+    with Telemetria("teste", logs_dir=tmp_path) as tel:
+        with ProcessPoolExecutor(
+            max_workers=2, initializer=configurar_worker, initargs=(fila_atual(),)
+        ) as pool:
+            chave = {"competencia": "2026-02", "arquivo": "Empresas0.zip"}
+            pool.submit(emitir, "inicio", **chave).result()
+            futuros = [
+                pool.submit(
+                    emitir,
+                    "chunk",
+                    **chave,
+                    linhas=1_000,
+                    bytes=2 * 1024 * 1024,
+                    parse_s=0.01,
+                    transform_s=0.02,
+                    copy_s=0.1,
+                )
+                for _ in range(3)
+            ]
+            for f in futuros:
+                f.result()
+            pool.submit(emitir, "fim", **chave, status="OK").result()
+    assert telemetria.fila_atual() is None
+
+    eventos = [json.loads(linha) for linha in tel.caminho.read_text().splitlines()]
+    assert [e["evento"] for e in eventos].count("chunk") == 3
+    assert {"ts", "pid", "rss_mb", "competencia", "arquivo"} <= set(eventos[0])
+
+    snapshot = json.loads(tel.progresso.read_text())
+    assert snapshot["comando"] == "teste"
+    assert snapshot["ativo"] is False
+    assert snapshot["totais"] == {
+        "arquivos": 1,
+        "em_curso": 0,
+        "linhas": 3_000,
+        "bytes": 6 * 1024 * 1024,
+    }
+    (arquivo,) = snapshot["arquivos"]
+    assert arquivo["status"] == "OK"
+    assert arquivo["chunks"] == 3
+    assert arquivo["copy_s"] == 0.3
+    assert set(arquivo["etapas_ms"]) == {"parse", "transform", "copy"}
+    assert arquivo["etapas_ms"]["copy"]["n"] == 3
+
+    assert ler_progresso(tmp_path) == [snapshot]
+
+
+def test_api_etl_progresso_ativos_primeiro(tmp_path, settings):
+    from cnpj.views import api_etl_progresso
+
+    settings.CNPJ_LOGS_DIR = str(tmp_path)
+    progresso = tmp_path / telemetria.DIRETORIO_PROGRESSO
+    progresso.mkdir()
+    (progresso / "load_cnpj_1.json").write_text(json.dumps({"comando": "a", "ativo": True}))
+    (progresso / "index_es_2.json").write_text(json.dumps({"comando": "b", "ativo": False}))
+    (progresso / "quebrado.json").write_text("{")
+
+    resp = api_etl_progresso(RequestFactory().get("/api/etl/progresso/"))
+    assert resp.status_code == 200
+    assert [e["comando"] for e in json.loads(resp.content)["execucoes"]] == ["a", "b"]
+
+    resp = api_etl_progresso(RequestFactory().get("/api/etl/progresso/", {"limite": "x"}))
+    assert resp.status_code == 400
@@ -0,0 +1,229 @@
+"""
+Testes das views async (deploy ASGI): mesma resposta das views síncronas,
+várias buscas lentas no ES atendidas ao mesmo tempo por um único loop, e o
+`InstrumentacaoMiddleware` funcionando na cadeia async — inclusive contando o
+SQL executado nas threads de `sync_to_async`, que têm conexões próprias.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from cnpj import views, views_async
+from cnpj.middleware import HEADER_SQL, InstrumentacaoMiddleware
+from cnpj.motores import Disjuntor
+
+
+def _fonte(i):
+    return {
+        "cnpj_basico": f"{i:08d}",
+        "cnpj_ordem": "0001",
+        "cnpj_dv": "00",
+        "razao_social": f"EMPRESA {i}",
+        "situacao_cadastral": "02",
+        "municipio": "7107",
+        "uf": "SP",
+        "cnae_fiscal_principal": "6201501",
+    }
+
+
+@pytest.fixture
+def disjuntor():
+    with patch("cnpj.motores._disjuntor", Disjuntor(3, 30.0)):
+        yield
+
+
+@pytest.fixture
+def descricoes():
+    with (
+        patch("cnpj.views.Cnae.objects.filter") as cnae,
+        patch("cnpj.views.Municipio.objects.filter") as mun,
+    ):
+        cnae.return_value.values_list.return_value = [("6201501", "Desenvolvimento")]
+        mun.return_value.values_list.return_value = [("7107", "SAO PAULO")]
+        yield
+
+
+def _sem_elapsed(resp) -> dict:
+    data = json.loads(resp.content)
+    data.pop("elapsed")
+    return data
+
+
+def test_busca_async_responde_igual_a_sincrona(disjuntor, descricoes):
+    hits = [_fonte(i) for i in range(3)]
+    request = RequestFactory().get("/api/busca/", {"competencia": "2026-02", "uf": "sp"})
+
+    with patch("cnpj.motores.buscar_es", return_value=(3, hits)):
+        sincrona = views.api_busca(request)
+    with patch("cnpj.motores.abuscar_es", new=AsyncMock(return_value=(3, hits))) as es:
+        assincrona = async_to_sync(views_async.api_busca)(request)
+
+    assert assincrona.status_code == sincrona.status_code == 200
+    assert _sem_elapsed(assincrona) == _sem_elapsed(sincrona)
+    assert es.await_args.args[2:] == (0, views.PAGE_SIZE)
+
+
+def test_busca_async_cnpj_e_metodo(disjuntor):
+    fabrica = RequestFactory()
+    invalido = fabrica.get("/api/busca/", {"competencia": "2026-02", "q": "33000167000102"})
+    assert async_to_sync(views_async.api_busca)(invalido).status_code == 400
+    pagina = fabrica.get("/api/busca/", {"competencia": "2026-02", "page": "abc"})
+    assert async_to_sync(views_async.api_busca)(pagina).status_code == 400
+    assert async_to_sync(views_async.api_busca)(fabrica.post("/api/busca/")).status_code == 405
+
+
+def test_buscas_lentas_no_es_nao_se_enfileiram(disjuntor, descricoes):
+    """20 buscas de 100 ms no ES, num único loop, terminam em ~100 ms, não em 2 s."""
+
+    async def es_lento(query, ordem, inicio, tamanho):
+        await asyncio.sleep(0.1)
+        return 1, [_fonte(1)]
+
+    async def disparar(n):
+        fabrica = RequestFactory()
+        return await asyncio.gather(
+            *(
+                views_async.api_busca(fabrica.get("/api/busca/", {"competencia": "2026-02"}))
+                for _ in range(n)
+            )
+        )
+
+    with patch("cnpj.motores.abuscar_es", new=es_lento):
+        t0 = time.perf_counter()
+        respostas = async_to_sync(disparar)(20)
+        segundos = time.perf_counter() - t0
+
+    assert all(r.status_code == 200 for r in respostas)
+    assert segundos < 1.0
+
+
+def test_suggest_async_usa_o_cache(disjuntor):
+    payload = {"q": "PADA", "competencia": "2026-02", "sugestoes": [{"texto": "PADARIA"}]}
+    request = RequestFactory().get("/api/suggest/", {"q": "pada", "competencia": "2026-02"})
+
+    with (
+        patch("cnpj.views_async._chave_sugestao", return_value="cnpj:suggest:teste-async"),
+        patch("cnpj.views_async.cache.aget", new=AsyncMock(return_value=payload)),
+        patch("cnpj.motores.cliente_es_async") as cliente,
+    ):
+        resp = async_to_sync(views_async.api_suggest)(request)
+
+    assert json.loads(resp.content) == payload
+    assert "public" in resp["Cache-Control"]
+    cliente.assert_not_called()
+
+
+def test_suggest_async_sem_competencia_nao_consulta(disjuntor):
+    request = RequestFactory().get("/api/suggest/", {"q": "padaria"})
+
+    with (
+        patch("cnpj.views_async._chave_sugestao", return_value="cnpj:suggest:teste-vazio"),
+        patch("cnpj.views_async._latest_competencia", return_value=None),
+        patch("cnpj.motores.cliente_es_async") as cliente,
+    ):
+        resp = async_to_sync(views_async.api_suggest)(request)
+
+    assert json.loads(resp.content) == {"q": "PADARIA", "sugestoes": []}
+    cliente.assert_not_called()
+
+
+def test_middleware_na_cadeia_async(settings):
+    settings.CNPJ_INSTRUMENTACAO = True
+
+    async def view(request):
+        connection.execute_wrappers[-1](lambda *a: None, "SELECT 1", None, False, {})
+        await asyncio.sleep(0)
+        return HttpResponse("ok")
+
+    middleware = InstrumentacaoMiddleware(view)
+    assert iscoroutinefunction(middleware)
+
+    response = async_to_sync(middleware)(RequestFactory().get("/api/busca/"))
+    assert response[HEADER_SQL] == "1"
+    assert "total;dur=" in response["Server-Timing"]
+
+
+def _consulta_em_conexao_nova():
+    """SELECT numa conexão recém-aberta desta thread (driver falso, caminho real do Django)."""
+    conn = connections["default"]
+    try:
+        with (
+            patch.object(conn, "get_new_connection", return_value=MagicMock()),
+            patch.object(conn, "init_connection_state"),
+            patch.object(conn, "ensure_connection"),
+        ):
+            conn.connect()  # dispara `connection_created`
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+    finally:
+        conn.connection = None
+
+
+def test_middleware_conta_sql_das_threads_de_sync_to_async(settings):
+    settings.CNPJ_INSTRUMENTACAO = True
+
+    async def view(request):
+        # Thread à parte, com conexões próprias (como as views/reserva sob ASGI)
+        await sync_to_async(_consulta_em_conexao_nova, thread_sensitive=False)()
+        await sync_to_async(_consulta_em_conexao_nova, thread_sensitive=False)()
+        return HttpResponse("ok")
+
+    response = async_to_sync(InstrumentacaoMiddleware(view))(RequestFactory().get("/api/busca/"))
+    assert response[HEADER_SQL] == "2"
+
+
+def test_streaming_sob_asgi_entrega_pedaco_a_pedaco(settings):
+    """Export/lookup sob ASGI: o corpo é async e não é montado inteiro em memória."""
+    from django.http import StreamingHttpResponse
+
+    from cnpj import export
+
+    settings.CNPJ_ASYNC = True
+    consumidos = []
+
+    def lotes():
+        for i in range(1_000):
+            consumidos.append(i)
+            yield f"{i}\n"
+
+    with patch.object(export, "liberar_slot") as liberar:
+        response = StreamingHttpResponse(
+            views._corpo_streaming(export.StreamExportacao(lotes(), 0))
+        )
+        assert response.is_async
+
+        async def primeiros(n):
+            it = aiter(response)
+            return [await anext(it) for _ in range(n)]
+
+        assert async_to_sync(primeiros)(2) == [b"0\n", b"1\n"]
+        assert consumidos == [0, 1]
+
+        response.close()  # fim da resposta: fecha o gerador e libera a vaga
+        liberar.assert_called_once()
+
+
+def test_lookup_sob_asgi_responde_com_corpo_async(settings):
+    settings.CNPJ_ASYNC = True
+    request = RequestFactory().post(
+        "/api/cnpj/lookup",
+        data=json.dumps({"cnpjs": ["x"], "competencia": "2026-02"}),
+        content_type="application/json",
+    )
+
+    response = views.api_cnpj_lookup(request)
+
+    assert response.is_async
+
+    async def corpo():
+        return b"".join([parte async for parte in response])
+
+    assert json.loads(async_to_sync(corpo)()) == {"entrada": "x", "erro": "CNPJ inválido"}
@@ -0,0 +1,138 @@
+"""
+Testes da leitura de ZIPs direto do HTTP contra um servidor local: stream
+deflate (com e sem data descriptor), queda no meio, fallback via diretório
+central e a carga do load_cnpj a partir de uma URL.
+"""
+
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cnpj import zip_http
+from cnpj.management.commands import load_cnpj
+from cnpj.zip_http import abrir_membro_remoto
+
+# Razão social aleatória: o ZIP precisa ser maior que um bloco HTTP para a queda no meio
+CSV = "".join(
+    f'"{i:08d}";"EMPRESA {os.urandom(16).hex()} LTDA";"2062";"49";"1000,00";"01";""\n'
+    for i in range(40_000)
+)
+
+
+def _zip(metodo=zipfile.ZIP_DEFLATED, descritor=False) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=metodo) as zf:
+        if descritor:
+            # escrita em stream: tamanhos e CRC vão num data descriptor após os dados
+            with zf.open("K3241.K03200Y0.D60214.EMPRECSV", "w", force_zip64=False) as f:
+                f.write(CSV.encode("iso-8859-1"))
+        else:
+            zf.writestr("K3241.K03200Y0.D60214.EMPRECSV", CSV.encode("iso-8859-1"))
+    return buf.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    conteudo = b""
+    quedas = 0
+    ranges: list = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.conteudo)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        cls = type(self)
+        rng = self.headers.get("Range")
+        cls.ranges.append(rng)
+        inicio, fim = 0, len(self.conteudo) - 1
+        if rng:
+            a, _, b = rng.removeprefix("bytes=").partition("-")
+            inicio, fim = int(a), int(b) if b else fim
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        corpo = self.conteudo[inicio : fim + 1]
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        if cls.quedas > 0:
+            cls.quedas -= 1
+            self.wfile.write(corpo[: len(corpo) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(corpo)
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    monkeypatch.setattr(zip_http.time, "sleep", lambda s: None)
+    _Handler.quedas = 0
+    _Handler.ranges = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("descritor", [False, True])
+def test_stream_deflate(servidor, descritor):
+    _Handler.conteudo = _zip(descritor=descritor)
+
+    with abrir_membro_remoto(f"{servidor}/Empresas0.zip") as f:
+        assert f.read().decode("iso-8859-1") == CSV
+    assert _Handler.ranges == [None]  # uma única requisição, sem diretório central
+
+
+def test_stream_retoma_apos_queda(servidor):
+    _Handler.conteudo = _zip()
+    _Handler.quedas = 1
+
+    with abrir_membro_remoto(f"{servidor}/Empresas0.zip") as f:
+        assert f.read().decode("iso-8859-1") == CSV
+    assert _Handler.ranges[0] is None
+    assert _Handler.ranges[1].startswith("bytes=")
+
+
+def test_crc_divergente(servidor):
+    dados = bytearray(_zip(metodo=zipfile.ZIP_DEFLATED))
+    crc = 14  # offset do CRC-32 no cabeçalho local
+    dados[crc : crc + 4] = b"\0\0\0\0"
+    _Handler.conteudo = bytes(dados)
+
+    with abrir_membro_remoto(f"{servidor}/Empresas0.zip") as f, pytest.raises(OSError):
+        f.read()
+
+
+def test_armazenado_usa_diretorio_central(servidor):
+    _Handler.conteudo = _zip(metodo=zipfile.ZIP_STORED)
+
+    with abrir_membro_remoto(f"{servidor}/Cnaes.zip") as f:
+        assert f.read().decode("iso-8859-1") == CSV
+    assert all(r and r.startswith("bytes=") for r in _Handler.ranges[1:])
+
+
+def test_worker_carrega_de_url(servidor, tmp_path, monkeypatch):
+    _Handler.conteudo = _zip(descritor=True)
+    copiados = []
+    monkeypatch.setattr(
+        load_cnpj,
+        "_copy_dataframe_raw",
+        lambda df, tabela, colunas, dsn: copiados.append((tabela, df)) or len(df),
+    )
+    nome, qtd, erros, _ = load_cnpj._worker(
+        (f"{servidor}/2026-02/Empresas0.zip", "2026-02", False, "")
+    )
+
+    assert (nome, qtd, erros) == ("Empresas0.zip", 40_000, [])
+    assert copiados[0][0] == "cnpj_empresa"
+    assert copiados[0][1]["competencia"].iloc[0] == "2026-02"